@@ -0,0 +1,109 @@
+# ===================================================================
+# BENCHMARK: CODEC BINARIO vs JSON
+# ===================================================================
+#
+# Uso: python benchmarks/bench_codec_binario.py [turnos]
+#
+# Juega turnos de dado de 4 jugadores y arma los payloads de los eventos
+# frecuentes (paso_1_resultado_movimiento, paso_2_resultado_casilla y
+# estado_juego_actualizado) tal como los emite app.py. Compara tamaño y
+# tiempo de codificación/decodificación de codec_binario contra JSON.
+#
+# ===================================================================
+
+import os
+import sys
+import json
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.juego_web import JuegoOcaWeb
+from src.core.estado_sync import SincronizadorEstado
+from src.core import codec_binario
+
+
+def estado_de(juego):
+    return {
+        "jugadores": juego.obtener_estado_jugadores(),
+        "tablero": juego.obtener_estado_tablero(),
+        "turno_actual": juego.obtener_turno_actual(),
+        "ronda": juego.ronda,
+        "estado": "jugando",
+        "colores_jugadores": {},
+        "evento_global_activo": juego.evento_global_activo,
+    }
+
+
+def generar_payloads(turnos):
+    payloads = {evento: [] for evento in codec_binario.EVENTOS_BINARIOS}
+    juego = None
+    for _ in range(turnos):
+        if juego is None or juego.ha_terminado():
+            kits = ("tactico", "ingeniero", "espectro", "tactico")
+            juego = JuegoOcaWeb(
+                [{"nombre": f"Jugador_{i}", "kit_id": k} for i, k in enumerate(kits)]
+            )
+            sync = SincronizadorEstado()
+            sync.registrar(estado_de(juego))
+
+        nombre = juego.obtener_turno_actual()
+        resultado = juego.paso_1_lanzar_y_mover(nombre)
+        payloads["paso_1_resultado_movimiento"].append(
+            {"jugador": nombre, "resultado": resultado, "habilidad_usada": None}
+        )
+        if resultado.get("pausado"):
+            continue
+        resultado = juego.paso_2_procesar_casilla_y_avanzar(nombre)
+        payloads["paso_2_resultado_casilla"].append(
+            {
+                "estado_delta": sync.registrar(estado_de(juego)),
+                "eventos": resultado.get("eventos", []),
+            }
+        )
+        payloads["estado_juego_actualizado"].append(
+            {
+                "estado_delta": sync.registrar(estado_de(juego)),
+                "eventos_recientes": juego.eventos_turno[-5:],
+            }
+        )
+    return payloads
+
+
+def medir(codificar, decodificar, datos):
+    inicio = time.perf_counter()
+    codificados = [codificar(d) for d in datos]
+    t_cod = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    for c in codificados:
+        decodificar(c)
+    t_dec = time.perf_counter() - inicio
+    n = len(datos)
+    return sum(len(c) for c in codificados) / n, t_cod / n * 1e6, t_dec / n * 1e6
+
+
+def codificar_json(datos):
+    return json.dumps(datos, separators=(",", ":")).encode("utf-8")
+
+
+def main(turnos=400):
+    for evento, datos in generar_payloads(turnos).items():
+        if not datos:
+            continue
+        print(f"{evento} ({len(datos)} payloads)")
+        bytes_json, cod_json, dec_json = medir(codificar_json, json.loads, datos)
+        bytes_bin, cod_bin, dec_bin = medir(
+            codec_binario.codificar, codec_binario.decodificar, datos
+        )
+        print(
+            f"  json    {bytes_json:7.0f} bytes {cod_json:7.1f} µs/cod "
+            f"{dec_json:7.1f} µs/dec"
+        )
+        print(
+            f"  binario {bytes_bin:7.0f} bytes {cod_bin:7.1f} µs/cod "
+            f"{dec_bin:7.1f} µs/dec ({bytes_json / max(bytes_bin, 1):.2f}x más chico)"
+        )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 400)
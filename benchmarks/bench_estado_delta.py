@@ -0,0 +1,99 @@
+# ===================================================================
+# BENCHMARK: ESTADO COMPLETO vs DELTA VERSIONADO
+# ===================================================================
+#
+# Uso: python benchmarks/bench_estado_delta.py [turnos]
+#
+# Juega una partida de 4 bots y, en cada turno, compara el tamaño y el
+# tiempo de codificación JSON del estado_juego completo contra el delta
+# de SincronizadorEstado. Se reporta aparte el costo de calcular el delta
+# (una vez por emit) y el de codificar (Socket.IO codifica el paquete una
+# vez por destinatario). La última línea mide el paquete por destinatario
+# cuando el delta ya viene pre-codificado (JSONCrudo + JsonSocketIO).
+#
+# ===================================================================
+
+import os
+import sys
+import json
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.juego_web import JuegoOcaWeb
+from src.core.bot_runtime import cargar_agente_inferencia
+from src.core.estado_sync import SincronizadorEstado
+from src.core.proyeccion_estado import JSONCrudo, JsonSocketIO
+
+
+def estado_de(juego):
+    return {
+        "jugadores": juego.obtener_estado_jugadores(),
+        "tablero": juego.obtener_estado_tablero(),
+        "turno_actual": juego.obtener_turno_actual(),
+        "ronda": juego.ronda,
+        "estado": "jugando",
+        "colores_jugadores": {},
+        "evento_global_activo": juego.evento_global_activo,
+    }
+
+
+def main(turnos=400):
+    agente = cargar_agente_inferencia()
+    sync = SincronizadorEstado()
+    bytes_completo = bytes_delta = 0
+    codificar_completo = codificar_delta = calcular_delta = paquete_crudo = 0.0
+    medidos = 0
+
+    juego = None
+    for _ in range(turnos):
+        if juego is None or juego.ha_terminado():
+            kits = ("tactico", "ingeniero", "espectro", "tactico")
+            juego = JuegoOcaWeb(
+                [{"nombre": f"Bot_{i}", "kit_id": k} for i, k in enumerate(kits)]
+            )
+            sync = SincronizadorEstado()
+            sync.registrar(estado_de(juego))
+        juego.ejecutar_turno_bot(juego.obtener_turno_actual(), agente)
+
+        estado = estado_de(juego)
+        inicio = time.perf_counter()
+        bytes_completo += len(json.dumps(estado))
+        codificar_completo += time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        delta = sync.registrar(estado)
+        calcular_delta += time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        bytes_delta += len(json.dumps(delta))
+        codificar_delta += time.perf_counter() - inicio
+
+        crudo = JSONCrudo.codificar(delta)
+        inicio = time.perf_counter()
+        JsonSocketIO.dumps(
+            ["estado_juego_actualizado", {"estado_delta": crudo}],
+            separators=(",", ":"),
+        )
+        paquete_crudo += time.perf_counter() - inicio
+        medidos += 1
+
+    print(f"Turnos medidos: {medidos}")
+    print(
+        f"completo {bytes_completo / medidos:8.0f} bytes/turno "
+        f"{codificar_completo / medidos * 1e6:8.1f} µs/codificación"
+    )
+    print(
+        f"delta    {bytes_delta / medidos:8.0f} bytes/turno "
+        f"{codificar_delta / medidos * 1e6:8.1f} µs/codificación "
+        f"(+{calcular_delta / medidos * 1e6:.1f} µs por emit para calcularlo)"
+    )
+    print(
+        f"paquete con delta pre-codificado {paquete_crudo / medidos * 1e6:.1f} "
+        "µs/destinatario"
+    )
+    print(f"Reducción de tamaño: {bytes_completo / max(bytes_delta, 1):.1f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 400)
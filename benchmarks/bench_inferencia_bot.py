@@ -0,0 +1,56 @@
+# ===================================================================
+# BENCHMARK: LATENCIA DE INFERENCIA DEL BOT (TORCH vs NUMPY)
+# ===================================================================
+#
+# Uso: python benchmarks/bench_inferencia_bot.py [iteraciones]
+#
+# Mide el tiempo por decisión (un estado de 9 floats) del forward de
+# torch y del runtime NumPy que usan los workers web.
+#
+# ===================================================================
+
+import os
+import sys
+import time
+import tempfile
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.bot_runtime import cargar_agente_inferencia
+
+
+def medir(nombre, funcion, estados):
+    inicio = time.perf_counter()
+    for estado in estados:
+        funcion(estado)
+    total = time.perf_counter() - inicio
+    print(f"{nombre:<8} {total / len(estados) * 1e6:8.2f} µs/decisión")
+    return total
+
+
+def main(iteraciones=20000):
+    import torch
+    from src.core.bot_agent import VoltraceAgent
+
+    torch.set_num_threads(1)
+    agente = VoltraceAgent()
+    agente.epsilon = 0.0
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta = os.path.join(carpeta, "cerebro.npz")
+        agente.exportar_pesos(ruta)
+        runtime = cargar_agente_inferencia(ruta)
+    runtime.epsilon = 0.0
+
+    estados = np.random.default_rng(0).random((iteraciones, 9), dtype=np.float32)
+    lista = [list(map(float, e)) for e in estados]
+
+    t_torch = medir("torch", agente.tomar_decision, lista)
+    t_numpy = medir("numpy", runtime.tomar_decision, lista)
+    print(f"speedup  {t_torch / t_numpy:8.2f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
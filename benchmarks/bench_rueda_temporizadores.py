@@ -0,0 +1,106 @@
+# ===================================================================
+# BENCHMARK: RUEDA DE TEMPORIZADORES vs threading.Timer
+# ===================================================================
+#
+# Uso: python benchmarks/bench_rueda_temporizadores.py [temporizadores]
+#
+# Simula N temporizadores concurrentes con la forma de los del servidor
+# (timeouts de turno de 30-120 s, revanchas, invitaciones de 10 min): se
+# agendan todos, el 90% se cancela antes de vencer (el jugador actuó a
+# tiempo) y se avanza el reloj (simulado) hasta que vence el resto.
+# Compara con crear, iniciar y cancelar un threading.Timer por cada uno.
+#
+# ===================================================================
+
+import os
+import sys
+import time
+import random
+import threading
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.rueda_temporizadores import RuedaTemporizadores
+
+
+class RelojFalso:
+    def __init__(self):
+        self.ahora = 0.0
+
+    def __call__(self):
+        return self.ahora
+
+
+def medir_rueda(retardos, cancelar):
+    reloj = RelojFalso()
+    rueda = RuedaTemporizadores(reloj=reloj)
+    disparados = [0]
+
+    def vencer():
+        disparados[0] += 1
+
+    inicio = time.perf_counter()
+    temporizadores = [rueda.agendar(r, vencer) for r in retardos]
+    t_agendar = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    for i in cancelar:
+        temporizadores[i].cancelar()
+    t_cancelar = time.perf_counter() - inicio
+
+    # Ticker simulado: un avance por tick de 0.1 s hasta que vence todo
+    ticks = 0
+    inicio = time.perf_counter()
+    while rueda.pendientes:
+        reloj.ahora += rueda.resolucion
+        rueda.avanzar()
+        ticks += 1
+    t_avanzar = time.perf_counter() - inicio
+    return t_agendar, t_cancelar, t_avanzar, ticks, disparados[0]
+
+
+def medir_threading(retardos, cancelar):
+    inicio = time.perf_counter()
+    timers = []
+    for r in retardos:
+        timer = threading.Timer(r, lambda: None)
+        timer.daemon = True
+        timer.start()
+        timers.append(timer)
+    t_agendar = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    for timer in timers:
+        timer.cancel()
+    t_cancelar = time.perf_counter() - inicio
+    for timer in timers:
+        timer.join()
+    return t_agendar, t_cancelar
+
+
+def main(n=10_000):
+    azar = random.Random(42)
+    retardos = [azar.choice((azar.uniform(30, 120), 30.0, 600.0)) for _ in range(n)]
+    cancelar = azar.sample(range(n), int(n * 0.9))
+
+    t_agendar, t_cancelar, t_avanzar, ticks, disparados = medir_rueda(
+        retardos, cancelar
+    )
+    print(f"{n} temporizadores concurrentes ({len(cancelar)} cancelados)")
+    print(
+        f"rueda     agendar {t_agendar / n * 1e6:6.2f} µs  "
+        f"cancelar {t_cancelar / len(cancelar) * 1e6:6.2f} µs  "
+        f"avanzar {t_avanzar / ticks * 1e6:6.2f} µs/tick ({ticks} ticks, "
+        f"{disparados} vencidos)"
+    )
+
+    t_agendar, t_cancelar = medir_threading(retardos, cancelar)
+    print(
+        f"threading agendar {t_agendar / n * 1e6:6.2f} µs  "
+        f"cancelar {t_cancelar / n * 1e6:6.2f} µs  "
+        f"(+{n} hilos vivos mientras esperan)"
+    )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000)
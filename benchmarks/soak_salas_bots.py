@@ -0,0 +1,49 @@
+# ===================================================================
+# SOAK TEST: SALAS SOLO DE BOTS EN FAST-FORWARD
+# ===================================================================
+#
+# Uso: python benchmarks/soak_salas_bots.py [salas] [bots_por_sala]
+#
+# Crea N salas con solo bots y sin oyentes, las deja correr a velocidad
+# de motor a través del planificador y reporta duración, partidas por
+# segundo y las métricas del planificador.
+#
+# ===================================================================
+
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import src.app as servidor  # noqa: E402  (aplica el monkey patch de eventlet)
+
+
+def main(cantidad_salas=50, bots_por_sala=4):
+    salas = []
+    for n in range(cantidad_salas):
+        sala = servidor.SalaJuego(f"soak{n:04d}")
+        for i in range(1, bots_por_sala + 1):
+            sala.agregar_jugador(f"Bot_{i}", f"Bot_{i}")
+        sala.iniciar_juego()
+        servidor.salas_activas[sala.id_sala] = sala
+        salas.append(sala)
+
+    inicio = time.monotonic()
+    for sala in salas:
+        servidor._iniciar_temporizador_turno(
+            sala.id_sala, sala.juego.obtener_turno_actual()
+        )
+    while any(sala.estado == "jugando" for sala in salas):
+        servidor.socketio.sleep(0.1)
+    duracion = time.monotonic() - inicio
+
+    rondas = sum(sala.juego.ronda for sala in salas)
+    print(f"{cantidad_salas} partidas en {duracion:.2f}s")
+    print(f"{cantidad_salas / duracion:.1f} partidas/s, {rondas} rondas en total")
+    print(servidor.planificador_bots.obtener_metricas())
+
+
+if __name__ == "__main__":
+    argumentos = [int(a) for a in sys.argv[1:3]]
+    main(*argumentos)
@@ -0,0 +1,21 @@
+# ===================================================================
+# CONFIGURACIÓN DE GUNICORN - VOLTRACE (gunicorn.conf.py)
+# ===================================================================
+#
+# Gunicorn la carga sola desde el directorio de trabajo (ver el CMD del
+# Dockerfile). Los workers se configuran por línea de comandos; acá solo
+# van los hooks del proceso maestro.
+#
+# ===================================================================
+
+import os
+
+
+# El segmento de pesos compartidos sobrevive a los workers (un worker
+# reiniciado se reconecta al mismo); se borra cuando se apaga el maestro.
+def on_exit(server):
+    nombre_segmento = os.environ.get("VOLTRACE_SHM_PESOS")
+    if nombre_segmento:
+        from src.core.pesos_compartidos import destruir_segmento
+
+        destruir_segmento(nombre_segmento)
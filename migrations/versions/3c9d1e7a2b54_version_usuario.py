@@ -0,0 +1,28 @@
+"""Version de usuario para concurrencia optimista
+
+Revision ID: 3c9d1e7a2b54
+Revises: ebbfa2fbc648
+Create Date: 2026-10-19 10:12:41.318204
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "3c9d1e7a2b54"
+down_revision = "ebbfa2fbc648"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("user", schema=None) as batch_op:
+        batch_op.add_column(
+            sa.Column("version", sa.Integer(), nullable=False, server_default="1")
+        )
+
+
+def downgrade():
+    with op.batch_alter_table("user", schema=None) as batch_op:
+        batch_op.drop_column("version")
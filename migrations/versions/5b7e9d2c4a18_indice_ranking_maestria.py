@@ -0,0 +1,26 @@
+"""Indice de ranking de maestria por kit y XP
+
+Revision ID: 5b7e9d2c4a18
+Revises: 8f2a4c6d1e93
+Create Date: 2026-10-19 15:20:41.337120
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "5b7e9d2c4a18"
+down_revision = "8f2a4c6d1e93"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("user_kit_maestria", schema=None) as batch_op:
+        batch_op.create_index("ix_maestria_kit_xp", ["kit_id", "xp"], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table("user_kit_maestria", schema=None) as batch_op:
+        batch_op.drop_index("ix_maestria_kit_xp")
@@ -0,0 +1,44 @@
+"""Indice unico de maestria por usuario y kit
+
+Revision ID: 8f2a4c6d1e93
+Revises: 3c9d1e7a2b54
+Create Date: 2026-10-19 12:40:05.902114
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "8f2a4c6d1e93"
+down_revision = "3c9d1e7a2b54"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Fusionar duplicados (sumando XP) antes de exigir unicidad
+    op.execute("""
+        UPDATE user_kit_maestria SET
+            xp = (SELECT SUM(m.xp) FROM user_kit_maestria m
+                  WHERE m.user_id = user_kit_maestria.user_id
+                    AND m.kit_id = user_kit_maestria.kit_id),
+            cosmetic_unlocked = (SELECT MAX(CASE WHEN m.cosmetic_unlocked THEN 1 ELSE 0 END)
+                                 FROM user_kit_maestria m
+                                 WHERE m.user_id = user_kit_maestria.user_id
+                                   AND m.kit_id = user_kit_maestria.kit_id) = 1
+        """)
+    op.execute("""
+        DELETE FROM user_kit_maestria WHERE id NOT IN (
+            SELECT MIN(id) FROM user_kit_maestria GROUP BY user_id, kit_id
+        )
+        """)
+    with op.batch_alter_table("user_kit_maestria", schema=None) as batch_op:
+        batch_op.create_index(
+            "uq_maestria_usuario_kit", ["user_id", "kit_id"], unique=True
+        )
+
+
+def downgrade():
+    with op.batch_alter_table("user_kit_maestria", schema=None) as batch_op:
+        batch_op.drop_index("uq_maestria_usuario_kit")
@@ -0,0 +1,67 @@
+"""Resultados de partida y resumenes por periodo
+
+Revision ID: d4a8c2f61b37
+Revises: 5b7e9d2c4a18
+Create Date: 2026-10-19 17:42:08.915264
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "d4a8c2f61b37"
+down_revision = "5b7e9d2c4a18"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "resultado_partida",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("kit_id", sa.String(length=50), nullable=True),
+        sa.Column("ganador", sa.Boolean(), nullable=False),
+        sa.Column("xp_ganada", sa.Integer(), nullable=False),
+        sa.Column("jugada_en", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["user.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    with op.batch_alter_table("resultado_partida", schema=None) as batch_op:
+        batch_op.create_index(
+            batch_op.f("ix_resultado_partida_user_id"), ["user_id"], unique=False
+        )
+        batch_op.create_index(
+            batch_op.f("ix_resultado_partida_jugada_en"), ["jugada_en"], unique=False
+        )
+
+    op.create_table(
+        "resumen_periodo",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("periodo", sa.String(length=10), nullable=False),
+        sa.Column("inicio", sa.Date(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("games_played", sa.Integer(), nullable=False),
+        sa.Column("games_won", sa.Integer(), nullable=False),
+        sa.Column("xp_ganada", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["user.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    with op.batch_alter_table("resumen_periodo", schema=None) as batch_op:
+        batch_op.create_index(
+            "uq_resumen_periodo_usuario",
+            ["periodo", "inicio", "user_id"],
+            unique=True,
+        )
+
+
+def downgrade():
+    with op.batch_alter_table("resumen_periodo", schema=None) as batch_op:
+        batch_op.drop_index("uq_resumen_periodo_usuario")
+    op.drop_table("resumen_periodo")
+
+    with op.batch_alter_table("resultado_partida", schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f("ix_resultado_partida_jugada_en"))
+        batch_op.drop_index(batch_op.f("ix_resultado_partida_user_id"))
+    op.drop_table("resultado_partida")
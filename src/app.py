@@ -41,6 +41,7 @@ from flask import (
     url_for,
     redirect,
     current_app,
+    copy_current_request_context,
 )
 from flask_migrate import Migrate
 from flask_socketio import SocketIO, emit, join_room, leave_room
@@ -49,8 +50,8 @@ from sendgrid import SendGridAPIClient
 from sendgrid.helpers.mail import Mail as SendGridMail, TrackingSettings, ClickTracking
 import json
 import uuid
+import functools
 from datetime import datetime
-from threading import Timer
 import threading
 import time
 import logging
@@ -66,6 +67,7 @@ basedir_env = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 load_dotenv(os.path.join(basedir_env, ".env"))
 
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.orm.exc import StaleDataError
 from flask_login import (
     LoginManager,
     UserMixin,
@@ -77,23 +79,50 @@ from flask_login import (
 from werkzeug.security import generate_password_hash, check_password_hash
 
 # Importaciones de nuestros módulos locales
-from src.core.ml_adapter import VoltraceMLAdapter
-from src.core.bot_agent import VoltraceAgent
+from src.core.bot_runtime import cargar_agente_inferencia
+from src.core.planificador_bots import PlanificadorBots
+from src.core.rueda_temporizadores import RuedaTemporizadores
+from src.core.cola_comandos import ColaComandosSala
+from src.core.ejecutor_db import EjecutorDB
+from src.core import psycopg_cooperativo
+from src.core.carriles_db import CarrilesDB
+from src.core.fin_partida_db import EscritorFinPartida
+from src.core.ranking import RankingMaterializado, RankingsMaestria, TAMANO_TOP
+from src.core.temporadas import EstadisticasTemporada, PERIODOS, METRICAS
+from src.core.avisos_estado import AgregadorEstados
+from src.core.identidades import CacheIdentidades
+from src.core.proyeccion_estado import ProyeccionSala, JsonSocketIO
+from src.core import codec_binario
+from src.core.catalogo import (
+    CATALOGO,
+    ETAG_CATALOGO,
+    HABILIDADES_POR_CATEGORIA,
+    ETAG_HABILIDADES,
+    ETAG_PERKS,
+    catalogo_casillas,
+)
 from src.core.juego_web import JuegoOcaWeb
 from src.core.achievements import AchievementSystem
 from src.social import SocialSystem
 from src.models import db, User, UserKitMaestria
-from src.core.habilidades import crear_habilidades, KITS_VOLTRACE
+from src.core.habilidades import KITS_VOLTRACE
 from src.core.perks import PERKS_CONFIG
 from src.core.game_config import (
     DURACION_TURNO_SEGUNDOS,
-    XP_POR_PARTIDA,
-    XP_VICTORIA,
-    XP_MAESTRIA_BASE,
-    XP_MAESTRIA_VICTORIA,
     COSTO_PACK_BASICO,
     COSTO_PACK_INTERMEDIO,
     COSTO_PACK_AVANZADO,
+    RETARDO_TURNO_BOT_SEGUNDOS,
+    MAX_WORKERS_BOTS,
+    RITMO_BOTS_CON_ESPECTADORES,
+    MAX_WORKERS_DB,
+    MAX_COLA_DB,
+    MAX_CACHE_LOGROS,
+    MAX_CACHE_AMIGOS,
+    MAX_CACHE_IDENTIDADES,
+    PRESENCIA_TTL_SEGUNDOS,
+    PRESENCIA_BARRIDO_SEGUNDOS,
+    VENTANA_AVISOS_ESTADO_SEGUNDOS,
 )
 
 # --- Configuración de Logging ---
@@ -209,7 +238,9 @@ Si no solicitaste este cambio, simplemente ignorá este email.
 
 
 # --- Configuración de la Base de Datos (SQLAlchemy) ---
-db_lock = threading.Lock()
+# Escrituras serializadas por usuario (carriles) en vez de un lock global;
+# User.version detecta las que se cruzan por fuera (ver carriles_db.py)
+carriles_db = CarrilesDB()
 basedir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 DATABASE_URL = os.environ.get("DATABASE_URL")
 if DATABASE_URL:
@@ -218,6 +249,8 @@ if DATABASE_URL:
     if DATABASE_URL.startswith("postgres://"):
         DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
     app.config["SQLALCHEMY_DATABASE_URI"] = DATABASE_URL
+    # Las consultas ceden el hub de eventlet en vez de congelarlo
+    psycopg_cooperativo.activar()
     app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
         "pool_pre_ping": True,  # Verifica la conexión antes de usarla
         "pool_recycle": 280,  # Recicla la conexión cada 280s
@@ -281,7 +314,14 @@ def update_xp_and_level(user, xp_to_add):
             level_up = True
 
         db.session.commit()
+        ranking.actualizar(
+            user.username, user.level, user.xp, user.games_played, user.games_won
+        )
         return level_up
+    except StaleDataError:
+        # Otra escritura se adelantó: que carriles_db.ejecutar reintente
+        db.session.rollback()
+        raise
     except Exception as e:
         db.session.rollback()
         logger.error(
@@ -290,176 +330,257 @@ def update_xp_and_level(user, xp_to_add):
         return False
 
 
+# Emite el aviso de logros desbloqueados a un jugador.
+def _emitir_logros_desbloqueados(unlocked_list, sid):
+    if unlocked_list and sid:
+        socketio.emit(
+            "achievements_unlocked",
+            {
+                "achievements": [
+                    achievement_system.get_achievement_info(ach_id)
+                    for ach_id in unlocked_list
+                ]
+            },
+            to=sid,
+        )
+
+
+# Escrituras de columnas sueltas del perfil (avatar, kit, título). Van
+# por carriles_db como el resto: releen al usuario en cada intento, así
+# un choque de versión con un fin de partida o un logro se reintenta.
+def _actualizar_usuario_db(username, **valores):
+    user = User.query.filter_by(username=username).first()
+    if not user:
+        return None
+    for campo, valor in valores.items():
+        setattr(user, campo, valor)
+    db.session.commit()
+    return user
+
+
+def _cambiar_password_db(username, password):
+    user = User.query.filter_by(username=username).first()
+    user.set_password(password)
+    db.session.commit()
+
+
+# Suma 1 a un contador del usuario y le da XP, en un solo commit. Corre
+# dentro de carriles_db.ejecutar (se repite entera si hay conflicto).
+# Devuelve (user, level_up) o (None, False) si el usuario no existe.
+def _sumar_contador_usuario_db(username, contador, xp):
+    user = User.query.filter_by(username=username).first()
+    if not user:
+        return None, False
+    setattr(user, contador, (getattr(user, contador, 0) or 0) + 1)
+    level_up = update_xp_and_level(user, xp)
+    return user, level_up
+
+
 def _procesar_creacion_sala_db_async(app, sid, username):
     with app.app_context():
-        with db_lock:
-            try:
-                logger.debug(
-                    f"THREAD: Procesando XP/Logros de creación de sala para: {username}"
+        try:
+            logger.debug(
+                f"THREAD: Procesando XP/Logros de creación de sala para: {username}"
+            )
+            user, level_up = carriles_db.ejecutar(
+                [username], _sumar_contador_usuario_db, username, "rooms_created", 5
+            )
+            if user:
+                socketio.emit(
+                    "profile_stats_updated",
+                    {
+                        "rooms_created": user.rooms_created,
+                        "xp": user.xp,
+                        "level": user.level,
+                        "xp_next_level": get_xp_for_next_level(user.level),
+                    },
+                    to=sid,
                 )
-                user = User.query.filter_by(username=username).first()
-                if user:
-                    user.rooms_created = getattr(user, "rooms_created", 0) + 1
-                    level_up = update_xp_and_level(user, 5)
+                if level_up:
                     socketio.emit(
-                        "profile_stats_updated",
-                        {
-                            "rooms_created": user.rooms_created,
-                            "xp": user.xp,
-                            "level": user.level,
-                            "xp_next_level": get_xp_for_next_level(user.level),
-                        },
-                        to=sid,
+                        "level_up", {"new_level": user.level, "xp": user.xp}, to=sid
                     )
-                    if level_up:
-                        socketio.emit(
-                            "level_up", {"new_level": user.level, "xp": user.xp}, to=sid
-                        )
 
-                    # Verificar logros
-                    unlocked_list = achievement_system.check_achievement(
-                        username, "room_created"
-                    )
-                    if unlocked_list:
-                        socketio.emit(
-                            "achievements_unlocked",
-                            {
-                                "achievements": [
-                                    achievement_system.get_achievement_info(ach_id)
-                                    for ach_id in unlocked_list
-                                ]
-                            },
-                            to=sid,
-                        )
-                logger.debug(
-                    f"THREAD: Fin de procesamiento de creación de sala para: {username}"
-                )
-            except Exception as e:
-                logger.error(
-                    f"!!! ERROR FATAL en _procesar_creacion_sala_db_async: {e}",
-                    exc_info=True,
+                # Verificar logros
+                unlocked_list = achievement_system.check_achievement(
+                    username, "room_created"
                 )
+                _emitir_logros_desbloqueados(unlocked_list, sid)
+            logger.debug(
+                f"THREAD: Fin de procesamiento de creación de sala para: {username}"
+            )
+        except Exception as e:
+            logger.error(
+                f"!!! ERROR FATAL en _procesar_creacion_sala_db_async: {e}",
+                exc_info=True,
+            )
 
 
 def _procesar_habilidad_db_async(app, sid, username, event_data=None):
     with app.app_context():
-        with db_lock:
-            try:
-                if event_data is None:
-                    event_data = {}  # Asegurar que sea un dict
-
-                logger.debug(f"Thread Habilidad: Procesando XP para {username}")
-                user_db = User.query.filter_by(username=username).first()
-                if user_db:
-                    # Actualizar XP y Nivel
-                    user_db.abilities_used = getattr(user_db, "abilities_used", 0) + 1
-                    level_up = update_xp_and_level(user_db, 10)
-                    socketio.emit(
-                        "profile_stats_updated",
-                        {
-                            "abilities_used": user_db.abilities_used,
-                            "xp": user_db.xp,
-                            "level": user_db.level,
-                            "xp_next_level": get_xp_for_next_level(user_db.level),
-                        },
-                        to=sid,
-                    )
-                    if level_up:
-                        socketio.emit(
-                            "level_up",
-                            {"new_level": user_db.level, "xp": user_db.xp},
-                            to=sid,
-                        )
+        try:
+            if event_data is None:
+                event_data = {}  # Asegurar que sea un dict
 
-                # Pasar el event_data completo a check_achievement
-                unlocked_list = achievement_system.check_achievement(
-                    username, "ability_used", event_data
+            logger.debug(f"Thread Habilidad: Procesando XP para {username}")
+            user_db, level_up = carriles_db.ejecutar(
+                [username], _sumar_contador_usuario_db, username, "abilities_used", 10
+            )
+            if user_db:
+                socketio.emit(
+                    "profile_stats_updated",
+                    {
+                        "abilities_used": user_db.abilities_used,
+                        "xp": user_db.xp,
+                        "level": user_db.level,
+                        "xp_next_level": get_xp_for_next_level(user_db.level),
+                    },
+                    to=sid,
                 )
-
-                if unlocked_list:
+                if level_up:
                     socketio.emit(
-                        "achievements_unlocked",
-                        {
-                            "achievements": [
-                                achievement_system.get_achievement_info(ach_id)
-                                for ach_id in unlocked_list
-                            ]
-                        },
+                        "level_up",
+                        {"new_level": user_db.level, "xp": user_db.xp},
                         to=sid,
                     )
 
-                logger.debug(f"THREAD: Fin de procesamiento para: {username}")
-            except Exception as e:
-                logger.error(
-                    f"!!! ERROR FATAL en _procesar_habilidad_db_async: {e}",
-                    exc_info=True,
-                )
+            # Pasar el event_data completo a check_achievement
+            unlocked_list = achievement_system.check_achievement(
+                username, "ability_used", event_data
+            )
+            _emitir_logros_desbloqueados(unlocked_list, sid)
+
+            logger.debug(f"THREAD: Fin de procesamiento para: {username}")
+        except Exception as e:
+            logger.error(
+                f"!!! ERROR FATAL en _procesar_habilidad_db_async: {e}",
+                exc_info=True,
+            )
 
 
 def _procesar_chat_db_async(app, sid, username, id_sala):
     with app.app_context():
-        with db_lock:
-            try:
-                user_db = User.query.filter_by(username=username).first()
-                if user_db:
-                    user_db.game_messages_sent = (
-                        getattr(user_db, "game_messages_sent", 0) + 1
+        try:
+            carriles_db.ejecutar(
+                [username],
+                _sumar_contador_usuario_db,
+                username,
+                "game_messages_sent",
+                1,
+            )
+
+            # Incrementar el contador de la partida actual en JuegoOcaWeb
+            sala = salas_activas.get(id_sala)
+            if sala and sala.juego:
+                jugador_juego = sala.juego._encontrar_jugador(username)
+                if jugador_juego:
+                    jugador_juego.game_messages_sent_this_match = (
+                        getattr(jugador_juego, "game_messages_sent_this_match", 0) + 1
                     )
-                    update_xp_and_level(user_db, 1)
-
-                # Incrementar el contador de la partida actual en JuegoOcaWeb
-                sala = salas_activas.get(id_sala)
-                if sala and sala.juego:
-                    jugador_juego = sala.juego._encontrar_jugador(username)
-                    if jugador_juego:
-                        jugador_juego.game_messages_sent_this_match = (
-                            getattr(jugador_juego, "game_messages_sent_this_match", 0)
-                            + 1
-                        )
 
-            except Exception as e:
-                logger.error(
-                    f"!!! ERROR en _procesar_chat_db_async: {e}", exc_info=True
-                )
+        except Exception as e:
+            logger.error(f"!!! ERROR en _procesar_chat_db_async: {e}", exc_info=True)
+
+
+def _sumar_mensaje_privado_db(sender_username):
+    user_db = User.query.filter_by(username=sender_username).first()
+    if user_db:
+        user_db.private_messages_sent = getattr(user_db, "private_messages_sent", 0) + 1
+        db.session.commit()
 
 
 def _procesar_pm_db_async(app, sid, sender_username):
     with app.app_context():
-        with db_lock:
-            try:
-                user_db = User.query.filter_by(username=sender_username).first()
-                if user_db:
-                    user_db.private_messages_sent = (
-                        getattr(user_db, "private_messages_sent", 0) + 1
-                    )
-                    db.session.commit()
+        try:
+            carriles_db.ejecutar(
+                [sender_username], _sumar_mensaje_privado_db, sender_username
+            )
 
-                unlocked = achievement_system.check_achievement(
-                    sender_username, "private_message_sent"
-                )
-                if unlocked:
-                    socketio.emit(
-                        "achievements_unlocked",
-                        {
-                            "achievements": [
-                                achievement_system.get_achievement_info(ach_id)
-                                for ach_id in unlocked
-                            ]
-                        },
-                        to=sid,
-                    )
+            unlocked = achievement_system.check_achievement(
+                sender_username, "private_message_sent"
+            )
+            _emitir_logros_desbloqueados(unlocked, sid)
 
-            except Exception as e:
-                logger.error(f"!!! ERROR en _procesar_pm_db_async: {e}", exc_info=True)
+        except Exception as e:
+            logger.error(f"!!! ERROR en _procesar_pm_db_async: {e}", exc_info=True)
+
+
+# Evalúa en una sola transacción los hechos de logros de un turno
+# ({nombre: [(tipo_evento, datos), ...]}) y avisa a cada jugador.
+def _procesar_logros_turno_async(app, eventos_por_usuario, sids):
+    with app.app_context():
+        try:
+            desbloqueados = achievement_system.check_achievements_batch(
+                eventos_por_usuario
+            )
+            for nombre, unlocked_list in desbloqueados.items():
+                if unlocked_list:
+                    logger.info(f"LOGROS DEL TURNO: {unlocked_list} para {nombre}")
+                _emitir_logros_desbloqueados(unlocked_list, sids.get(nombre))
+        except Exception as e:
+            logger.error(
+                f"!!! ERROR en _procesar_logros_turno_async: {e}", exc_info=True
+            )
+
+
+# Fin de turno: agrupa por jugador los hechos que acumuló el motor y los
+# manda a evaluar juntos (los bots no tienen logros).
+def _vaciar_logros_turno(sala):
+    if not sala.juego:
+        return
+    hechos = sala.juego.extraer_hechos_logros()
+    if not hechos:
+        return
+    sids = {
+        datos["nombre"]: sid
+        for sid, datos in sala.jugadores.items()
+        if not datos["nombre"].startswith("Bot_")
+    }
+    eventos_por_usuario = {}
+    for nombre, tipo_evento, datos in hechos:
+        if nombre in sids:
+            eventos_por_usuario.setdefault(nombre, []).append((tipo_evento, datos))
+    if eventos_por_usuario:
+        ejecutor_db.enviar(_procesar_logros_turno_async, app, eventos_por_usuario, sids)
 
 
 # --- Configurar SocketIO ---
-socketio = SocketIO(app, cors_allowed_origins="*")
+# JsonSocketIO inserta el estado ya codificado de cada sala sin volver a
+# serializarlo por destinatario (ver proyeccion_estado.py)
+socketio = SocketIO(app, cors_allowed_origins="*", json=JsonSocketIO)
 
 # --- Inicialización de Sistemas ---
-achievement_system = AchievementSystem(db_lock)
-social_system = SocialSystem()
-agente_ia_global = VoltraceAgent()
+# Room de Socket.IO que recibe los cambios del top (todo socket autenticado)
+SALA_RANKING = "ranking"
+
+
+def _emitir_top(top):
+    socketio.emit("actualizar_top_5", top, to=SALA_RANKING)
+
+
+ranking = RankingMaterializado(al_cambiar_top=_emitir_top)
+achievement_system = AchievementSystem(
+    carriles_db, cache_size=MAX_CACHE_LOGROS, ranking=ranking
+)
+rankings_maestria = RankingsMaestria()
+estadisticas_temporada = EstadisticasTemporada()
+escritor_fin_partida = EscritorFinPartida(
+    achievement_system,
+    carriles_db,
+    calculate_level_from_xp,
+    ranking,
+    rankings_maestria,
+    estadisticas_temporada,
+)
+identidades = CacheIdentidades(cache_size=MAX_CACHE_IDENTIDADES, nivel_de=ranking.nivel)
+social_system = SocialSystem(
+    cache_size=MAX_CACHE_AMIGOS,
+    nivel_de=ranking.nivel,
+    presence_ttl=PRESENCIA_TTL_SEGUNDOS,
+    identidades=identidades,
+    carriles=carriles_db,
+)
+agente_ia_global = cargar_agente_inferencia()
 
 # --- Creación de Tablas de DB (si no existen) ---
 with app.app_context():
@@ -496,14 +617,45 @@ with app.app_context():
         else:
             logger.info("Sincronización de Logros: La DB ya está actualizada.")
 
+        # Mapa internal_id -> id/XP en memoria para otorgar logros sin releer
+        achievement_system.load_definitions()
+
     except Exception as e:
         db.session.rollback()
         logger.error(f"!!! ERROR al sincronizar la tabla de Logros: {e}", exc_info=True)
 
+    # Ranking en memoria: una sola consulta al arrancar (ver ranking.py)
+    try:
+        ranking.cargar(
+            db.session.query(
+                User.username,
+                User.level,
+                User.xp,
+                User.games_played,
+                User.games_won,
+            ).all()
+        )
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"!!! ERROR al cargar el ranking: {e}", exc_info=True)
+
+    # Rankings de maestría por kit (recorre el índice ix_maestria_kit_xp)
+    try:
+        rankings_maestria.cargar(
+            db.session.query(UserKitMaestria.kit_id, User.username, UserKitMaestria.xp)
+            .join(User, User.id == UserKitMaestria.user_id)
+            .order_by(UserKitMaestria.kit_id, UserKitMaestria.xp.desc())
+            .all()
+        )
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"!!! ERROR al cargar rankings de maestría: {e}", exc_info=True)
+
 # --- Variables Globales del Servidor ---
 salas_activas = {}
 revanchas_pendientes = {}
 sessions_activas = {}
+sids_binarios = set()  # SIDs que negociaron codec_binario
 
 # --- Constantes para Revancha ---
 TIEMPO_MAXIMO_REVANCHA = 45
@@ -522,6 +674,9 @@ class SalaJuego:
         self.turno_actual = 0
         self.log_eventos = []
         self.turn_timer = None
+        self.proyeccion = self._nueva_proyeccion()
+        # Todo lo que muta la partida pasa por aquí (ver cola_comandos.py)
+        self.comandos = ColaComandosSala(id_sala)
 
     def agregar_jugador(self, sid, nombre, kit_id="tactico", avatar_emoji="👤"):
         if len(self.jugadores) < 4 and sid not in self.jugadores:
@@ -544,6 +699,25 @@ class SalaJuego:
             return True
         return False
 
+    # Estado público de la partida tal como lo reciben los clientes.
+    def estado_publico(self):
+        return {
+            "jugadores": self.juego.obtener_estado_jugadores(),
+            "tablero": self.juego.obtener_estado_tablero(),
+            "turno_actual": self.juego.obtener_turno_actual(),
+            "ronda": self.juego.ronda,
+            "estado": self.estado,
+            "colores_jugadores": getattr(self, "colores_map", {}),
+            "evento_global_activo": self.juego.evento_global_activo,
+        }
+
+    # Proyección versionada y pre-codificada del estado público
+    def _nueva_proyeccion(self):
+        return ProyeccionSala(
+            self.estado_publico,
+            lambda: {"catalogo_casillas": catalogo_casillas(self.juego)},
+        )
+
     def puede_iniciar(self):
         # Necesita al menos 2 jugadores y estar en estado 'esperando'
         return len(self.jugadores) >= 2 and self.estado == "esperando"
@@ -561,6 +735,7 @@ class SalaJuego:
                 )
 
             self.juego = JuegoOcaWeb(jugadores_config, achievement_system)
+            self.proyeccion = self._nueva_proyeccion()
             self.estado = "jugando"
             self.log_eventos.append("¡El juego ha comenzado!")
             return True
@@ -643,6 +818,13 @@ def register():
     try:
         db.session.add(new_user)
         db.session.commit()
+        ranking.actualizar(
+            new_user.username,
+            new_user.level,
+            new_user.xp,
+            new_user.games_played,
+            new_user.games_won,
+        )
         login_user(new_user, remember=True)
 
         # Guardar todo en la sesión
@@ -791,17 +973,17 @@ def set_avatar():
     if not new_emoji or len(new_emoji) > 5:  # Validación simple
         return jsonify({"success": False, "message": "Emoji inválido."}), 400
 
+    username = current_user.username
     try:
-        user = current_user
-        user.avatar_emoji = new_emoji
-        db.session.commit()
-        logger.info(f"Usuario {user.username} actualizó su avatar a: {new_emoji}")
+        carriles_db.ejecutar(
+            [username], _actualizar_usuario_db, username, avatar_emoji=new_emoji
+        )
+        identidades.invalidar(username)
+        logger.info(f"Usuario {username} actualizó su avatar a: {new_emoji}")
         return jsonify({"success": True, "avatar_emoji": new_emoji})
     except Exception as e:
         db.session.rollback()
-        logger.error(
-            f"Error al guardar avatar para {user.username}: {e}", exc_info=True
-        )
+        logger.error(f"Error al guardar avatar para {username}: {e}", exc_info=True)
         return jsonify({"success": False, "message": "Error del servidor."}), 500
 
 
@@ -823,8 +1005,9 @@ def reset_token(token):
             flash("Las contraseñas no coinciden.", "danger")
             return render_template("reset_password.html", token=token)
 
-        user.set_password(password)  # Usamos tu método existente
-        db.session.commit()
+        carriles_db.ejecutar(
+            [user.username], _cambiar_password_db, user.username, password
+        )
         flash("Tu contraseña ha sido actualizada. Ya podés iniciar sesión.", "success")
         return redirect(url_for("login"))
 
@@ -834,6 +1017,7 @@ def reset_token(token):
 @app.route("/logout", methods=["POST"])
 @login_required  # Requiere que el usuario esté logueado
 def logout():
+    achievement_system.forget_user(current_user.username)
     session.clear()
     logout_user()  # Cierra la sesión
     return jsonify({"success": True, "message": "Sesión cerrada"})
@@ -879,28 +1063,46 @@ def profile(username):
 
 @app.route("/leaderboard")
 def leaderboard():
-    try:
-        # Obtener los top 50 jugadores ordenados por nivel y luego XP
-        top_jugadores = (
-            User.query.order_by(User.level.desc(), User.xp.desc()).limit(50).all()
-        )
+    # Top 50 por nivel y luego XP, desde el ranking en memoria
+    return jsonify(ranking.top(50))
+
+
+@app.route("/leaderboard/temporada")
+def leaderboard_temporada():
+    # Top del día, la semana o la temporada en curso, desde los resúmenes
+    periodo = request.args.get("periodo", "temporada")
+    metrica = request.args.get("metrica", "games_won")
+    if periodo not in PERIODOS or metrica not in METRICAS:
+        return jsonify({"error": "Período o métrica inválidos"}), 400
+    n = min(request.args.get("n", 10, type=int), 100)
+    return jsonify(estadisticas_temporada.ranking(periodo, metrica, n))
+
+
+@app.route("/leaderboard/<username>")
+def leaderboard_posicion(username):
+    # Posición del jugador y quienes tiene cerca
+    resultado = ranking.vecinos(username)
+    if resultado is None:
+        return jsonify({"error": "Usuario no encontrado"}), 404
+    return jsonify(resultado)
 
-        # Formatear los datos para el cliente
-        ranking_data = [
-            {
-                "username": j.username,
-                "level": j.level,
-                "xp": j.xp,
-                "games_played": j.games_played,
-                "games_won": j.games_won,
-            }
-            for j in top_jugadores
-        ]
-        logger.debug(f"Ruta /leaderboard: {ranking_data}")
-        return jsonify(ranking_data)
-    except Exception as e:
-        logger.error(f"Error al obtener leaderboard: {e}", exc_info=True)
-        return jsonify([])  # Devolver lista vacía en caso de error
+
+@app.route("/maestria/ranking/<kit_id>")
+def ranking_maestria(kit_id):
+    # Top de maestría de un kit y, si se pide, la posición de un jugador
+    if kit_id not in KITS_VOLTRACE:
+        return jsonify({"error": "Kit no encontrado"}), 404
+    n = min(request.args.get("n", 10, type=int), 100)
+    username = request.args.get("username")
+    return jsonify(
+        {
+            "kit_id": kit_id,
+            "top": rankings_maestria.top(kit_id, n),
+            "jugador": (
+                rankings_maestria.posicion(kit_id, username) if username else None
+            ),
+        }
+    )
 
 
 @app.route("/achievements")
@@ -949,11 +1151,7 @@ def send_friend_request(sender_username, target_username):
     # Notificar al objetivo si está conectado
     if result["success"]:
         logger.debug(f"Buscando SID para notificar a: {target_username}")
-        presence_info = social_system.presence_data.get(target_username, {})
-        logger.debug(
-            f"Datos de presencia encontrados para {target_username}: {presence_info}"
-        )
-        target_sid = presence_info.get("extra_data", {}).get("sid")
+        target_sid = social_system.get_sid(target_username)
         logger.debug(f"SID encontrado: {target_sid}")
 
         if target_sid:
@@ -987,11 +1185,7 @@ def accept_friend_request(username, friend_username):
         # Notificar al sistema de logros para AMBOS usuarios
         unlocked_user = achievement_system.check_achievement(username, "friend_added")
         if unlocked_user:
-            user_sid = (
-                social_system.presence_data.get(username, {})
-                .get("extra_data", {})
-                .get("sid")
-            )
+            user_sid = social_system.get_sid(username)
             if user_sid:
                 socketio.emit(
                     "achievements_unlocked",
@@ -1007,11 +1201,7 @@ def accept_friend_request(username, friend_username):
         unlocked_friend = achievement_system.check_achievement(
             friend_username, "friend_added"
         )
-        sid_sender = (
-            social_system.presence_data.get(friend_username, {})
-            .get("extra_data", {})
-            .get("sid")
-        )
+        sid_sender = social_system.get_sid(friend_username)
         if unlocked_friend and sid_sender:
             socketio.emit(
                 "achievements_unlocked",
@@ -1044,6 +1234,10 @@ def reject_friend_request(username, friend_username):
 @app.route("/social/amigos/remove/<username>/<friend_to_remove>", methods=["POST"])
 def remove_friend(username, friend_to_remove):
     result = social_system.remove_friend(username, friend_to_remove)
+    if result["success"]:
+        # 'friends_count' bajó: el progreso de logros sociales se recalcula
+        achievement_system.invalidate_progress(username)
+        achievement_system.invalidate_progress(friend_to_remove)
     # Podrías notificar al amigo eliminado si está online
     return jsonify(result)
 
@@ -1084,36 +1278,65 @@ def respond_to_invitation_route(username, invitation_id, response):
     return jsonify(result)
 
 
+# Respuesta cacheable de un recurso del catálogo estático (304 si el ETag coincide).
+def _respuesta_catalogo(datos, etag):
+    respuesta = jsonify(datos)
+    respuesta.set_etag(etag)
+    respuesta.cache_control.public = True
+    respuesta.cache_control.max_age = 3600
+    return respuesta.make_conditional(request)
+
+
 @app.route("/api/get_all_abilities")
 def get_all_abilities():
     try:
-        # crear_habilidades() devuelve un dict de listas de objetos Habilidad
-        habilidades_dict = crear_habilidades()
-        habilidades_json_ready = {}
-
-        # Convertir los objetos Habilidad en diccionarios para que JSON pueda leerlos
-        for categoria, lista_habilidades in habilidades_dict.items():
-            habilidades_json_ready[categoria] = []
-            for hab in lista_habilidades:
-                habilidades_json_ready[categoria].append(
-                    {
-                        "nombre": hab.nombre,
-                        "tipo": hab.tipo,
-                        "descripcion": hab.descripcion,
-                        "simbolo": hab.simbolo,
-                        "cooldown_base": hab.cooldown_base,
-                    }
-                )
-        return jsonify(habilidades_json_ready)
+        # Habilidades por categoría, con su ID compacto del catálogo
+        return _respuesta_catalogo(HABILIDADES_POR_CATEGORIA, ETAG_HABILIDADES)
     except Exception as e:
         logger.error(f"!!! ERROR en /api/get_all_abilities: {e}", exc_info=True)
         return jsonify({"error": "No se pudieron cargar las habilidades"}), 500
 
 
+@app.route("/api/metricas")
+def get_metricas():
+    # Métricas internas del servidor (colas, lag, workers, proyecciones)
+    proyecciones = {}
+    colas = {"salas": 0, "profundidad": 0, "procesados": 0, "coalescidos": 0}
+    for sala in list(salas_activas.values()):
+        for clave, valor in sala.proyeccion.obtener_metricas().items():
+            if clave != "version":
+                proyecciones[clave] = proyecciones.get(clave, 0) + valor
+        metricas_cola = sala.comandos.obtener_metricas()
+        colas["salas"] += 1
+        for clave in ("profundidad", "procesados", "coalescidos"):
+            colas[clave] += metricas_cola[clave]
+        # Peor sala: es la que el jugador nota
+        for clave in ("profundidad_max", "espera_max_ms", "espera_ms", "ejecucion_ms"):
+            colas[clave] = max(colas.get(clave, 0), metricas_cola[clave])
+    return jsonify(
+        {
+            "temporizadores": rueda_temporizadores.obtener_metricas(),
+            "db": ejecutor_db.obtener_metricas(),
+            "carriles_db": carriles_db.obtener_metricas(),
+            "logros": achievement_system.get_metrics(),
+            "social": social_system.get_metrics(),
+            "identidades": identidades.obtener_metricas(),
+            "presencia": social_system.presencia.obtener_metricas(),
+            "avisos_estado": agregador_estados.obtener_metricas(),
+            "ranking": ranking.obtener_metricas(),
+            "ranking_maestria": rankings_maestria.obtener_metricas(),
+            "temporadas": estadisticas_temporada.obtener_metricas(),
+            "bots": planificador_bots.obtener_metricas(),
+            "estado": proyecciones,
+            "comandos": colas,
+        }
+    )
+
+
 @app.route("/api/get_all_perks")
 def get_all_perks():
     try:
-        return jsonify(PERKS_CONFIG)
+        return _respuesta_catalogo(PERKS_CONFIG, ETAG_PERKS)
     except Exception as e:
         logger.error(f"!!! ERROR en /api/get_all_perks: {e}", exc_info=True)
         return jsonify({"error": "No se pudieron cargar los perks"}), 500
@@ -1124,11 +1347,47 @@ def get_all_perks():
 # ===================================================================
 
 
+# Serializa un handler en la cola de comandos de su sala. Si la cola está
+# ocupada, el handler corre después (en otro greenlet) con su propio
+# contexto de request, así request.sid y emit() siguen apuntando al
+# cliente que lo envió.
+def _comando_de_sala(handler):
+    @functools.wraps(handler)
+    def encolar(data):
+        id_sala = data.get("id_sala") if isinstance(data, dict) else None
+        if isinstance(id_sala, dict):
+            id_sala = id_sala.get("value")
+        sala = salas_activas.get(id_sala) if isinstance(id_sala, str) else None
+        if sala is None:
+            return handler(data)
+        sala.comandos.encolar(copy_current_request_context(handler), data)
+
+    return encolar
+
+
 @socketio.on("connect")
 def on_connect():
     # Se ejecuta cuando un cliente establece una conexión WebSocket
     logger.info(f"Cliente conectado: {request.sid}")
     emit("conectado", {"mensaje": "Conexión exitosa"})  # Enviar confirmación al cliente
+    # Catálogo estático: el estado por turno solo referencia sus IDs
+    emit("catalogo", dict(CATALOGO, etag=ETAG_CATALOGO))
+
+
+@socketio.on("negociar_codificacion")
+def negociar_codificacion(data):
+    # El cliente ofrece sus formatos; los eventos de juego frecuentes
+    # viajan en binario si lo soporta (ver codec_binario.py)
+    formatos = (data or {}).get("formatos") or []
+    if codec_binario.FORMATO in formatos:
+        sids_binarios.add(request.sid)
+        return {
+            "formato": codec_binario.FORMATO,
+            "eventos": codec_binario.EVENTOS_BINARIOS,
+            "campos": codec_binario.CAMPOS,
+        }
+    sids_binarios.discard(request.sid)
+    return {"formato": "json"}
 
 
 @socketio.on("authenticate")
@@ -1140,30 +1399,63 @@ def authenticate(data):
         emit(
             "authenticated", {"username": username}
         )  # Confirmar autenticación al cliente
+        # El lobby recibe los cambios del top 5 sin tener que pedirlos
+        join_room(SALA_RANKING)
         # Actualizar presencia en el sistema social a 'online'
         social_system.update_user_presence(username, "online", {"sid": request.sid})
+        _agendar_barrido_presencias()
         logger.info(
             f"--- SOCKET AUTHENTICATED --- User: {username}, SID: {request.sid}"
         )
+        _avisar_estado_a_amigos(username, "online")
 
-        try:
-            friends_list = social_system.get_friends_list_server(username)
-            for friend_username in friends_list:
-                friend_sid = (
-                    social_system.presence_data.get(friend_username, {})
-                    .get("extra_data", {})
-                    .get("sid")
-                )
-                if friend_sid:
-                    socketio.emit(
-                        "friend_status_update",
-                        {"username": username, "status": "online"},
-                        room=friend_sid,
-                    )
-        except Exception as e:
-            logger.error(
-                f"!!! ERROR al notificar conexión a amigos: {e}", exc_info=True
-            )
+
+# Anota el cambio para los amigos de 'username': les llega agrupado en
+# un 'friend_status_batch' (ver avisos_estado.py).
+def _avisar_estado_a_amigos(username, status):
+    try:
+        agregador_estados.anotar(
+            username, status, social_system.get_friends_list_server(username)
+        )
+    except Exception as e:
+        logger.error(
+            f"!!! ERROR al notificar estado '{status}' de {username} a amigos: {e}",
+            exc_info=True,
+        )
+
+
+# Barrido periódico de presencias vencidas (quien dejó de mandar
+# 'presence_heartbeat'): se agenda mientras haya alguien conectado. Corre
+# como tarea de fondo: encolar en ejecutor_db puede esperar a que haya
+# lugar, y el ticker de la rueda no debe bloquearse nunca.
+_temporizador_presencias = None
+
+
+def _agendar_barrido_presencias():
+    global _temporizador_presencias
+    if _temporizador_presencias is None or not _temporizador_presencias.activo:
+        _temporizador_presencias = rueda_temporizadores.agendar(
+            PRESENCIA_BARRIDO_SEGUNDOS,
+            socketio.start_background_task,
+            _barrer_presencias,
+        )
+
+
+def _barrer_presencias():
+    global _temporizador_presencias
+    _temporizador_presencias = None
+    vencidos = social_system.expire_presences()
+    if vencidos:
+        # La lista de amigos puede requerir la DB: fuera del ticker
+        ejecutor_db.enviar(_avisar_presencias_vencidas_async, app, vencidos)
+    if social_system.presencia.pendientes():
+        _agendar_barrido_presencias()
+
+
+def _avisar_presencias_vencidas_async(app, usernames):
+    with app.app_context():
+        for username in usernames:
+            _avisar_estado_a_amigos(username, "offline")
 
 
 @socketio.on("disconnect")
@@ -1175,29 +1467,23 @@ def on_disconnect():
     sesion_info = sessions_activas.pop(request.sid, {})
     username_desconectado = sesion_info.get("username")
 
+    sids_binarios.discard(request.sid)
+
+    # Si estaba mirando alguna partida, deja de contar como espectador
+    for sala in salas_activas.values():
+        sala.espectadores.pop(request.sid, None)
+
     if not username_desconectado:
         logger.warning("Desconexión de un SID no autenticado.")
         return
 
-    # Actualizar presencia social a 'offline'
+    # Actualizar presencia social a 'offline' (si ya venció por falta de
+    # latidos, el agregador no vuelve a avisar)
     social_system.update_user_presence(username_desconectado, "offline")
+    achievement_system.forget_user(username_desconectado)
 
-    try:
-        friends_list = social_system.get_friends_list_server(username_desconectado)
-        for friend_username in friends_list:
-            friend_sid = (
-                social_system.presence_data.get(friend_username, {})
-                .get("extra_data", {})
-                .get("sid")
-            )
-            if friend_sid:
-                socketio.emit(
-                    "friend_status_update",
-                    {"username": username_desconectado, "status": "offline"},
-                    room=friend_sid,
-                )
-    except Exception as e:
-        logger.error(f"!!! ERROR al notificar desconexión a amigos: {e}", exc_info=True)
+    _avisar_estado_a_amigos(username_desconectado, "offline")
+    social_system.forget_user(username_desconectado)
 
     # Buscar en qué sala estaba el jugador
     id_sala_afectada = None
@@ -1213,7 +1499,12 @@ def on_disconnect():
         logger.info(
             f"--- DESCONEXIÓN INMEDIATA --- Jugador: {username_desconectado} en Sala: {id_sala_afectada}."
         )
-        _finalizar_desconexion(request.sid, id_sala_afectada, username_desconectado)
+        sala_afectada.comandos.encolar(
+            _finalizar_desconexion,
+            request.sid,
+            id_sala_afectada,
+            username_desconectado,
+        )
     else:
         logger.info(
             f"Jugador {username_desconectado} desconectado (no estaba en una sala)."
@@ -1237,8 +1528,8 @@ def crear_sala(data):
     # Leer el kit guardado en la sesión del usuario
     kit_seleccionado = data.get("kit_id", "tactico")
 
-    user_db = User.query.filter_by(username=username).first()
-    avatar_guardado = user_db.avatar_emoji if user_db else "👤"
+    identidad = identidades.obtener(username)
+    avatar_guardado = identidad.avatar_emoji if identidad else "👤"
 
     # Pasarlo al agregar_jugador
     if salas_activas[id_sala].agregar_jugador(
@@ -1251,10 +1542,12 @@ def crear_sala(data):
         )
 
         # Iniciar hilo para el trabajo de DB
-        threading.Thread(
-            target=_procesar_creacion_sala_db_async,
-            args=(current_app._get_current_object(), request.sid, username),
-        ).start()
+        ejecutor_db.enviar(
+            _procesar_creacion_sala_db_async,
+            current_app._get_current_object(),
+            request.sid,
+            username,
+        )
         # Actualizar presencia a 'in_lobby'
         social_system.update_user_presence(
             username, "in_lobby", {"room_id": id_sala, "sid": request.sid}
@@ -1288,8 +1581,8 @@ def unirse_sala(data):
         return
 
     kit_seleccionado = data.get("kit_id", "tactico")
-    user_db = User.query.filter_by(username=username).first()
-    avatar_guardado = user_db.avatar_emoji if user_db else "👤"
+    identidad = identidades.obtener(username)
+    avatar_guardado = identidad.avatar_emoji if identidad else "👤"
 
     if sala.agregar_jugador(request.sid, username, kit_seleccionado, avatar_guardado):
         join_room(id_sala)
@@ -1374,6 +1667,45 @@ def salir_sala(data):
         )
 
 
+@socketio.on("observar_sala")
+def observar_sala(data):
+    # Un espectador se suma a la room para ver la partida sin jugar
+    id_sala = (data or {}).get("id_sala")
+    sala = salas_activas.get(id_sala)
+    if not sala or not sala.juego or sala.estado != "jugando":
+        emit("error", {"mensaje": "No hay una partida en curso en esa sala."})
+        return
+
+    username = sessions_activas.get(request.sid, {}).get("username", "Espectador")
+    sala.espectadores[request.sid] = username
+    join_room(id_sala)
+    emit(
+        "observando_sala",
+        {"id_sala": id_sala, "estado_juego": _estado_completo_juego(sala)},
+    )
+
+
+@socketio.on("solicitar_estado_completo")
+def solicitar_estado_completo(data):
+    # El cliente recibió un delta cuya base no coincide con su versión
+    id_sala = (data or {}).get("id_sala")
+    sala = salas_activas.get(id_sala)
+    if not sala or not sala.juego:
+        return
+    participa = request.sid in sala.jugadores or request.sid in sala.espectadores
+    if not participa:
+        return
+    emit("estado_juego_completo", {"estado_juego": _estado_completo_juego(sala)})
+
+
+@socketio.on("dejar_observar")
+def dejar_observar(data):
+    id_sala = (data or {}).get("id_sala")
+    sala = salas_activas.get(id_sala)
+    if sala and sala.espectadores.pop(request.sid, None) is not None:
+        leave_room(id_sala)
+
+
 @socketio.on("agregar_bot")
 def agregar_bot(data):
     id_sala = data.get("id_sala")
@@ -1486,12 +1818,11 @@ def guardar_kit(data):
         return
 
     try:
-        # Encontrar al usuario en la DB
-        user = User.query.filter_by(username=username).first()
+        # Guardar en la Base de Datos
+        user = carriles_db.ejecutar(
+            [username], _actualizar_usuario_db, username, kit_id=kit_id
+        )
         if user:
-            # Guardar en la Base de Datos
-            setattr(user, "kit_id", kit_id)
-            db.session.commit()
             logger.info(
                 f"Cliente {sid} (User: {username}) guardó el kit: {kit_id} en la DB."
             )
@@ -1511,6 +1842,7 @@ def guardar_kit(data):
 
 
 @socketio.on("iniciar_juego")
+@_comando_de_sala
 def iniciar_juego_manual(data):
     # Handler para el botón "Iniciar Juego" en la sala de espera
     id_sala = data["id_sala"]
@@ -1530,6 +1862,7 @@ def iniciar_juego_manual(data):
 
 
 @socketio.on("lanzar_dado")
+@_comando_de_sala
 def lanzar_dado(data):
     # Maneja la acción de lanzar el dado
     try:
@@ -1566,48 +1899,12 @@ def lanzar_dado(data):
         # Ejecutar el movimiento
         resultado = sala.juego.paso_1_lanzar_y_mover(nombre_jugador_emitente)
 
-        try:
-            seises_consecutivos = resultado.get("consecutive_sixes", 0)
-            if seises_consecutivos >= 3:
-                logger.info(
-                    f"LOGRO DETECTADO: 'lucky_seven' para {nombre_jugador_emitente}"
-                )
-                unlocked_list = achievement_system.check_achievement(
-                    nombre_jugador_emitente,
-                    "dice_rolled",
-                    {"consecutive_sixes": seises_consecutivos},
-                )
-                if unlocked_list:
-                    socketio.emit(
-                        "achievements_unlocked",
-                        {
-                            "achievements": [
-                                achievement_system.get_achievement_info(ach_id)
-                                for ach_id in unlocked_list
-                            ]
-                        },
-                        to=request.sid,
-                    )  # Notificar solo al jugador
-        except Exception as e:
-            logger.error(
-                f"!!! ERROR al procesar logro 'lucky_seven': {e}", exc_info=True
-            )
-
         if resultado.get("pausado"):
-            logger.debug(f"TURNO PAUSADO - Sala: {id_sala}. Enviando estado completo.")
-            colores_map = getattr(sala, "colores_map", {})
-            socketio.emit(
+            logger.debug(f"TURNO PAUSADO - Sala: {id_sala}. Enviando delta de estado.")
+            _emitir_evento_juego(
                 "paso_2_resultado_casilla",
                 {
-                    "estado_juego": {
-                        "jugadores": sala.juego.obtener_estado_jugadores(),
-                        "tablero": sala.juego.obtener_estado_tablero(),
-                        "turno_actual": sala.juego.obtener_turno_actual(),
-                        "ronda": sala.juego.ronda,
-                        "estado": sala.estado,
-                        "colores_jugadores": colores_map,
-                        "evento_global_activo": sala.juego.evento_global_activo,
-                    },
+                    "estado_delta": _delta_estado_juego(sala),
                     "eventos": resultado.get("eventos", []),
                 },
                 room=id_sala,
@@ -1619,7 +1916,7 @@ def lanzar_dado(data):
             return
 
         # Emitir el resultado del movimiento
-        socketio.emit(
+        _emitir_evento_juego(
             "paso_1_resultado_movimiento",
             {
                 "jugador": nombre_jugador_emitente,
@@ -1635,6 +1932,7 @@ def lanzar_dado(data):
 
 
 @socketio.on("paso_2_terminar_movimiento")
+@_comando_de_sala
 def terminar_movimiento(data):
     # Maneja la señal del cliente de que la animación de movimiento terminó
     try:
@@ -1673,76 +1971,8 @@ def terminar_movimiento(data):
             nombre_jugador_a_procesar
         )
 
-        try:
-            eventos_del_paso_2 = resultado.get("eventos", [])
-            eventos_procesados_logros = set()  # Para no duplicar
-
-            for evento_str in eventos_del_paso_2:
-                if not isinstance(evento_str, str):
-                    continue
-
-                nombre_salvado = None
-                evento_logro = None
-
-                # Comprobar 'Inmortal'
-                if (
-                    "inmortal" not in eventos_procesados_logros
-                    and evento_str.startswith("❤️‍🩹 ¡Último Aliento salvó a")
-                ):
-                    partes = evento_str.split(" ")
-                    if len(partes) >= 6:
-                        nombre_salvado = partes[5]
-                        evento_logro = "inmortal"
-                        eventos_procesados_logros.add(
-                            "inmortal"
-                        )  # Marcar como procesado
-
-                # Comprobar 'Muralla Humana'
-                elif (
-                    "muralla_humana" not in eventos_procesados_logros
-                    and evento_str.strip().endswith(": 🛡️ protegido")
-                ):
-                    partes = evento_str.strip().split(":")
-                    if len(partes) >= 2:
-                        nombre_salvado = partes[0].strip()  # Obtener el nombre
-                        evento_logro = "muralla_humana"
-                        eventos_procesados_logros.add("muralla_humana")  # Marcar
-
-                # Si encontramos un evento de logro, procesarlo
-                if nombre_salvado and evento_logro:
-                    logger.info(
-                        f"LOGRO DETECTADO: '{evento_logro}' para {nombre_salvado}"
-                    )
-
-                    unlocked_list = achievement_system.check_achievement(
-                        nombre_salvado, "game_event", {"event_name": evento_logro}
-                    )
-
-                    if unlocked_list:
-                        sid_salvado = None
-                        for sid, data_jugador in sala.jugadores.items():
-                            if data_jugador["nombre"] == nombre_salvado:
-                                sid_salvado = sid
-                                break
-
-                        if sid_salvado:
-                            socketio.emit(
-                                "achievements_unlocked",
-                                {
-                                    "achievements": [
-                                        achievement_system.get_achievement_info(ach_id)
-                                        for ach_id in unlocked_list
-                                    ]
-                                },
-                                to=sid_salvado,
-                            )
-                    # No hacemos 'break' por si un evento activa ambos (improbable, pero seguro)
-
-        except Exception as e:
-            logger.error(
-                f"!!! ERROR al procesar logros de 'paso_2_terminar_movimiento': {e}",
-                exc_info=True,
-            )
+        # Fin del turno: evaluar juntos los logros que acumuló el motor
+        _vaciar_logros_turno(sala)
 
         if sala.juego.ha_terminado():
             logger.info(f"--- JUEGO TERMINADO (PASO 2) --- Sala: {id_sala}")
@@ -1775,36 +2005,24 @@ def terminar_movimiento(data):
             logger.debug(
                 "Iniciando hilo para procesar estadísticas de DB en segundo plano..."
             )
-            stats_thread = threading.Thread(
-                target=_procesar_estadisticas_fin_juego_async,
-                args=(
-                    current_app._get_current_object(),
-                    jugadores_items_copia,
-                    ganador_nombre,
-                    ronda_copia,
-                    player_count_copia,
-                    juego_obj_copia,
-                ),
+            ejecutor_db.enviar(
+                _procesar_estadisticas_fin_juego_async,
+                current_app._get_current_object(),
+                jugadores_items_copia,
+                ganador_nombre,
+                ronda_copia,
+                player_count_copia,
+                juego_obj_copia,
             )
-            stats_thread.start()
 
             # Salir inmediatamente
             return
 
         # Si el juego NO ha terminado, enviar la actualización normal
-        colores_map = getattr(sala, "colores_map", {})
-        socketio.emit(
+        _emitir_evento_juego(
             "paso_2_resultado_casilla",
             {
-                "estado_juego": {
-                    "jugadores": sala.juego.obtener_estado_jugadores(),
-                    "tablero": sala.juego.obtener_estado_tablero(),
-                    "turno_actual": sala.juego.obtener_turno_actual(),
-                    "ronda": sala.juego.ronda,
-                    "estado": sala.estado,
-                    "colores_jugadores": colores_map,
-                    "evento_global_activo": sala.juego.evento_global_activo,
-                },
+                "estado_delta": _delta_estado_juego(sala),
                 "eventos": resultado.get("eventos", []),
             },
             room=id_sala,
@@ -1820,6 +2038,7 @@ def terminar_movimiento(data):
 
 
 @socketio.on("usar_habilidad")
+@_comando_de_sala
 def usar_habilidad(data):
     # Maneja la acción de usar una habilidad
     id_sala_data = data.get("id_sala")
@@ -1870,110 +2089,51 @@ def usar_habilidad(data):
             nombre_jugador_emitente, indice_habilidad, objetivo
         )
 
-        # Revisar los eventos devueltos por la habilidad, INCLUSO SI FALLÓ
-        try:
-            eventos_de_habilidad = resultado.get("eventos", [])
-            for evento_str in eventos_de_habilidad:
-                if isinstance(evento_str, str) and evento_str.strip().endswith(
-                    "protegido por Invisibilidad."
-                ):
-                    partes = evento_str.strip().split(" ")
-                    if len(partes) >= 2:
-                        # Extraer el nombre del jugador
-                        nombre_protegido = partes[1]
-                        logger.info(
-                            f"LOGRO DETECTADO: 'fantasma' para {nombre_protegido}"
-                        )
-
-                        unlocked_list = achievement_system.check_achievement(
-                            nombre_protegido, "game_event", {"event_name": "fantasma"}
-                        )
-
-                        if unlocked_list:
-                            sid_protegido = None
-                            for s, data_jugador in sala.jugadores.items():
-                                if data_jugador["nombre"] == nombre_protegido:
-                                    sid_protegido = s
-                                    break
-
-                            if sid_protegido:
-                                socketio.emit(
-                                    "achievements_unlocked",
-                                    {
-                                        "achievements": [
-                                            achievement_system.get_achievement_info(
-                                                ach_id
-                                            )
-                                            for ach_id in unlocked_list
-                                        ]
-                                    },
-                                    to=sid_protegido,
-                                )
-                        break  # Encontramos el evento
-        except Exception as e:
-            logger.error(
-                f"!!! ERROR al procesar logros de 'usar_habilidad': {e}", exc_info=True
-            )
-
         if resultado["exito"]:
 
             # Este hilo siempre se ejecuta para el jugador que usó la habilidad
             if sid in sessions_activas:
-                threading.Thread(
-                    target=_procesar_habilidad_db_async,
-                    args=(
-                        current_app._get_current_object(),
-                        sid,
-                        nombre_jugador_emitente,
-                        resultado,
-                    ),
-                ).start()
+                ejecutor_db.enviar(
+                    _procesar_habilidad_db_async,
+                    current_app._get_current_object(),
+                    sid,
+                    nombre_jugador_emitente,
+                    resultado,
+                )
 
             # Chequeo para reflejo simple (1v1)
             jugador_que_reflejo = resultado.get("jugador_reflejo")
             if jugador_que_reflejo:
                 # Buscar el SID actual del defensor que reflejó
-                sid_defensor = (
-                    social_system.presence_data.get(jugador_que_reflejo, {})
-                    .get("extra_data", {})
-                    .get("sid")
-                )
+                sid_defensor = social_system.get_sid(jugador_que_reflejo)
                 if sid_defensor and sid_defensor in sessions_activas:
                     logger.debug(
                         f"REFLEJO DETECTADO: Iniciando hilo de logros para DEFENSOR: {jugador_que_reflejo}"
                     )
-                    threading.Thread(
-                        target=_procesar_habilidad_db_async,
-                        args=(
-                            current_app._get_current_object(),
-                            sid_defensor,
-                            jugador_que_reflejo,
-                            resultado,
-                        ),
-                    ).start()
+                    ejecutor_db.enviar(
+                        _procesar_habilidad_db_async,
+                        current_app._get_current_object(),
+                        sid_defensor,
+                        jugador_que_reflejo,
+                        resultado,
+                    )
 
             # Chequeo para reflejo múltiple (Bomba Energética)
             jugadores_que_reflejaron = resultado.get("jugadores_reflejo", [])
             if jugadores_que_reflejaron:
                 for nombre_defensor in jugadores_que_reflejaron:
-                    sid_defensor = (
-                        social_system.presence_data.get(nombre_defensor, {})
-                        .get("extra_data", {})
-                        .get("sid")
-                    )
+                    sid_defensor = social_system.get_sid(nombre_defensor)
                     if sid_defensor and sid_defensor in sessions_activas:
                         logger.debug(
                             f"REFLEJO (BOMBA) DETECTADO: Iniciando hilo de logros para DEFENSOR: {nombre_defensor}"
                         )
-                        threading.Thread(
-                            target=_procesar_habilidad_db_async,
-                            args=(
-                                current_app._get_current_object(),
-                                sid_defensor,
-                                nombre_defensor,
-                                resultado,  # Pasar el mismo event_data
-                            ),
-                        ).start()
+                        ejecutor_db.enviar(
+                            _procesar_habilidad_db_async,
+                            current_app._get_current_object(),
+                            sid_defensor,
+                            nombre_defensor,
+                            resultado,  # Pasar el mismo event_data
+                        )
 
             # VERIFICAR SI ES HABILIDAD DE MOVIMIENTO O NO
             es_habilidad_movimiento = (
@@ -1991,7 +2151,7 @@ def usar_habilidad(data):
                     logger.debug(
                         "Habilidad de Movimiento (Paso 1) detectada. Emitiendo 'paso_1_resultado_movimiento'."
                     )
-                    socketio.emit(
+                    _emitir_evento_juego(
                         "paso_1_resultado_movimiento",
                         {
                             "jugador": nombre_jugador_emitente,
@@ -2009,7 +2169,7 @@ def usar_habilidad(data):
                     logger.debug(
                         "Habilidad de Movimiento Doble (Paso 1) detectada. Emitiendo 'paso_1' para ambos."
                     )
-                    socketio.emit(
+                    _emitir_evento_juego(
                         "paso_1_resultado_movimiento",
                         {
                             "jugador": nombre_jugador_emitente,
@@ -2022,7 +2182,7 @@ def usar_habilidad(data):
                         room=id_sala,
                     )
                     mov_obj = resultado["resultado_movimiento_objetivo"]
-                    socketio.emit(
+                    _emitir_evento_juego(
                         "paso_1_resultado_movimiento",
                         {
                             "jugador": mov_obj["jugador"],
@@ -2038,7 +2198,7 @@ def usar_habilidad(data):
                         "Habilidad de Movimiento de Otro (Paso 1) detectada. Emitiendo 'paso_1'."
                     )
                     mov_obj = resultado["resultado_movimiento"]
-                    socketio.emit(
+                    _emitir_evento_juego(
                         "paso_1_resultado_movimiento",
                         {
                             "jugador": mov_obj["jugador_movido"],
@@ -2059,7 +2219,7 @@ def usar_habilidad(data):
                     eventos_principales = resultado.get("eventos", [])
                     for i, mov in enumerate(resultado.get("movimientos", [])):
                         eventos_a_enviar = eventos_principales if i == 0 else []
-                        socketio.emit(
+                        _emitir_evento_juego(
                             "paso_1_resultado_movimiento",
                             {
                                 "jugador": mov["jugador"],
@@ -2076,30 +2236,21 @@ def usar_habilidad(data):
                 )
 
                 # ENVIAR RESPUESTA DEL JUEGO INMEDIATAMENTE
-                colores_map = getattr(sala, "colores_map", {})
                 celda_actualizada = resultado.get("celda_actualizada")
+                estado_delta = _delta_estado_juego(sala)
 
                 if celda_actualizada:
                     # CASO B1: Habilidad que SÍ cambia el tablero
                     logger.debug(
                         "(Habilidad No-Mov) Celda actualizada detectada. Enviando FULL state."
                     )
-                    estado_juego_full = {
-                        "jugadores": sala.juego.obtener_estado_jugadores(),
-                        "tablero": sala.juego.obtener_estado_tablero(),
-                        "turno_actual": sala.juego.obtener_turno_actual(),
-                        "ronda": sala.juego.ronda,
-                        "estado": sala.estado,
-                        "colores_jugadores": colores_map,
-                        "evento_global_activo": sala.juego.evento_global_activo,
-                    }
                     socketio.emit(
                         "habilidad_usada_full",
                         {
                             "jugador": nombre_jugador_emitente,
                             "habilidad": resultado["habilidad"],
                             "resultado": resultado,
-                            "estado_juego": estado_juego_full,
+                            "estado_delta": estado_delta,
                         },
                         room=id_sala,
                     )
@@ -2109,15 +2260,6 @@ def usar_habilidad(data):
                     logger.debug(
                         "(Habilidad No-Mov) Sin cambio de celda. Enviando PARTIAL state."
                     )
-                    estado_juego_parcial = {
-                        "jugadores": sala.juego.obtener_estado_jugadores(),
-                        "turno_actual": sala.juego.obtener_turno_actual(),
-                        "ronda": sala.juego.ronda,
-                        "estado": sala.estado,
-                        "colores_jugadores": colores_map,
-                        "evento_global_activo": sala.juego.evento_global_activo,
-                    }
-
                     if resultado.get("habilidad", {}).get("nombre") == "Invisibilidad":
                         emit(
                             "habilidad_usada_privada",
@@ -2125,7 +2267,7 @@ def usar_habilidad(data):
                                 "jugador": nombre_jugador_emitente,
                                 "habilidad": resultado["habilidad"],
                                 "resultado": resultado,
-                                "estado_juego_parcial": estado_juego_parcial,
+                                "estado_delta": estado_delta,
                             },
                             to=sid,
                         )
@@ -2144,7 +2286,7 @@ def usar_habilidad(data):
                                         f"{nombre_jugador_emitente} usó una habilidad."
                                     ],
                                 },
-                                "estado_juego_parcial": estado_juego_parcial,
+                                "estado_delta": estado_delta,
                             },
                             room=id_sala,
                             include_self=False,
@@ -2156,7 +2298,7 @@ def usar_habilidad(data):
                                 "jugador": nombre_jugador_emitente,
                                 "habilidad": resultado["habilidad"],
                                 "resultado": resultado,
-                                "estado_juego_parcial": estado_juego_parcial,
+                                "estado_delta": estado_delta,
                             },
                             room=id_sala,
                         )
@@ -2173,6 +2315,7 @@ def usar_habilidad(data):
 
 
 @socketio.on("comprar_perk")
+@_comando_de_sala
 def comprar_perk(data):
     # Maneja la solicitud de comprar un pack de perks
     id_sala_data = data.get("id_sala")
@@ -2246,6 +2389,7 @@ def comprar_perk(data):
 
 
 @socketio.on("seleccionar_perk")
+@_comando_de_sala
 def seleccionar_perk(data):
     id_sala_data = data.get("id_sala")
     if isinstance(id_sala_data, dict) and "value" in id_sala_data:
@@ -2297,23 +2441,14 @@ def seleccionar_perk(data):
 
                 # Si la activación fue exitosa, enviar estado actualizado a TODOS en la sala
                 if resultado_activacion.get("exito"):
-                    colores_map = getattr(sala, "colores_map", {})
-                    estado_juego = {
-                        "jugadores": sala.juego.obtener_estado_jugadores(),  # Incluirá PM actualizados y perks activos
-                        "tablero": sala.juego.obtener_estado_tablero(),
-                        "turno_actual": sala.juego.obtener_turno_actual(),  # Sigue siendo el mismo turno
-                        "ronda": sala.juego.ronda,
-                        "estado": sala.estado,
-                        "colores_jugadores": colores_map,
-                        "evento_global_activo": sala.juego.evento_global_activo,
-                    }
                     logger.debug(
                         f"Activación exitosa. Emitiendo 'estado_juego_actualizado' a sala {id_sala}"
                     )
-                    socketio.emit(
+                    _emitir_evento_juego(
                         "estado_juego_actualizado",
                         {
-                            "estado_juego": estado_juego,
+                            # Incluye PM actualizados y perks activos
+                            "estado_delta": _delta_estado_juego(sala),
                             "eventos_recientes": sala.juego.eventos_turno[-5:],
                         },
                         room=id_sala,
@@ -2339,6 +2474,7 @@ def seleccionar_perk(data):
 
 
 @socketio.on("cancelar_oferta_perk")
+@_comando_de_sala
 def cancelar_oferta_perk(data):
     id_sala = data.get("id_sala")
     sid = request.sid
@@ -2372,15 +2508,6 @@ def cancelar_oferta_perk(data):
                 )
 
                 # Notificar a todos del estado actualizado (por los PM)
-                colores_map = getattr(sala, "colores_map", {})
-                estado_juego_parcial = {
-                    "jugadores": sala.juego.obtener_estado_jugadores(),
-                    "turno_actual": sala.juego.obtener_turno_actual(),
-                    "ronda": sala.juego.ronda,
-                    "estado": sala.estado,
-                    "colores_jugadores": colores_map,
-                    "evento_global_activo": sala.juego.evento_global_activo,
-                }
                 socketio.emit(
                     "habilidad_usada_parcial",
                     {
@@ -2391,7 +2518,7 @@ def cancelar_oferta_perk(data):
                             "simbolo": "↩️",
                         },
                         "resultado": {"eventos": [resultado.get("mensaje")]},
-                        "estado_juego_parcial": estado_juego_parcial,
+                        "estado_delta": _delta_estado_juego(sala),
                     },
                     room=id_sala,
                 )
@@ -2490,13 +2617,13 @@ def arsenal_cargar_maestria():
     logger.debug(f"RECIBIDO EVENTO: arsenal:cargar_maestria - Usuario: {username}")
 
     try:
-        user = User.query.filter_by(username=username).first()
-        if not user:
+        user_id = identidades.id_de(username)
+        if not user_id:
             emit("error", {"mensaje": "Usuario no encontrado."})
             return
 
         # Consultar la DB por todas las maestrías de este usuario
-        maestrias_db = UserKitMaestria.query.filter_by(user_id=user.id).all()
+        maestrias_db = UserKitMaestria.query.filter_by(user_id=user_id).all()
 
         desbloqueados = [m.kit_id for m in maestrias_db if m.cosmetic_unlocked]
 
@@ -2509,12 +2636,16 @@ def arsenal_cargar_maestria():
         # Usamos KITS_VOLTRACE como la fuente maestra
         for kit_id, kit_config in KITS_VOLTRACE.items():
             xp_actual = maestrias_map.get(kit_id, 0)
+            # Posición en el ranking del kit (desde memoria)
+            puesto = rankings_maestria.posicion(kit_id, username) or {}
 
             lista_completa_maestria.append(
                 {
                     "kit_id": kit_id,
                     "nombre": kit_config.get("nombre", kit_id.capitalize()),
                     "xp": xp_actual,
+                    "posicion": puesto.get("posicion"),
+                    "jugadores": puesto.get("jugadores", 0),
                 }
             )
 
@@ -2529,6 +2660,29 @@ def arsenal_cargar_maestria():
         emit("error", {"mensaje": "Error del servidor al cargar maestría."})
 
 
+@socketio.on("arsenal:ranking_kit")
+def arsenal_ranking_kit(data):
+    sid = request.sid
+    if sid not in sessions_activas:
+        emit("error", {"mensaje": "No autenticado."})
+        return
+
+    username = sessions_activas[sid]["username"]
+    kit_id = (data or {}).get("kit_id")
+    if kit_id not in KITS_VOLTRACE:
+        emit("error", {"mensaje": "Kit no encontrado."})
+        return
+
+    emit(
+        "arsenal:ranking_kit_data",
+        {
+            "kit_id": kit_id,
+            "top": rankings_maestria.top(kit_id, 10),
+            "jugador": rankings_maestria.posicion(kit_id, username),
+        },
+    )
+
+
 @socketio.on("arsenal:equip_title")
 def arsenal_equip_title(data):
     sid = request.sid
@@ -2598,8 +2752,9 @@ def arsenal_equip_title(data):
                 emit("error", {"mensaje": "¡Aún no has desbloqueado este título!"})
                 return
 
-        user.equipped_title = title_name
-        db.session.commit()
+        carriles_db.ejecutar(
+            [username], _actualizar_usuario_db, username, equipped_title=title_name
+        )
 
         # Enviar confirmación al cliente
         emit("arsenal:title_equipped", {"title": title_name})
@@ -2640,10 +2795,14 @@ def manejar_mensaje(data):
         # Iniciar el hilo para el trabajo de DB
         if sid in sessions_activas:
             username = sessions_activas[sid]["username"]
-            threading.Thread(
-                target=_procesar_chat_db_async,
-                args=(current_app._get_current_object(), sid, username, id_sala),
-            ).start()
+            ejecutor_db.enviar(
+                _procesar_chat_db_async,
+                current_app._get_current_object(),
+                sid,
+                username,
+                id_sala,
+                descartable=True,
+            )
 
     else:
         emit(
@@ -2690,8 +2849,7 @@ def handle_private_message(data):
 
     if result["success"]:
         # A. Notificar al destinatario si está conectado
-        presence_info = social_system.presence_data.get(target, {})
-        target_sid = presence_info.get("extra_data", {}).get("sid")
+        target_sid = social_system.get_sid(target)
         logger.debug(f"Intentando notificar a {target} (SID: {target_sid})")
         if target_sid:
             try:
@@ -2713,10 +2871,13 @@ def handle_private_message(data):
         emit("message_sent_confirm", result["message_data"])
 
         # Iniciar el hilo para el trabajo de DB
-        threading.Thread(
-            target=_procesar_pm_db_async,
-            args=(current_app._get_current_object(), sid, sender),
-        ).start()
+        ejecutor_db.enviar(
+            _procesar_pm_db_async,
+            current_app._get_current_object(),
+            sid,
+            sender,
+            descartable=True,
+        )
 
     else:
         logger.warning(f"PM ERROR (social_system): {result['message']}")
@@ -2742,12 +2903,14 @@ def handle_invite_to_room(data):
     logger.debug(f"Resultado de social_system.send_room_invitation: {result}")
 
     if result["success"]:
-        # Intentar notificar al destinatario si está conectado
-        recipient_sid = (
-            social_system.presence_data.get(recipient, {})
-            .get("extra_data", {})
-            .get("sid")
+        rueda_temporizadores.agendar(
+            social_system.INVITATION_TTL_SECONDS,
+            social_system.expire_invitation,
+            recipient,
+            result["invitation_data"]["id"],
         )
+        # Intentar notificar al destinatario si está conectado
+        recipient_sid = social_system.get_sid(recipient)
         logger.debug(
             f"Intentando notificar invitación a {recipient} (SID: {recipient_sid})"
         )
@@ -2775,17 +2938,9 @@ def handle_presence_heartbeat():
     sid = request.sid
     if sid in sessions_activas:
         username = sessions_activas[sid]["username"]
-        current_status = social_system._get_user_status(
-            username
-        )  # Obtener estado actual
-
-        if current_status != "offline":
-            # Refrescar 'last_seen' llamando a update_user_presence
-            presence_data = social_system.presence_data.get(username, {})
-            extra_data = presence_data.get("extra_data", {"sid": sid})
-            if extra_data.get("sid") != sid:
-                extra_data["sid"] = sid
-            social_system.update_user_presence(username, current_status, extra_data)
+        # Solo refresca la última vez visto (y el sid); quien ya venció
+        # sigue offline hasta su próximo cambio de estado
+        social_system.presence_heartbeat(username, sid)
 
 
 # ===================================================================
@@ -2865,7 +3020,7 @@ def solicitar_revancha(data):
     # Si TODOS los participantes originales solicitan, iniciar revancha inmediatamente
     if len(info_revancha["solicitudes"]) == len(info_revancha["participantes"]):
         if info_revancha["timer"]:
-            info_revancha["timer"].cancel()  # Cancelar timer si estaba corriendo
+            info_revancha["timer"].cancelar()  # Cancelar timer si estaba corriendo
             logger.debug(
                 f"Timer de revancha para sala {id_sala_original} cancelado (todos respondieron)."
             )
@@ -2946,7 +3101,7 @@ def abandonar_revancha(data):
 
             # Limpiar
             if info_revancha.get("timer"):
-                info_revancha["timer"].cancel()
+                info_revancha["timer"].cancelar()
             revanchas_pendientes.pop(id_sala_original, None)
 
         # Si todavía es posible pero no todos han aceptado
@@ -2976,24 +3131,9 @@ def abandonar_revancha(data):
 
 @socketio.on("pedir_top_5")
 def manejar_pedir_top_5():
-    # Handler para obtener el top 5
-    try:
-        top_jugadores = (
-            User.query.order_by(User.level.desc(), User.xp.desc()).limit(5).all()
-        )
-        ranking_data = [
-            {
-                "username": j.username,
-                "level": j.level,
-                "xp": j.xp,
-                # No incluir stats de juego aquí si solo es para un display rápido
-            }
-            for j in top_jugadores
-        ]
-        emit("actualizar_top_5", ranking_data)  # Enviar solo al que pidió
-    except Exception as e:
-        logger.error(f"Error al obtener top 5: {e}", exc_info=True)
-        emit("actualizar_top_5", [])  # Enviar lista vacía en caso de error
+    # Top 5 desde memoria; los cambios posteriores llegan solos (SALA_RANKING)
+    join_room(SALA_RANKING)
+    emit("actualizar_top_5", ranking.top(TAMANO_TOP))
 
 
 # ===================================================================
@@ -3049,7 +3189,7 @@ def _finalizar_desconexion(sid_original, id_sala, username_desconectado):
                             room=p_sid_original,
                         )
                 if info_revancha.get("timer"):
-                    info_revancha["timer"].cancel()
+                    info_revancha["timer"].cancelar()
                 revanchas_pendientes.pop(id_sala, None)
             else:
                 # Notificar a los que quedan
@@ -3115,19 +3255,18 @@ def _finalizar_desconexion(sid_original, id_sala, username_desconectado):
             )
 
             sala.juego.marcar_jugador_inactivo(username_desconectado)
+            _vaciar_logros_turno(sala)
             # Mover el procesamiento de estadísticas de abandono a un hilo
             logger.debug(
                 f"Iniciando hilo para procesar abandono de {username_desconectado}..."
             )
-            threading.Thread(
-                target=_procesar_abandono_db_async,
-                args=(
-                    current_app._get_current_object(),
-                    username_desconectado,
-                    sala.juego,
-                    len(sala.jugadores),
-                ),
-            ).start()
+            ejecutor_db.enviar(
+                _procesar_abandono_db_async,
+                current_app._get_current_object(),
+                username_desconectado,
+                sala.juego,
+                len(sala.jugadores),
+            )
 
             # Comprobar si el juego termina
             if sala.juego.ha_terminado():
@@ -3151,18 +3290,15 @@ def _finalizar_desconexion(sid_original, id_sala, username_desconectado):
                 logger.debug(
                     "Iniciando hilo para procesar estadísticas de fin de juego (por desconexión)..."
                 )
-                stats_thread = threading.Thread(
-                    target=_procesar_estadisticas_fin_juego_async,
-                    args=(
-                        current_app._get_current_object(),
-                        jugadores_items_copia,
-                        ganador_nombre,
-                        ronda_copia,
-                        player_count_copia,
-                        juego_obj_copia,
-                    ),
+                ejecutor_db.enviar(
+                    _procesar_estadisticas_fin_juego_async,
+                    current_app._get_current_object(),
+                    jugadores_items_copia,
+                    ganador_nombre,
+                    ronda_copia,
+                    player_count_copia,
+                    juego_obj_copia,
                 )
-                stats_thread.start()
 
                 stats_finales_dict = sala.juego.obtener_estadisticas_finales()
 
@@ -3207,29 +3343,18 @@ def _finalizar_desconexion(sid_original, id_sala, username_desconectado):
                             exc_info=True,
                         )
 
-                colores_map = getattr(sala, "colores_map", {})
                 nuevo_turno_actual = (
                     sala.juego.obtener_turno_actual()
                 )  # Obtener el nuevo turno
 
-                estado_juego_actualizado = {
-                    "jugadores": sala.juego.obtener_estado_jugadores(),
-                    "tablero": sala.juego.obtener_estado_tablero(),
-                    "turno_actual": nuevo_turno_actual,
-                    "ronda": sala.juego.ronda,
-                    "estado": sala.estado,
-                    "colores_jugadores": colores_map,
-                    "evento_global_activo": sala.juego.evento_global_activo,
-                }
-
                 eventos_recientes = [f"🔌 {username_desconectado} se desconectó."]
                 if nuevo_turno_actual:
                     eventos_recientes.append(f"Es el turno de {nuevo_turno_actual}.")
 
-                socketio.emit(
+                _emitir_evento_juego(
                     "estado_juego_actualizado",
                     {
-                        "estado_juego": estado_juego_actualizado,
+                        "estado_delta": _delta_estado_juego(sala),
                         "eventos_recientes": eventos_recientes,
                     },
                     room=id_sala,
@@ -3290,17 +3415,11 @@ def iniciar_juego_sala(id_sala):
         logger.info(f"sala.iniciar_juego() tuvo ÉXITO. Estado ahora: {sala.estado}")
 
         # Preparar el estado inicial del juego para enviar a los clientes
-        estado_juego = {
-            "estado": sala.estado,
-            "jugadores": sala.juego.obtener_estado_jugadores(),
-            "tablero": sala.juego.obtener_estado_tablero(),
-            "turno_actual": sala.juego.obtener_turno_actual(),
-            "ronda": sala.juego.ronda,
-            "colores_jugadores": colores_map,
-            "evento_global_activo": sala.juego.evento_global_activo,
-        }
+        # (versión inicial del protocolo de deltas, ver estado_sync.py)
+        estado_juego = sala.proyeccion.completo()
+        primer_jugador_turno = sala.juego.obtener_turno_actual()
         logger.debug(
-            f"ESTADO INICIAL A ENVIAR - Turno: {estado_juego.get('turno_actual')}, Estado: {estado_juego.get('estado')}"
+            f"ESTADO INICIAL A ENVIAR - Turno: {primer_jugador_turno}, Estado: {sala.estado}"
         )
 
         # Actualizar presencia de todos los jugadores a "in_game"
@@ -3315,7 +3434,6 @@ def iniciar_juego_sala(id_sala):
         logger.debug(f"EMITIENDO 'juego_iniciado' a sala {id_sala}")
         socketio.emit("juego_iniciado", estado_juego, room=id_sala)
 
-        primer_jugador_turno = estado_juego.get("turno_actual")
         if primer_jugador_turno:
             _iniciar_temporizador_turno(id_sala, primer_jugador_turno)
     else:
@@ -3335,7 +3453,7 @@ def _crear_nueva_sala_revancha(id_sala_original):
         return
 
     if info_revancha.get("timer"):
-        info_revancha["timer"].cancel()
+        info_revancha["timer"].cancelar()
 
     nueva_id_sala = str(uuid.uuid4())[:8]  # Nuevo ID para la sala de revancha
     logger.info(f"CREANDO SALA DE REVANCHA - Nueva ID: {nueva_id_sala}")
@@ -3352,11 +3470,7 @@ def _crear_nueva_sala_revancha(id_sala_original):
         p_username = p_data["nombre"]
 
         if p_username in nombres_solicitantes:
-            p_sid_actual = (
-                social_system.presence_data.get(p_username, {})
-                .get("extra_data", {})
-                .get("sid")
-            )
+            p_sid_actual = social_system.get_sid(p_username)
             estado_actual = social_system._get_user_status(p_username)
 
             # Solo unir si tiene SID y está 'online' (no en otra sala o juego)
@@ -3462,9 +3576,10 @@ def iniciar_timer_revancha(id_sala_original):
             )
             _crear_nueva_sala_revancha(id_sala_original)
 
-    # Crear y empezar el timer usando threading.Timer
-    timer = Timer(TIEMPO_MAXIMO_REVANCHA, timer_callback)
-    timer.start()
+    # Agendar en la rueda compartida (el callback corre como tarea de fondo)
+    timer = rueda_temporizadores.agendar(
+        TIEMPO_MAXIMO_REVANCHA, socketio.start_background_task, timer_callback
+    )
 
     # Guardar la referencia al timer por si necesitamos cancelarlo
     if id_sala_original in revanchas_pendientes:
@@ -3478,10 +3593,11 @@ TURNO_TIMEOUT_SEGUNDOS = (
 
 
 def _cancelar_temporizador_turno(id_sala):
+    planificador_bots.cancelar(id_sala)
     if id_sala in salas_activas:
         sala = salas_activas[id_sala]
         if sala.turn_timer:
-            sala.turn_timer.cancel()
+            sala.turn_timer.cancelar()
             sala.turn_timer = None
             logger.debug(f"TIMER CANCELADO - Sala: {id_sala}")
 
@@ -3535,18 +3651,72 @@ def _expulsar_por_inactividad(id_sala, nombre_jugador_expulsado, turno_ronda_exp
         _finalizar_desconexion(sid_a_expulsar, id_sala, nombre_jugador_expulsado)
 
 
-def _ejecutar_hilo_bot(app, id_sala, nombre_bot):
-    with app.app_context():
-        socketio.sleep(2.0)
+# Delta versionado respecto a lo último emitido a la sala, ya codificado
+# (ver estado_sync.py y proyeccion_estado.py).
+def _delta_estado_juego(sala):
+    return sala.proyeccion.delta()
+
+
+# Estado completo + versión para un cliente que entra o perdió una versión.
+# Es la vista de la última versión emitida: el próximo delta parte de ella.
+def _estado_completo_juego(sala):
+    return sala.proyeccion.completo()
 
+
+# Emite un evento de juego a la sala: en binario a quienes lo negociaron
+# (codificado una vez por emit) y en JSON al resto.
+def _emitir_evento_juego(evento, datos, room):
+    binarios = []
+    if sids_binarios:
+        participantes = socketio.server.manager.get_participants("/", room)
+        binarios = [sid for sid, _ in participantes if sid in sids_binarios]
+    if not binarios:
+        socketio.emit(evento, datos, room=room)
+        return
+    socketio.emit(evento, datos, room=room, skip_sid=binarios)
+    socketio.emit(evento, codec_binario.codificar(datos), to=binarios)
+
+
+# --- Salas solo de bots (fast-forward) ---
+def _sala_solo_bots(sala):
+    return bool(sala.jugadores) and all(
+        datos["nombre"].startswith("Bot_") for datos in sala.jugadores.values()
+    )
+
+
+# Hay alguien conectado a la room de Socket.IO (jugadores o espectadores).
+def _sala_tiene_oyentes(id_sala):
+    try:
+        return (
+            next(socketio.server.manager.get_participants("/", id_sala), None)
+            is not None
+        )
+    except KeyError:
+        return False
+
+
+# Pausa antes del próximo turno de bot: ritmo normal si hay humanos jugando,
+# velocidad de motor si la sala es solo de bots y nadie mira.
+def _retardo_turno_bot(sala):
+    if not _sala_solo_bots(sala):
+        return None
+    if _sala_tiene_oyentes(sala.id_sala):
+        return RITMO_BOTS_CON_ESPECTADORES
+    return 0.0
+
+
+# Worker del planificador: la pausa entre jugadas ya la aplicó la rueda.
+def _ejecutar_turno_bot_programado(id_sala, nombre_bot):
+    with app.app_context():
         sala = salas_activas.get(id_sala)
         if not sala or not sala.juego or sala.estado != "jugando":
             return
 
-        logger.info(f"Calculando turno de {nombre_bot} en sala {id_sala}...")
+        logger.debug(f"Calculando turno de {nombre_bot} en sala {id_sala}...")
 
         # Ejecuta la acción a través del Agente Global
         resultado = sala.juego.ejecutar_turno_bot(nombre_bot, agente_ia_global)
+        _vaciar_logros_turno(sala)
 
         # Verifica si el juego terminó con esta jugada
         if sala.juego.ha_terminado():
@@ -3562,39 +3732,27 @@ def _ejecutar_hilo_bot(app, id_sala, nombre_bot):
                 room=id_sala,
             )
 
-            threading.Thread(
-                target=_procesar_estadisticas_fin_juego_async,
-                args=(
-                    app,
-                    list(sala.jugadores.items()),
-                    stats_finales_dict.get("ganador"),
-                    sala.juego.ronda,
-                    len(sala.jugadores),
-                    sala.juego,
-                ),
-            ).start()
+            ejecutor_db.enviar(
+                _procesar_estadisticas_fin_juego_async,
+                app,
+                list(sala.jugadores.items()),
+                stats_finales_dict.get("ganador"),
+                sala.juego.ronda,
+                len(sala.jugadores),
+                sala.juego,
+            )
             return
 
-        # Actualiza el estado del tablero a todos los jugadores
-        colores_map = getattr(sala, "colores_map", {})
-        estado_juego_actualizado = {
-            "jugadores": sala.juego.obtener_estado_jugadores(),
-            "tablero": sala.juego.obtener_estado_tablero(),
-            "turno_actual": sala.juego.obtener_turno_actual(),
-            "ronda": sala.juego.ronda,
-            "estado": sala.estado,
-            "colores_jugadores": colores_map,
-            "evento_global_activo": sala.juego.evento_global_activo,
-        }
-
-        socketio.emit(
-            "estado_juego_actualizado",
-            {
-                "estado_juego": estado_juego_actualizado,
-                "eventos_recientes": resultado.get("eventos", []),
-            },
-            room=id_sala,
-        )
+        # Actualiza el estado del tablero a todos los jugadores (si alguien mira)
+        if not _sala_solo_bots(sala) or _sala_tiene_oyentes(id_sala):
+            _emitir_evento_juego(
+                "estado_juego_actualizado",
+                {
+                    "estado_delta": _delta_estado_juego(sala),
+                    "eventos_recientes": resultado.get("eventos", []),
+                },
+                room=id_sala,
+            )
 
         # Inicia el timer o hilo del siguiente jugador
         nuevo_turno_actual = sala.juego.obtener_turno_actual()
@@ -3611,11 +3769,8 @@ def _iniciar_temporizador_turno(id_sala, nombre_jugador_turno):
 
     # Desvío para ejecución automática si es un bot
     if nombre_jugador_turno.startswith("Bot_"):
-        socketio.start_background_task(
-            _ejecutar_hilo_bot,
-            current_app._get_current_object(),
-            id_sala,
-            nombre_jugador_turno,
+        planificador_bots.programar(
+            id_sala, nombre_jugador_turno, retardo=_retardo_turno_bot(sala)
         )
         return
 
@@ -3625,13 +3780,76 @@ def _iniciar_temporizador_turno(id_sala, nombre_jugador_turno):
 
     ronda_actual = sala.juego.ronda
 
-    timer = threading.Timer(
+    sala.turn_timer = rueda_temporizadores.agendar(
         TURNO_TIMEOUT_SEGUNDOS,
+        socketio.start_background_task,
+        _encolar_en_sala,
+        id_sala,
         _expulsar_por_inactividad,
-        args=[id_sala, nombre_jugador_turno, ronda_actual],
+        id_sala,
+        nombre_jugador_turno,
+        turno_ronda_expulsion=ronda_actual,
+        clave="expulsion",
+    )
+
+
+# Encola un comando en la sala (si sigue existiendo). Para timers y
+# workers: lo que llega desde fuera de un handler.
+def _encolar_en_sala(id_sala, funcion, *args, clave=None, **kwargs):
+    sala = salas_activas.get(id_sala)
+    if sala is not None:
+        sala.comandos.encolar(funcion, *args, clave=clave, **kwargs)
+
+
+def _encolar_turno_bot(id_sala, nombre_bot):
+    _encolar_en_sala(
+        id_sala, _ejecutar_turno_bot_programado, id_sala, nombre_bot, clave="turno_bot"
     )
-    sala.turn_timer = timer
-    timer.start()
+
+
+# Único ticker para todos los vencimientos (turnos, revanchas,
+# invitaciones y ritmo de bots)
+rueda_temporizadores = RuedaTemporizadores(
+    iniciar_tarea=socketio.start_background_task,
+    dormir=socketio.sleep,
+)
+
+
+def _emitir_estados_amigos(sid, cambios):
+    socketio.emit("friend_status_batch", {"friends": cambios}, to=sid)
+
+
+# El vaciado emite por red: corre como tarea de fondo, no en el ticker
+def _agendar_avisos_estado(retardo, funcion):
+    rueda_temporizadores.agendar(retardo, socketio.start_background_task, funcion)
+
+
+# Cambios de estado de amigos agrupados por destinatario
+agregador_estados = AgregadorEstados(
+    ventana=VENTANA_AVISOS_ESTADO_SEGUNDOS,
+    agendar=_agendar_avisos_estado,
+    emitir=_emitir_estados_amigos,
+    sid_de=social_system.get_sid,
+)
+
+# Escrituras de DB fuera del flujo del juego (XP, estadísticas, logros de
+# eventos): cola acotada con un máximo de workers en vez de un hilo por tarea
+ejecutor_db = EjecutorDB(
+    iniciar_tarea=socketio.start_background_task,
+    dormir=socketio.sleep,
+    contexto=app.app_context,
+    max_workers=MAX_WORKERS_DB,
+    max_cola=MAX_COLA_DB,
+)
+
+planificador_bots = PlanificadorBots(
+    ejecutar_turno=_encolar_turno_bot,
+    iniciar_tarea=socketio.start_background_task,
+    dormir=socketio.sleep,
+    max_workers=MAX_WORKERS_BOTS,
+    retardo_turno=RETARDO_TURNO_BOT_SEGUNDOS,
+    rueda=rueda_temporizadores,
+)
 
 
 def limpiar_salas_inactivas():
@@ -3664,277 +3882,214 @@ def limpiar_salas_inactivas():
                         # También limpiar revanchas pendientes asociadas si existen
                         if id_sala in revanchas_pendientes:
                             if revanchas_pendientes[id_sala].get("timer"):
-                                revanchas_pendientes[id_sala]["timer"].cancel()
+                                revanchas_pendientes[id_sala]["timer"].cancelar()
                             del revanchas_pendientes[id_sala]
             else:
                 logger.debug("No se encontraron salas inactivas para eliminar.")
 
+        # Historial de temporadas cerradas (no hace nada si ya está al día)
+        ejecutor_db.enviar(_compactar_temporadas_async, app)
+
+
+def _compactar_temporadas_async(app):
+    with app.app_context():
+        try:
+            estadisticas_temporada.compactar()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(
+                f"!!! ERROR en _compactar_temporadas_async: {e}", exc_info=True
+            )
+
 
 def _procesar_estadisticas_fin_juego_async(
     app, jugadores_items, ganador_nombre, ronda, player_count_db, juego_obj
 ):
     with app.app_context():
-        with db_lock:
-            logger.debug(
-                f"THREAD: Iniciando procesamiento de estadísticas para {len(jugadores_items)} jugadores..."
-            )
-            try:
-                for sid, jugador_data in jugadores_items:
+        logger.debug(
+            f"THREAD: Iniciando procesamiento de estadísticas para {len(jugadores_items)} jugadores..."
+        )
+        try:
+            jugadores = []
+            sids = {}
+            kits = {}
+            for sid, jugador_data in jugadores_items:
 
-                    username = jugador_data.get("nombre")
-                    if not username:
-                        logger.warning(
-                            "ADVERTENCIA: No se encontró nombre en jugador_data. Omitiendo stats."
-                        )
-                        continue  # Saltar a este jugador
+                username = jugador_data.get("nombre")
+                if not username:
+                    logger.warning(
+                        "ADVERTENCIA: No se encontró nombre en jugador_data. Omitiendo stats."
+                    )
+                    continue  # Saltar a este jugador
 
-                    jugador_juego = juego_obj._encontrar_jugador(username)
-                    if not jugador_juego:
-                        logger.warning(
-                            f"ADVERTENCIA: No se encontró a {username} en el objeto juego. Omitiendo stats."
-                        )
-                        continue
-
-                    is_winner = username == ganador_nombre
-                    user_db = User.query.filter_by(username=username).first()
-
-                    if user_db:
-                        user_db.games_played += 1
-                        xp_ganada = XP_POR_PARTIDA
-
-                        current_consecutive_wins = 0
-                        if is_winner:
-                            user_db.games_won += 1
-                            xp_ganada += XP_VICTORIA
-                            user_db.consecutive_wins = (
-                                getattr(user_db, "consecutive_wins", 0) + 1
-                            )
-                            current_consecutive_wins = user_db.consecutive_wins
-                        else:
-                            user_db.consecutive_wins = 0
-                            current_consecutive_wins = 0
-
-                        if user_db.level >= 5:
-                            try:
-                                kit_usado = jugador_data.get("kit_id", "tactico")
-                                xp_maestria_ganada = (
-                                    XP_MAESTRIA_VICTORIA
-                                    if is_winner
-                                    else XP_MAESTRIA_BASE
-                                )
-
-                                maestria = UserKitMaestria.query.filter_by(
-                                    user_id=user_db.id, kit_id=kit_usado
-                                ).first()
-
-                                if not maestria:
-                                    maestria = UserKitMaestria(
-                                        user_id=user_db.id,
-                                        kit_id=kit_usado,
-                                        xp=0,
-                                        level=1,
-                                    )
-
-                                maestria.xp += xp_maestria_ganada
-
-                                MAESTRIA_XP_NV10 = 6750
-
-                                if (
-                                    maestria.xp >= MAESTRIA_XP_NV10
-                                    and maestria.cosmetic_unlocked == False
-                                ):
-                                    maestria.cosmetic_unlocked = True
-                                    logger.info(
-                                        f"COSMÉTICO DESBLOQUEADO: {kit_usado} para {user_db.username}"
-                                    )
-                                    # Comprobar si el SID sigue activo ANTES de emitir
-                                    if sid in sessions_activas:
-                                        socketio.emit(
-                                            "cosmetic_unlocked",
-                                            {"kit_id": kit_usado},
-                                            to=sid,
-                                        )
-
-                                db.session.add(maestria)
-                                logger.info(
-                                    f"MAESTRÍA: {xp_maestria_ganada} XP añadidos a {user_db.username} para kit {kit_usado}. Total: {maestria.xp}"
-                                )
-
-                            except Exception as e:
-                                db.session.rollback()
-                                logger.error(
-                                    f"!!! ERROR al procesar Maestría de Kit: {e}",
-                                    exc_info=True,
-                                )
-
-                        level_up = update_xp_and_level(user_db, xp_ganada)
-
-                        # Comprobar si el SID sigue activo ANTES de emitir
-                        if sid in sessions_activas:
-                            socketio.emit(
-                                "profile_stats_updated",
-                                {
-                                    "games_played": user_db.games_played,
-                                    "games_won": user_db.games_won,
-                                    "consecutive_wins": user_db.consecutive_wins,
-                                    "xp": user_db.xp,
-                                    "level": user_db.level,
-                                    "equipped_title": getattr(
-                                        user_db, "equipped_title", None
-                                    ),
-                                    "xp_next_level": get_xp_for_next_level(
-                                        user_db.level
-                                    ),
-                                },
-                                to=sid,
-                            )
-
-                        event_data = {
-                            "won": is_winner,
-                            "final_energy": jugador_juego.get_puntaje(),
-                            "reached_position": jugador_juego.get_posicion(),
-                            "total_rounds": ronda,
-                            "player_count": player_count_db,
-                            "colisiones": getattr(
-                                jugador_juego, "colisiones_causadas", 0
-                            ),
-                            "special_tiles_activated": getattr(
-                                jugador_juego, "tipos_casillas_visitadas", set()
-                            ),
-                            "abilities_used": getattr(
-                                jugador_juego, "habilidades_usadas_en_partida", 0
-                            ),
-                            "treasures_this_game": getattr(
-                                jugador_juego, "tesoros_recogidos", 0
-                            ),
-                            "completed_without_traps": getattr(
-                                jugador_juego, "trampas_evitadas", True
-                            ),
-                            "precision_laser": getattr(
-                                jugador_juego, "dado_perfecto_usado", 0
-                            ),
-                            "messages_this_game": getattr(
-                                jugador_juego, "game_messages_sent_this_match", 0
-                            ),
-                            "only_active_player": len(
-                                [j for j in juego_obj.jugadores if j.esta_activo()]
-                            )
-                            == 1,
-                            "never_eliminated": jugador_juego.esta_activo(),
-                            "energy_packs_collected": getattr(
-                                jugador_juego, "energy_packs_collected", 0
-                            ),
-                            "consecutive_wins": current_consecutive_wins,
-                            "ultimo_en_mid_game": getattr(
-                                juego_obj, "ultimo_en_mid_game", None
-                            ),
-                        }
-
-                        unlocked_achievements = achievement_system.check_achievement(
-                            username, "game_finished", event_data
-                        )
+                jugador_juego = juego_obj._encontrar_jugador(username)
+                if not jugador_juego:
+                    logger.warning(
+                        f"ADVERTENCIA: No se encontró a {username} en el objeto juego. Omitiendo stats."
+                    )
+                    continue
 
-                        # Comprobar si el SID sigue activo ANTES de emitir
-                        if unlocked_achievements and sid in sessions_activas:
-                            socketio.emit(
-                                "achievements_unlocked",
-                                {
-                                    "achievements": [
-                                        achievement_system.get_achievement_info(ach_id)
-                                        for ach_id in unlocked_achievements
-                                    ]
-                                },
-                                to=sid,
-                            )
+                is_winner = username == ganador_nombre
+                event_data = {
+                    "won": is_winner,
+                    "final_energy": jugador_juego.get_puntaje(),
+                    "reached_position": jugador_juego.get_posicion(),
+                    "total_rounds": ronda,
+                    "player_count": player_count_db,
+                    "colisiones": getattr(jugador_juego, "colisiones_causadas", 0),
+                    "special_tiles_activated": getattr(
+                        jugador_juego, "tipos_casillas_visitadas", set()
+                    ),
+                    "abilities_used": getattr(
+                        jugador_juego, "habilidades_usadas_en_partida", 0
+                    ),
+                    "treasures_this_game": getattr(
+                        jugador_juego, "tesoros_recogidos", 0
+                    ),
+                    "completed_without_traps": getattr(
+                        jugador_juego, "trampas_evitadas", True
+                    ),
+                    "precision_laser": getattr(jugador_juego, "dado_perfecto_usado", 0),
+                    "messages_this_game": getattr(
+                        jugador_juego, "game_messages_sent_this_match", 0
+                    ),
+                    "only_active_player": len(
+                        [j for j in juego_obj.jugadores if j.esta_activo()]
+                    )
+                    == 1,
+                    "never_eliminated": jugador_juego.esta_activo(),
+                    "energy_packs_collected": getattr(
+                        jugador_juego, "energy_packs_collected", 0
+                    ),
+                    "ultimo_en_mid_game": getattr(
+                        juego_obj, "ultimo_en_mid_game", None
+                    ),
+                }
 
-                    # Comprobar si el SID sigue activo ANTES de actualizar la presencia
-                    if sid in sessions_activas:
-                        social_system.update_user_presence(
-                            username, "online", {"sid": sid}
+                sids[username] = sid
+                kits[username] = jugador_data.get("kit_id", "tactico")
+                jugadores.append(
+                    {
+                        "username": username,
+                        "ganador": is_winner,
+                        "kit_id": kits[username],
+                        "event_data": event_data,
+                    }
+                )
+
+            # Todos los jugadores en una transacción (ver fin_partida_db.py)
+            resultados = escritor_fin_partida.registrar(jugadores)
+
+            for username, sid in sids.items():
+                resultado = resultados.get(username)
+                # Comprobar si el SID sigue activo ANTES de emitir
+                if resultado and sid in sessions_activas:
+                    if resultado["cosmetico"]:
+                        socketio.emit(
+                            "cosmetic_unlocked",
+                            {"kit_id": kits[username]},
+                            to=sid,
                         )
+                    socketio.emit(
+                        "profile_stats_updated",
+                        {
+                            "games_played": resultado["games_played"],
+                            "games_won": resultado["games_won"],
+                            "consecutive_wins": resultado["consecutive_wins"],
+                            "xp": resultado["xp"],
+                            "level": resultado["level"],
+                            "equipped_title": resultado["equipped_title"],
+                            "xp_next_level": get_xp_for_next_level(resultado["level"]),
+                        },
+                        to=sid,
+                    )
+                    _emitir_logros_desbloqueados(resultado["logros"], sid)
 
-                logger.debug("THREAD: Procesamiento de estadísticas COMPLETO.")
-            except Exception as e:
-                logger.error(
-                    f"!!! ERROR FATAL en hilo _procesar_estadisticas_fin_juego: {e}",
-                    exc_info=True,
-                )
+                # Comprobar si el SID sigue activo ANTES de actualizar la presencia
+                if sid in sessions_activas:
+                    social_system.update_user_presence(username, "online", {"sid": sid})
+
+            logger.debug("THREAD: Procesamiento de estadísticas COMPLETO.")
+        except Exception as e:
+            logger.error(
+                f"!!! ERROR FATAL en hilo _procesar_estadisticas_fin_juego: {e}",
+                exc_info=True,
+            )
 
 
 def _procesar_abandono_db_async(app, username, juego_obj, sala_jugadores_count):
     with app.app_context():
-        with db_lock:
-            try:
-                logger.debug(
-                    f"THREAD: Actualizando estadísticas de abandono para {username}..."
+        try:
+            logger.debug(
+                f"THREAD: Actualizando estadísticas de abandono para {username}..."
+            )
+            jugador_juego = juego_obj._encontrar_jugador(username)
+            user_db = None
+            if jugador_juego:
+                # Dar una pequeña cantidad de XP por participar
+                user_db, _ = carriles_db.ejecutar(
+                    [username],
+                    _sumar_contador_usuario_db,
+                    username,
+                    "games_played",
+                    25,
                 )
-                user_db = User.query.filter_by(username=username).first()
-                jugador_juego = juego_obj._encontrar_jugador(username)
 
-                if user_db and jugador_juego:
-                    user_db.games_played += 1
-                    update_xp_and_level(
-                        user_db, 25
-                    )  # Dar una pequeña cantidad de XP por participar
-
-                    # Re-crear el event_data que estaba en _finalizar_desconexion
-                    event_data = {
-                        "won": False,
-                        "final_energy": jugador_juego.get_puntaje(),
-                        "reached_position": jugador_juego.get_posicion(),
-                        "total_rounds": juego_obj.ronda,
-                        "player_count": sala_jugadores_count + 1,
-                        "colisiones": getattr(jugador_juego, "colisiones_causadas", 0),
-                        "special_tiles_activated": getattr(
-                            jugador_juego, "tipos_casillas_visitadas", set()
-                        ),
-                        "abilities_used": getattr(
-                            jugador_juego, "habilidades_usadas_en_partida", 0
-                        ),
-                        "treasures_this_game": getattr(
-                            jugador_juego, "tesoros_recogidos", 0
-                        ),
-                        "completed_without_traps": False,
-                        "precision_laser": getattr(
-                            jugador_juego, "dado_perfecto_usado", 0
-                        ),
-                        "messages_this_game": getattr(
-                            jugador_juego, "game_messages_sent_this_match", 0
-                        ),
-                        "only_active_player": False,
-                        "never_eliminated": False,
-                        "energy_packs_collected": getattr(
-                            jugador_juego, "energy_packs_collected", 0
-                        ),
-                    }
-                    achievement_system.check_achievement(
-                        username, "game_finished", event_data
-                    )
-                    logger.debug(
-                        f"THREAD: Estadísticas de abandono para {username} actualizadas."
-                    )
-                else:
-                    logger.warning(
-                        f"THREAD (WARN): No se encontró {username} en DB o juego para stats de abandono."
-                    )
-            except Exception as e:
-                db.session.rollback()
-                logger.error(
-                    f"!!! ERROR en _procesar_abandono_db_async: {e}", exc_info=True
+            if user_db and jugador_juego:
+
+                # Re-crear el event_data que estaba en _finalizar_desconexion
+                event_data = {
+                    "won": False,
+                    "final_energy": jugador_juego.get_puntaje(),
+                    "reached_position": jugador_juego.get_posicion(),
+                    "total_rounds": juego_obj.ronda,
+                    "player_count": sala_jugadores_count + 1,
+                    "colisiones": getattr(jugador_juego, "colisiones_causadas", 0),
+                    "special_tiles_activated": getattr(
+                        jugador_juego, "tipos_casillas_visitadas", set()
+                    ),
+                    "abilities_used": getattr(
+                        jugador_juego, "habilidades_usadas_en_partida", 0
+                    ),
+                    "treasures_this_game": getattr(
+                        jugador_juego, "tesoros_recogidos", 0
+                    ),
+                    "completed_without_traps": False,
+                    "precision_laser": getattr(jugador_juego, "dado_perfecto_usado", 0),
+                    "messages_this_game": getattr(
+                        jugador_juego, "game_messages_sent_this_match", 0
+                    ),
+                    "only_active_player": False,
+                    "never_eliminated": False,
+                    "energy_packs_collected": getattr(
+                        jugador_juego, "energy_packs_collected", 0
+                    ),
+                }
+                achievement_system.check_achievement(
+                    username, "game_finished", event_data
                 )
+                logger.debug(
+                    f"THREAD: Estadísticas de abandono para {username} actualizadas."
+                )
+            else:
+                logger.warning(
+                    f"THREAD (WARN): No se encontró {username} en DB o juego para stats de abandono."
+                )
+        except Exception as e:
+            db.session.rollback()
+            logger.error(
+                f"!!! ERROR en _procesar_abandono_db_async: {e}", exc_info=True
+            )
 
 
-def get_friends_list_server_safe(username):
-    user = User.query.filter_by(username=username).first()
-    if not user:
-        return []
-    # Obtener los nombres de usuario de los amigos
-    friends = [friend.username for friend in user.friends]
-    return friends
-
-
-# Asignar la función a social_system para que el código anterior funcione
-social_system.get_friends_list_server = get_friends_list_server_safe
+# Cuenta un nuevo día de login en un solo commit (se repite si hay
+# conflicto de versión: tras el rollback 'user_obj' se relee).
+def _registrar_login_diario_db(user_obj, today):
+    user_obj.last_login_date = today
+    current_days_count = (user_obj.unique_login_days_count or 0) + 1
+    user_obj.unique_login_days_count = current_days_count
+    db.session.commit()  # Guardar los cambios en la DB
+    return current_days_count
 
 
 def _procesar_login_diario(user_obj):
@@ -3952,11 +4107,9 @@ def _procesar_login_diario(user_obj):
             )
 
             # Actualizar el contador y la fecha en la DB
-            user_obj.last_login_date = today
-            current_days_count = getattr(user_obj, "unique_login_days_count", 0) + 1
-            user_obj.unique_login_days_count = current_days_count
-
-            db.session.commit()  # Guardar los cambios en la DB
+            current_days_count = carriles_db.ejecutar(
+                [user_obj.username], _registrar_login_diario_db, user_obj, today
+            )
 
             # Ahora, comprobar el logro con el nuevo contador
             unlocked_list = achievement_system.check_achievement(
@@ -3968,11 +4121,7 @@ def _procesar_login_diario(user_obj):
 
             if unlocked_list:
                 # Si se desbloqueó, notificar al usuario
-                sid = (
-                    social_system.presence_data.get(user_obj.username, {})
-                    .get("extra_data", {})
-                    .get("sid")
-                )
+                sid = social_system.get_sid(user_obj.username)
                 if sid:
                     socketio.emit(
                         "achievements_unlocked",
@@ -10,25 +10,128 @@
 #   logros (nombre, XP, icono, trigger, etc.).
 # - check_achievement: Función principal que recibe un evento (ej.
 #   'game_finished') y determina si se debe desbloquear un logro.
+# - check_achievements_batch: Evalúa juntos los eventos de un turno
+#   (agrupados por usuario) con un solo commit.
+# - Índice de reglas: al crear el sistema, los logros se agrupan por el
+#   evento que los evalúa y por la estadística de la que dependen; cada
+#   evento solo revisa las reglas que puede cambiar (ej. 'dice_rolled' no
+#   revisa persistencia ni lee estadísticas del usuario).
+# - Cache de desbloqueados: los IDs ya obtenidos por cada usuario activo
+#   quedan en memoria (LRU). Si un evento no tiene reglas pendientes, o
+#   solo reglas que se deciden con 'event_data' y no se cumplen, no se
+#   toca la DB.
+# - Definiciones: internal_id -> id/XP de la tabla 'achievement' en
+#   memoria desde el arranque; los desbloqueos se escriben con un INSERT
+#   por lotes idempotente (clave primaria compuesta de user_achievement).
 # - _check_*_achievements: Funciones helper para verificar categorías
 #   específicas de logros (social, persistencia, juego, etc.).
 # - get_user_achievement_progress: Calcula el estado actual (progreso)
-#   de todos los logros para un usuario.
+#   de todos los logros para un usuario. Los metadatos se precalculan y el
+#   documento de cada usuario queda en memoria; las evaluaciones lo
+#   actualizan con los logros y estadísticas nuevos.
 #
 # ===================================================================
 
+from collections import OrderedDict
 from datetime import datetime
-from src.models import db, User, Achievement, UserAchievement
+from src.models import (
+    db,
+    User,
+    Achievement,
+    UserAchievement,
+    insert_con_conflicto,
+)
 from sqlalchemy.orm import selectinload
 import logging
 
 logger = logging.getLogger("voltrace")
 
+# Triggers de la configuración que se evalúan con otro tipo de evento
+TRIGGER_EVENTS = {
+    # El motor los reporta como hechos 'game_event' (ver juego_web.py)
+    "collision": ("game_event",),
+    "ability_defense": ("game_event",),
+    # Se cuenta al terminar la partida
+    "achievement_unlocked": ("game_finished",),
+}
+
+# Logros que además revisa otro evento
+EXTRA_EVENTS = {
+    "treasure_hunter": ("special_tile",),
+    "trap_avoider": ("special_tile",),
+}
+
+# Logros de persistencia: no dependen del evento sino de una estadística
+PERSISTENCE_STATS = {
+    "veteran": "games_played",
+    "champion": "games_won",
+    "level_master": "level",
+}
+
+# Logros (no de persistencia) que leen estadísticas del usuario; el resto
+# se decide solo con 'event_data' y los IDs ya desbloqueados
+RULE_STATS = {
+    "first_game": "games_played",
+    "first_win": "games_won",
+    "first_ability": "abilities_used",
+    "first_room": "rooms_created",
+    "room_host": "rooms_created",
+    "social_butterfly": "friends_count",
+    "popular": "friends_count",
+    "chat_master": "private_messages_sent",
+}
+
+# Progreso en el perfil: estadística que mide cada logro acumulativo
+PROGRESS_STATS = {
+    "veteran": "games_played",
+    "champion": "games_won",
+    "level_master": "level",
+    "chat_master": "private_messages_sent",
+    "room_host": "rooms_created",
+    "coleccionista": "unlocked_achievements_count",
+    "social_butterfly": "friends_count",
+    "popular": "friends_count",
+    "dedicated": "unique_login_days_count",
+}
+
+# Progreso de los logros de primera vez (0 o 1)
+FIRST_TIME_STATS = {
+    "first_game": "games_played",
+    "first_win": "games_won",
+    "first_room": "rooms_created",
+    "first_ability": "abilities_used",
+}
+
+# Estadísticas que cambian junto con cada evento (XP -> nivel incluido)
+EVENT_STATS = {
+    "game_finished": ("games_played", "games_won", "level"),
+    "ability_used": ("abilities_used", "level"),
+    "room_created": ("rooms_created", "level"),
+    "friend_added": ("friends_count",),
+    "private_message_sent": ("private_messages_sent",),
+    "login": ("unique_login_days_count",),
+}
+
 
 class AchievementSystem:
 
-    def __init__(self, db_lock):
-        self.db_lock = db_lock
+    def __init__(self, carriles, cache_size=2048, ranking=None):
+        # Carriles de escritura por usuario (ver carriles_db.py)
+        self.carriles = carriles
+        # RankingMaterializado que recibe la XP de recompensa ya confirmada
+        self.ranking = ranking
+        # {username: set(internal_id)} de los usuarios activos (LRU)
+        self.cache_size = cache_size
+        self._unlocked_cache = OrderedDict()
+        self._cache_hits = 0
+        self._cache_misses = 0
+        self._skipped_events = 0
+        # {internal_id: {"id", "xp_reward"}} (ver load_definitions)
+        self._definitions = None
+        self._missing_definitions = set()
+        # {username: {"unlocked", "stats", "document"}} (LRU, ver
+        # get_user_achievement_progress)
+        self._progress_cache = OrderedDict()
         self.achievements_config = {
             # Logros de Primeras Veces
             "first_win": {
@@ -399,156 +502,380 @@ class AchievementSystem:
             },  # Requiere trackeo por partida
         }
 
-    def check_achievement(self, username, event_type, event_data=None, user_obj=None):
-        with self.db_lock:
-            unlocked_achievements = []
-            newly_unlocked_ids = []
-
-            if user_obj:
-                user = user_obj
-            else:
-                user = (
-                    User.query.options(
-                        selectinload(User.unlocked_achievements_assoc).selectinload(
-                            UserAchievement.achievement
-                        )
-                    )
-                    .filter_by(username=username)
-                    .first()
-                )
-
-            if not user:
-                logger.warning(
-                    f"ACHIEVEMENT ERROR: Usuario {username} no encontrado. No se verificaron logros."
-                )
-                return []
-
-            # Obtener IDs de logros ya desbloqueados
-            unlocked_ach_ids = [
-                ua.achievement.internal_id for ua in user.unlocked_achievements_assoc
-            ]
-
-            # Mapear las estadísticas del usuario para compatibilidad con las funciones de verificación
-            user_stats = {
-                "xp": user.xp,
-                "level": user.level,
-                "games_played": user.games_played,
-                "games_won": user.games_won,
-                "abilities_used": getattr(user, "abilities_used", 0),
-                "game_messages_sent": getattr(user, "game_messages_sent", 0),
-                "private_messages_sent": getattr(user, "private_messages_sent", 0),
-                "messages_sent": getattr(user, "chat_messages_sent", 0),
-                "rooms_created": getattr(user, "rooms_created", 0),
-                "friends_count": user.friends.count(),
-                "unique_login_days_count": getattr(user, "unique_login_days_count", 0),
-            }
-
-            # Llamar a las funciones de verificación
-            if event_type == "game_finished":
-                newly_unlocked_ids.extend(
-                    self._check_game_finished_achievements(
-                        username, event_data, unlocked_ach_ids, user_stats
-                    )
+        # --- Índice de reglas ---
+        # evento -> logros que su verificación puede otorgar
+        self.rules_by_event = {}
+        for internal_id, config in self.achievements_config.items():
+            if internal_id in PERSISTENCE_STATS:
+                continue
+            trigger = config.get("trigger")
+            events = TRIGGER_EVENTS.get(trigger, (trigger,))
+            for event_type in events + EXTRA_EVENTS.get(internal_id, ()):
+                self.rules_by_event.setdefault(event_type, set()).add(internal_id)
+        # estadística -> logros de persistencia que dependen de ella
+        self.rules_by_stat = {}
+        for internal_id, stat in PERSISTENCE_STATS.items():
+            self.rules_by_stat.setdefault(stat, set()).add(internal_id)
+        # Logros que necesitan las estadísticas del usuario para decidirse
+        self.stat_rules = set(RULE_STATS) | set(PERSISTENCE_STATS)
+
+        # Metadatos del progreso de perfil, precalculados
+        self._progress_groups = self._compile_progress()
+
+        # Verificación de cada tipo de evento, con una firma común
+        self._evaluators = {
+            "game_finished": self._check_game_finished_achievements,
+            "ability_used": self._check_ability_achievements,
+            "room_created": lambda username, event_data, current, stats: (
+                self._check_room_achievements(username, current, stats)
+            ),
+            "dice_rolled": self._check_dice_achievements,
+            "special_tile": self._check_special_tile_achievements,
+            "game_event": self._check_game_event_achievements,
+            "login": self._check_login_achievements,
+            "friend_added": lambda username, event_data, current, stats: (
+                self._check_social_achievements(
+                    username, "friend_added", current, stats
                 )
-
-            elif event_type == "ability_used":
-                newly_unlocked_ids.extend(
-                    self._check_ability_achievements(
-                        username, event_data, unlocked_ach_ids, user_stats
-                    )
+            ),
+            "private_message_sent": lambda username, event_data, current, stats: (
+                self._check_social_achievements(
+                    username, "private_message_sent", current, stats
                 )
+            ),
+        }
 
-            elif event_type == "room_created":
-                newly_unlocked_ids.extend(
-                    self._check_room_achievements(
-                        username, unlocked_ach_ids, user_stats
-                    )
-                )
+    def check_achievement(self, username, event_type, event_data=None, user_obj=None):
+        return self.carriles.ejecutar(
+            [username],
+            self._check_achievement_tx,
+            username,
+            event_type,
+            event_data,
+            user_obj,
+        )
 
-            elif event_type == "dice_rolled":
-                newly_unlocked_ids.extend(
-                    self._check_dice_achievements(
-                        username, event_data, unlocked_ach_ids, user_stats
-                    )
-                )
+    def _check_achievement_tx(self, username, event_type, event_data, user_obj):
+        users = {username: user_obj} if user_obj else {}
+        unlocked_by_user = self._evaluate_events(
+            {username: [(event_type, event_data)]}, users
+        )
+        return unlocked_by_user.get(username, [])
+
+    # Evalúa los eventos acumulados de un turno: {username: [(event_type,
+    # event_data), ...]}. Una sola carga de usuarios, una evaluación por
+    # usuario y un solo commit. Devuelve {username: [ids desbloqueados]}.
+    def check_achievements_batch(self, events_by_user):
+        if not events_by_user:
+            return {}
+        return self.carriles.ejecutar(
+            list(events_by_user), self._check_achievements_batch_tx, events_by_user
+        )
 
-            elif event_type == "special_tile":
-                newly_unlocked_ids.extend(
-                    self._check_special_tile_achievements(
-                        username, event_data, unlocked_ach_ids, user_stats
-                    )
-                )
+    def _check_achievements_batch_tx(self, events_by_user):
+        return self._evaluate_events(events_by_user)
 
-            elif event_type == "game_event":
-                newly_unlocked_ids.extend(
-                    self._check_game_event_achievements(
-                        username, event_data, unlocked_ach_ids, user_stats
-                    )
+    def _load_users(self, usernames):
+        users = (
+            User.query.options(
+                selectinload(User.unlocked_achievements_assoc).selectinload(
+                    UserAchievement.achievement
                 )
+            )
+            .filter(User.username.in_(usernames))
+            .all()
+        )
+        return {user.username: user for user in users}
 
-            elif event_type == "login":
-                newly_unlocked_ids.extend(
-                    self._check_login_achievements(
-                        username, event_data, unlocked_ach_ids, user_stats
-                    )
-                )
+    # IDs de logros que el usuario ya tiene (relación precargada).
+    def unlocked_ids(self, user):
+        return [ua.achievement.internal_id for ua in user.unlocked_achievements_assoc]
 
-            # Añadimos los nuevos triggers sociales
-            elif event_type == "friend_added":
+    # Mapear las estadísticas del usuario para compatibilidad con las
+    # funciones de verificación. 'overrides' permite evaluar con valores
+    # calculados en memoria que todavía no se escribieron.
+    def user_stats(self, user, **overrides):
+        stats = {
+            "xp": user.xp,
+            "level": user.level,
+            "games_played": user.games_played,
+            "games_won": user.games_won,
+            "abilities_used": getattr(user, "abilities_used", 0),
+            "game_messages_sent": getattr(user, "game_messages_sent", 0),
+            "private_messages_sent": getattr(user, "private_messages_sent", 0),
+            "messages_sent": getattr(user, "chat_messages_sent", 0),
+            "rooms_created": getattr(user, "rooms_created", 0),
+            # Contador desnormalizado (lo mantiene social.py): sin COUNT
+            "friends_count": user.friends_count or 0,
+            "unique_login_days_count": getattr(user, "unique_login_days_count", 0),
+        }
+        stats.update(overrides)
+        return stats
+
+    # Reglas que los eventos podrían cumplir y el usuario aún no tiene:
+    # las de cada evento más las de persistencia de las estadísticas que
+    # ese evento cambia.
+    def candidate_rules(self, events, unlocked_ach_ids):
+        rules = set()
+        for event_type, _ in events:
+            rules |= self.rules_by_event.get(event_type, set())
+            for stat in EVENT_STATS.get(event_type, ()):
+                rules |= self.rules_by_stat.get(stat, set())
+        return rules.difference(unlocked_ach_ids)
+
+    # Corre las verificaciones de cada evento (sin tocar la DB) y devuelve
+    # los IDs nuevos, sin repetidos. Solo se llaman las verificaciones con
+    # reglas pendientes.
+    def collect_unlocks(self, username, unlocked_ach_ids, user_stats, events):
+        pending = self.candidate_rules(events, unlocked_ach_ids)
+        if not pending:
+            return []
+
+        newly_unlocked_ids = []
+        for event_type, event_data in events:
+            evaluator = self._evaluators.get(event_type)
+            if evaluator and pending & self.rules_by_event.get(event_type, set()):
                 newly_unlocked_ids.extend(
-                    self._check_social_achievements(
-                        username, event_type, unlocked_ach_ids, user_stats
-                    )
-                )
-
-            elif event_type == "private_message_sent":
-                newly_unlocked_ids.extend(
-                    self._check_social_achievements(
-                        username, event_type, unlocked_ach_ids, user_stats
-                    )
+                    evaluator(username, event_data, unlocked_ach_ids, user_stats)
                 )
 
+        if pending.intersection(PERSISTENCE_STATS):
             newly_unlocked_ids.extend(
                 self._check_persistence_achievements(
                     username, unlocked_ach_ids, user_stats
                 )
             )
 
-            # Guardar logros desbloqueados y otorgar XP (EN LA DB)
-            total_xp_gained = 0
-
-            # Filtra solo los ID de logros que aún no hemos procesado para evitar doble conteo si una subfunción retorna el mismo ID
-            final_unlocks = list(set(newly_unlocked_ids))
-
-            # Obtener todos los objetos Achievement necesarios en una sola consulta
-            achievements_to_unlock = Achievement.query.filter(
-                Achievement.internal_id.in_(final_unlocks)
-            ).all()
-
-            for achievement_obj in achievements_to_unlock:
-                # Verificar UNA ÚLTIMA VEZ que el logro no esté ya en la tabla de asociación
-                is_already_unlocked = UserAchievement.query.filter_by(
-                    user_id=user.id, achievement_id=achievement_obj.id
-                ).first()
-
-                if not is_already_unlocked:
-                    # Añadir a la tabla de asociación UserAchievement
-                    ua = UserAchievement(user=user, achievement=achievement_obj)
-                    db.session.add(ua)
-
-                    # Sumar XP y guardar ID para retorno
-                    xp_reward = achievement_obj.xp_reward
-                    total_xp_gained += xp_reward
-                    unlocked_achievements.append(achievement_obj.internal_id)
+        # Filtra solo los ID de logros que aún no hemos procesado para evitar doble conteo si una subfunción retorna el mismo ID
+        return list(dict.fromkeys(newly_unlocked_ids))
+
+    # Evalúa {username: eventos} y escribe lo desbloqueado con un solo
+    # commit. 'users' son objetos User que el llamador ya tiene.
+    #
+    # Consultas: ninguna si los desbloqueados están en cache y no hay
+    # reglas pendientes que lean estadísticas o se cumplan; si no, una
+    # carga de usuarios (con logros solo si faltan en la cache) y, al
+    # desbloquear, un INSERT de logros y el UPDATE de XP.
+    def _evaluate_events(self, events_by_user, users=None):
+        users = dict(users or {})
+
+        # 1. IDs ya desbloqueados: cache o relación precargada
+        unlocked = {
+            username: self._cached_unlocked(username) for username in events_by_user
+        }
+        missing = [
+            username
+            for username, ids in unlocked.items()
+            if ids is None and username not in users
+        ]
+        if missing:
+            users.update(self._load_users(missing))
+        for username, events in events_by_user.items():
+            if unlocked[username] is not None:
+                continue
+            if username not in users:
+                logger.debug(
+                    f"ACHIEVEMENT: Usuario {username} no encontrado (¿bot?). Se omiten {len(events)} eventos."
+                )
+                del unlocked[username]
+                continue
+            unlocked[username] = self._cache_unlocked(
+                username, self.unlocked_ids(users[username])
+            )
 
-            # Actualizar XP del usuario y guardar en DB
+        # 2. Reglas pendientes; quien no tiene ninguna no se evalúa
+        pending = {}
+        for username, ids in unlocked.items():
+            rules = self.candidate_rules(events_by_user[username], ids)
+            if rules:
+                pending[username] = rules
+            else:
+                self._skipped_events += len(events_by_user[username])
+
+        # 3. Estadísticas solo para quien tiene reglas que las leen
+        need_stats = [
+            username
+            for username, rules in pending.items()
+            if username not in users and rules & self.stat_rules
+        ]
+        if need_stats:
+            users.update(self._load_plain_users(need_stats))
+
+        # El progreso cacheado toma las estadísticas recién leídas
+        for username in unlocked:
+            if username in users and username in self._progress_cache:
+                self.update_progress_stats(username, **self.user_stats(users[username]))
+
+        found = {}
+        for username, rules in pending.items():
+            user = users.get(username)
+            if user is None and rules & self.stat_rules:
+                continue  # Usuario borrado desde que se cacheó
+            stats = self.user_stats(user) if user else {}
+            new_ids = self.collect_unlocks(
+                username, unlocked[username], stats, events_by_user[username]
+            )
+            if new_ids:
+                found[username] = new_ids
+        if not found:
+            return {}
+
+        # 4. Escritura (caso poco frecuente)
+        to_load = [username for username in found if username not in users]
+        if to_load:
+            users.update(self._load_plain_users(to_load))
+        unlocked_by_user = self._grant(users, found)
+        # Valores absolutos que quedan en la DB (User usa version_id_col:
+        # si otro proceso los cambió, el commit falla y no se publica nada)
+        ranked = [
+            (username, user.level, user.xp, user.games_played, user.games_won)
+            for username, user in users.items()
+            if unlocked_by_user.get(username)
+        ]
+        db.session.commit()
+        self.remember_unlocks(unlocked_by_user)
+        if self.ranking and ranked:
+            self.ranking.actualizar_lote(ranked)
+        return unlocked_by_user
+
+    def _load_plain_users(self, usernames):
+        users = User.query.filter(User.username.in_(usernames)).all()
+        return {user.username: user for user in users}
+
+    # Agrega a la sesión lo desbloqueado (sin commit): un INSERT por lotes
+    # idempotente y la XP solo de lo que realmente se insertó. La cantidad
+    # de sentencias no depende de cuántos logros se otorgan.
+    def _grant(self, users, found):
+        definitions = self.definitions(
+            {internal_id for ids in found.values() for internal_id in ids}
+        )
+        now = datetime.utcnow()
+        rows = [
+            {
+                "user_id": users[username].id,
+                "achievement_id": definitions[internal_id]["id"],
+                "unlocked_at": now,
+            }
+            for username, new_ids in found.items()
+            if username in users
+            for internal_id in new_ids
+            if internal_id in definitions
+        ]
+        inserted = self.insert_unlocks(rows)
+
+        unlocked_by_user = {}
+        for username, new_ids in found.items():
+            user = users.get(username)
+            if not user:
+                continue
+            # Lo que ya estaba en la tabla (otro proceso pudo otorgarlo) no
+            # se devuelve ni suma XP
+            unlocked_achievements = [
+                internal_id
+                for internal_id in new_ids
+                if internal_id in definitions
+                and (user.id, definitions[internal_id]["id"]) in inserted
+            ]
+            total_xp_gained = sum(
+                definitions[internal_id]["xp_reward"]
+                for internal_id in unlocked_achievements
+            )
             if total_xp_gained > 0:
                 user.xp += total_xp_gained
+            unlocked_by_user[username] = unlocked_achievements
+        return unlocked_by_user
+
+    # INSERT ... ON CONFLICT DO NOTHING sobre la clave primaria (user_id,
+    # achievement_id). Devuelve los pares {(user_id, achievement_id)} que
+    # se insertaron de verdad.
+    def insert_unlocks(self, rows):
+        if not rows:
+            return set()
+        table = UserAchievement.__table__
+        statement = (
+            insert_con_conflicto(table)
+            .values(rows)
+            .on_conflict_do_nothing(
+                index_elements=[table.c.user_id, table.c.achievement_id]
+            )
+            .returning(table.c.user_id, table.c.achievement_id)
+        )
+        return {tuple(row) for row in db.session.connection().execute(statement)}
 
-            # Guardar todos los cambios de una vez
-            db.session.commit()
+    # --- Definiciones de logros ---
 
-            return unlocked_achievements
+    # {internal_id: {"id", "xp_reward"}} de toda la tabla; se carga al
+    # arrancar, tras sincronizar la configuración con la DB.
+    def load_definitions(self):
+        self._definitions = {
+            a.internal_id: {"id": a.id, "xp_reward": a.xp_reward or 0}
+            for a in Achievement.query.all()
+        }
+        self._missing_definitions = set()
+        return self._definitions
+
+    # Devuelve el mapa; solo vuelve a la DB la primera vez o si aparece un
+    # logro desconocido (se recarga una vez por ID).
+    def definitions(self, internal_ids=()):
+        if self._definitions is None:
+            return self.load_definitions()
+        unknown = set(internal_ids) - set(self._definitions) - self._missing_definitions
+        if unknown:
+            self.load_definitions()
+            self._missing_definitions = unknown - set(self._definitions)
+            for internal_id in self._missing_definitions:
+                logger.warning(f"ACHIEVEMENT: '{internal_id}' no existe en la DB.")
+        return self._definitions
+
+    # --- Cache de IDs desbloqueados ---
+
+    def _cached_unlocked(self, username):
+        ids = self._unlocked_cache.get(username)
+        if ids is None:
+            self._cache_misses += 1
+            return None
+        self._unlocked_cache.move_to_end(username)
+        self._cache_hits += 1
+        return ids
+
+    def _cache_unlocked(self, username, ids):
+        ids = set(ids)
+        self._unlocked_cache[username] = ids
+        self._unlocked_cache.move_to_end(username)
+        while len(self._unlocked_cache) > self.cache_size:
+            self._unlocked_cache.popitem(last=False)
+        return ids
+
+    # Suma a las caches (desbloqueados y progreso) lo otorgado en un
+    # commit ya confirmado (también lo usa la escritura de fin de partida).
+    # {username: [ids]}
+    def remember_unlocks(self, unlocked_by_user):
+        now = datetime.utcnow().isoformat()
+        for username, ids in unlocked_by_user.items():
+            if not ids:
+                continue
+            cached = self._unlocked_cache.get(username)
+            if cached is not None:
+                cached.update(ids)
+            state = self._progress_cache.get(username)
+            if state is not None:
+                for internal_id in ids:
+                    state["unlocked"].setdefault(internal_id, now)
+                state["document"] = None
+
+    # El usuario se fue: la próxima evaluación recarga desde la DB.
+    def forget_user(self, username):
+        self._unlocked_cache.pop(username, None)
+        self._progress_cache.pop(username, None)
+
+    def get_metrics(self):
+        return {
+            "cache_usuarios": len(self._unlocked_cache),
+            "cache_aciertos": self._cache_hits,
+            "cache_fallos": self._cache_misses,
+            "eventos_omitidos": self._skipped_events,
+            "progreso_usuarios": len(self._progress_cache),
+        }
 
     def _check_game_finished_achievements(
         self, username, event_data, current_achievements, user_stats
@@ -952,121 +1279,118 @@ class AchievementSystem:
     def get_all_achievements(self):
         return self.achievements_config
 
+    # Progreso de logros para el perfil, servido desde memoria. La primera
+    # vista carga al usuario con sus logros; después el documento se
+    # mantiene con lo que informan las evaluaciones (remember_unlocks,
+    # update_progress_stats) y solo se vuelve a armar si algo cambió.
     def get_user_achievement_progress(self, username):
-        user = (
-            User.query.options(
-                selectinload(User.unlocked_achievements_assoc).selectinload(
-                    UserAchievement.achievement
+        state = self._progress_cache.get(username)
+        if state is None:
+            user = self._load_users([username]).get(username)
+            if not user:
+                return {"error": "Usuario no encontrado"}
+            unlocked_map = {
+                ua.achievement.internal_id: (
+                    ua.unlocked_at.isoformat() if ua.unlocked_at else None
                 )
-            )
-            .filter_by(username=username)
-            .first()
+                for ua in user.unlocked_achievements_assoc
+            }
+            state = {
+                "unlocked": unlocked_map,
+                "stats": self.user_stats(user),
+                "document": None,
+            }
+            self._progress_cache[username] = state
+            while len(self._progress_cache) > self.cache_size:
+                self._progress_cache.popitem(last=False)
+            if username not in self._unlocked_cache:
+                self._cache_unlocked(username, unlocked_map)
+        self._progress_cache.move_to_end(username)
+
+        if state["document"] is None:
+            state["document"] = self._render_progress(state)
+        return state["document"]
+
+    # Actualiza las estadísticas de un progreso cacheado (si lo hay).
+    def update_progress_stats(self, username, **stats):
+        state = self._progress_cache.get(username)
+        if state is None:
+            return
+        state["stats"].update(stats)
+        state["document"] = None
+
+    # Descarta el progreso cacheado (cambios que no pasan por los logros,
+    # ej. eliminar un amigo baja 'friends_count').
+    def invalidate_progress(self, username):
+        self._progress_cache.pop(username, None)
+
+    # Metadatos fijos del progreso, agrupados por categoría y ordenados por
+    # nombre una sola vez.
+    def _compile_progress(self):
+        groups = {}
+        ordered = sorted(
+            self.achievements_config.items(),
+            key=lambda item: (
+                item[1].get("category", "general"),
+                item[1].get("name", "N/A"),
+            ),
         )
-        if not user:
-            return {"error": "Usuario no encontrado"}
-
-        unlocked_assoc = UserAchievement.query.filter_by(user_id=user.id).all()
-        # Crear un mapa {achievement_id: unlocked_at} y un set de IDs
-        unlocked_map = {
-            ua.achievement.internal_id: ua.unlocked_at for ua in unlocked_assoc
-        }
-        unlocked_ids_set = set(unlocked_map.keys())
-
-        # btener las estadísticas actuales del usuario para calcular progreso
-        current_user_stats = {
-            "xp": user.xp,
-            "level": user.level,
-            "games_played": user.games_played,
-            "games_won": user.games_won,
-            "abilities_used": getattr(user, "abilities_used", 0),
-            "game_messages_sent": getattr(user, "game_messages_sent", 0),
-            "private_messages_sent": getattr(user, "private_messages_sent", 0),
-            "rooms_created": getattr(user, "rooms_created", 0),
-            "unlocked_achievements_count": len(unlocked_ids_set),
-            "friends_count": getattr(user, "friends_count", 0),
-            "unique_login_days_count": getattr(user, "unique_login_days_count", 0),
-        }
-
-        # Iterar sobre TODOS los logros configurados y obtener su info/progreso
-        progress_list = []
-        all_achievements_config = self.achievements_config  # Usar la config de la clase
-
-        for ach_id, ach_config in all_achievements_config.items():
-            is_unlocked = ach_id in unlocked_ids_set
-            target_value = ach_config.get("target_value", 1)
-            current_value = 0  # Default
-
-            if is_unlocked:
-                current_value = target_value  # Si está desbloqueado, progreso es 100%
-            elif current_user_stats:  # Calcular progreso solo si no está desbloqueado
-
-                # Mapeo de ID de logro a stat del usuario
-                stat_map = {
-                    "veteran": "games_played",
-                    "champion": "games_won",
-                    "level_master": "level",
-                    "chat_master": "private_messages_sent",
-                    "room_host": "rooms_created",
-                    "coleccionista": "unlocked_achievements_count",
-                    "social_butterfly": "friends_count",
-                    "popular": "friends_count",
-                    "dedicated": "unique_login_days_count",
+        for ach_id, ach_config in ordered:
+            category = ach_config.get("category", "general")
+            groups.setdefault(category, []).append(
+                {
+                    "id": ach_id,
+                    "name": ach_config.get("name", "N/A"),
+                    "desc": ach_config.get("description", ""),
+                    "xp_reward": ach_config.get("xp_reward", 0),
+                    "icon": ach_config.get("icon", "⭐"),
+                    "category": category,
+                    "target_value": ach_config.get("target_value", 1),
                 }
+            )
+        return list(groups.values())
 
-                if ach_id in stat_map:
-                    current_value = current_user_stats.get(stat_map[ach_id], 0)
+    def _render_progress(self, state):
+        unlocked_map = state["unlocked"]
+        stats = dict(state["stats"], unlocked_achievements_count=len(unlocked_map))
 
-                # Logros de primera vez
-                elif ach_id == "first_game":
-                    current_value = (
-                        1 if current_user_stats.get("games_played", 0) >= 1 else 0
-                    )
-                elif ach_id == "first_win":
-                    current_value = (
-                        1 if current_user_stats.get("games_won", 0) >= 1 else 0
-                    )
-                elif ach_id == "first_room":
-                    current_value = (
-                        1 if current_user_stats.get("rooms_created", 0) >= 1 else 0
-                    )
-                elif ach_id == "first_ability":
+        # Mismo orden de siempre: categoría, desbloqueados primero, nombre
+        progress_list = []
+        for group in self._progress_groups:
+            locked = []
+            for static in group:
+                ach_id = static["id"]
+                target_value = static["target_value"]
+                is_unlocked = ach_id in unlocked_map
+                if is_unlocked:
+                    current_value = target_value  # Progreso al 100%
+                elif ach_id in PROGRESS_STATS:
+                    current_value = stats.get(PROGRESS_STATS[ach_id]) or 0
+                elif ach_id in FIRST_TIME_STATS:
+                    # Logros de primera vez
                     current_value = (
-                        1 if current_user_stats.get("abilities_used", 0) >= 1 else 0
+                        1 if (stats.get(FIRST_TIME_STATS[ach_id]) or 0) >= 1 else 0
                     )
+                else:
+                    current_value = 0
 
-                # Asegurar que current_value no exceda target_value
-                current_value = min(current_value, target_value)
-
-            # Construir datos del logro para el cliente
-            achievement_data = {
-                "id": ach_id,
-                "name": ach_config.get("name", "N/A"),
-                "desc": ach_config.get("description", ""),
-                "xp_reward": ach_config.get("xp_reward", 0),
-                "icon": ach_config.get("icon", "⭐"),
-                "category": ach_config.get("category", "general"),
-                "unlocked": is_unlocked,
-                "unlocked_at": (
-                    unlocked_map.get(ach_id).isoformat()
-                    if is_unlocked and unlocked_map.get(ach_id)
-                    else None
-                ),
-                "target_value": target_value,
-                "current_value": current_value,
-            }
-            progress_list.append(achievement_data)
-
-        # Ordenar y devolver el resultado
-        progress_list.sort(key=lambda x: (x["category"], not x["unlocked"], x["name"]))
+                achievement_data = dict(
+                    static,
+                    unlocked=is_unlocked,
+                    unlocked_at=unlocked_map.get(ach_id) if is_unlocked else None,
+                    current_value=min(current_value, target_value),
+                )
+                if is_unlocked:
+                    progress_list.append(achievement_data)
+                else:
+                    locked.append(achievement_data)
+            progress_list.extend(locked)
 
+        total = len(self.achievements_config)
         return {
-            "unlocked": len(unlocked_ids_set),
-            "total": len(all_achievements_config),
-            "percentage": (
-                (len(unlocked_ids_set) / len(all_achievements_config)) * 100
-                if len(all_achievements_config) > 0
-                else 0
-            ),
+            "unlocked": len(unlocked_map),
+            "total": total,
+            "percentage": (len(unlocked_map) / total) * 100 if total > 0 else 0,
             "achievements": progress_list,  # La lista detallada
         }
 
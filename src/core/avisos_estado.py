@@ -0,0 +1,93 @@
+# ===================================================================
+# AVISOS AGRUPADOS DE ESTADO DE AMIGOS - VOLTRACE (avisos_estado.py)
+# ===================================================================
+#
+# Los cambios de estado (conexión, desconexión, vencimiento de presencia)
+# no se emiten al instante a cada amigo: se anotan y, pasada una ventana
+# corta, cada destinatario recibe UN lote con todos sus amigos que
+# cambiaron.
+#
+# - Por usuario se guarda solo el último estado anotado en la ventana
+#   (y sus amigos a avisar).
+# - Al vaciar, se compara con el último estado que se anunció de él: si
+#   coincide (ej. offline -> online en pocos segundos por una conexión
+#   móvil inestable) el cambio se descarta sin emitir nada.
+# - Los sid se resuelven al vaciar: quien ya se fue no recibe nada.
+#
+# Como los demás módulos de core, no conoce Socket.IO: recibe cómo
+# agendar el vaciado, cómo emitir un lote y cómo encontrar el sid.
+#
+# ===================================================================
+
+import logging
+import threading
+
+logger = logging.getLogger("voltrace")
+
+OFFLINE = "offline"
+
+
+class AgregadorEstados:
+    def __init__(self, ventana, agendar, emitir, sid_de):
+        self.ventana = ventana
+        self.agendar = agendar  # agendar(retardo, funcion)
+        self.emitir = emitir  # emitir(sid, [{"username", "status"}, ...])
+        self.sid_de = sid_de
+        self._lock = threading.Lock()
+        self._pendientes = {}  # username -> (status, amigos)
+        self._anunciado = {}  # username -> último estado emitido (sin offline)
+        self._agendado = False
+
+        # Métricas
+        self._anotados = 0
+        self._colapsados = 0
+        self._lotes = 0
+        self._cambios = 0
+
+    def anotar(self, username, status, amigos):
+        with self._lock:
+            self._pendientes[username] = (status, list(amigos))
+            self._anotados += 1
+            if self._agendado:
+                return
+            self._agendado = True
+        self.agendar(self.ventana, self.vaciar)
+
+    # Emite un lote por destinatario con los cambios netos de la ventana.
+    def vaciar(self):
+        with self._lock:
+            pendientes, self._pendientes = self._pendientes, {}
+            self._agendado = False
+            por_sid = {}
+            for username, (status, amigos) in pendientes.items():
+                if status == self._anunciado.get(username, OFFLINE):
+                    self._colapsados += 1
+                    continue
+                if status == OFFLINE:
+                    self._anunciado.pop(username, None)
+                else:
+                    self._anunciado[username] = status
+                cambio = {"username": username, "status": status}
+                for amigo in amigos:
+                    sid = self.sid_de(amigo)
+                    if sid:
+                        por_sid.setdefault(sid, []).append(cambio)
+            self._lotes += len(por_sid)
+            self._cambios += sum(len(cambios) for cambios in por_sid.values())
+
+        # Fuera del lock: emitir puede ir a la red
+        for sid, cambios in por_sid.items():
+            try:
+                self.emitir(sid, cambios)
+            except Exception as e:
+                logger.error(f"AVISOS ESTADO: error al emitir lote a {sid}: {e}")
+        return len(por_sid)
+
+    def obtener_metricas(self):
+        return {
+            "pendientes": len(self._pendientes),
+            "anotados": self._anotados,
+            "colapsados": self._colapsados,
+            "lotes": self._lotes,
+            "cambios": self._cambios,
+        }
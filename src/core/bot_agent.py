@@ -1,8 +1,24 @@
 # ===================================================================
 # CEREBRO IA (DEEP Q-NETWORK)
 # ===================================================================
+#
+# Herramienta de entrenamiento: es el único módulo que importa torch.
+# El servidor web juega con bot_runtime.py (NumPy) a partir de los
+# pesos que se exportan desde acá con 'exportar_pesos'.
+#
+# Entrenamiento por self-play (todos los bots de cada partida comparten
+# el mismo agente) y exportación al archivo que carga el servidor:
+#   python -m src.core.bot_agent [partidas] [salida.npz] [semilla]
+#
+# El data/voltrace_cerebro.npz versionado sale de:
+#   python -m src.core.bot_agent 2000 data/voltrace_cerebro.npz 3
+#
+# ===================================================================
 
+import os
+import sys
 import random
+import logging
 import numpy as np
 from collections import deque
 import torch
@@ -10,6 +26,22 @@ import torch.nn as nn
 import torch.nn.functional as F
 import torch.optim as optim
 
+from src.core.bot_runtime import (
+    CAPAS_CEREBRO,
+    RUTA_PESOS_DEFECTO,
+    VoltraceAgenteInferencia,
+    CerebroNumpy,
+    cargar_pesos,
+    guardar_pesos,
+    pesos_aleatorios,
+)
+from src.core.habilidades import KITS_VOLTRACE
+from src.core.juego_web import JuegoOcaWeb
+
+logger = logging.getLogger("voltrace")
+
+MAX_TURNOS_PARTIDA = 500  # Corte de seguridad por si una partida no termina
+
 
 # Red neuronal de 9 entradas → 5 acciones posibles.
 class VoltraceCerebro(nn.Module):
@@ -26,8 +58,8 @@ class VoltraceCerebro(nn.Module):
 
 
 class VoltraceAgent:
-    def __init__(self, input_size=9, output_size=5):
-        self.cerebro = VoltraceCerebro(input_size, output_size)
+    def __init__(self, input_size=9, output_size=5, hidden_size=64):
+        self.cerebro = VoltraceCerebro(input_size, hidden_size, output_size)
         self.optimizer = optim.Adam(self.cerebro.parameters(), lr=0.001)
         self.memory = deque(maxlen=2000)
 
@@ -51,10 +83,6 @@ class VoltraceAgent:
             valores_q = self.cerebro(estado_tensor)
         return torch.argmax(valores_q).item()
 
-    # Aplica la ecuación de Bellman sobre un minibatch aleatorio de la memoria.
-    def entrenar_memoria(self, batch_size=32):
-        pass
-
     # Aplica la ecuación de Bellman sobre un minibatch aleatorio de la memoria.
     def entrenar_memoria(self, batch_size=32):
         if len(self.memory) < batch_size:
@@ -66,8 +94,13 @@ class VoltraceAgent:
         estados = torch.FloatTensor(np.array([t[0] for t in minibatch]))
         acciones = torch.LongTensor([t[1] for t in minibatch]).unsqueeze(1)
         recompensas = torch.FloatTensor([t[2] for t in minibatch])
-        siguientes_estados = torch.FloatTensor(np.array([t[3] for t in minibatch]))
-        finalizados = torch.FloatTensor([t[4] for t in minibatch])
+        # Un bot eliminado no tiene siguiente estado: cuenta como terminal
+        siguientes_estados = torch.FloatTensor(
+            np.array([t[0] * 0 if t[3] is None else t[3] for t in minibatch])
+        )
+        finalizados = torch.FloatTensor(
+            [1.0 if t[3] is None else t[4] for t in minibatch]
+        )
 
         # Q-values actuales de las acciones tomadas
         q_actuales = self.cerebro(estados).gather(1, acciones).squeeze(1)
@@ -89,3 +122,108 @@ class VoltraceAgent:
         # Decay de exploración (Epsilon)
         if self.epsilon > self.epsilon_min:
             self.epsilon *= self.epsilon_decay
+
+    # Exporta los pesos al formato .npz que consume el runtime NumPy.
+    def exportar_pesos(self, ruta):
+        estado = self.cerebro.state_dict()
+        pesos = {}
+        for capa in CAPAS_CEREBRO:
+            pesos[f"{capa}_w"] = estado[f"{capa}.weight"].detach().cpu().numpy()
+            pesos[f"{capa}_b"] = estado[f"{capa}.bias"].detach().cpu().numpy()
+        guardar_pesos(ruta, pesos)
+
+
+# Juega una partida completa: cada bot decide con el agente de su nombre.
+# Devuelve el nombre del ganador (o None si se cortó por turnos o por un
+# error del motor: la partida se descarta y el entrenamiento sigue).
+def jugar_partida(agentes, kits):
+    juego = JuegoOcaWeb(
+        [{"nombre": nombre, "kit_id": kit} for nombre, kit in zip(agentes, kits)]
+    )
+    try:
+        for _ in range(MAX_TURNOS_PARTIDA):
+            nombre = juego.obtener_turno_actual()
+            if juego.ha_terminado() or nombre is None:
+                break
+            juego.ejecutar_turno_bot(nombre, agentes[nombre])
+    except Exception as e:
+        logger.error(f"ENTRENAMIENTO: partida descartada ({type(e).__name__}: {e})")
+        return None
+    if not juego.ha_terminado():
+        return None
+    ganador = juego.determinar_ganador()
+    return ganador.get_nombre() if ganador else None
+
+
+def _sortear_kits(n):
+    return random.sample(list(KITS_VOLTRACE), n)
+
+
+# Self-play: 2 a 4 bots por partida con kits al azar, todos con el mismo
+# agente (cada turno entrena un minibatch). Exporta los pesos al final.
+def entrenar(partidas=2000, ruta=RUTA_PESOS_DEFECTO, semilla=None):
+    if semilla is not None:
+        random.seed(semilla)
+        np.random.seed(semilla)
+        torch.manual_seed(semilla)
+
+    agente = VoltraceAgent()
+    for n in range(1, partidas + 1):
+        nombres = [f"Bot_{i}" for i in range(random.randint(2, 4))]
+        jugar_partida(dict.fromkeys(nombres, agente), _sortear_kits(len(nombres)))
+        if n % 100 == 0:
+            logger.warning(
+                f"ENTRENAMIENTO: {n}/{partidas} partidas (epsilon={agente.epsilon:.3f})"
+            )
+
+    os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+    agente.exportar_pesos(ruta)
+    return agente
+
+
+# Compara los pesos exportados contra un bot al azar en partidas 1 vs 1
+# (alternando quién empieza): recompensa media por turno de cada uno y
+# tasa de victorias del entrenado. Los dados pesan mucho en quién gana;
+# la recompensa por turno es la señal que optimiza el entrenamiento.
+def evaluar(ruta, partidas=200):
+    agentes = {
+        "Entrenado": VoltraceAgenteInferencia(
+            CerebroNumpy(cargar_pesos(ruta)), epsilon=0.0
+        ),
+        "Azar": VoltraceAgenteInferencia(CerebroNumpy(pesos_aleatorios()), 1.0),
+    }
+    recompensas = dict.fromkeys(agentes, 0.0)
+    turnos = dict.fromkeys(agentes, 0)
+    victorias = 0
+    for n in range(partidas):
+        orden = list(agentes) if n % 2 else list(reversed(agentes))
+        ganador = jugar_partida({k: agentes[k] for k in orden}, _sortear_kits(2))
+        victorias += ganador == "Entrenado"
+        for nombre, agente in agentes.items():
+            recompensas[nombre] += sum(t[2] for t in agente.memory)
+            turnos[nombre] += len(agente.memory)
+            agente.memory.clear()
+    return {
+        "recompensa_entrenado": recompensas["Entrenado"] / max(turnos["Entrenado"], 1),
+        "recompensa_azar": recompensas["Azar"] / max(turnos["Azar"], 1),
+        "victorias": victorias / partidas,
+    }
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 4:
+        print("Uso: python -m src.core.bot_agent [partidas] [salida.npz] [semilla]")
+        sys.exit(1)
+    # El motor registra cada jugada en INFO; para entrenar alcanza con el progreso
+    logger.setLevel(logging.WARNING)
+    total_partidas = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    ruta_salida = sys.argv[2] if len(sys.argv) > 2 else RUTA_PESOS_DEFECTO
+    semilla = int(sys.argv[3]) if len(sys.argv) > 3 else None
+    entrenar(total_partidas, ruta_salida, semilla)
+    print(f"Pesos exportados a {ruta_salida}")
+    resultado = evaluar(ruta_salida)
+    print(
+        f"Recompensa por turno: {resultado['recompensa_entrenado']:.2f} "
+        f"(al azar: {resultado['recompensa_azar']:.2f}). "
+        f"Victorias contra el bot al azar: {resultado['victorias']:.0%}"
+    )
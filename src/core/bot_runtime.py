@@ -0,0 +1,170 @@
+# ===================================================================
+# RUNTIME DE INFERENCIA IA (SOLO NUMPY) - VOLTRACE (bot_runtime.py)
+# ===================================================================
+#
+# Forward pass del VoltraceCerebro implementado con NumPy puro, para
+# que los workers web puedan decidir las jugadas de los bots sin
+# importar torch (que solo usan las herramientas de entrenamiento en
+# bot_agent.py).
+#
+# Formato de exportación de pesos (.npz, float32, layout de torch):
+#   fc1_w (oculta, entrada)   fc1_b (oculta,)
+#   fc2_w (oculta, oculta)    fc2_b (oculta,)
+#   fc3_w (salida, oculta)    fc3_b (salida,)
+#
+# ===================================================================
+
+import os
+import random
+import logging
+from collections import deque
+
+import numpy as np
+
+logger = logging.getLogger("voltrace")
+
+CAPAS_CEREBRO = ("fc1", "fc2", "fc3")
+
+# Ruta por defecto del archivo de pesos exportado por el entrenamiento.
+RUTA_PESOS_DEFECTO = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    "data",
+    "voltrace_cerebro.npz",
+)
+
+
+# Valida y normaliza un dict {fc1_w, fc1_b, ...} al layout que usa el forward.
+def preparar_pesos(pesos):
+    capas = []
+    entrada_esperada = None
+    for nombre in CAPAS_CEREBRO:
+        w = np.asarray(pesos[f"{nombre}_w"], dtype=np.float32)
+        b = np.asarray(pesos[f"{nombre}_b"], dtype=np.float32)
+        if w.ndim != 2 or b.shape != (w.shape[0],):
+            raise ValueError(f"Forma inválida en la capa {nombre}: {w.shape}/{b.shape}")
+        if entrada_esperada is not None and w.shape[1] != entrada_esperada:
+            raise ValueError(f"La capa {nombre} no encadena con la anterior.")
+        entrada_esperada = w.shape[0]
+        # Guardamos W transpuesta y contigua: x @ W.T sin copias en cada jugada
+        capas.append((np.ascontiguousarray(w.T), b))
+    return capas
+
+
+# Inicialización equivalente a nn.Linear (uniforme ±1/sqrt(fan_in)).
+def pesos_aleatorios(input_size=9, hidden_size=64, output_size=5, semilla=None):
+    rng = np.random.default_rng(semilla)
+    tamanos = [
+        (hidden_size, input_size),
+        (hidden_size, hidden_size),
+        (output_size, hidden_size),
+    ]
+    pesos = {}
+    for nombre, (salida, entrada) in zip(CAPAS_CEREBRO, tamanos):
+        limite = 1.0 / np.sqrt(entrada)
+        pesos[f"{nombre}_w"] = rng.uniform(-limite, limite, (salida, entrada))
+        pesos[f"{nombre}_b"] = rng.uniform(-limite, limite, (salida,))
+    return pesos
+
+
+def cargar_pesos(ruta):
+    with np.load(ruta) as datos:
+        return {clave: datos[clave] for clave in datos.files}
+
+
+def guardar_pesos(ruta, pesos):
+    np.savez(ruta, **{k: np.asarray(v, dtype=np.float32) for k, v in pesos.items()})
+
+
+# Red 9 → 64 → 64 → 5 con ReLU, idéntica a VoltraceCerebro.forward.
+class CerebroNumpy:
+    def __init__(self, pesos):
+        self.capas = preparar_pesos(pesos)
+        self.input_size = self.capas[0][0].shape[0]
+        self.output_size = self.capas[-1][0].shape[1]
+
+    def forward(self, x):
+        h = np.asarray(x, dtype=np.float32)
+        ultima = len(self.capas) - 1
+        for i, (w, b) in enumerate(self.capas):
+            h = h @ w
+            h += b
+            if i < ultima:
+                np.maximum(h, 0.0, out=h)
+        return h
+
+    __call__ = forward
+
+
+class VoltraceAgenteInferencia:
+    """
+    Agente de solo inferencia con la misma interfaz que VoltraceAgent
+    (tomar_decision / recordar_jugada / entrenar_memoria). No entrena:
+    los pesos salen del self-play de bot_agent.py, y las transiciones
+    solo quedan en memoria (acotada) como registro de las últimas jugadas.
+    """
+
+    def __init__(self, cerebro, epsilon=0.05):
+        self.cerebro = cerebro
+        self.memory = deque(maxlen=2000)
+        self.epsilon = epsilon
+        self.epsilon_min = 0.05
+        self.action_size = cerebro.output_size
+
+    # Guarda una transición (s, a, r, s', done).
+    def recordar_jugada(self, estado, accion, recompensa, siguiente_estado, finalizado):
+        self.memory.append((estado, accion, recompensa, siguiente_estado, finalizado))
+
+    # Explora al azar o explota la red neuronal
+    def tomar_decision(self, estado):
+        if np.random.rand() <= self.epsilon:
+            return random.randrange(self.action_size)
+        return int(np.argmax(self.cerebro(estado)))
+
+    # Variante por lote: una fila de features por bot (ver extraer_lote).
+    def tomar_decisiones(self, estados):
+        acciones = np.argmax(self.cerebro(estados), axis=1)
+        explorar = np.random.rand(len(acciones)) <= self.epsilon
+        if explorar.any():
+            acciones[explorar] = np.random.randint(
+                self.action_size, size=int(explorar.sum())
+            )
+        return acciones
+
+    # El servidor no entrena: el ajuste de pesos vive en bot_agent.py.
+    def entrenar_memoria(self, batch_size=32):
+        return None
+
+
+# Carga los pesos exportados; sin archivo, la red arranca aleatoria y
+# explorando al 100% (mismo comportamiento que un VoltraceAgent nuevo).
+# Con VOLTRACE_SHM_PESOS, los pesos se comparten entre workers mediante
+# un segmento de memoria compartida (ver pesos_compartidos.py).
+def cargar_agente_inferencia(ruta=None, nombre_segmento=None):
+    ruta = ruta or os.environ.get("VOLTRACE_PESOS_BOT", RUTA_PESOS_DEFECTO)
+    nombre_segmento = nombre_segmento or os.environ.get("VOLTRACE_SHM_PESOS")
+
+    pesos, epsilon = None, 1.0
+    if os.path.exists(ruta):
+        try:
+            pesos = cargar_pesos(ruta)
+            preparar_pesos(pesos)
+            epsilon = 0.05
+            logger.info(f"Pesos del bot cargados desde {ruta}")
+        except (OSError, KeyError, ValueError) as e:
+            pesos = None
+            logger.error(f"Pesos del bot inválidos en {ruta}: {e}")
+    else:
+        logger.warning(f"No se encontró {ruta}. Bot con pesos aleatorios.")
+    if pesos is None:
+        pesos = pesos_aleatorios()
+
+    if nombre_segmento:
+        from src.core.pesos_compartidos import SegmentoPesos, CerebroCompartido
+
+        try:
+            segmento = SegmentoPesos.conectar_o_crear(nombre_segmento, pesos)
+            return VoltraceAgenteInferencia(CerebroCompartido(segmento), epsilon)
+        except (OSError, ValueError, RuntimeError) as e:
+            logger.error(f"No se pudo usar el segmento '{nombre_segmento}': {e}")
+
+    return VoltraceAgenteInferencia(CerebroNumpy(pesos), epsilon)
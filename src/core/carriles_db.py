@@ -0,0 +1,117 @@
+# ===================================================================
+# CARRILES DE ESCRITURA POR USUARIO - VOLTRACE (carriles_db.py)
+# ===================================================================
+#
+# Reemplaza al 'db_lock' global (que serializaba TODA escritura del
+# servidor: chat, logros, fin de partida, abandono, login diario) por
+# carriles: cada usuario cae, por hash de su clave, en uno de
+# 'num_carriles' locks reentrantes. Escrituras de usuarios distintos
+# corren en paralelo; las de un mismo usuario siguen en orden.
+#
+# - bloquear(*claves): toma los carriles de todas las claves en orden de
+#   índice (sin interbloqueos entre, ej., dos fines de partida).
+# - ejecutar(claves, funcion): bloquear + concurrencia optimista. User
+#   tiene columna 'version' (version_id_col de SQLAlchemy): si otro
+#   proceso o una ruta HTTP modificó la fila entre la lectura y el commit,
+#   el UPDATE no afecta filas y se lanza StaleDataError. Se hace rollback
+#   y se vuelve a correr 'funcion' (que debe releer lo que modifica y no
+#   emitir nada) hasta 'max_reintentos' veces.
+# - Anidado: un ejecutar dentro de otro no reintenta por su cuenta; el
+#   conflicto sube y lo reintenta el de afuera.
+#
+# ===================================================================
+
+import time
+import zlib
+import logging
+import threading
+from contextlib import contextmanager
+
+from sqlalchemy.orm.exc import StaleDataError
+from src.models import db
+
+logger = logging.getLogger("voltrace")
+
+
+class CarrilesDB:
+    def __init__(self, num_carriles=64, max_reintentos=3, reloj=time.monotonic):
+        self.num_carriles = num_carriles
+        self.max_reintentos = max_reintentos
+        self.reloj = reloj
+        self._carriles = [threading.RLock() for _ in range(num_carriles)]
+        self._local = threading.local()
+
+        # Métricas
+        self._ejecuciones = 0
+        self._esperas = 0
+        self._espera_ewma = 0.0
+        self._espera_max = 0.0
+        self._conflictos = 0
+        self._reintentos = 0
+        self._agotados = 0
+
+    def indice(self, clave):
+        return zlib.crc32(str(clave).encode("utf-8")) % self.num_carriles
+
+    @contextmanager
+    def bloquear(self, *claves):
+        tomados = []
+        try:
+            for indice in sorted({self.indice(clave) for clave in claves}):
+                carril = self._carriles[indice]
+                if not carril.acquire(blocking=False):
+                    # Otro usuario del mismo carril (o el mismo) está escribiendo
+                    inicio = self.reloj()
+                    carril.acquire()
+                    espera = self.reloj() - inicio
+                    self._esperas += 1
+                    self._espera_ewma = 0.9 * self._espera_ewma + 0.1 * espera
+                    self._espera_max = max(self._espera_max, espera)
+                tomados.append(carril)
+            yield
+        finally:
+            for carril in reversed(tomados):
+                carril.release()
+
+    # Corre funcion(*args, **kwargs) con los carriles de 'claves' tomados,
+    # reintentando si el commit choca con otra escritura de la misma fila.
+    def ejecutar(self, claves, funcion, *args, **kwargs):
+        with self.bloquear(*claves):
+            if getattr(self._local, "profundidad", 0):
+                return funcion(*args, **kwargs)
+
+            self._local.profundidad = 1
+            self._ejecuciones += 1
+            try:
+                intento = 0
+                while True:
+                    try:
+                        return funcion(*args, **kwargs)
+                    except StaleDataError:
+                        db.session.rollback()
+                        self._conflictos += 1
+                        if intento >= self.max_reintentos:
+                            self._agotados += 1
+                            logger.error(
+                                f"Conflicto de escritura sin resolver tras {intento} reintentos: {list(claves)}"
+                            )
+                            raise
+                        intento += 1
+                        self._reintentos += 1
+                        logger.info(
+                            f"Conflicto de versión para {list(claves)}, reintento {intento}"
+                        )
+            finally:
+                self._local.profundidad = 0
+
+    def obtener_metricas(self):
+        return {
+            "carriles": self.num_carriles,
+            "ejecuciones": self._ejecuciones,
+            "esperas": self._esperas,
+            "espera_ms": round(self._espera_ewma * 1000, 1),
+            "espera_max_ms": round(self._espera_max * 1000, 1),
+            "conflictos": self._conflictos,
+            "reintentos": self._reintentos,
+            "agotados": self._agotados,
+        }
@@ -0,0 +1,101 @@
+# ===================================================================
+# CATÁLOGO ESTÁTICO - VOLTRACE (catalogo.py)
+# ===================================================================
+#
+# Definiciones que no cambian durante una partida (habilidades, perks,
+# kits y casillas del tablero), indexadas por ID compacto. El cliente
+# recibe el catálogo una vez por conexión (evento 'catalogo') y el
+# estado por turno solo referencia IDs:
+#
+#   jugador["habilidades"]  -> [3, 9, 14, 19]   IDs de habilidad
+#   jugador["cooldowns"]    -> [0, 2, 0, 0]     en el mismo orden
+#   celda["casilla_especial"] -> "portal_magico" (id_unico de la casilla)
+#
+# Las casillas sin id_unico (ej. Minas colocadas por jugadores) y las
+# habilidades fuera del catálogo se siguen enviando completas.
+#
+# ===================================================================
+
+import json
+import hashlib
+
+from src.core.habilidades import crear_habilidades, KITS_VOLTRACE
+from src.core.perks import PERKS_CONFIG
+
+
+def _etag_de(datos):
+    crudo = json.dumps(datos, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.sha1(crudo).hexdigest()[:16]
+
+
+# Habilidades indexadas con IDs en orden de definición.
+def _indexar_habilidades():
+    por_id, id_por_nombre, por_categoria = {}, {}, {}
+    for categoria, lista in crear_habilidades().items():
+        por_categoria[categoria] = []
+        for hab in lista:
+            id_hab = len(por_id) + 1
+            datos = {
+                "id": id_hab,
+                "nombre": hab.nombre,
+                "tipo": hab.tipo,
+                "descripcion": hab.descripcion,
+                "simbolo": hab.simbolo,
+                "cooldown_base": hab.cooldown_base,
+                "energia_coste": hab.energia_coste,
+            }
+            por_id[id_hab] = datos
+            id_por_nombre[hab.nombre] = id_hab
+            por_categoria[categoria].append(datos)
+    return por_id, id_por_nombre, por_categoria
+
+
+HABILIDADES_POR_ID, ID_HABILIDAD, HABILIDADES_POR_CATEGORIA = _indexar_habilidades()
+
+KITS_CATALOGO = {
+    kit_id: {
+        "nombre": kit["nombre"],
+        "descripcion": kit["descripcion"],
+        "habilidades": [ID_HABILIDAD[nombre] for nombre in kit["habilidades"]],
+    }
+    for kit_id, kit in KITS_VOLTRACE.items()
+}
+
+CATALOGO = {
+    "habilidades": HABILIDADES_POR_ID,
+    "perks": PERKS_CONFIG,
+    "kits": KITS_CATALOGO,
+}
+
+ETAG_HABILIDADES = _etag_de(HABILIDADES_POR_CATEGORIA)
+ETAG_PERKS = _etag_de(PERKS_CONFIG)
+ETAG_CATALOGO = _etag_de(CATALOGO)
+
+
+# Referencia compacta de una habilidad para el estado por turno.
+def referencia_habilidad(habilidad):
+    id_hab = ID_HABILIDAD.get(habilidad.nombre)
+    if id_hab is not None:
+        return id_hab
+    return {
+        "nombre": habilidad.nombre,
+        "tipo": habilidad.tipo,
+        "descripcion": habilidad.descripcion,
+        "simbolo": habilidad.simbolo,
+        "energia_coste": habilidad.energia_coste,
+    }
+
+
+# Referencia compacta de una casilla especial para el tablero por turno.
+def referencia_casilla(casilla):
+    return casilla.get("id_unico") or casilla
+
+
+# Definiciones de las casillas de esta partida (se envían con el estado
+# completo: inicio, espectadores y resincronizaciones).
+def catalogo_casillas(juego):
+    return {
+        casilla["id_unico"]: casilla
+        for casilla in juego.casillas_especiales.values()
+        if casilla.get("id_unico")
+    }
@@ -0,0 +1,387 @@
+# ===================================================================
+# CODIFICACIÓN BINARIA DE EVENTOS - VOLTRACE (codec_binario.py)
+# ===================================================================
+#
+# Formato binario opcional para los eventos de alta frecuencia
+# (EVENTOS_BINARIOS). Es un subconjunto de MessagePack con un esquema
+# compacto encima:
+#
+# - Las claves conocidas (CAMPOS) viajan como un entero de 1 byte (su
+#   índice en la tupla). Las demás claves van como texto.
+# - Las listas de enteros que no caben en 1 byte se empaquetan como un
+#   array int16 little-endian (ext tipo 1).
+# - Los cambios de jugadores de un delta ({nombre: {campo: valor}}) se
+#   envían como columnas: nombres + posiciones y energía empaquetadas en
+#   int16 (AUSENTE si ese campo no cambió) + el resto de campos.
+#
+# El cliente lo negocia por conexión (evento 'negociar_codificacion') y
+# recibe CAMPOS en la respuesta, así el esquema vive solo aquí. Quien no
+# lo negocia sigue recibiendo JSON. CAMPOS solo crece al final: cambiar
+# el orden rompe a los clientes conectados.
+#
+# ===================================================================
+
+import struct
+import sys
+from array import array
+
+from src.core.proyeccion_estado import JSONCrudo
+
+FORMATO = "bin1"
+
+EVENTOS_BINARIOS = (
+    "paso_1_resultado_movimiento",
+    "paso_2_resultado_casilla",
+    "estado_juego_actualizado",
+)
+
+CAMPOS = (
+    # Sobres de los eventos
+    "estado_delta",
+    "eventos",
+    "eventos_recientes",
+    "jugador",
+    "resultado",
+    "habilidad_usada",
+    # Delta versionado (estado_sync.py)
+    "version",
+    "base",
+    "jugadores",
+    "jugadores_empaquetados",
+    "tablero",
+    "globales",
+    "turno_actual",
+    "ronda",
+    "estado",
+    "colores_jugadores",
+    "evento_global_activo",
+    # Jugador (Jugador.to_dict)
+    "nombre",
+    "avatar_emoji",
+    "posicion",
+    "puntaje",
+    "activo",
+    "habilidades",
+    "cooldowns",
+    "efectos_activos",
+    "pm",
+    "perks_activos",
+    "es_caza",
+    "recompensa_reclamada",
+    # Celdas del tablero
+    "casilla_especial",
+    "energia",
+    # Resultado de movimiento
+    "exito",
+    "dado",
+    "avance",
+    "pos_inicial",
+    "pos_final",
+    "meta_alcanzada",
+    "pausado",
+    "consecutive_sixes",
+    "jugador_movido",
+    "tipo",
+    "turnos",
+    "mensaje",
+)
+TAG_CAMPO = {campo: tag for tag, campo in enumerate(CAMPOS)}
+
+EXT_INT16 = 1
+AUSENTE = -32768  # Columna empaquetada sin valor para ese jugador
+
+_CAMPO_EMPAQUETADO = TAG_CAMPO["jugadores_empaquetados"]
+_INT16_MIN, _INT16_MAX = -32767, 32767
+_LITTLE_ENDIAN = sys.byteorder == "little"
+
+_empacar_d = struct.Struct(">d").pack
+_empacar_b = struct.Struct(">b").pack
+_empacar_h = struct.Struct(">h").pack
+_empacar_i = struct.Struct(">i").pack
+_empacar_q = struct.Struct(">q").pack
+_empacar_H = struct.Struct(">H").pack
+_empacar_I = struct.Struct(">I").pack
+
+
+# ===================================================================
+# --- CODIFICACIÓN ---
+# ===================================================================
+
+
+def codificar(datos):
+    """Codifica un payload de evento al formato binario."""
+    partes = []
+    _escribir(datos, partes)
+    return b"".join(partes)
+
+
+def _escribir(valor, out):
+    if valor is None:
+        out.append(b"\xc0")
+    elif valor is True:
+        out.append(b"\xc3")
+    elif valor is False:
+        out.append(b"\xc2")
+    elif isinstance(valor, int):
+        _escribir_int(valor, out)
+    elif isinstance(valor, str):
+        _escribir_str(valor, out)
+    elif isinstance(valor, dict):
+        _escribir_mapa(valor, out)
+    elif isinstance(valor, (list, tuple)):
+        _escribir_lista(valor, out)
+    elif isinstance(valor, float):
+        out.append(b"\xcb" + _empacar_d(valor))
+    elif isinstance(valor, array):
+        _escribir_int16(valor, out)
+    elif isinstance(valor, JSONCrudo):
+        _escribir(valor.datos, out)
+    elif isinstance(valor, (bytes, bytearray)):
+        _escribir_cabecera(len(valor), b"\xc4", b"\xc5", b"\xc6", out)
+        out.append(bytes(valor))
+    else:
+        raise TypeError(f"Tipo no codificable en binario: {type(valor).__name__}")
+
+
+def _escribir_int(valor, out):
+    if 0 <= valor < 128:
+        out.append(bytes((valor,)))
+    elif -32 <= valor < 0:
+        out.append(bytes((valor & 0xFF,)))
+    elif -128 <= valor < 128:
+        out.append(b"\xd0" + _empacar_b(valor))
+    elif -32768 <= valor < 32768:
+        out.append(b"\xd1" + _empacar_h(valor))
+    elif -(2**31) <= valor < 2**31:
+        out.append(b"\xd2" + _empacar_i(valor))
+    elif -(2**63) <= valor < 2**63:
+        out.append(b"\xd3" + _empacar_q(valor))
+    else:
+        raise TypeError(f"Entero fuera de rango para binario: {valor}")
+
+
+def _escribir_cabecera(n, corto, medio, largo, out):
+    if n < 256:
+        out.append(corto + bytes((n,)))
+    elif n < 65536:
+        out.append(medio + _empacar_H(n))
+    else:
+        out.append(largo + _empacar_I(n))
+
+
+def _escribir_str(valor, out):
+    crudo = valor.encode("utf-8")
+    n = len(crudo)
+    if n < 32:
+        out.append(bytes((0xA0 | n,)))
+    else:
+        _escribir_cabecera(n, b"\xd9", b"\xda", b"\xdb", out)
+    out.append(crudo)
+
+
+def _escribir_lista(valor, out):
+    empaquetado = _como_int16(valor)
+    if empaquetado is not None:
+        _escribir_int16(empaquetado, out)
+        return
+    n = len(valor)
+    if n < 16:
+        out.append(bytes((0x90 | n,)))
+    elif n < 65536:
+        out.append(b"\xdc" + _empacar_H(n))
+    else:
+        out.append(b"\xdd" + _empacar_I(n))
+    for item in valor:
+        _escribir(item, out)
+
+
+def _escribir_mapa(valor, out):
+    n = len(valor)
+    if n < 16:
+        out.append(bytes((0x80 | n,)))
+    elif n < 65536:
+        out.append(b"\xde" + _empacar_H(n))
+    else:
+        out.append(b"\xdf" + _empacar_I(n))
+    for clave, item in valor.items():
+        if clave == "jugadores" and isinstance(item, dict):
+            columnas = _empaquetar_jugadores(item)
+            if columnas is not None:
+                out.append(bytes((_CAMPO_EMPAQUETADO,)))
+                _escribir(columnas, out)
+                continue
+        tag = TAG_CAMPO.get(clave)
+        if tag is not None:
+            out.append(bytes((tag,)))
+        else:
+            # Misma conversión de claves que JSON (las claves son texto)
+            _escribir_str(clave if isinstance(clave, str) else str(clave), out)
+        _escribir(item, out)
+
+
+def _escribir_int16(valores, out):
+    if not _LITTLE_ENDIAN:
+        valores = array("h", valores)
+        valores.byteswap()
+    crudo = valores.tobytes()
+    _escribir_cabecera(len(crudo), b"\xc7", b"\xc8", b"\xc9", out)
+    out.append(bytes((EXT_INT16,)))
+    out.append(crudo)
+
+
+# Lista de enteros como array int16, solo si ocupa menos que la lista
+# normal (los enteros de 0 a 127 ya ocupan 1 byte).
+def _como_int16(valores):
+    if len(valores) < 2:
+        return None
+    grandes = False
+    for v in valores:
+        if type(v) is not int or not _INT16_MIN <= v <= _INT16_MAX:
+            return None
+        if not -32 <= v < 128:
+            grandes = True
+    return array("h", valores) if grandes else None
+
+
+# {nombre: {campo: valor}} -> [nombres, posiciones, puntajes, restos]
+def _empaquetar_jugadores(cambios):
+    nombres, posiciones, puntajes, restos = [], array("h"), array("h"), []
+    for nombre, campos in cambios.items():
+        if not isinstance(campos, dict):
+            return None
+        resto = dict(campos)
+        for columna, campo in ((posiciones, "posicion"), (puntajes, "puntaje")):
+            valor = resto.pop(campo, AUSENTE)
+            if valor is not AUSENTE and (
+                type(valor) is not int or not _INT16_MIN <= valor <= _INT16_MAX
+            ):
+                return None
+            columna.append(valor)
+        nombres.append(nombre)
+        restos.append(resto)
+    return [nombres, posiciones, puntajes, restos]
+
+
+# ===================================================================
+# --- DECODIFICACIÓN ---
+# ===================================================================
+
+
+def decodificar(datos):
+    """Decodifica un payload binario (inverso de codificar)."""
+    valor, _ = _leer(bytes(datos), 0)
+    return valor
+
+
+def _leer(datos, pos):
+    b = datos[pos]
+    pos += 1
+    if b < 0x80:
+        return b, pos
+    if b >= 0xE0:
+        return b - 0x100, pos
+    if 0xA0 <= b <= 0xBF:
+        n = b & 0x1F
+        return datos[pos : pos + n].decode("utf-8"), pos + n
+    if 0x90 <= b <= 0x9F:
+        return _leer_lista(datos, pos, b & 0x0F)
+    if 0x80 <= b <= 0x8F:
+        return _leer_mapa(datos, pos, b & 0x0F)
+    if b == 0xC0:
+        return None, pos
+    if b == 0xC2:
+        return False, pos
+    if b == 0xC3:
+        return True, pos
+    if b in _ENTEROS:
+        formato = _ENTEROS[b]
+        return formato.unpack_from(datos, pos)[0], pos + formato.size
+    if b in _LONGITUDES:
+        tipo, formato = _LONGITUDES[b]
+        n = formato.unpack_from(datos, pos)[0]
+        pos += formato.size
+        if tipo == "str":
+            return datos[pos : pos + n].decode("utf-8"), pos + n
+        if tipo == "bin":
+            return datos[pos : pos + n], pos + n
+        if tipo == "lista":
+            return _leer_lista(datos, pos, n)
+        if tipo == "mapa":
+            return _leer_mapa(datos, pos, n)
+        return _leer_ext(datos, pos, n)
+    raise ValueError(f"Byte de tipo desconocido: {b:#04x}")
+
+
+def _leer_lista(datos, pos, n):
+    lista = []
+    for _ in range(n):
+        item, pos = _leer(datos, pos)
+        lista.append(item)
+    return lista, pos
+
+
+def _leer_mapa(datos, pos, n):
+    mapa = {}
+    for _ in range(n):
+        clave, pos = _leer(datos, pos)
+        valor, pos = _leer(datos, pos)
+        if clave == _CAMPO_EMPAQUETADO:
+            mapa["jugadores"] = _desempaquetar_jugadores(valor)
+            continue
+        mapa[CAMPOS[clave] if isinstance(clave, int) else clave] = valor
+    return mapa, pos
+
+
+def _leer_ext(datos, pos, n):
+    tipo = datos[pos]
+    crudo = datos[pos + 1 : pos + 1 + n]
+    if tipo != EXT_INT16:
+        raise ValueError(f"Tipo ext desconocido: {tipo}")
+    valores = array("h")
+    valores.frombytes(crudo)
+    if not _LITTLE_ENDIAN:
+        valores.byteswap()
+    return valores.tolist(), pos + 1 + n
+
+
+def _desempaquetar_jugadores(columnas):
+    nombres, posiciones, puntajes, restos = columnas
+    jugadores = {}
+    for nombre, posicion, puntaje, resto in zip(nombres, posiciones, puntajes, restos):
+        campos = {}
+        if posicion != AUSENTE:
+            campos["posicion"] = posicion
+        if puntaje != AUSENTE:
+            campos["puntaje"] = puntaje
+        campos.update(resto)
+        jugadores[nombre] = campos
+    return jugadores
+
+
+_ENTEROS = {
+    0xCC: struct.Struct(">B"),
+    0xCD: struct.Struct(">H"),
+    0xCE: struct.Struct(">I"),
+    0xCF: struct.Struct(">Q"),
+    0xD0: struct.Struct(">b"),
+    0xD1: struct.Struct(">h"),
+    0xD2: struct.Struct(">i"),
+    0xD3: struct.Struct(">q"),
+    0xCA: struct.Struct(">f"),
+    0xCB: struct.Struct(">d"),
+}
+_LONGITUDES = {
+    0xC4: ("bin", struct.Struct(">B")),
+    0xC5: ("bin", struct.Struct(">H")),
+    0xC6: ("bin", struct.Struct(">I")),
+    0xC7: ("ext", struct.Struct(">B")),
+    0xC8: ("ext", struct.Struct(">H")),
+    0xC9: ("ext", struct.Struct(">I")),
+    0xD9: ("str", struct.Struct(">B")),
+    0xDA: ("str", struct.Struct(">H")),
+    0xDB: ("str", struct.Struct(">I")),
+    0xDC: ("lista", struct.Struct(">H")),
+    0xDD: ("lista", struct.Struct(">I")),
+    0xDE: ("mapa", struct.Struct(">H")),
+    0xDF: ("mapa", struct.Struct(">I")),
+}
@@ -0,0 +1,134 @@
+# ===================================================================
+# COLA DE COMANDOS POR SALA - VOLTRACE (cola_comandos.py)
+# ===================================================================
+#
+# Cada sala serializa todo lo que muta su partida (handlers de Socket.IO,
+# timers de inactividad, turnos de bots, desconexiones) en una cola
+# propia. Nunca hay dos comandos de la misma sala ejecutándose a la vez,
+# sin un lock global: salas distintas siguen avanzando en paralelo.
+#
+# - Worker único: quien encola en una cola ociosa la procesa en el
+#   momento y la vacía antes de volver; lo que llega mientras tanto
+#   (desde otro hilo/greenlet) lo ejecuta ese mismo worker, en orden.
+# - Coalescencia: los comandos idempotentes se encolan con una 'clave'.
+#   Si ya hay uno pendiente con la misma clave, se reemplazan sus
+#   argumentos en vez de encolar otro (ej. dos turnos de bot de la sala).
+# - Métricas por sala: profundidad, espera en cola y tiempo de ejecución.
+#
+# La cola no conoce Flask ni Socket.IO: quien encola un handler debe
+# pasarlo ya ligado a su contexto (ver _comando_de_sala en app.py).
+#
+# ===================================================================
+
+import time
+import logging
+import threading
+from collections import deque
+
+logger = logging.getLogger("voltrace")
+
+
+class Comando:
+    __slots__ = ("funcion", "args", "kwargs", "clave", "encolado")
+
+    def __init__(self, funcion, args, kwargs, clave, encolado):
+        self.funcion = funcion
+        self.args = args
+        self.kwargs = kwargs
+        self.clave = clave
+        self.encolado = encolado
+
+
+class ColaComandosSala:
+    def __init__(self, id_sala, reloj=time.monotonic):
+        self.id_sala = id_sala
+        self.reloj = reloj
+        self._cola = deque()
+        self._pendientes = {}  # clave -> Comando aún no ejecutado
+        self._lock = threading.Lock()
+        self._procesando = False
+
+        # Métricas
+        self._profundidad_max = 0
+        self._procesados = 0
+        self._coalescidos = 0
+        self._fallidos = 0
+        self._espera_ewma = 0.0
+        self._espera_max = 0.0
+        self._ejecucion_ewma = 0.0
+
+    # Encola funcion(*args, **kwargs). Si la cola estaba ociosa, este mismo
+    # llamador la procesa hasta vaciarla.
+    def encolar(self, funcion, *args, clave=None, **kwargs):
+        with self._lock:
+            pendiente = self._pendientes.get(clave) if clave is not None else None
+            if pendiente is not None:
+                pendiente.funcion = funcion
+                pendiente.args = args
+                pendiente.kwargs = kwargs
+                self._coalescidos += 1
+            else:
+                comando = Comando(funcion, args, kwargs, clave, self.reloj())
+                self._cola.append(comando)
+                if clave is not None:
+                    self._pendientes[clave] = comando
+                self._profundidad_max = max(self._profundidad_max, len(self._cola))
+            if self._procesando:
+                return
+            self._procesando = True
+        self._procesar()
+
+    @property
+    def profundidad(self):
+        return len(self._cola)
+
+    def obtener_metricas(self):
+        return {
+            "profundidad": len(self._cola),
+            "profundidad_max": self._profundidad_max,
+            "procesados": self._procesados,
+            "coalescidos": self._coalescidos,
+            "fallidos": self._fallidos,
+            "espera_ms": round(self._espera_ewma * 1000, 2),
+            "espera_max_ms": round(self._espera_max * 1000, 2),
+            "ejecucion_ms": round(self._ejecucion_ewma * 1000, 2),
+        }
+
+    def _procesar(self):
+        try:
+            while self._ejecutar_siguiente():
+                pass
+        except BaseException:
+            # El worker murió (ej. greenlet cancelado): el próximo encolar
+            # retoma la cola en vez de dejar la sala bloqueada.
+            with self._lock:
+                self._procesando = False
+            raise
+
+    # Ejecuta el próximo comando. Devuelve False (y libera la cola) si no
+    # quedaba ninguno.
+    def _ejecutar_siguiente(self):
+        with self._lock:
+            if not self._cola:
+                self._procesando = False
+                return False
+            comando = self._cola.popleft()
+            if comando.clave is not None:
+                self._pendientes.pop(comando.clave, None)
+
+        inicio = self.reloj()
+        espera = inicio - comando.encolado
+        self._espera_ewma = 0.9 * self._espera_ewma + 0.1 * espera
+        self._espera_max = max(self._espera_max, espera)
+        try:
+            comando.funcion(*comando.args, **comando.kwargs)
+        except Exception as e:
+            self._fallidos += 1
+            logger.error(
+                f"Error en comando de la sala {self.id_sala}: {e}", exc_info=True
+            )
+        finally:
+            self._procesados += 1
+            duracion = self.reloj() - inicio
+            self._ejecucion_ewma = 0.9 * self._ejecucion_ewma + 0.1 * duracion
+        return True
@@ -0,0 +1,159 @@
+# ===================================================================
+# EJECUTOR ACOTADO DE TAREAS DE BASE DE DATOS - VOLTRACE (ejecutor_db.py)
+# ===================================================================
+#
+# Reemplaza el "un threading.Thread nuevo por cada escritura" (XP,
+# estadísticas de chat/PM/habilidades, fin de partida, logros de eventos
+# del motor) por una cola acotada y un máximo de workers.
+#
+# - Los workers se lanzan a demanda (hasta 'max_workers') y terminan al
+#   vaciarse la cola: sin tareas no hay nada corriendo ni sondeando.
+# - Back-pressure: con la cola llena, una tarea 'descartable' (ej. contar
+#   un mensaje de chat) se rechaza; el resto hace esperar a quien encola
+#   hasta que haya lugar (como mucho 'espera_max' segundos; después se
+#   encola igual para no perder XP ni estadísticas de fin de partida).
+# - Métricas: profundidad de la cola, latencia de espera y de ejecución,
+#   rechazadas y esperas por cola llena.
+#
+# Los workers son green threads (socketio.start_background_task), no
+# hilos del sistema: una tarea solo deja correr al resto del servidor
+# mientras espera E/S cooperativa. Con PostgreSQL, app.py pone a psycopg2
+# en modo cooperativo (ver psycopg_cooperativo.py) para que una consulta
+# lenta ceda el hub; con SQLite las consultas siguen bloqueando.
+#
+# Como el planificador de bots, no conoce Socket.IO: recibe las funciones
+# para lanzar tareas y dormir, y opcionalmente un 'contexto' (ej.
+# app.app_context) dentro del cual corre cada tarea.
+#
+# ===================================================================
+
+import time
+import logging
+import threading
+from collections import deque
+
+logger = logging.getLogger("voltrace")
+
+
+class EjecutorDB:
+    def __init__(
+        self,
+        iniciar_tarea,
+        dormir,
+        contexto=None,
+        max_workers=4,
+        max_cola=256,
+        espera_max=5.0,
+        reloj=time.monotonic,
+    ):
+        self.iniciar_tarea = iniciar_tarea
+        self.dormir = dormir
+        self.contexto = contexto
+        self.max_workers = max_workers
+        self.max_cola = max_cola
+        self.espera_max = espera_max
+        self.reloj = reloj
+
+        self._cola = deque()
+        self._lock = threading.Lock()
+        self._workers_activos = 0
+
+        # Métricas
+        self._profundidad_max = 0
+        self._completadas = 0
+        self._fallidas = 0
+        self._rechazadas = 0
+        self._esperas = 0
+        self._latencia_ewma = 0.0
+        self._latencia_max = 0.0
+        self._ejecucion_ewma = 0.0
+
+    # Encola funcion(*args, **kwargs). Devuelve False si se rechazó.
+    def enviar(self, funcion, *args, descartable=False, **kwargs):
+        if len(self._cola) >= self.max_cola:
+            if descartable:
+                self._rechazadas += 1
+                logger.warning(
+                    f"Ejecutor DB lleno ({len(self._cola)}): tarea "
+                    f"{getattr(funcion, '__name__', funcion)} descartada"
+                )
+                return False
+            self._esperar_lugar()
+
+        with self._lock:
+            self._cola.append((funcion, args, kwargs, self.reloj()))
+            self._profundidad_max = max(self._profundidad_max, len(self._cola))
+            lanzar = self._workers_activos < self.max_workers
+            if lanzar:
+                self._workers_activos += 1
+        if lanzar:
+            self.iniciar_tarea(self._bucle_worker)
+        return True
+
+    def _esperar_lugar(self):
+        self._esperas += 1
+        limite = self.reloj() + self.espera_max
+        while len(self._cola) >= self.max_cola and self.reloj() < limite:
+            self.dormir(0.01)
+
+    def obtener_metricas(self):
+        return {
+            "profundidad": len(self._cola),
+            "profundidad_max": self._profundidad_max,
+            "max_cola": self.max_cola,
+            "workers_activos": self._workers_activos,
+            "max_workers": self.max_workers,
+            "completadas": self._completadas,
+            "fallidas": self._fallidas,
+            "rechazadas": self._rechazadas,
+            "esperas_cola_llena": self._esperas,
+            "latencia_ms": round(self._latencia_ewma * 1000, 1),
+            "latencia_max_ms": round(self._latencia_max * 1000, 1),
+            "ejecucion_ms": round(self._ejecucion_ewma * 1000, 1),
+        }
+
+    # --- Workers ---
+
+    def _siguiente(self):
+        with self._lock:
+            if not self._cola:
+                self._workers_activos -= 1
+                return None
+            return self._cola.popleft()
+
+    def _bucle_worker(self):
+        try:
+            while True:
+                tarea = self._siguiente()
+                if tarea is None:
+                    return
+                self._ejecutar(*tarea)
+                # Ceder el hub entre tareas
+                self.dormir(0)
+        except BaseException:
+            # Worker cancelado: libera su lugar para el próximo enviar()
+            with self._lock:
+                self._workers_activos -= 1
+            raise
+
+    def _ejecutar(self, funcion, args, kwargs, encolada):
+        inicio = self.reloj()
+        latencia = inicio - encolada
+        self._latencia_ewma = 0.9 * self._latencia_ewma + 0.1 * latencia
+        self._latencia_max = max(self._latencia_max, latencia)
+        try:
+            if self.contexto:
+                with self.contexto():
+                    funcion(*args, **kwargs)
+            else:
+                funcion(*args, **kwargs)
+            self._completadas += 1
+        except Exception as e:
+            self._fallidas += 1
+            logger.error(
+                f"Error en tarea de DB {getattr(funcion, '__name__', funcion)}: {e}",
+                exc_info=True,
+            )
+        finally:
+            duracion = self.reloj() - inicio
+            self._ejecucion_ewma = 0.9 * self._ejecucion_ewma + 0.1 * duracion
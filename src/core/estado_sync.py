@@ -0,0 +1,111 @@
+# ===================================================================
+# SINCRONIZACIÓN DE ESTADO POR VERSIONES - VOLTRACE (estado_sync.py)
+# ===================================================================
+#
+# En vez de mandar el estado completo de la partida en cada emit, cada
+# sala lleva una versión que crece con cada cambio y los clientes
+# reciben solo lo que cambió respecto a la versión anterior:
+#
+#   {
+#     "version": 8,               versión resultante
+#     "base": 7,                  versión sobre la que se aplica
+#     "jugadores": {nombre: {campo: valor}},   solo campos cambiados
+#     "tablero": {pos: celda | null},          null = la celda se vació
+#     "globales": {campo: valor},              turno_actual, ronda, ...
+#   }
+#
+# Los valores del delta son absolutos (no incrementos), así que aplicar
+# un delta sobre un estado más nuevo sigue siendo correcto. Un cliente
+# cuya versión no coincide con 'base' pide el estado completo
+# (evento 'solicitar_estado_completo').
+#
+# ===================================================================
+
+import copy
+
+CAMPOS_GLOBALES = (
+    "turno_actual",
+    "ronda",
+    "estado",
+    "colores_jugadores",
+    "evento_global_activo",
+)
+
+_TIPOS_INMUTABLES = (str, int, float, bool, type(None))
+
+
+# Copia de un valor para compararlo en el próximo emit. Las listas y
+# dicts del motor se mutan en el lugar (efectos_activos, perks_activos...),
+# así que no alcanza con guardar la referencia. Solo se copia lo que
+# cambió; comparar con == es mucho más barato que serializar.
+def _copiar(valor):
+    if isinstance(valor, _TIPOS_INMUTABLES):
+        return valor
+    return copy.deepcopy(valor)
+
+
+class SincronizadorEstado:
+    def __init__(self):
+        self.version = 0
+        self._jugadores = {}  # nombre -> {campo: valor}
+        self._tablero = {}  # pos (str) -> celda
+        self._globales = {}  # campo -> valor
+
+    # Compara el estado con la última versión registrada y devuelve el
+    # delta. Si nada cambió la versión no avanza (delta vacío, base == version).
+    def registrar(self, estado):
+        delta_jugadores = {}
+        for jugador in estado.get("jugadores", []):
+            nombre = jugador["nombre"]
+            previas = self._jugadores.setdefault(nombre, {})
+            cambios = {}
+            for campo, valor in jugador.items():
+                if campo not in previas or previas[campo] != valor:
+                    previas[campo] = _copiar(valor)
+                    cambios[campo] = valor
+            if cambios:
+                delta_jugadores[nombre] = cambios
+
+        delta_tablero = {}
+        if "tablero" in estado:
+            tablero = {str(pos): celda for pos, celda in estado["tablero"].items()}
+            for pos in list(self._tablero):
+                if pos not in tablero:
+                    del self._tablero[pos]
+                    delta_tablero[pos] = None
+            for pos, celda in tablero.items():
+                if self._tablero.get(pos) != celda:
+                    self._tablero[pos] = _copiar(celda)
+                    delta_tablero[pos] = celda
+
+        delta_globales = {}
+        for campo in CAMPOS_GLOBALES:
+            if campo not in estado:
+                continue
+            valor = estado[campo]
+            if campo not in self._globales or self._globales[campo] != valor:
+                self._globales[campo] = _copiar(valor)
+                delta_globales[campo] = valor
+
+        base = self.version
+        if delta_jugadores or delta_tablero or delta_globales:
+            self.version += 1
+        return {
+            "version": self.version,
+            "base": base,
+            "jugadores": delta_jugadores,
+            "tablero": delta_tablero,
+            "globales": delta_globales,
+        }
+
+    # Estado completo en la versión actual, armado con las copias guardadas
+    # (no con el motor, que puede haber cambiado desde el último registro).
+    def vista(self):
+        estado = dict(self._globales)
+        estado["jugadores"] = [dict(campos) for campos in self._jugadores.values()]
+        estado["tablero"] = dict(self._tablero)
+        return estado
+
+    @staticmethod
+    def delta_vacio(delta):
+        return not (delta["jugadores"] or delta["tablero"] or delta["globales"])
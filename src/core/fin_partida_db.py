@@ -0,0 +1,288 @@
+# ===================================================================
+# ESCRITURA MASIVA DE FIN DE PARTIDA - VOLTRACE (fin_partida_db.py)
+# ===================================================================
+#
+# Registra estadísticas, XP de maestría de kit y logros de TODOS los
+# jugadores de una partida terminada en una sola transacción:
+#
+# 1. Lectura en lote: usuarios (+ logros desbloqueados, precargados) y
+#    maestrías de los kits usados (las definiciones de logros ya están
+#    en memoria, ver AchievementSystem.definitions).
+# 2. Cálculo en memoria: partidas, victorias, racha, XP y nivel, XP de
+#    maestría y desbloqueo de cosmético, y logros ('game_finished' con
+#    las estadísticas ya actualizadas, como hacía check_achievement).
+# 3. Escritura: un INSERT ... ON CONFLICT DO NOTHING de logros (la XP de
+#    recompensa cuenta solo lo insertado), un UPDATE de 'user' por lotes
+#    (con chequeo de 'version') y un INSERT ... ON CONFLICT DO UPDATE de
+#    maestrías, más el resultado de cada jugador y la suma de sus
+#    resúmenes de día/semana/temporada (ver temporadas.py); un solo
+#    commit. Lo otorgado y las estadísticas nuevas
+#    pasan a las caches de AchievementSystem (desbloqueados y progreso)
+#    y a los rankings en memoria (global, con un solo aviso si cambia el
+#    top, y de maestría por kit).
+#
+# Corre dentro de carriles_db.ejecutar con las claves de todos los
+# jugadores: si otra escritura cambió a alguno (versión distinta) se lanza
+# StaleDataError y el lote se recalcula desde cero.
+#
+# No emite nada: devuelve por jugador lo necesario para notificarlo.
+#
+# ===================================================================
+
+import logging
+from datetime import datetime
+
+from sqlalchemy import bindparam, update
+from sqlalchemy.orm.exc import StaleDataError
+
+from src.models import db, User, UserKitMaestria, insert_con_conflicto
+from src.core.game_config import (
+    XP_POR_PARTIDA,
+    XP_VICTORIA,
+    XP_MAESTRIA_BASE,
+    XP_MAESTRIA_VICTORIA,
+)
+
+logger = logging.getLogger("voltrace")
+
+NIVEL_MINIMO_MAESTRIA = 5
+MAESTRIA_XP_NV10 = 6750  # XP de maestría que desbloquea el cosmético del kit
+
+
+class EscritorFinPartida:
+    def __init__(
+        self,
+        achievement_system,
+        carriles,
+        calcular_nivel,
+        ranking=None,
+        rankings_maestria=None,
+        temporadas=None,
+    ):
+        self.achievement_system = achievement_system
+        self.carriles = carriles
+        self.calcular_nivel = calcular_nivel
+        self.ranking = ranking
+        self.rankings_maestria = rankings_maestria
+        self.temporadas = temporadas
+
+    # jugadores: [{"username", "ganador", "kit_id", "event_data"}, ...]
+    # Devuelve {username: {estadísticas nuevas, "cosmetico", "logros"}}.
+    def registrar(self, jugadores):
+        if not jugadores:
+            return {}
+        return self.carriles.ejecutar(
+            [j["username"] for j in jugadores], self._registrar_tx, jugadores
+        )
+
+    def _registrar_tx(self, jugadores):
+        # --- 1. Lectura en lote ---
+        usuarios = self.achievement_system._load_users(
+            [j["username"] for j in jugadores]
+        )
+        jugadores = [j for j in jugadores if j["username"] in usuarios]
+        if not jugadores:
+            return {}
+
+        maestrias = {
+            (m.user_id, m.kit_id): m
+            for m in UserKitMaestria.query.filter(
+                UserKitMaestria.user_id.in_(
+                    [usuarios[j["username"]].id for j in jugadores]
+                )
+            )
+        }
+
+        # --- 2. Cálculo en memoria ---
+        resultados = {}
+        filas_usuario = []
+        filas_maestria = []
+        totales_maestria = []  # (kit_id, username, XP total) para el ranking
+        logros_por_usuario = {}
+        for jugador in jugadores:
+            user = usuarios[jugador["username"]]
+            ganador = jugador["ganador"]
+
+            games_played = (user.games_played or 0) + 1
+            games_won = (user.games_won or 0) + (1 if ganador else 0)
+            consecutive_wins = (user.consecutive_wins or 0) + 1 if ganador else 0
+            xp = (user.xp or 0) + XP_POR_PARTIDA + (XP_VICTORIA if ganador else 0)
+            level = max(user.level or 1, self.calcular_nivel(xp))
+
+            cosmetico = False
+            if (user.level or 1) >= NIVEL_MINIMO_MAESTRIA:
+                xp_maestria = XP_MAESTRIA_VICTORIA if ganador else XP_MAESTRIA_BASE
+                actual = maestrias.get((user.id, jugador["kit_id"]))
+                xp_previa = actual.xp if actual else 0
+                ya_desbloqueado = bool(actual and actual.cosmetic_unlocked)
+                cosmetico = (
+                    not ya_desbloqueado and xp_previa + xp_maestria >= MAESTRIA_XP_NV10
+                )
+                filas_maestria.append(
+                    {
+                        "user_id": user.id,
+                        "kit_id": jugador["kit_id"],
+                        "xp": xp_maestria,
+                        "level": 1,
+                        "cosmetic_unlocked": cosmetico,
+                    }
+                )
+                totales_maestria.append(
+                    (jugador["kit_id"], user.username, xp_previa + xp_maestria)
+                )
+                logger.info(
+                    f"MAESTRÍA: {xp_maestria} XP añadidos a {user.username} para kit {jugador['kit_id']}. Total: {xp_previa + xp_maestria}"
+                )
+                if cosmetico:
+                    logger.info(
+                        f"COSMÉTICO DESBLOQUEADO: {jugador['kit_id']} para {user.username}"
+                    )
+
+            event_data = dict(jugador["event_data"], consecutive_wins=consecutive_wins)
+            logros = self.achievement_system.collect_unlocks(
+                user.username,
+                self.achievement_system.unlocked_ids(user),
+                self.achievement_system.user_stats(
+                    user,
+                    xp=xp,
+                    level=level,
+                    games_played=games_played,
+                    games_won=games_won,
+                ),
+                [("game_finished", event_data)],
+            )
+            logros_por_usuario[user.username] = logros
+
+            filas_usuario.append(
+                {
+                    "b_id": user.id,
+                    "b_version": user.version,
+                    "games_played": games_played,
+                    "games_won": games_won,
+                    "consecutive_wins": consecutive_wins,
+                    "xp": xp,
+                    "level": level,
+                }
+            )
+            resultados[user.username] = {
+                "games_played": games_played,
+                "games_won": games_won,
+                "consecutive_wins": consecutive_wins,
+                "xp": xp,
+                "level": level,
+                "equipped_title": user.equipped_title,
+                "cosmetico": cosmetico,
+                "logros": [],
+            }
+
+        # --- 3. Escritura en una transacción ---
+        # Logros primero: la XP de recompensa se suma solo por los que el
+        # INSERT idempotente realmente agregó (definiciones en memoria)
+        definiciones = self.achievement_system.definitions(
+            {i for logros in logros_por_usuario.values() for i in logros}
+        )
+        ahora = datetime.utcnow()
+        insertados = self.achievement_system.insert_unlocks(
+            [
+                {
+                    "user_id": fila["b_id"],
+                    "achievement_id": definiciones[internal_id]["id"],
+                    "unlocked_at": ahora,
+                }
+                for username, fila in zip(resultados, filas_usuario)
+                for internal_id in logros_por_usuario[username]
+                if internal_id in definiciones
+            ]
+        )
+        for username, fila in zip(resultados, filas_usuario):
+            otorgados = [
+                internal_id
+                for internal_id in logros_por_usuario[username]
+                if internal_id in definiciones
+                and (fila["b_id"], definiciones[internal_id]["id"]) in insertados
+            ]
+            fila["xp"] += sum(definiciones[i]["xp_reward"] for i in otorgados)
+            resultados[username]["xp"] = fila["xp"]
+            resultados[username]["logros"] = otorgados
+
+        self._actualizar_usuarios(filas_usuario)
+        if filas_maestria:
+            self._sumar_maestrias(filas_maestria)
+        if self.temporadas:
+            self.temporadas.registrar(
+                [
+                    {
+                        "user_id": usuarios[jugador["username"]].id,
+                        "kit_id": jugador["kit_id"],
+                        "ganador": bool(jugador["ganador"]),
+                        "xp_ganada": resultados[jugador["username"]]["xp"]
+                        - (usuarios[jugador["username"]].xp or 0),
+                    }
+                    for jugador in jugadores
+                ]
+            )
+        db.session.commit()
+        self.achievement_system.remember_unlocks(
+            {username: r["logros"] for username, r in resultados.items()}
+        )
+        for username, r in resultados.items():
+            self.achievement_system.update_progress_stats(
+                username,
+                games_played=r["games_played"],
+                games_won=r["games_won"],
+                xp=r["xp"],
+                level=r["level"],
+            )
+        if self.ranking:
+            self.ranking.actualizar_lote(
+                [
+                    (
+                        username,
+                        r["level"],
+                        r["xp"],
+                        r["games_played"],
+                        r["games_won"],
+                    )
+                    for username, r in resultados.items()
+                ]
+            )
+        if self.rankings_maestria and totales_maestria:
+            self.rankings_maestria.actualizar_lote(totales_maestria)
+        return resultados
+
+    def _actualizar_usuarios(self, filas):
+        tabla = User.__table__
+        sentencia = (
+            update(tabla)
+            .where(tabla.c.id == bindparam("b_id"))
+            .where(tabla.c.version == bindparam("b_version"))
+            .values(
+                games_played=bindparam("games_played"),
+                games_won=bindparam("games_won"),
+                consecutive_wins=bindparam("consecutive_wins"),
+                xp=bindparam("xp"),
+                level=bindparam("level"),
+                version=tabla.c.version + 1,
+            )
+        )
+        resultado = db.session.connection().execute(sentencia, filas)
+        dialecto = db.session.get_bind().dialect
+        if dialecto.supports_sane_multi_rowcount and resultado.rowcount != len(filas):
+            raise StaleDataError(
+                f"Fin de partida: {len(filas) - resultado.rowcount} usuarios cambiaron durante el cálculo"
+            )
+
+    # Suma XP de maestría (crea la fila si el kit no tenía) y marca el
+    # cosmético sin desmarcarlo nunca.
+    def _sumar_maestrias(self, filas):
+        tabla = UserKitMaestria.__table__
+        sentencia = insert_con_conflicto(tabla).values(filas)
+        sentencia = sentencia.on_conflict_do_update(
+            index_elements=[tabla.c.user_id, tabla.c.kit_id],
+            set_={
+                "xp": tabla.c.xp + sentencia.excluded.xp,
+                "cosmetic_unlocked": tabla.c.cosmetic_unlocked
+                | sentencia.excluded.cosmetic_unlocked,
+            },
+        )
+        db.session.connection().execute(sentencia)
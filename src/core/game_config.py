@@ -13,6 +13,26 @@ DURACION_TURNO_SEGUNDOS = 90
 MAX_JUGADORES = 4
 MIN_JUGADORES = 2
 
+# --- BOTS (PLANIFICADOR) ---
+RETARDO_TURNO_BOT_SEGUNDOS = 2.0  # Pausa "humana" antes de cada jugada de bot
+MAX_WORKERS_BOTS = 4  # Turnos de bot ejecutándose a la vez en el servidor
+RITMO_BOTS_CON_ESPECTADORES = 0.5  # Pausa en salas solo de bots con público
+
+# --- ESCRITURAS DE DB EN SEGUNDO PLANO ---
+MAX_WORKERS_DB = 4  # Tareas de DB ejecutándose a la vez
+MAX_COLA_DB = 256  # Tareas en espera antes de aplicar back-pressure
+MAX_CACHE_LOGROS = 2048  # Usuarios con sus logros desbloqueados en memoria
+MAX_CACHE_AMIGOS = 2048  # Usuarios con sus amigos y solicitudes en memoria
+MAX_CACHE_IDENTIDADES = 4096  # username -> (id, nivel, avatar) en memoria
+
+# --- PRESENCIA ---
+PRESENCIA_TTL_SEGUNDOS = 60  # Sin latido en este tiempo, el usuario pasa a offline
+PRESENCIA_BARRIDO_SEGUNDOS = 5  # Cada cuánto se buscan presencias vencidas
+VENTANA_AVISOS_ESTADO_SEGUNDOS = 2  # Cambios de estado de amigos agrupados por lote
+
+# --- TEMPORADAS ---
+MESES_POR_TEMPORADA = 3  # Temporadas trimestrales (ene, abr, jul, oct)
+
 # --- VALORES DE CASILLAS ESPECIALES ---
 # Tesoros y Recursos
 ENERGIA_TESORO_MENOR = 70
@@ -0,0 +1,100 @@
+# ===================================================================
+# CACHE DE IDENTIDADES - VOLTRACE (identidades.py)
+# ===================================================================
+#
+# username -> (id, nivel, avatar) en memoria, para que los caminos
+# calientes (sistema social, salas, arsenal) trabajen por ID en vez de
+# empezar con uno o dos User.query.filter_by(username=...).first().
+#
+# - LRU acotada ('cache_size'). Un fallo lee solo esas columnas; varios
+#   fallos juntos (obtener_varios) se leen con un único IN.
+# - El id y el username no cambian nunca; el avatar se invalida al
+#   cambiarlo (/api/set_avatar). El nivel sale de 'nivel_de' (el ranking
+#   en memoria, que recibe cada cambio de XP) si se inyecta; si no, es el
+#   leído de la DB.
+# - No se guardan los usuarios que no existen (se pueden registrar).
+#
+# ===================================================================
+
+import logging
+import threading
+from collections import OrderedDict, namedtuple
+
+from src.models import db, User
+
+logger = logging.getLogger("voltrace")
+
+Identidad = namedtuple("Identidad", ["id", "username", "level", "avatar_emoji"])
+
+
+class CacheIdentidades:
+    def __init__(self, cache_size=4096, nivel_de=None):
+        self.cache_size = cache_size
+        self.nivel_de = nivel_de
+        self._cache = OrderedDict()  # username -> Identidad
+        self._lock = threading.Lock()
+
+        # Métricas
+        self._aciertos = 0
+        self._fallos = 0
+
+    # Identidad del usuario, o None si no existe.
+    def obtener(self, username):
+        return self.obtener_varios([username]).get(username)
+
+    # {username: Identidad} de los que existen (una consulta para los
+    # que no estaban en memoria).
+    def obtener_varios(self, usernames):
+        encontrados = {}
+        faltan = []
+        with self._lock:
+            for username in usernames:
+                identidad = self._cache.get(username)
+                if identidad is None:
+                    faltan.append(username)
+                    continue
+                self._cache.move_to_end(username)
+                encontrados[username] = identidad
+            self._aciertos += len(encontrados)
+            self._fallos += len(faltan)
+
+        if faltan:
+            filas = db.session.execute(
+                db.select(User.id, User.username, User.level, User.avatar_emoji).where(
+                    User.username.in_(faltan)
+                )
+            ).all()
+            with self._lock:
+                for fila in filas:
+                    identidad = Identidad(*fila)
+                    self._cache[identidad.username] = identidad
+                    encontrados[identidad.username] = identidad
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+        if self.nivel_de:
+            for username, identidad in encontrados.items():
+                nivel = self.nivel_de(username)
+                if nivel is not None and nivel != identidad.level:
+                    encontrados[username] = identidad._replace(level=nivel)
+        return encontrados
+
+    def id_de(self, username):
+        identidad = self.obtener(username)
+        return identidad.id if identidad else None
+
+    # Cambió el perfil (ej. avatar): la próxima lectura vuelve a la DB.
+    def invalidar(self, username):
+        with self._lock:
+            self._cache.pop(username, None)
+
+    def limpiar(self):
+        with self._lock:
+            self._cache.clear()
+
+    def obtener_metricas(self):
+        return {
+            "usuarios": len(self._cache),
+            "aciertos": self._aciertos,
+            "fallos": self._fallos,
+        }
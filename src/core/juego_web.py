@@ -22,13 +22,12 @@ import random
 import os
 import logging
 import traceback
-import threading
 
 from src.core.ml_adapter import VoltraceMLAdapter
-from src.core.bot_agent import VoltraceAgent
 from src.core.habilidades import Habilidad, crear_habilidades, KITS_VOLTRACE
 from src.core.perks import PERKS_CONFIG, obtener_perks_por_tier
 from src.core.jugadores import JugadorWeb
+from src.core.catalogo import referencia_casilla
 from src.core.game_config import (
     POSICION_META,
     ENERGIA_TESORO_MENOR,
@@ -82,6 +81,11 @@ class JuegoOcaWeb:
         self.evento_global_duracion = 0
         self.ultimo_en_mid_game = None
         self.achievement_system = achievement_system
+        # Hechos relevantes para logros del turno en curso (el servidor los
+        # evalúa juntos al terminar el turno, ver extraer_hechos_logros)
+        self.hechos_logros = []
+        self.version_tablero = 0  # Se incrementa con cada cambio de packs/casillas
+        self._adaptadores_ml = {}
 
         # Log para mostrar la configuración
         logger.info(
@@ -438,6 +442,12 @@ class JuegoOcaWeb:
                         self.eventos_turno.append(
                             f"🔥 ¡Racha! {nombre_jugador} sacó {consecutive_sixes_count} seises seguidos."
                         )
+                    if consecutive_sixes_count >= 3:
+                        self._registrar_hecho_logro(
+                            nombre_jugador,
+                            "dice_rolled",
+                            {"consecutive_sixes": consecutive_sixes_count},
+                        )
                 else:
                     jugador.consecutive_sixes = 0
 
@@ -585,6 +595,7 @@ class JuegoOcaWeb:
                     f"❤️‍🩹 ¡Último Aliento salvó a {jugador.get_nombre()}! Sobrevive con 50 E y Escudo (3 Turnos)."
                 )
                 jugador._ultimo_aliento_notificado = True  # Marcar como notificado
+                self._registrar_logro_evento(jugador.get_nombre(), "inmortal")
             # Si no fue salvado Y está inactivo, AHORA sí mostrar mensaje de eliminación
             elif not jugador.esta_activo():
                 mensaje_elim = (
@@ -769,6 +780,9 @@ class JuegoOcaWeb:
                         f"❤️‍🩹 ¡Último Aliento salvó a {jugador_afectado.get_nombre()}! Sobrevive con 50 E y Escudo (3 Turnos)."
                     )
                     jugador_afectado._ultimo_aliento_notificado = True
+                    self._registrar_logro_evento(
+                        jugador_afectado.get_nombre(), "inmortal"
+                    )
 
                 # Lógica de Recompensa de Mina
                 if casilla.get("nombre") == "Mina de Energía" and casilla.get(
@@ -790,6 +804,7 @@ class JuegoOcaWeb:
 
                     if posicion in self.casillas_especiales:
                         del self.casillas_especiales[posicion]
+                        self.version_tablero += 1
                         self.eventos_turno.append(
                             f"✅ Mina en pos {posicion} consumida."
                         )
@@ -974,6 +989,9 @@ class JuegoOcaWeb:
                         f"❤️‍🩹 ¡Último Aliento salvó a {jugador_afectado.get_nombre()}! Sobrevive con 50 E y Escudo (3 Turnos)."
                     )
                     jugador_afectado._ultimo_aliento_notificado = True
+                    self._registrar_logro_evento(
+                        jugador_afectado.get_nombre(), "inmortal"
+                    )
 
     def _buscar_energia_en_posicion(self, jugador, posicion):
         for i, pack in enumerate(self.energia_packs):
@@ -1049,8 +1067,12 @@ class JuegoOcaWeb:
                         f"❤️‍🩹 ¡Último Aliento salvó a {jugador_afectado.get_nombre()}! Sobrevive con 50 E y Escudo (3 Turnos)."
                     )
                     jugador_afectado._ultimo_aliento_notificado = True
+                    self._registrar_logro_evento(
+                        jugador_afectado.get_nombre(), "inmortal"
+                    )
 
                 # Reducir valor del pack a la mitad
+                self.version_tablero += 1
                 self.energia_packs[i]["valor"] = energia_original // 2
                 if (
                     abs(self.energia_packs[i]["valor"]) < 10
@@ -1126,23 +1148,10 @@ class JuegoOcaWeb:
                     j_afectado.ganar_pm(
                         2, fuente="colision"
                     )  # Colisión NO activa Acumulador
-                    if self.achievement_system and self._verificar_efecto_activo(
-                        j_afectado, "escudo"
-                    ):
-                        try:
-                            threading.Thread(
-                                target=self.achievement_system.check_achievement,
-                                args=(
-                                    j_afectado.get_nombre(),
-                                    "game_event",
-                                    {"event_name": "muralla_humana"},
-                                ),
-                            ).start()
-                        except Exception as e:
-                            logger.error(
-                                f"ERROR al verificar logro 'muralla_humana' en hilo: {e}",
-                                exc_info=True,
-                            )
+                    if self._verificar_efecto_activo(j_afectado, "escudo"):
+                        self._registrar_logro_evento(
+                            j_afectado.get_nombre(), "muralla_humana"
+                        )
 
                 elif "amortiguacion" in j_afectado.perks_activos:
                     energia_perdida = int(energia_perdida * 0.67)  # Pierde 67% aprox
@@ -2130,6 +2139,9 @@ class JuegoOcaWeb:
                                     f"❤️‍🩹 ¡Último Aliento salvó a {jugador_afectado.get_nombre()}! Sobrevive con 50 E y Escudo (3 Turnos)."
                                 )
                                 jugador_afectado._ultimo_aliento_notificado = True
+                                self._registrar_logro_evento(
+                                    jugador_afectado.get_nombre(), "inmortal"
+                                )
                         continue  # Pasar al siguiente jugador
 
                     # Comprobar Escudo (bloquea el daño)
@@ -2163,6 +2175,9 @@ class JuegoOcaWeb:
                                 f"❤️‍🩹 ¡Último Aliento salvó a {jugador_afectado.get_nombre()}! Sobrevive con 50 E y Escudo (3 Turnos)."
                             )
                             jugador_afectado._ultimo_aliento_notificado = True
+                            self._registrar_logro_evento(
+                                jugador_afectado.get_nombre(), "inmortal"
+                            )
 
                         # Lógica de empuje (Bomba Fragmentación) - Solo si el objetivo aún está activo
                         if (
@@ -2288,6 +2303,9 @@ class JuegoOcaWeb:
                         f"❤️‍🩹 ¡Último Aliento salvó a {jugador_afectado.get_nombre()}! Sobrevive con 50 E y Escudo (3 Turnos)."
                     )
                     jugador_afectado._ultimo_aliento_notificado = True
+                    self._registrar_logro_evento(
+                        jugador_afectado.get_nombre(), "inmortal"
+                    )
 
             return {
                 "exito": True,
@@ -2330,6 +2348,7 @@ class JuegoOcaWeb:
                     f"❤️‍🩹 ¡Último Aliento salvó a {jugador_afectado.get_nombre()}! Sobrevive con 50 E y Escudo (3 Turnos)."
                 )
                 jugador_afectado._ultimo_aliento_notificado = True
+                self._registrar_logro_evento(jugador_afectado.get_nombre(), "inmortal")
 
             return {"exito": True, "eventos": eventos}
 
@@ -2708,6 +2727,7 @@ class JuegoOcaWeb:
 
         # Colocar la Mina en el juego
         self.casillas_especiales[pos_actual] = nueva_casilla_data
+        self.version_tablero += 1
         eventos.append(f"💣 Mina Colocada en {pos_actual} (-50 E).")
 
         # Devolver el "delta" del tablero
@@ -3234,47 +3254,23 @@ class JuegoOcaWeb:
         return [jugador.to_dict() for jugador in self.jugadores]
 
     def obtener_estado_tablero(self):
+        # Solo lo propio del tablero (casillas y packs). Las fichas se
+        # derivan en el cliente de la posición de cada jugador, así
+        # moverse no reenvía celdas (ver hidratarEstado en estadoSync.js).
         tablero = {}
 
-        # Agregar jugadores al tablero
-        for jugador in self.jugadores:
-            pos = jugador.get_posicion()
-            if pos not in tablero:
-                tablero[pos] = {
-                    "jugadores": [],
-                    "casilla_especial": None,
-                    "energia": None,
-                }
-
-            tablero[pos]["jugadores"].append(
-                {
-                    "nombre": jugador.get_nombre(),
-                    "energia": jugador.get_puntaje(),
-                    "activo": jugador.esta_activo(),
-                    "avatar_emoji": jugador.avatar_emoji,
-                }
-            )
-
         # Agregar casillas especiales
         for pos, datos in self.casillas_especiales.items():
             if pos not in tablero:
-                tablero[pos] = {
-                    "jugadores": [],
-                    "casilla_especial": None,
-                    "energia": None,
-                }
-            tablero[pos]["casilla_especial"] = datos
+                tablero[pos] = {"casilla_especial": None, "energia": None}
+            tablero[pos]["casilla_especial"] = referencia_casilla(datos)
 
         # Agregar packs de energía
         for pack in self.energia_packs:
             pos = pack["posicion"]
             if pack["valor"] != 0:
                 if pos not in tablero:
-                    tablero[pos] = {
-                        "jugadores": [],
-                        "casilla_especial": None,
-                        "energia": None,
-                    }
+                    tablero[pos] = {"casilla_especial": None, "energia": None}
                 tablero[pos]["energia"] = pack["valor"]
 
         return tablero
@@ -3300,6 +3296,21 @@ class JuegoOcaWeb:
     def _verificar_efecto_activo(self, jugador, tipo_efecto):
         return any(efecto["tipo"] == tipo_efecto for efecto in jugador.efectos_activos)
 
+    # --- Hechos para logros (se evalúan al terminar el turno) ---
+
+    def _registrar_hecho_logro(self, nombre_jugador, tipo_evento, datos=None):
+        self.hechos_logros.append((nombre_jugador, tipo_evento, datos or {}))
+
+    def _registrar_logro_evento(self, nombre_jugador, nombre_evento):
+        self._registrar_hecho_logro(
+            nombre_jugador, "game_event", {"event_name": nombre_evento}
+        )
+
+    # Devuelve y vacía los hechos acumulados desde la última extracción.
+    def extraer_hechos_logros(self):
+        hechos, self.hechos_logros = self.hechos_logros, []
+        return hechos
+
     def _obtener_efecto_activo(self, jugador, tipo_efecto):
         for efecto in jugador.efectos_activos:
             if efecto.get("tipo") == tipo_efecto:
@@ -3346,21 +3357,7 @@ class JuegoOcaWeb:
                 )
 
                 # Disparar el logro "Fantasma"
-                if self.achievement_system:
-                    try:
-                        threading.Thread(
-                            target=self.achievement_system.check_achievement,
-                            args=(
-                                objetivo.get_nombre(),
-                                "game_event",
-                                {"event_name": "fantasma"},
-                            ),
-                        ).start()
-                    except Exception as e:
-                        logger.error(
-                            f"ERROR al verificar logro 'fantasma' (Anticipación): {e}",
-                            exc_info=True,
-                        )
+                self._registrar_logro_evento(objetivo.get_nombre(), "fantasma")
 
                 return False  # No puede ser afectado
 
@@ -3371,21 +3368,7 @@ class JuegoOcaWeb:
             )
 
             # Disparar el logro "Fantasma"
-            if self.achievement_system:
-                try:
-                    threading.Thread(
-                        target=self.achievement_system.check_achievement,
-                        args=(
-                            objetivo.get_nombre(),
-                            "game_event",
-                            {"event_name": "fantasma"},
-                        ),
-                    ).start()
-                except Exception as e:
-                    logger.error(
-                        f"ERROR al verificar logro 'fantasma' (Invisibilidad): {e}",
-                        exc_info=True,
-                    )
+            self._registrar_logro_evento(objetivo.get_nombre(), "fantasma")
 
             return False  # No puede ser afectado
 
@@ -3433,15 +3416,24 @@ class JuegoOcaWeb:
     # --- 8. INTEGRACIÓN CON MACHINE LEARNING (IA) ---
     # ===================================================================
 
+    # Adaptador cacheado por partida (uno por modo de features).
+    def obtener_adaptador_ml(self, extendido=False):
+        adaptador = self._adaptadores_ml.get(extendido)
+        if adaptador is None:
+            adaptador = VoltraceMLAdapter(self, extendido=extendido)
+            self._adaptadores_ml[extendido] = adaptador
+        return adaptador
+
     # Ejecuta el turno completo de un bot interactuando con la red neuronal.
     def ejecutar_turno_bot(self, nombre_bot, agente):
-        adaptador = VoltraceMLAdapter(self)
+        adaptador = self.obtener_adaptador_ml()
         jugador = self._encontrar_jugador(nombre_bot)
 
         if not jugador or not jugador.esta_activo():
             return {"exito": False, "mensaje": "Bot inactivo."}
 
-        estado_actual = adaptador.obtener_estado_vectorial(nombre_bot)
+        # Copia: el buffer del adaptador se reutiliza en la siguiente lectura
+        estado_actual = adaptador.obtener_estado_vectorial(nombre_bot).copy()
         posicion_inicial = jugador.get_posicion()
         energia_inicial = jugador.get_puntaje()
 
@@ -3500,6 +3492,8 @@ class JuegoOcaWeb:
             recompensa += 100
 
         siguiente_estado = adaptador.obtener_estado_vectorial(nombre_bot)
+        if siguiente_estado is not None:
+            siguiente_estado = siguiente_estado.copy()
         finalizado = 1.0 if self.ha_terminado() else 0.0
 
         agente.recordar_jugada(
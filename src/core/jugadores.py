@@ -11,11 +11,13 @@
 # - Métodos para modificar estado (procesar_energia, avanzar).
 # - Manejar la lógica de gasto/ganancia de Puntos de Mando (PM).
 # - Lógica de perks pasivos (ej. 'ultimo_aliento', 'acumulador_de_pm').
-# - Serialización de su estado a un diccionario (to_dict).
+# - Serialización de su estado a un diccionario (to_dict), con las
+#   habilidades como referencias al catálogo estático.
 #
 # ===================================================================
 import logging
 from src.core.perks import PERKS_CONFIG
+from src.core.catalogo import referencia_habilidad
 from src.core.game_config import ENERGIA_INICIAL, POSICION_META
 
 logger = logging.getLogger("voltrace")
@@ -305,16 +307,10 @@ class JugadorWeb:
             "posicion": self.__posicion,
             "puntaje": self.__puntaje,
             "activo": self.__activo,
-            "habilidades": [
-                {
-                    "nombre": h.nombre,
-                    "tipo": h.tipo,
-                    "descripcion": h.descripcion,
-                    "simbolo": h.simbolo,
-                    "cooldown": self.habilidades_cooldown.get(h.nombre, 0),
-                    "energia_coste": h.energia_coste,
-                }
-                for h in self.habilidades
+            # IDs del catálogo estático (ver catalogo.py) + cooldowns en el mismo orden
+            "habilidades": [referencia_habilidad(h) for h in self.habilidades],
+            "cooldowns": [
+                self.habilidades_cooldown.get(h.nombre, 0) for h in self.habilidades
             ],
             "efectos_activos": self.efectos_activos,
             "pm": self.pm,
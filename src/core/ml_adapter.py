@@ -1,55 +1,158 @@
 # ===================================================================
 # ADAPTADOR PARA MACHINE LEARNING
 # ===================================================================
+#
+# Un adaptador por partida (ver JuegoOcaWeb.obtener_adaptador_ml).
+# Escribe las features en buffers float32 preasignados y mantiene
+# tensores precomputados del tablero (valor de packs y de casillas por
+# posición) que solo se reconstruyen cuando cambia 'version_tablero'.
+#
+# Modos:
+# - Básico (9 features): el que consume el VoltraceCerebro actual.
+# - Extendido: agrega todos los rivales y la ventana de lookahead
+#   (packs y casillas de las próximas posiciones alcanzables).
+#
+# ===================================================================
+
+import numpy as np
+
+TAMANO_BASICO = 9
+MAX_HABILIDADES = 4
+MAX_RIVALES = 3
+VENTANA_LOOKAHEAD = 6  # Alcance de un dado
+
+
+# El rival más cercano ya está en el vector básico; el extendido suma
+# los demás rivales y la ventana de packs + casillas.
+def calcular_tamano_estado(extendido=False):
+    if not extendido:
+        return TAMANO_BASICO
+    return TAMANO_BASICO + 2 * (MAX_RIVALES - 1) + 2 * VENTANA_LOOKAHEAD
 
 
 class VoltraceMLAdapter:
-    def __init__(self, juego):
+    def __init__(self, juego, extendido=False):
         self.juego = juego
         self.meta = 75.0  # Posición de la meta
         self.energia_max_ref = 1000.0  # Referencia para normalizar la energía
         self.pm_max_ref = 20.0  # Referencia para normalizar los Puntos de Mejora
+        self.pack_max_ref = 150.0  # Referencia para normalizar packs y casillas
+        self.extendido = extendido
+
+        self.tamano_estado = calcular_tamano_estado(extendido)
+        self._buffer = np.zeros(self.tamano_estado, dtype=np.float32)
+
+        # Datos por jugador en el orden fijo de juego.jugadores
+        n = len(juego.jugadores)
+        self._indices = {j.get_nombre(): i for i, j in enumerate(juego.jugadores)}
+        self._posiciones = np.zeros(n, dtype=np.float32)
+        self._energias = np.zeros(n, dtype=np.float32)
+        self._distancias = np.zeros(n, dtype=np.float32)
+        self._activos = np.zeros(n, dtype=bool)
+
+        # Tensores del tablero (con padding para que la ventana nunca se salga)
+        largo = int(self.meta) + VENTANA_LOOKAHEAD + 1
+        self._valor_packs = np.zeros(largo, dtype=np.float32)
+        self._valor_casillas = np.zeros(largo, dtype=np.float32)
+        self._version_tablero = None
+
+    # Reconstruye los tensores del tablero solo si el juego lo modificó.
+    def _sincronizar_tablero(self):
+        version = getattr(self.juego, "version_tablero", None)
+        if version is not None and version == self._version_tablero:
+            return
+        self._valor_packs.fill(0.0)
+        self._valor_casillas.fill(0.0)
+        limite = len(self._valor_packs)
+        for pack in self.juego.energia_packs:
+            if 0 <= pack["posicion"] < limite:
+                self._valor_packs[pack["posicion"]] = pack["valor"]
+        for pos, casilla in self.juego.casillas_especiales.items():
+            if 0 <= pos < limite:
+                # Las casillas sin valor de energía cuentan como "hay algo" (+1)
+                self._valor_casillas[pos] = casilla.get("valor", 1) or 1
+        self._valor_packs /= self.pack_max_ref
+        self._valor_casillas /= self.pack_max_ref
+        self._version_tablero = version
+
+    def _sincronizar_jugadores(self):
+        for i, jugador in enumerate(self.juego.jugadores):
+            self._posiciones[i] = jugador.get_posicion()
+            self._energias[i] = jugador.get_puntaje()
+            self._activos[i] = jugador.esta_activo()
 
-    def obtener_estado_vectorial(self, nombre_bot):
+    def obtener_estado_vectorial(self, nombre_bot, out=None):
         """
-        Convierte el estado actual del juego en una lista plana de números (floats)
-        normalizados entre 0.0 y 1.0 para que el modelo predictivo lo procese.
+        Escribe el estado actual del juego como floats normalizados en 'out'
+        (o en el buffer interno del adaptador) y lo devuelve. El buffer se
+        reutiliza entre llamadas: copiarlo si hay que guardarlo.
         """
-        bot = self.juego._encontrar_jugador(nombre_bot)
-        if not bot or not bot.esta_activo():
+        indice = self._indices.get(nombre_bot)
+        if indice is None:
+            return None
+        bot = self.juego.jugadores[indice]
+        if not bot.esta_activo():
             return None
 
-        estado = []
+        estado = self._buffer if out is None else out
+        estado.fill(0.0)
+        self._sincronizar_jugadores()
+        posicion = self._posiciones[indice]
 
         # --- 1. DATOS DEL BOT ---
-        # Normalizamos la posición, energía y PM dividiendo por sus máximos esperados
-        estado.append(bot.get_posicion() / self.meta)
-        estado.append(bot.get_puntaje() / self.energia_max_ref)
-        estado.append(bot.get_pm() / self.pm_max_ref)
-
-        # Estado de sus habilidades (1.0 = Lista para usar, 0.0 = En cooldown)
-        for hab in bot.habilidades:
-            cd = bot.habilidades_cooldown.get(hab.nombre, 0)
-            estado.append(1.0 if cd == 0 else 0.0)
-
-        # Rellenamos con ceros si el bot tiene menos de 4 habilidades (para mantener el tamaño del vector estático)
-        faltantes = 4 - len(bot.habilidades)
-        estado.extend([0.0] * faltantes)
-
-        # --- 2. DATOS DEL RIVAL MÁS CERCANO ---
-        # Filtramos a los jugadores que no son el bot y siguen vivos
-        rivales = [j for j in self.juego.jugadores if j != bot and j.esta_activo()]
-
-        if rivales:
-            # Encontramos al rival con menor distancia absoluta
-            rival_mas_cercano = min(
-                rivales, key=lambda x: abs(x.get_posicion() - bot.get_posicion())
-            )
-            estado.append(rival_mas_cercano.get_posicion() / self.meta)
-            estado.append(rival_mas_cercano.get_puntaje() / self.energia_max_ref)
-        else:
-            # Si no hay rivales vivos, rellenamos con ceros
-            estado.extend([0.0, 0.0])
+        estado[0] = posicion / self.meta
+        estado[1] = self._energias[indice] / self.energia_max_ref
+        estado[2] = bot.get_pm() / self.pm_max_ref
+
+        # Estado de sus habilidades (1.0 = Lista para usar, 0.0 = En cooldown).
+        # Si tiene menos de 4, las posiciones restantes quedan en cero.
+        for i, hab in enumerate(bot.habilidades[:MAX_HABILIDADES]):
+            if bot.habilidades_cooldown.get(hab.nombre, 0) == 0:
+                estado[3 + i] = 1.0
+
+        # --- 2. RIVALES ORDENADOS POR DISTANCIA ---
+        np.subtract(self._posiciones, posicion, out=self._distancias)
+        np.abs(self._distancias, out=self._distancias)
+        self._distancias[~self._activos] = np.inf
+        self._distancias[indice] = np.inf
+
+        cantidad = MAX_RIVALES if self.extendido else 1
+        orden = np.argsort(self._distancias, kind="stable")[:cantidad]
+        for k, rival in enumerate(orden):
+            if not np.isfinite(self._distancias[rival]):
+                break
+            base = 7 if k == 0 else TAMANO_BASICO + 2 * (k - 1)
+            estado[base] = self._posiciones[rival] / self.meta
+            estado[base + 1] = self._energias[rival] / self.energia_max_ref
+
+        # --- 3. VENTANA DE LOOKAHEAD (solo modo extendido) ---
+        if self.extendido:
+            self._sincronizar_tablero()
+            desde = int(posicion) + 1
+            hasta = desde + VENTANA_LOOKAHEAD
+            base = TAMANO_BASICO + 2 * (MAX_RIVALES - 1)
+            estado[base : base + VENTANA_LOOKAHEAD] = self._valor_packs[desde:hasta]
+            base += VENTANA_LOOKAHEAD
+            estado[base : base + VENTANA_LOOKAHEAD] = self._valor_casillas[desde:hasta]
 
-        # Devuelve un vector de exactamente 9 números (Ej: [0.12, 0.60, 0.05, 1.0, 0.0, 1.0, 1.0, 0.15, 0.58])
         return estado
+
+    # Extrae las features de muchos bots (de una o varias partidas) en una
+    # sola matriz (N, tamano_estado). Devuelve (matriz, mascara_activos).
+    @staticmethod
+    def extraer_lote(solicitudes, extendido=False, out=None):
+        if out is None:
+            out = np.zeros(
+                (len(solicitudes), calcular_tamano_estado(extendido)), dtype=np.float32
+            )
+        mascara = np.zeros(len(solicitudes), dtype=bool)
+
+        for fila, (juego, nombre_bot) in enumerate(solicitudes):
+            adaptador = juego.obtener_adaptador_ml(extendido)
+            mascara[fila] = (
+                adaptador.obtener_estado_vectorial(nombre_bot, out=out[fila])
+                is not None
+            )
+            if not mascara[fila]:
+                out[fila].fill(0.0)
+        return out, mascara
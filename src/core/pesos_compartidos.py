@@ -0,0 +1,266 @@
+# ===================================================================
+# PESOS DEL BOT EN MEMORIA COMPARTIDA - VOLTRACE (pesos_compartidos.py)
+# ===================================================================
+#
+# Publica los pesos de la política en un único segmento de memoria
+# compartida que todos los workers del servidor mapean en modo lectura.
+# Cada worker evalúa la red directamente sobre vistas NumPy del
+# segmento (sin copias), y un contador de versión le permite tomar
+# pesos nuevos sin recargar archivos ni reiniciar.
+#
+# Layout del segmento:
+#   cabecera  <4sII Q 6I>  magic, formato, capacidad (floats), versión,
+#                          formas (salida, entrada) de fc1, fc2 y fc3
+#   datos     float32      fc1_wT, fc1_b, fc2_wT, fc2_b, fc3_wT, fc3_b
+#
+# La versión funciona como un seqlock: impar mientras se escribe,
+# par cuando los pesos son consistentes. Los lectores verifican que
+# no haya cambiado durante el forward y, si cambió, lo repiten.
+#
+# Ciclo de vida: el segmento es del host, no de un worker. Ni el creador
+# ni los que lo abren quedan registrados en el resource_tracker, así que
+# sobrevive a la muerte de cualquier worker (uno reiniciado se reconecta
+# al mismo) y se borra explícitamente al apagar el servidor (ver
+# gunicorn.conf.py).
+#
+# Uso desde las herramientas de entrenamiento:
+#   python -m src.core.pesos_compartidos <segmento> <pesos.npz>
+#   python -m src.core.pesos_compartidos --destruir <segmento>
+#
+# ===================================================================
+
+import sys
+import time
+import struct
+import logging
+from multiprocessing import shared_memory, resource_tracker
+
+import numpy as np
+
+from src.core.bot_runtime import CAPAS_CEREBRO, preparar_pesos, cargar_pesos
+
+logger = logging.getLogger("voltrace")
+
+MAGIC = b"VTCB"
+FORMATO = 1
+CABECERA = struct.Struct("<4sIIQ6I")
+OFFSET_VERSION = 12  # magic (4) + formato (4) + capacidad (4)
+VERSION = struct.Struct("<Q")
+CAPACIDAD_DEFECTO = 64 * 1024  # floats: sobra para la red 9-64-64-5
+REINTENTOS_LECTURA = 50
+ESPERA_CREADOR = 2.0  # Segundos que 'abrir' espera a que el creador publique
+
+
+# En Python < 3.13 el resource_tracker borra el segmento cuando sale el
+# proceso que lo creó o lo abrió; acá el borrado es siempre explícito.
+def _desregistrar(shm):
+    try:
+        resource_tracker.unregister(shm._name, "shared_memory")
+    except Exception:
+        pass
+
+
+# True si el creador ya escribió la cabecera y publicó los primeros pesos.
+def _inicializado(shm):
+    if shm.size < CABECERA.size:
+        return False
+    magic, formato, _, version = struct.unpack_from("<4sIIQ", shm.buf, 0)
+    return magic == MAGIC and formato == FORMATO and version > 0
+
+
+class SegmentoPesos:
+    def __init__(self, shm, propietario=False):
+        self.shm = shm
+        self.propietario = propietario
+        magic, formato, capacidad = struct.unpack_from("<4sII", shm.buf, 0)
+        if propietario:
+            capacidad = (shm.size - CABECERA.size) // 4
+        elif magic != MAGIC or formato != FORMATO:
+            raise ValueError(f"El segmento '{shm.name}' no contiene pesos Voltrace.")
+        self.capacidad = capacidad
+        self._datos = np.ndarray(
+            (capacidad,), dtype=np.float32, buffer=shm.buf, offset=CABECERA.size
+        )
+
+    # --- Creación / conexión ---
+
+    @classmethod
+    def crear(cls, nombre, pesos, capacidad=CAPACIDAD_DEFECTO):
+        shm = shared_memory.SharedMemory(
+            name=nombre, create=True, size=CABECERA.size + capacidad * 4
+        )
+        _desregistrar(shm)
+        segmento = cls(shm, propietario=True)
+        CABECERA.pack_into(shm.buf, 0, MAGIC, FORMATO, capacidad, 0, *([0] * 6))
+        segmento.publicar(pesos)
+        return segmento
+
+    # Un worker puede llegar entre que el creador crea el segmento y
+    # publica los pesos: espera hasta 'espera' segundos a que estén.
+    @classmethod
+    def abrir(cls, nombre, espera=ESPERA_CREADOR):
+        limite = time.monotonic() + espera
+        while True:
+            try:
+                shm = shared_memory.SharedMemory(name=nombre)
+            except ValueError:
+                shm = None  # Recién creado: todavía sin tamaño
+            if shm is not None:
+                _desregistrar(shm)
+                if _inicializado(shm):
+                    return cls(shm)
+                shm.close()
+            if time.monotonic() >= limite:
+                raise ValueError(f"El segmento '{nombre}' no contiene pesos Voltrace.")
+            time.sleep(0.005)
+
+    # El primer worker crea y publica; el resto se conecta al existente.
+    @classmethod
+    def conectar_o_crear(cls, nombre, pesos):
+        try:
+            return cls.crear(nombre, pesos)
+        except FileExistsError:
+            return cls.abrir(nombre)
+
+    # --- Escritura (herramientas de entrenamiento) ---
+
+    def publicar(self, pesos):
+        capas = preparar_pesos(pesos)
+        total = sum(w.size + b.size for w, b in capas)
+        if total > self.capacidad:
+            raise ValueError(
+                f"Los pesos ({total} floats) no entran en el segmento ({self.capacidad})."
+            )
+
+        version = self.version
+        if version % 2:
+            version += 1  # Un escritor anterior murió a mitad de publicación
+        VERSION.pack_into(self.shm.buf, OFFSET_VERSION, version + 1)
+
+        formas = []
+        offset = 0
+        for w, b in capas:
+            self._datos[offset : offset + w.size] = w.ravel()
+            offset += w.size
+            self._datos[offset : offset + b.size] = b
+            offset += b.size
+            formas.extend((w.shape[1], w.shape[0]))
+        struct.pack_into("<6I", self.shm.buf, CABECERA.size - 24, *formas)
+
+        VERSION.pack_into(self.shm.buf, OFFSET_VERSION, version + 2)
+        logger.info(f"Pesos publicados en '{self.shm.name}' (versión {version + 2})")
+        return version + 2
+
+    # --- Lectura (workers) ---
+
+    @property
+    def version(self):
+        return VERSION.unpack_from(self.shm.buf, OFFSET_VERSION)[0]
+
+    # Devuelve (versión, capas) con vistas de solo lectura sobre el segmento.
+    def vistas(self):
+        for _ in range(REINTENTOS_LECTURA):
+            version = self.version
+            if version == 0 or version % 2:
+                time.sleep(0.001)
+                continue
+            formas = struct.unpack_from("<6I", self.shm.buf, CABECERA.size - 24)
+            capas = []
+            offset = 0
+            for i in range(len(CAPAS_CEREBRO)):
+                salida, entrada = formas[2 * i], formas[2 * i + 1]
+                w = self._datos[offset : offset + salida * entrada]
+                offset += salida * entrada
+                b = self._datos[offset : offset + salida]
+                offset += salida
+                w = w.reshape(entrada, salida)
+                w.flags.writeable = False
+                b.flags.writeable = False
+                capas.append((w, b))
+            if self.version == version:
+                return version, capas
+        raise RuntimeError(f"No hay pesos consistentes en '{self.shm.name}'.")
+
+    def cerrar(self):
+        self._datos = None
+        self.shm.close()
+
+    def destruir(self):
+        self.cerrar()
+        # unlink() también lo desregistra: se vuelve a registrar para que
+        # el resource_tracker no avise de un nombre desconocido.
+        resource_tracker.register(self.shm._name, "shared_memory")
+        self.shm.unlink()
+
+
+# Borra el segmento al apagar el servidor. Devuelve False si no existía.
+def destruir_segmento(nombre):
+    try:
+        shm = shared_memory.SharedMemory(name=nombre)
+    except FileNotFoundError:
+        return False
+    shm.close()
+    shm.unlink()  # Abrirlo lo registró: unlink lo desregistra
+    logger.info(f"Segmento de pesos '{nombre}' destruido.")
+    return True
+
+
+class CerebroCompartido:
+    """
+    Misma interfaz que CerebroNumpy, pero evaluando sobre el segmento
+    compartido. Si la versión cambia se remapean las vistas en la
+    siguiente jugada, sin recargar nada desde disco.
+    """
+
+    def __init__(self, segmento):
+        self.segmento = segmento
+        self.version, self.capas = segmento.vistas()
+
+    @property
+    def input_size(self):
+        return self.capas[0][0].shape[0]
+
+    @property
+    def output_size(self):
+        return self.capas[-1][0].shape[1]
+
+    def forward(self, x):
+        x = np.asarray(x, dtype=np.float32)
+        for _ in range(REINTENTOS_LECTURA):
+            if self.segmento.version != self.version:
+                self.version, self.capas = self.segmento.vistas()
+            h = x
+            ultima = len(self.capas) - 1
+            for i, (w, b) in enumerate(self.capas):
+                h = h @ w
+                h += b
+                if i < ultima:
+                    np.maximum(h, 0.0, out=h)
+            # Seqlock: si hubo una publicación durante el forward, repetir
+            if self.segmento.version == self.version:
+                return h
+        raise RuntimeError("Los pesos compartidos cambian demasiado rápido.")
+
+    __call__ = forward
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Uso: python -m src.core.pesos_compartidos <segmento> <pesos.npz>")
+        print("     python -m src.core.pesos_compartidos --destruir <segmento>")
+        sys.exit(1)
+    if sys.argv[1] == "--destruir":
+        if not destruir_segmento(sys.argv[2]):
+            print(f"No existe el segmento '{sys.argv[2]}'.")
+        sys.exit(0)
+    nombre_segmento, ruta_pesos = sys.argv[1], sys.argv[2]
+    pesos_nuevos = cargar_pesos(ruta_pesos)
+    try:
+        segmento_existente = SegmentoPesos.abrir(nombre_segmento)
+        print(f"Versión {segmento_existente.publicar(pesos_nuevos)} publicada.")
+        segmento_existente.cerrar()
+    except FileNotFoundError:
+        print(
+            f"No existe el segmento '{nombre_segmento}'. ¿Están corriendo los workers?"
+        )
+        sys.exit(1)
@@ -0,0 +1,180 @@
+# ===================================================================
+# PLANIFICADOR CENTRAL DE TURNOS DE BOTS - VOLTRACE (planificador_bots.py)
+# ===================================================================
+#
+# Reemplaza el "una tarea de fondo + sleep(2.0) por turno de bot".
+#
+# - Los turnos se agendan en la rueda de temporizadores compartida del
+#   servidor (ver rueda_temporizadores.py): agendar y cancelar son O(1) y
+#   su ticker mueve los turnos vencidos a la cola de listos.
+# - Un conjunto acotado de workers consume la cola en round-robin por
+#   sala (una sala nunca tiene más de un turno pendiente), así ninguna
+#   sala acapara CPU.
+# - Back-pressure: si el hub se atrasa (el ticker despierta tarde) o la
+#   cola de listos crece, los turnos nuevos se agendan más espaciados.
+#
+# El planificador no conoce Socket.IO: recibe las funciones para lanzar
+# tareas y dormir (socketio.start_background_task / socketio.sleep).
+#
+# ===================================================================
+
+import time
+import logging
+from collections import deque
+
+from src.core.rueda_temporizadores import RuedaTemporizadores
+
+logger = logging.getLogger("voltrace")
+
+
+class TurnoAgendado:
+    __slots__ = ("id_sala", "nombre_bot", "vence", "temporizador", "cancelado")
+
+    def __init__(self, id_sala, nombre_bot, vence):
+        self.id_sala = id_sala
+        self.nombre_bot = nombre_bot
+        self.vence = vence
+        self.temporizador = None
+        self.cancelado = False
+
+
+class PlanificadorBots:
+    def __init__(
+        self,
+        ejecutar_turno,
+        iniciar_tarea,
+        dormir,
+        max_workers=4,
+        retardo_turno=2.0,
+        resolucion=0.1,
+        umbral_lag_hub=0.25,
+        max_listos=64,
+        reloj=time.monotonic,
+        rueda=None,
+    ):
+        self.ejecutar_turno = ejecutar_turno
+        self.iniciar_tarea = iniciar_tarea
+        self.dormir = dormir
+        self.max_workers = max_workers
+        self.retardo_turno = retardo_turno
+        self.resolucion = resolucion
+        self.umbral_lag_hub = umbral_lag_hub
+        self.max_listos = max_listos
+        self.reloj = reloj
+
+        # Sin rueda compartida (ej. tests) usa una propia, avanzada a mano
+        self.rueda = rueda or RuedaTemporizadores(resolucion=resolucion, reloj=reloj)
+        self._pendientes = {}  # id_sala -> TurnoAgendado
+        self._listos = deque()
+        self._iniciado = False
+
+        # Métricas
+        self._workers_activos = 0
+        self._turnos_ejecutados = 0
+        self._turnos_fallidos = 0
+        self._lag_turno_ewma = 0.0
+        self._lag_turno_max = 0.0
+
+    # --- API pública ---
+
+    # Agenda el turno del bot; reemplaza cualquier turno pendiente de la sala.
+    def programar(self, id_sala, nombre_bot, retardo=None):
+        self.cancelar(id_sala)
+        if retardo is None:
+            retardo = self.retardo_turno * self.factor_presion()
+        turno = TurnoAgendado(id_sala, nombre_bot, self.reloj() + retardo)
+        if retardo <= 0:
+            # Sin pausa (salas en fast-forward): directo al final de la cola
+            # de listos, así sigue respetando el round-robin entre salas.
+            self._listos.append(turno)
+        else:
+            turno.temporizador = self.rueda.agendar(retardo, self._listos.append, turno)
+        self._pendientes[id_sala] = turno
+        self.iniciar()
+        return turno
+
+    def cancelar(self, id_sala):
+        turno = self._pendientes.pop(id_sala, None)
+        if turno is None:
+            return False
+        turno.cancelado = True
+        self.rueda.cancelar(turno.temporizador)
+        return True
+
+    def tiene_turno_pendiente(self, id_sala):
+        return id_sala in self._pendientes
+
+    # Multiplicador de espera (1.0 = normal) según la carga del hub.
+    def factor_presion(self):
+        factor = 1.0
+        lag_hub = self.rueda.lag_ewma
+        if lag_hub > self.umbral_lag_hub:
+            factor += lag_hub / self.umbral_lag_hub
+        if len(self._listos) > self.max_listos:
+            factor += len(self._listos) / self.max_listos
+        return min(factor, 8.0)
+
+    def obtener_metricas(self):
+        return {
+            "turnos_agendados": len(self._pendientes),
+            "cola_listos": len(self._listos),
+            "workers_activos": self._workers_activos,
+            "max_workers": self.max_workers,
+            "turnos_ejecutados": self._turnos_ejecutados,
+            "turnos_fallidos": self._turnos_fallidos,
+            "lag_turno_ms": round(self._lag_turno_ewma * 1000, 1),
+            "lag_turno_max_ms": round(self._lag_turno_max * 1000, 1),
+            "lag_hub_ms": round(self.rueda.lag_ewma * 1000, 1),
+            "factor_presion": round(self.factor_presion(), 2),
+        }
+
+    # --- Ticker y workers ---
+
+    def iniciar(self):
+        if self._iniciado:
+            return
+        self._iniciado = True
+        self.rueda.iniciar()
+        for _ in range(self.max_workers):
+            self.iniciar_tarea(self._bucle_worker)
+        logger.info(f"Planificador de bots iniciado ({self.max_workers} workers)")
+
+    # Mueve a la cola de listos los turnos vencidos hasta 'ahora' (la rueda
+    # compartida ya lo hace sola con su ticker).
+    def avanzar(self, ahora=None):
+        self.rueda.avanzar(ahora)
+
+    # Ejecuta el siguiente turno listo. Devuelve False si no había ninguno.
+    def ejecutar_siguiente(self):
+        while self._listos:
+            turno = self._listos.popleft()
+            if turno.cancelado or self._pendientes.get(turno.id_sala) is not turno:
+                continue
+            del self._pendientes[turno.id_sala]
+
+            lag = max(0.0, self.reloj() - turno.vence)
+            self._lag_turno_ewma = 0.9 * self._lag_turno_ewma + 0.1 * lag
+            self._lag_turno_max = max(self._lag_turno_max, lag)
+
+            self._workers_activos += 1
+            try:
+                self.ejecutar_turno(turno.id_sala, turno.nombre_bot)
+                self._turnos_ejecutados += 1
+            except Exception as e:
+                self._turnos_fallidos += 1
+                logger.error(
+                    f"Error en turno de {turno.nombre_bot} (sala {turno.id_sala}): {e}",
+                    exc_info=True,
+                )
+            finally:
+                self._workers_activos -= 1
+            return True
+        return False
+
+    def _bucle_worker(self):
+        while True:
+            if not self.ejecutar_siguiente():
+                self.dormir(self.resolucion)
+            else:
+                # Ceder el hub entre turnos para el resto de salas
+                self.dormir(0)
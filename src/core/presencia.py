@@ -0,0 +1,140 @@
+# ===================================================================
+# REGISTRO DE PRESENCIA - VOLTRACE (presencia.py)
+# ===================================================================
+#
+# Estado de conexión de cada usuario (online, in_lobby, in_game,
+# offline) y sus datos extra (sid, room_id...), para SocialSystem.
+#
+# - Cada registro usa __slots__ y guarda la última vez visto como un
+#   float de time.monotonic (sin formatear ni parsear fechas): leer un
+#   estado es una consulta a un dict.
+# - Vencimiento proactivo: un heap de (vence, username) con una sola
+#   entrada por usuario conectado. Un latido solo mueve 'visto'; al
+#   sacar una entrada vencida del heap, si el usuario latió después se
+#   vuelve a meter con su nuevo vencimiento y, si no, pasa a offline y se
+#   devuelve UNA vez para avisar a sus amigos. Quien llama a 'vencidos'
+#   (el servidor, cada pocos segundos) hace el aviso.
+#
+# Como los demás módulos de core, no conoce Socket.IO.
+#
+# ===================================================================
+
+import heapq
+import logging
+import threading
+import time
+
+logger = logging.getLogger("voltrace")
+
+OFFLINE = "offline"
+
+
+class _Presencia:
+    __slots__ = ("status", "visto", "extra_data", "en_heap")
+
+    def __init__(self):
+        self.status = OFFLINE
+        self.visto = 0.0
+        self.extra_data = None
+        self.en_heap = False
+
+
+class RegistroPresencia:
+    def __init__(self, ttl=60, reloj=time.monotonic):
+        self.ttl = ttl
+        self.reloj = reloj
+        self._registros = {}  # username -> _Presencia
+        self._heap = []  # (vence, username); una entrada por conectado
+        self._lock = threading.Lock()
+
+        # Métricas
+        self._latidos = 0
+        self._vencidos = 0
+
+    # Cambia el estado. 'extra_data' reemplaza al anterior; al pasar a
+    # offline sin extra_data se borra (el sid ya no sirve).
+    def actualizar(self, username, status, extra_data=None):
+        with self._lock:
+            registro = self._registros.get(username)
+            if registro is None:
+                registro = self._registros[username] = _Presencia()
+            registro.status = status
+            registro.visto = self.reloj()
+            if extra_data:
+                registro.extra_data = extra_data
+            elif status == OFFLINE:
+                registro.extra_data = None
+            if status != OFFLINE:
+                self._programar(username, registro)
+
+    # Latido del cliente: solo refresca 'visto' (no revive a quien ya
+    # venció). Devuelve False si el usuario está offline.
+    def latido(self, username, sid=None):
+        with self._lock:
+            registro = self._registros.get(username)
+            if registro is None or registro.status == OFFLINE:
+                return False
+            registro.visto = self.reloj()
+            if sid:
+                if registro.extra_data is None:
+                    registro.extra_data = {}
+                registro.extra_data["sid"] = sid
+            self._latidos += 1
+            return True
+
+    def estado(self, username):
+        registro = self._registros.get(username)
+        return registro.status if registro else OFFLINE
+
+    def extra_data(self, username):
+        registro = self._registros.get(username)
+        return (registro.extra_data or {}) if registro else {}
+
+    def sid(self, username):
+        return self.extra_data(username).get("sid")
+
+    # Pasa a offline a quienes no latieron en 'ttl' segundos y los
+    # devuelve (cada vencimiento sale una sola vez). Conservan el sid:
+    # el socket puede seguir abierto.
+    def vencidos(self, ahora=None):
+        ahora = self.reloj() if ahora is None else ahora
+        vencidos = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= ahora:
+                _, username = heapq.heappop(self._heap)
+                registro = self._registros.get(username)
+                if registro is None:
+                    continue
+                registro.en_heap = False
+                if registro.status == OFFLINE:
+                    continue
+                if registro.visto + self.ttl > ahora:
+                    self._programar(username, registro)
+                    continue
+                registro.status = OFFLINE
+                vencidos.append(username)
+            self._vencidos += len(vencidos)
+        if vencidos:
+            logger.info(
+                f"PRESENCIA: {len(vencidos)} usuarios sin latido pasan a offline."
+            )
+        return vencidos
+
+    # Usuarios con un vencimiento pendiente (conectados).
+    def pendientes(self):
+        return len(self._heap)
+
+    def obtener_metricas(self):
+        return {
+            "usuarios": len(self._registros),
+            "conectados": len(self._heap),
+            "latidos": self._latidos,
+            "vencidos": self._vencidos,
+        }
+
+    # Con el lock tomado. Si ya tiene entrada, 'vencidos' la reprograma
+    # cuando llegue (no se duplica por cada latido).
+    def _programar(self, username, registro):
+        if not registro.en_heap:
+            heapq.heappush(self._heap, (registro.visto + self.ttl, username))
+            registro.en_heap = True
@@ -0,0 +1,124 @@
+# ===================================================================
+# PROYECCIÓN DE ESTADO POR SALA - VOLTRACE (proyeccion_estado.py)
+# ===================================================================
+#
+# Cada sala tiene una única proyección de su estado público:
+#
+# - delta():    proyecta el motor una vez por acción, registra la nueva
+#               versión (ver estado_sync.py) y codifica el delta a JSON
+#               una sola vez.
+# - completo(): estado completo de la versión actual, codificado una vez
+#               por versión y reutilizado por todos los que lo pidan
+#               (inicio de partida, espectadores, resincronizaciones).
+#
+# Lo codificado viaja como JSONCrudo: JsonSocketIO (el módulo json que se
+# pasa a SocketIO(app, json=...)) lo inserta tal cual en el paquete, así
+# Socket.IO no vuelve a serializar el estado por cada destinatario. Lo
+# privado de cada emit (ej. 'habilidad_usada_privada') va en los demás
+# campos del payload, encima del estado compartido.
+#
+# ===================================================================
+
+import json
+import secrets
+
+from src.core.estado_sync import SincronizadorEstado
+
+
+class JSONCrudo:
+    """
+    Fragmento JSON ya codificado. Conserva los datos originales para los
+    clientes que negociaron otra codificación (ver codec_binario.py).
+    """
+
+    __slots__ = ("texto", "datos")
+
+    def __init__(self, texto, datos=None):
+        self.texto = texto
+        self.datos = datos
+
+    @classmethod
+    def codificar(cls, datos):
+        return cls(json.dumps(datos, separators=(",", ":")), datos)
+
+    def __len__(self):
+        return len(self.texto)
+
+
+# Marca aleatoria por proceso: nunca sale del servidor (siempre se
+# reemplaza), así un texto de usuario no puede imitar un fragmento.
+_MARCA = secrets.token_hex(8)
+
+
+class JsonSocketIO:
+    """
+    Módulo json para Socket.IO (dumps/loads compatibles con la stdlib)
+    que inserta los JSONCrudo sin volver a serializarlos.
+    """
+
+    @staticmethod
+    def dumps(obj, **kwargs):
+        crudos = []
+
+        def insertar(valor):
+            if not isinstance(valor, JSONCrudo):
+                raise TypeError(
+                    f"Object of type {type(valor).__name__} is not JSON serializable"
+                )
+            crudos.append(valor.texto)
+            return f"\x00{_MARCA}:{len(crudos) - 1}"
+
+        texto = json.dumps(obj, default=insertar, **kwargs)
+        for i, crudo in enumerate(crudos):
+            texto = texto.replace(f'"\\u0000{_MARCA}:{i}"', crudo, 1)
+        return texto
+
+    loads = staticmethod(json.loads)
+
+
+class ProyeccionSala:
+    def __init__(self, construir, extras_completo=None):
+        self.construir = construir  # () -> estado público del motor
+        self.extras_completo = extras_completo  # () -> campos solo del completo
+        self.sync = SincronizadorEstado()
+        self._completo = None  # (versión, JSONCrudo)
+
+        # Métricas
+        self.deltas_codificados = 0
+        self.completos_codificados = 0
+        self.completos_reutilizados = 0
+
+    @property
+    def version(self):
+        return self.sync.version
+
+    # Proyecta el estado actual y devuelve el delta ya codificado.
+    def delta(self):
+        delta = self.sync.registrar(self.construir())
+        self.deltas_codificados += 1
+        return JSONCrudo.codificar(delta)
+
+    # Estado completo de la versión actual (con 'version'), codificado una
+    # sola vez por versión.
+    def completo(self):
+        if self.sync.version == 0:
+            self.sync.registrar(self.construir())
+        if self._completo is not None and self._completo[0] == self.sync.version:
+            self.completos_reutilizados += 1
+            return self._completo[1]
+
+        estado = self.sync.vista()
+        estado["version"] = self.sync.version
+        if self.extras_completo:
+            estado.update(self.extras_completo())
+        self._completo = (self.sync.version, JSONCrudo.codificar(estado))
+        self.completos_codificados += 1
+        return self._completo[1]
+
+    def obtener_metricas(self):
+        return {
+            "version": self.sync.version,
+            "deltas_codificados": self.deltas_codificados,
+            "completos_codificados": self.completos_codificados,
+            "completos_reutilizados": self.completos_reutilizados,
+        }
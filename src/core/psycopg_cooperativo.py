@@ -0,0 +1,53 @@
+# ===================================================================
+# PSYCOPG2 COOPERATIVO CON EVENTLET - VOLTRACE (psycopg_cooperativo.py)
+# ===================================================================
+#
+# Los workers de EjecutorDB (y los handlers de Socket.IO) son green
+# threads de eventlet: comparten un solo hilo del sistema operativo.
+# psycopg2 es una extensión en C que espera la respuesta del servidor
+# dentro de libpq, así que una consulta lenta congela el hub entero
+# (timers, emits, turnos de bots) hasta que termina.
+#
+# Con un "wait callback" psycopg2 trabaja en modo asíncrono y, en vez de
+# bloquear, le pregunta a Python cómo esperar: acá la espera es un
+# trampoline sobre el socket de la conexión, que cede el hub hasta que
+# haya datos. Es lo mismo que hace psycogreen, sin sumar la dependencia.
+#
+# SQLite (desarrollo local) no tiene nada equivalente: sus consultas
+# siguen siendo bloqueantes, pero son locales y cortas.
+#
+# ===================================================================
+
+import logging
+
+from eventlet import patcher
+from eventlet.hubs import trampoline
+from psycopg2 import OperationalError, extensions
+
+logger = logging.getLogger("voltrace")
+
+
+# Wait callback de psycopg2: sondea la conexión y cede el hub mientras
+# libpq espera leer o escribir en el socket.
+def espera_cooperativa(conexion, timeout=None):
+    while True:
+        estado = conexion.poll()
+        if estado == extensions.POLL_OK:
+            return
+        if estado == extensions.POLL_READ:
+            trampoline(conexion.fileno(), read=True)
+        elif estado == extensions.POLL_WRITE:
+            trampoline(conexion.fileno(), write=True)
+        else:
+            raise OperationalError(f"Estado de poll inesperado: {estado}")
+
+
+# Instala el wait callback para todas las conexiones psycopg2 del
+# proceso. Devuelve False si eventlet no parcheó los sockets (ej. con
+# 'flask run'): ahí no hay hub que ceder.
+def activar():
+    if not patcher.is_monkey_patched("socket"):
+        return False
+    extensions.set_wait_callback(espera_cooperativa)
+    logger.info("psycopg2 en modo cooperativo: las consultas ceden el hub.")
+    return True
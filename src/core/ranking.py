@@ -0,0 +1,341 @@
+# ===================================================================
+# RANKINGS MATERIALIZADOS - VOLTRACE (ranking.py)
+# ===================================================================
+#
+# Rankings en memoria, para no ejecutar un ORDER BY en cada consulta:
+#
+# - RankingMaterializado: ranking global (nivel desc, XP desc) de
+#   /leaderboard y del top 5 que ven todos los clientes del lobby. Si
+#   cambia el top 5, llama a 'al_cambiar_top' con la nueva lista (el
+#   servidor la empuja a los clientes en vez de que la pidan).
+# - RankingsMaestria: un ranking por kit según la XP de maestría
+#   (UserKitMaestria), para el Arsenal.
+#
+# Ambos usan una skip list indexable (cada enlace guarda cuántas
+# posiciones salta): insertar, quitar y obtener la posición de un jugador
+# o el jugador de una posición son O(log n). top(n) y vecinos(username)
+# recorren solo lo que devuelven.
+#
+# Se cargan al arrancar con una consulta y después se actualizan con cada
+# cambio ya confirmado (update_xp_and_level y la escritura de fin de
+# partida). Reciben valores absolutos: repetir una actualización o
+# aplicarla tarde no desordena nada.
+#
+# Como los demás módulos de core, no conocen Socket.IO ni la DB.
+#
+# ===================================================================
+
+import random
+import logging
+import threading
+
+logger = logging.getLogger("voltrace")
+
+TAMANO_TOP = 5
+
+
+class _Nodo:
+    __slots__ = ("clave", "datos", "siguientes", "anchos")
+
+    def __init__(self, clave, datos, niveles):
+        self.clave = clave
+        self.datos = datos
+        self.siguientes = [None] * niveles
+        self.anchos = [0] * niveles
+
+
+# Skip list indexable ordenada por 'clave' (tuplas sin repetir). No es
+# thread-safe: la protege el ranking que la usa.
+class _ListaOrdenada:
+    def __init__(self, azar, max_niveles=24):
+        self.max_niveles = max_niveles
+        self._azar = azar
+        self._fin = _Nodo(None, None, 0)
+        self._cabeza = _Nodo(None, None, max_niveles)
+        self._cabeza.siguientes = [self._fin] * max_niveles
+        self._cabeza.anchos = [1] * max_niveles
+        self._tamano = 0
+
+    def __len__(self):
+        return self._tamano
+
+    def insertar(self, clave, datos):
+        anteriores = [None] * self.max_niveles
+        pasos_en_nivel = [0] * self.max_niveles
+        nodo = self._cabeza
+        for nivel in reversed(range(self.max_niveles)):
+            siguiente = nodo.siguientes[nivel]
+            while siguiente is not self._fin and siguiente.clave < clave:
+                pasos_en_nivel[nivel] += nodo.anchos[nivel]
+                nodo = siguiente
+                siguiente = nodo.siguientes[nivel]
+            anteriores[nivel] = nodo
+
+        niveles = 1
+        while niveles < self.max_niveles and self._azar.random() < 0.5:
+            niveles += 1
+        nuevo = _Nodo(clave, datos, niveles)
+        pasos = 0
+        for nivel in range(niveles):
+            previo = anteriores[nivel]
+            nuevo.siguientes[nivel] = previo.siguientes[nivel]
+            previo.siguientes[nivel] = nuevo
+            nuevo.anchos[nivel] = previo.anchos[nivel] - pasos
+            previo.anchos[nivel] = pasos + 1
+            pasos += pasos_en_nivel[nivel]
+        for nivel in range(niveles, self.max_niveles):
+            anteriores[nivel].anchos[nivel] += 1
+        self._tamano += 1
+
+    # Saca una clave presente y devuelve sus datos.
+    def quitar(self, clave):
+        anteriores = [None] * self.max_niveles
+        nodo = self._cabeza
+        for nivel in reversed(range(self.max_niveles)):
+            siguiente = nodo.siguientes[nivel]
+            while siguiente is not self._fin and siguiente.clave < clave:
+                nodo = siguiente
+                siguiente = nodo.siguientes[nivel]
+            anteriores[nivel] = nodo
+
+        objetivo = anteriores[0].siguientes[0]
+        for nivel in range(len(objetivo.siguientes)):
+            previo = anteriores[nivel]
+            previo.anchos[nivel] += objetivo.anchos[nivel] - 1
+            previo.siguientes[nivel] = objetivo.siguientes[nivel]
+        for nivel in range(len(objetivo.siguientes), self.max_niveles):
+            anteriores[nivel].anchos[nivel] -= 1
+        self._tamano -= 1
+        return objetivo.datos
+
+    # Índice (desde 0) de una clave presente en la lista.
+    def indice(self, clave):
+        indice = 0
+        nodo = self._cabeza
+        for nivel in reversed(range(self.max_niveles)):
+            siguiente = nodo.siguientes[nivel]
+            while siguiente is not self._fin and siguiente.clave < clave:
+                indice += nodo.anchos[nivel]
+                nodo = siguiente
+                siguiente = nodo.siguientes[nivel]
+        return indice
+
+    # Hasta 'n' datos (copias) a partir del índice 'desde'.
+    def rango(self, desde, n):
+        resultado = []
+        if desde >= self._tamano:
+            return resultado
+        restante = desde + 1
+        nodo = self._cabeza
+        for nivel in reversed(range(self.max_niveles)):
+            while nodo.anchos[nivel] <= restante:
+                restante -= nodo.anchos[nivel]
+                nodo = nodo.siguientes[nivel]
+        while nodo is not self._fin and len(resultado) < n:
+            resultado.append(dict(nodo.datos))
+            nodo = nodo.siguientes[0]
+        return resultado
+
+
+class RankingMaterializado:
+    def __init__(self, al_cambiar_top=None, max_niveles=24, semilla=None):
+        self.al_cambiar_top = al_cambiar_top
+        self.max_niveles = max_niveles
+        self._azar = random.Random(semilla)
+        self._lock = threading.RLock()
+        self._vaciar()
+
+        # Métricas
+        self._actualizaciones = 0
+        self._cambios_top = 0
+
+    def _vaciar(self):
+        self._lista = _ListaOrdenada(self._azar, self.max_niveles)
+        self._claves = {}  # username -> clave actual en la lista
+
+    # Orden del ranking: nivel y XP descendentes; a igualdad, por nombre.
+    @staticmethod
+    def _clave(username, level, xp):
+        return (-(level or 1), -(xp or 0), username)
+
+    def __len__(self):
+        return len(self._claves)
+
+    # filas: iterable de (username, level, xp, games_played, games_won)
+    def cargar(self, filas):
+        with self._lock:
+            self._vaciar()
+            for username, level, xp, games_played, games_won in filas:
+                self._insertar(username, level, xp, games_played, games_won)
+        logger.info(f"RANKING: {len(self._claves)} jugadores cargados en memoria.")
+
+    # Pone al jugador en su lugar según los valores nuevos. Los None se
+    # conservan del registro anterior. Devuelve True si cambió el top.
+    def actualizar(self, username, level, xp, games_played=None, games_won=None):
+        return self.actualizar_lote([(username, level, xp, games_played, games_won)])
+
+    def actualizar_lote(self, filas):
+        with self._lock:
+            top_antes = self._lista.rango(0, TAMANO_TOP)
+            for username, level, xp, games_played, games_won in filas:
+                anterior = self._quitar(username)
+                if anterior:
+                    if games_played is None:
+                        games_played = anterior["games_played"]
+                    if games_won is None:
+                        games_won = anterior["games_won"]
+                self._insertar(username, level, xp, games_played, games_won)
+                self._actualizaciones += 1
+            top = self._lista.rango(0, TAMANO_TOP)
+            cambio = top != top_antes
+            if cambio:
+                self._cambios_top += 1
+
+        # Fuera del lock: el aviso puede emitir por red
+        if cambio and self.al_cambiar_top:
+            try:
+                self.al_cambiar_top(top)
+            except Exception as e:
+                logger.error(f"RANKING: error al avisar cambio de top: {e}")
+        return cambio
+
+    def eliminar(self, username):
+        with self._lock:
+            return self._quitar(username) is not None
+
+    def top(self, n):
+        with self._lock:
+            return self._lista.rango(0, n)
+
+    # Posición (desde 1) del jugador, o None si no está.
+    def posicion(self, username):
+        with self._lock:
+            clave = self._claves.get(username)
+            if clave is None:
+                return None
+            return self._lista.indice(clave) + 1
+
+    # Nivel actual del jugador, o None si no está (lo usa la lista de
+    # amigos del sistema social).
+    def nivel(self, username):
+        with self._lock:
+            clave = self._claves.get(username)
+            return None if clave is None else -clave[0]
+
+    # Posición del jugador y los 'radio' que tiene arriba y abajo.
+    def vecinos(self, username, radio=2):
+        with self._lock:
+            clave = self._claves.get(username)
+            if clave is None:
+                return None
+            indice = self._lista.indice(clave)
+            desde = max(0, indice - radio)
+            jugadores = self._lista.rango(desde, indice - desde + radio + 1)
+            for numero, jugador in enumerate(jugadores, start=desde + 1):
+                jugador["posicion"] = numero
+            return {"posicion": indice + 1, "jugadores": jugadores}
+
+    def obtener_metricas(self):
+        return {
+            "jugadores": len(self._claves),
+            "actualizaciones": self._actualizaciones,
+            "cambios_top": self._cambios_top,
+        }
+
+    # --- Llamar con el lock tomado ---
+
+    def _insertar(self, username, level, xp, games_played, games_won):
+        clave = self._clave(username, level, xp)
+        self._lista.insertar(
+            clave,
+            {
+                "username": username,
+                "level": level,
+                "xp": xp,
+                "games_played": games_played,
+                "games_won": games_won,
+            },
+        )
+        self._claves[username] = clave
+
+    # Saca al jugador y devuelve sus datos (None si no estaba).
+    def _quitar(self, username):
+        clave = self._claves.pop(username, None)
+        if clave is None:
+            return None
+        return self._lista.quitar(clave)
+
+
+class RankingsMaestria:
+    def __init__(self, max_niveles=24, semilla=None):
+        self.max_niveles = max_niveles
+        self._azar = random.Random(semilla)
+        self._lock = threading.RLock()
+        self._listas = {}  # kit_id -> _ListaOrdenada
+        self._claves = {}  # (kit_id, username) -> clave actual
+        self._actualizaciones = 0
+
+    # Orden por kit: XP de maestría descendente; a igualdad, por nombre.
+    @staticmethod
+    def _clave(username, xp):
+        return (-(xp or 0), username)
+
+    # Reconstrucción en frío. filas: iterable de (kit_id, username, xp)
+    # (la consulta ordenada por kit y XP usa el índice 'ix_maestria_kit_xp').
+    def cargar(self, filas):
+        with self._lock:
+            self._listas = {}
+            self._claves = {}
+            for kit_id, username, xp in filas:
+                self._poner(kit_id, username, xp)
+        logger.info(
+            f"RANKING MAESTRÍA: {len(self._claves)} maestrías en {len(self._listas)} kits cargadas en memoria."
+        )
+
+    # filas: iterable de (kit_id, username, xp total ya confirmada)
+    def actualizar_lote(self, filas):
+        with self._lock:
+            for kit_id, username, xp in filas:
+                self._poner(kit_id, username, xp)
+                self._actualizaciones += 1
+
+    def top(self, kit_id, n):
+        with self._lock:
+            lista = self._listas.get(kit_id)
+            if lista is None:
+                return []
+            jugadores = lista.rango(0, n)
+            for numero, jugador in enumerate(jugadores, start=1):
+                jugador["posicion"] = numero
+            return jugadores
+
+    # {"posicion", "xp", "jugadores"} del jugador en el kit, o None.
+    def posicion(self, kit_id, username):
+        with self._lock:
+            clave = self._claves.get((kit_id, username))
+            if clave is None:
+                return None
+            lista = self._listas[kit_id]
+            return {
+                "posicion": lista.indice(clave) + 1,
+                "xp": -clave[0],
+                "jugadores": len(lista),
+            }
+
+    def obtener_metricas(self):
+        return {
+            "kits": len(self._listas),
+            "maestrias": len(self._claves),
+            "actualizaciones": self._actualizaciones,
+        }
+
+    def _poner(self, kit_id, username, xp):
+        lista = self._listas.get(kit_id)
+        if lista is None:
+            lista = self._listas[kit_id] = _ListaOrdenada(self._azar, self.max_niveles)
+        anterior = self._claves.get((kit_id, username))
+        if anterior is not None:
+            lista.quitar(anterior)
+        clave = self._clave(username, xp)
+        lista.insertar(clave, {"username": username, "xp": xp or 0})
+        self._claves[(kit_id, username)] = clave
@@ -0,0 +1,212 @@
+# ===================================================================
+# RUEDA JERÁRQUICA DE TEMPORIZADORES - VOLTRACE (rueda_temporizadores.py)
+# ===================================================================
+#
+# Un solo planificador para todos los vencimientos del servidor (timeout
+# de turno, ventana de revancha, expiración de invitaciones y ritmo de
+# los bots), en vez de un threading.Timer (hilo/greenlet) por cada uno.
+#
+# - 'niveles' ruedas de 2**bits ranuras. El nivel 0 avanza una ranura por
+#   tick ('resolucion' segundos); cada ranura del nivel k abarca una
+#   vuelta completa del nivel k-1. Con los valores por defecto (0.1 s,
+#   64 ranuras, 4 niveles) cubre ~19 días; lo que excede va a una lista
+#   de desborde que se reubica al dar la vuelta el último nivel.
+# - agendar y cancelar son O(1): cada ranura es un dict ordenado y el
+#   temporizador recuerda en cuál está.
+# - Al llegar a una ranura de nivel k se reparten sus temporizadores en
+#   los niveles inferiores (cascada) antes de disparar el nivel 0.
+# - Un solo ticker la avanza y ejecuta los vencidos: deben ser rápidos.
+#   Lo que hace trabajo real se agenda envuelto en una tarea de fondo
+#   (ej. agendar(t, socketio.start_background_task, funcion, ...)).
+#
+# Como el planificador de bots, no conoce Socket.IO: recibe las funciones
+# para lanzar tareas y dormir.
+#
+# ===================================================================
+
+import time
+import logging
+
+logger = logging.getLogger("voltrace")
+
+
+class Temporizador:
+    __slots__ = ("tick", "funcion", "args", "kwargs", "cancelado", "_rueda", "_ranura")
+
+    def __init__(self, rueda, tick, funcion, args, kwargs):
+        self.tick = tick
+        self.funcion = funcion
+        self.args = args
+        self.kwargs = kwargs
+        self.cancelado = False
+        self._rueda = rueda
+        self._ranura = None
+
+    def cancelar(self):
+        return self._rueda.cancelar(self)
+
+    @property
+    def activo(self):
+        return not self.cancelado and self._ranura is not None
+
+
+class RuedaTemporizadores:
+    def __init__(
+        self,
+        iniciar_tarea=None,
+        dormir=None,
+        resolucion=0.1,
+        bits=6,
+        niveles=4,
+        reloj=time.monotonic,
+    ):
+        self.iniciar_tarea = iniciar_tarea
+        self.dormir = dormir
+        self.resolucion = resolucion
+        self.reloj = reloj
+
+        self._bits = bits
+        self._mascara = (1 << bits) - 1
+        self._ruedas = [[{} for _ in range(1 << bits)] for _ in range(niveles)]
+        self._desborde = {}
+        self._tick = self.tick_de(reloj())
+        self._pendientes = 0
+        self._iniciado = False
+
+        # Métricas
+        self._agendados = 0
+        self._cancelados = 0
+        self._disparados = 0
+        self._fallidos = 0
+        self._lag_ewma = 0.0
+
+    def tick_de(self, instante):
+        return int(instante / self.resolucion)
+
+    # --- API pública ---
+
+    # Ejecuta funcion(*args, **kwargs) dentro de 'retardo' segundos.
+    def agendar(self, retardo, funcion, *args, **kwargs):
+        # Nunca en el tick actual: ya se procesó
+        tick = max(self.tick_de(self.reloj() + retardo), self._tick + 1)
+        temporizador = Temporizador(self, tick, funcion, args, kwargs)
+        self._insertar(temporizador)
+        self._pendientes += 1
+        self._agendados += 1
+        self.iniciar()
+        return temporizador
+
+    def cancelar(self, temporizador):
+        if temporizador is None or temporizador._ranura is None:
+            return False
+        del temporizador._ranura[temporizador]
+        temporizador._ranura = None
+        temporizador.cancelado = True
+        self._pendientes -= 1
+        self._cancelados += 1
+        return True
+
+    @property
+    def pendientes(self):
+        return self._pendientes
+
+    # Atraso medio del ticker respecto a su período (carga del hub).
+    @property
+    def lag_ewma(self):
+        return self._lag_ewma
+
+    def obtener_metricas(self):
+        return {
+            "pendientes": self._pendientes,
+            "agendados": self._agendados,
+            "cancelados": self._cancelados,
+            "disparados": self._disparados,
+            "fallidos": self._fallidos,
+            "lag_ms": round(self._lag_ewma * 1000, 1),
+        }
+
+    # --- Rueda ---
+
+    def _insertar(self, temporizador):
+        tick = temporizador.tick
+        for nivel, ranuras in enumerate(self._ruedas):
+            desplazamiento = self._bits * (nivel + 1)
+            # Nivel más bajo en el que 'tick' cae dentro de la vuelta actual
+            if tick >> desplazamiento == self._tick >> desplazamiento:
+                indice = (tick >> (self._bits * nivel)) & self._mascara
+                ranura = ranuras[indice]
+                break
+        else:
+            ranura = self._desborde
+        ranura[temporizador] = None
+        temporizador._ranura = ranura
+
+    # Reparte una ranura de nivel superior (o el desborde) en la rueda.
+    def _cascada(self, ranura):
+        temporizadores = list(ranura)
+        ranura.clear()
+        for temporizador in temporizadores:
+            self._insertar(temporizador)
+
+    # Avanza la rueda hasta 'ahora' y dispara lo vencido. Devuelve cuántos.
+    def avanzar(self, ahora=None):
+        ahora = self.reloj() if ahora is None else ahora
+        tick_objetivo = self.tick_de(ahora)
+        disparados = 0
+        while self._tick < tick_objetivo:
+            if not self._pendientes:
+                self._tick = tick_objetivo
+                break
+            self._tick += 1
+            tick = self._tick
+            # Cascadas de arriba hacia abajo: lo que baja del nivel k puede
+            # caer en la ranura del nivel k-1 que toca repartir ahora
+            if tick & ((1 << (self._bits * len(self._ruedas))) - 1) == 0:
+                self._cascada(self._desborde)
+            for nivel in range(len(self._ruedas) - 1, 0, -1):
+                if tick & ((1 << (self._bits * nivel)) - 1) == 0:
+                    indice = (tick >> (self._bits * nivel)) & self._mascara
+                    self._cascada(self._ruedas[nivel][indice])
+            ranura = self._ruedas[0][tick & self._mascara]
+            if ranura:
+                disparados += self._disparar(ranura)
+        return disparados
+
+    def _disparar(self, ranura):
+        vencidos = list(ranura)
+        ranura.clear()
+        for temporizador in vencidos:
+            temporizador._ranura = None
+            self._pendientes -= 1
+            self._disparados += 1
+            try:
+                temporizador.funcion(*temporizador.args, **temporizador.kwargs)
+            except Exception as e:
+                self._fallidos += 1
+                logger.error(f"Error en temporizador vencido: {e}", exc_info=True)
+        return len(vencidos)
+
+    # --- Ticker ---
+
+    def iniciar(self):
+        if self._iniciado or self.iniciar_tarea is None:
+            return
+        self._iniciado = True
+        self.iniciar_tarea(self._bucle_ticker)
+        logger.info("Rueda de temporizadores iniciada")
+
+    def _bucle_ticker(self):
+        esperado = self.reloj() + self.resolucion
+        while True:
+            self.dormir(self.resolucion)
+            ahora = self.reloj()
+            # Si el hub está saturado, el ticker despierta tarde
+            lag = max(0.0, ahora - esperado)
+            self._lag_ewma = 0.8 * self._lag_ewma + 0.2 * lag
+            esperado = ahora + self.resolucion
+            try:
+                self.avanzar(ahora)
+            except Exception as e:
+                logger.error(
+                    f"Error en el ticker de temporizadores: {e}", exc_info=True
+                )
@@ -0,0 +1,174 @@
+# ===================================================================
+# TEMPORADAS Y RANKINGS POR PERÍODO - VOLTRACE (temporadas.py)
+# ===================================================================
+#
+# Rankings diarios, semanales y de temporada (victorias, XP ganada y
+# partidas jugadas). 'User' solo guarda totales de toda la vida, así que:
+#
+# - ResultadoPartida: una fila por jugador y partida terminada (solo se
+#   agrega; es el historial fuente).
+# - ResumenPeriodo: totales por (período, inicio, usuario), sumados con
+#   un INSERT ... ON CONFLICT DO UPDATE en la misma transacción de fin de
+#   partida (ver fin_partida_db.py). Los rankings leen solo estas filas.
+# - compactar: cuando una temporada cierra, se borran su historial y sus
+#   resúmenes diarios/semanales; queda solo el resumen de la temporada.
+#
+# Períodos: 'dia' (fecha UTC), 'semana' (empieza el lunes) y 'temporada'
+# (MESES_POR_TEMPORADA meses desde enero).
+#
+# ===================================================================
+
+import logging
+from datetime import datetime, timedelta
+
+from src.models import (
+    db,
+    User,
+    ResultadoPartida,
+    ResumenPeriodo,
+    insert_con_conflicto,
+)
+from src.core.game_config import MESES_POR_TEMPORADA
+
+logger = logging.getLogger("voltrace")
+
+PERIODOS = ("dia", "semana", "temporada")
+METRICAS = ("games_won", "xp_ganada", "games_played")
+
+
+def inicio_semana(fecha):
+    return fecha - timedelta(days=fecha.weekday())
+
+
+def inicio_temporada(fecha):
+    mes = (fecha.month - 1) // MESES_POR_TEMPORADA * MESES_POR_TEMPORADA + 1
+    return fecha.replace(month=mes, day=1)
+
+
+# {periodo: primer día} de los períodos que contienen 'fecha'.
+def inicios_de_periodo(fecha):
+    return {
+        "dia": fecha,
+        "semana": inicio_semana(fecha),
+        "temporada": inicio_temporada(fecha),
+    }
+
+
+class EstadisticasTemporada:
+    def __init__(self, reloj=datetime.utcnow):
+        self.reloj = reloj
+
+        # Métricas
+        self._resultados = 0
+        self._consultas = 0
+        self._compactados = 0
+
+    # Agrega los resultados de una partida y suma sus resúmenes. Corre
+    # dentro de la transacción del llamador (no hace commit).
+    # resultados: [{"user_id", "kit_id", "ganador", "xp_ganada"}, ...]
+    def registrar(self, resultados):
+        if not resultados:
+            return
+        ahora = self.reloj()
+        conexion = db.session.connection()
+        conexion.execute(
+            ResultadoPartida.__table__.insert(),
+            [dict(r, jugada_en=ahora) for r in resultados],
+        )
+
+        tabla = ResumenPeriodo.__table__
+        filas = [
+            {
+                "periodo": periodo,
+                "inicio": inicio,
+                "user_id": r["user_id"],
+                "games_played": 1,
+                "games_won": 1 if r["ganador"] else 0,
+                "xp_ganada": r["xp_ganada"],
+            }
+            for r in resultados
+            for periodo, inicio in inicios_de_periodo(ahora.date()).items()
+        ]
+        sentencia = insert_con_conflicto(tabla).values(filas)
+        sentencia = sentencia.on_conflict_do_update(
+            index_elements=[tabla.c.periodo, tabla.c.inicio, tabla.c.user_id],
+            set_={
+                metrica: tabla.c[metrica] + sentencia.excluded[metrica]
+                for metrica in METRICAS
+            },
+        )
+        conexion.execute(sentencia)
+        self._resultados += len(resultados)
+
+    # Top 'n' del período que contiene 'fecha' (hoy por defecto), por
+    # 'metrica'. Solo lee resúmenes.
+    def ranking(self, periodo, metrica, n=10, fecha=None):
+        if periodo not in PERIODOS:
+            return {"error": f"Período inválido: {periodo}"}
+        if metrica not in METRICAS:
+            return {"error": f"Métrica inválida: {metrica}"}
+        self._consultas += 1
+        fecha = fecha or self.reloj().date()
+        inicio = inicios_de_periodo(fecha)[periodo]
+        columna = getattr(ResumenPeriodo, metrica)
+        filas = (
+            db.session.query(
+                User.username,
+                ResumenPeriodo.games_played,
+                ResumenPeriodo.games_won,
+                ResumenPeriodo.xp_ganada,
+            )
+            .join(User, User.id == ResumenPeriodo.user_id)
+            .filter(ResumenPeriodo.periodo == periodo, ResumenPeriodo.inicio == inicio)
+            .order_by(columna.desc(), User.username)
+            .limit(n)
+            .all()
+        )
+        return {
+            "periodo": periodo,
+            "inicio": inicio.isoformat(),
+            "metrica": metrica,
+            "jugadores": [
+                {
+                    "posicion": posicion,
+                    "username": fila.username,
+                    "games_played": fila.games_played,
+                    "games_won": fila.games_won,
+                    "xp_ganada": fila.xp_ganada,
+                }
+                for posicion, fila in enumerate(filas, start=1)
+            ],
+        }
+
+    # Borra el historial y los resúmenes diarios/semanales de temporadas
+    # ya cerradas. Idempotente: se puede correr seguido.
+    def compactar(self, hoy=None):
+        hoy = hoy or self.reloj().date()
+        corte = inicio_temporada(hoy)
+        resultados = ResultadoPartida.query.filter(
+            ResultadoPartida.jugada_en < datetime.combine(corte, datetime.min.time())
+        ).delete(synchronize_session=False)
+        # La semana en curso puede haber empezado antes que la temporada
+        resumenes = ResumenPeriodo.query.filter(
+            db.or_(
+                db.and_(ResumenPeriodo.periodo == "dia", ResumenPeriodo.inicio < corte),
+                db.and_(
+                    ResumenPeriodo.periodo == "semana",
+                    ResumenPeriodo.inicio < inicio_semana(corte),
+                ),
+            )
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        if resultados or resumenes:
+            self._compactados += resultados + resumenes
+            logger.info(
+                f"TEMPORADAS: compactadas temporadas anteriores a {corte} ({resultados} resultados, {resumenes} resúmenes)."
+            )
+        return {"resultados": resultados, "resumenes": resumenes}
+
+    def obtener_metricas(self):
+        return {
+            "resultados_registrados": self._resultados,
+            "consultas_ranking": self._consultas,
+            "filas_compactadas": self._compactados,
+        }
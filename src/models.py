@@ -14,6 +14,10 @@
 #   Achievement desbloqueado (relación N-a-N).
 # - Tablas de asociación: 'friendship' y 'friend_request' para
 #   el sistema social.
+# - ResultadoPartida: Registro (solo se agrega) del resultado de cada
+#   jugador en cada partida terminada.
+# - ResumenPeriodo: Totales por usuario de cada día, semana y temporada
+#   (rankings por período sin recorrer el historial).
 #
 # ===================================================================
 
@@ -21,6 +25,7 @@ from flask_login import UserMixin
 from itsdangerous import URLSafeTimedSerializer
 from flask import current_app
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.dialects import postgresql, sqlite
 from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
 
@@ -84,6 +89,10 @@ class User(db.Model, UserMixin):
     unique_login_days_count = db.Column(db.Integer, default=0)
     friends_count = db.Column(db.Integer, default=0, nullable=False)
 
+    # Concurrencia optimista: cada UPDATE exige la versión leída y la
+    # incrementa (StaleDataError si otra escritura se adelantó)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default="1")
+
     # --- Sistema Social (Amigos) ---
 
     # Amigos (Muchos-a-Muchos)
@@ -126,6 +135,7 @@ class User(db.Model, UserMixin):
     )
 
     __table_args__ = (db.Index("idx_user_level_xp", "level", "xp"),)
+    __mapper_args__ = {"version_id_col": version}
 
     def set_password(self, password):
         self.password_hash = generate_password_hash(password)
@@ -251,6 +261,14 @@ class UserKitMaestria(db.Model):
     level = db.Column(db.Integer, nullable=False, default=1)
     cosmetic_unlocked = db.Column(db.Boolean, nullable=False, default=False)
 
+    # Una fila por usuario y kit (destino del INSERT ... ON CONFLICT) y
+    # ranking por kit ordenado por XP (reconstrucción del ranking de
+    # maestría, ver core/ranking.py)
+    __table_args__ = (
+        db.Index("uq_maestria_usuario_kit", "user_id", "kit_id", unique=True),
+        db.Index("ix_maestria_kit_xp", "kit_id", "xp"),
+    )
+
     def __repr__(self):
         return f"<Maestria {self.user_id} - {self.kit_id}: XP {self.xp}>"
 
@@ -282,3 +300,52 @@ class Achievement(db.Model):
     xp_reward = db.Column(db.Integer, default=0)
 
     user_associations = db.relationship("UserAchievement", back_populates="achievement")
+
+
+class ResultadoPartida(db.Model):
+    __tablename__ = "resultado_partida"
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(
+        db.Integer, db.ForeignKey("user.id"), nullable=False, index=True
+    )
+    kit_id = db.Column(db.String(50), nullable=True)
+    ganador = db.Column(db.Boolean, nullable=False, default=False)
+    xp_ganada = db.Column(db.Integer, nullable=False, default=0)
+    # Índice: la compactación de temporadas borra por fecha
+    jugada_en = db.Column(
+        db.DateTime, nullable=False, default=datetime.utcnow, index=True
+    )
+
+    def __repr__(self):
+        return f"<ResultadoPartida {self.user_id} {self.jugada_en}>"
+
+
+class ResumenPeriodo(db.Model):
+    __tablename__ = "resumen_periodo"
+
+    id = db.Column(db.Integer, primary_key=True)
+    periodo = db.Column(db.String(10), nullable=False)  # dia, semana, temporada
+    inicio = db.Column(db.Date, nullable=False)  # Primer día del período
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    games_played = db.Column(db.Integer, nullable=False, default=0)
+    games_won = db.Column(db.Integer, nullable=False, default=0)
+    xp_ganada = db.Column(db.Integer, nullable=False, default=0)
+
+    # Una fila por período y usuario (destino del INSERT ... ON CONFLICT)
+    __table_args__ = (
+        db.Index(
+            "uq_resumen_periodo_usuario", "periodo", "inicio", "user_id", unique=True
+        ),
+    )
+
+    def __repr__(self):
+        return f"<ResumenPeriodo {self.periodo} {self.inicio} {self.user_id}>"
+
+
+# INSERT con ON CONFLICT del motor en uso (SQLite local, PostgreSQL en
+# producción).
+def insert_con_conflicto(tabla):
+    if db.session.get_bind().dialect.name == "postgresql":
+        return postgresql.insert(tabla)
+    return sqlite.insert(tabla)
@@ -15,29 +15,81 @@
 # - Invitaciones: Lógica para enviar y recibir invitaciones a salas
 #   entre amigos.
 #
+# Grafo de amistades en memoria: por usuario conectado se guardan sus
+# amigos y solicitudes (una consulta al primer uso). El aviso de
+# conexión/desconexión a los amigos y la lista de amigos se sirven de
+# ahí sin tocar la DB; enviar/aceptar/rechazar solicitudes y eliminar
+# amigos invalidan a los dos usuarios tras el commit. El nivel de los
+# amigos sale de 'nivel_de' (el ranking en memoria) si se inyecta.
+#
+# La presencia vive en un RegistroPresencia (core/presencia.py): estado
+# en memoria con vencimiento proactivo de quien deja de latir.
+#
+# Los usuarios se resuelven por CacheIdentidades (core/identidades.py):
+# username -> id en memoria, y las consultas trabajan por ID.
+#
+# Aceptar y eliminar amigos cambian 'friends_count' de los dos usuarios:
+# corren por los carriles de ambos (ver carriles_db.py), así un choque de
+# versión con un fin de partida o un logro se reintenta en vez de fallar.
+#
 # ===================================================================
 
 import json
 import os
 import logging
+import threading
+from collections import OrderedDict
 from datetime import datetime
 from typing import Dict, List, Optional, Tuple
-from src.models import db, User, Achievement, UserAchievement, PrivateMessage
-from sqlalchemy import func, case
-from sqlalchemy.orm import selectinload
+from src.models import (
+    db,
+    User,
+    Achievement,
+    UserAchievement,
+    PrivateMessage,
+    friendship,
+    friend_request,
+)
+from sqlalchemy import func, case, literal, select, union_all
+from sqlalchemy.orm import aliased, selectinload
+from src.core.presencia import RegistroPresencia
+from src.core.identidades import CacheIdentidades
 
 logger = logging.getLogger("voltrace")
 
 
 class SocialSystem:
+    # Vida de una invitación a sala (expira vía la rueda de temporizadores)
+    INVITATION_TTL_SECONDS = 600
 
-    def __init__(self):
-        self.presence_data = {}
+    def __init__(
+        self,
+        cache_size=2048,
+        nivel_de=None,
+        presence_ttl=60,
+        identidades=None,
+        carriles=None,
+    ):
+        self.presencia = RegistroPresencia(ttl=presence_ttl)
+        self.carriles = carriles
+        self.identidades = identidades or CacheIdentidades(nivel_de=nivel_de)
+        self.invitations = {}  # username -> [invitaciones recibidas]
+        self.nivel_de = nivel_de
+
+        # Grafo de amistades: username -> {"amigos": {username: nivel},
+        # "recibidas": [...], "enviadas": [...]}
+        self.cache_size = cache_size
+        self._grafo = OrderedDict()
+        self._grafo_lock = threading.Lock()
+        self._generacion = 0  # Sube con cada invalidación
+        self._grafo_hits = 0
+        self._grafo_misses = 0
 
     def send_friend_request(self, sender_username: str, target_username: str) -> Dict:
-        # Obtener los objetos User
-        sender = User.query.filter_by(username=sender_username).first()
-        target = User.query.filter_by(username=target_username).first()
+        # Identidades desde memoria; las relaciones, del grafo de amistades
+        usuarios = self.identidades.obtener_varios([sender_username, target_username])
+        sender = usuarios.get(sender_username)
+        target = usuarios.get(target_username)
 
         if not sender or not target:
             logger.warning(
@@ -54,43 +106,35 @@ class SocialSystem:
                 "message": "No puedes enviarte una solicitud a ti mismo.",
             }
 
-        if sender.is_friend(target):
+        grafo = self._friend_graph(sender_username)
+        if target_username in grafo["amigos"]:
             return {"success": False, "message": f"Ya eres amigo de {target_username}."}
 
-        if sender.has_sent_request_to(target):
+        if target_username in grafo["enviadas"]:
             return {
                 "success": False,
                 "message": f"Ya enviaste una solicitud a {target_username}.",
             }
 
-        if target.has_sent_request_to(sender):
+        if target_username in grafo["recibidas"]:
             return {
                 "success": False,
                 "message": f'{target_username} ya te envió una solicitud. Revísala en la pestaña "Solicitudes".',
             }
 
-        if target.has_sent_request_to(sender):
-            logger.info(
-                f"ACEPTACIÓN IMPLÍCITA: {sender_username} envió solicitud a {target_username}, coincidiendo con una existente. Aceptando automáticamente."
-            )
-            return self.accept_friend_request(
-                username=sender_username, friend_username=target_username
-            )
-
         try:
-            # Intentar crear la solicitud en la DB
-            if sender.send_friend_request(target):
-                db.session.commit()
-                return {
-                    "success": True,
-                    "message": f"Solicitud enviada a {target_username}.",
-                }
-            else:
-                # Esto solo debería pasar si alguna verificación falló inesperadamente
-                return {
-                    "success": False,
-                    "message": "No se pudo enviar la solicitud (error de lógica).",
-                }
+            # Crear la solicitud en la DB, por ID
+            db.session.execute(
+                friend_request.insert().values(
+                    sender_id=sender.id, receiver_id=target.id
+                )
+            )
+            db.session.commit()
+            self.invalidate_friends(sender_username, target_username)
+            return {
+                "success": True,
+                "message": f"Solicitud enviada a {target_username}.",
+            }
 
         except Exception as e:
             db.session.rollback()
@@ -104,6 +148,41 @@ class SocialSystem:
             }
 
     def accept_friend_request(self, username: str, friend_username: str) -> Dict:
+        try:
+            resultado = self._escribir(
+                [username, friend_username],
+                self._accept_friend_request_tx,
+                username,
+                friend_username,
+            )
+        except Exception as e:
+            db.session.rollback()
+            logger.error(
+                f"ERROR DB al aceptar solicitud entre {username} y {friend_username}: {e}",
+                exc_info=True,
+            )
+            return {"success": False, "message": "Error interno del servidor (DB)."}
+
+        if resultado["success"]:
+            self.invalidate_friends(username, friend_username)
+
+            # Notificación interna al EMISOR de la solicitud
+            self.update_user_presence(
+                friend_username,
+                "online",
+                {"new_friend": username, "type": "accepted"},
+            )
+            # Notificación interna al RECEPTOR de la solicitud
+            self.update_user_presence(
+                username,
+                "online",
+                {"new_friend": friend_username, "type": "accepted"},
+            )
+        return resultado
+
+    # Corre dentro de los carriles de ambos usuarios: relee todo en cada
+    # intento (un conflicto de versión lo repite entero).
+    def _accept_friend_request_tx(self, username, friend_username):
         # Obtener los objetos User
         user = User.query.filter_by(username=username).first()  # El receptor
         sender = User.query.filter_by(username=friend_username).first()  # El emisor
@@ -117,40 +196,16 @@ class SocialSystem:
                 "message": "No hay una solicitud pendiente de este usuario.",
             }
 
-        try:
-            # Lógica para aceptar: borra la solicitud y crea la amistad
-            if user.accept_friend_request(sender):
-                user.friends_count = (user.friends_count or 0) + 1
-                sender.friends_count = (sender.friends_count or 0) + 1
-                db.session.commit()
-
-                # Notificación interna al EMISOR de la solicitud
-                self.update_user_presence(
-                    friend_username,
-                    "online",
-                    {"new_friend": username, "type": "accepted"},
-                )
-                # Notificación interna al RECEPTOR de la solicitud
-                self.update_user_presence(
-                    username,
-                    "online",
-                    {"new_friend": friend_username, "type": "accepted"},
-                )
-
-                return {
-                    "success": True,
-                    "message": f"Ahora eres amigo de {friend_username}.",
-                }
-            else:
-                return {"success": False, "message": "Error de lógica al aceptar."}
-
-        except Exception as e:
-            db.session.rollback()
-            logger.error(
-                f"ERROR DB al aceptar solicitud entre {username} y {friend_username}: {e}",
-                exc_info=True,
-            )
-            return {"success": False, "message": "Error interno del servidor (DB)."}
+        # Lógica para aceptar: borra la solicitud y crea la amistad
+        if not user.accept_friend_request(sender):
+            return {"success": False, "message": "Error de lógica al aceptar."}
+        user.friends_count = (user.friends_count or 0) + 1
+        sender.friends_count = (sender.friends_count or 0) + 1
+        db.session.commit()
+        return {
+            "success": True,
+            "message": f"Ahora eres amigo de {friend_username}.",
+        }
 
     def reject_friend_request(self, username: str, friend_username: str) -> Dict:
         # Obtener los objetos User
@@ -171,6 +226,7 @@ class SocialSystem:
             # Lógica para rechazar
             if user.reject_friend_request(sender):
                 db.session.commit()
+                self.invalidate_friends(username, friend_username)
                 return {
                     "success": True,
                     "message": f"Solicitud de {friend_username} rechazada.",
@@ -188,6 +244,29 @@ class SocialSystem:
             return {"success": False, "message": "Error interno del servidor (DB)."}
 
     def remove_friend(self, username, friend_to_remove):
+        try:
+            resultado = self._escribir(
+                [username, friend_to_remove],
+                self._remove_friend_tx,
+                username,
+                friend_to_remove,
+            )
+        except Exception as e:
+            db.session.rollback()
+            logger.error(
+                f"ERROR DB al remover amistad entre {username} y {friend_to_remove}: {e}",
+                exc_info=True,
+            )
+            return {"success": False, "message": "Error interno del servidor (DB)."}
+
+        if resultado["success"]:
+            self.invalidate_friends(username, friend_to_remove)
+            self.update_user_presence(
+                friend_to_remove, "online", {"friend_removed": username}
+            )
+        return resultado
+
+    def _remove_friend_tx(self, username, friend_to_remove):
         # Obtener los objetos User
         user = User.query.filter_by(username=username).first()
         friend = User.query.filter_by(username=friend_to_remove).first()
@@ -198,37 +277,30 @@ class SocialSystem:
         if not user.is_friend(friend):
             return {"success": False, "message": f"{friend_to_remove} no es tu amigo."}
 
-        try:
-            # Lógica para remover la amistad (definida en models.py)
-            if user.remove_friend(friend):
-                user.friends_count = max(0, (user.friends_count or 0) - 1)
-                friend.friends_count = max(0, (friend.friends_count or 0) - 1)
-                db.session.commit()
-
-                self.update_user_presence(
-                    friend_to_remove, "online", {"friend_removed": username}
-                )
-
-                return {
-                    "success": True,
-                    "message": f"{friend_to_remove} fue eliminado de tus amigos.",
-                }
-            else:
-                return {"success": False, "message": "Error de lógica al eliminar."}
+        # Lógica para remover la amistad (definida en models.py)
+        if not user.remove_friend(friend):
+            return {"success": False, "message": "Error de lógica al eliminar."}
+        user.friends_count = max(0, (user.friends_count or 0) - 1)
+        friend.friends_count = max(0, (friend.friends_count or 0) - 1)
+        db.session.commit()
+        return {
+            "success": True,
+            "message": f"{friend_to_remove} fue eliminado de tus amigos.",
+        }
 
-        except Exception as e:
-            db.session.rollback()
-            logger.error(
-                f"ERROR DB al remover amistad entre {username} y {friend_to_remove}: {e}",
-                exc_info=True,
-            )
-            return {"success": False, "message": "Error interno del servidor (DB)."}
+    # Escrituras que tocan columnas de User (versionadas): por los carriles
+    # de los usuarios involucrados si se inyectaron (ver carriles_db.py),
+    # que reintentan ante un conflicto de versión.
+    def _escribir(self, claves, funcion, *args):
+        if self.carriles is None:
+            return funcion(*args)
+        return self.carriles.ejecutar(claves, funcion, *args)
 
     def search_users(
         self, query: str, current_user: str, limit: int = 10
     ) -> List[Dict]:
-        user_searching = User.query.filter_by(username=current_user).first()
-        if not user_searching:
+        grafo = self._friend_graph(current_user)
+        if grafo is None:
             return {"error": "Usuario de búsqueda no válido"}
 
         # Buscar en la Base de Datos: Filtra por username que contiene la query
@@ -246,11 +318,11 @@ class SocialSystem:
         for target_user in results:
             relation = "none"  # Asume que no hay relación
 
-            if user_searching.is_friend(target_user):
+            if target_user.username in grafo["amigos"]:
                 relation = "friend"
-            elif user_searching.has_sent_request_to(target_user):
+            elif target_user.username in grafo["enviadas"]:
                 relation = "pending_sent"
-            elif user_searching.has_received_request_from(target_user):
+            elif target_user.username in grafo["recibidas"]:
                 relation = "pending_received"
 
             output.append(
@@ -264,92 +336,138 @@ class SocialSystem:
         return output
 
     def get_friends_list(self, username: str) -> Dict:
-        main_user = User.query.filter_by(username=username).first()
+        grafo = self._friend_graph(username)
 
-        if not main_user:
+        if grafo is None:
             return {"error": "Usuario no encontrado"}
 
-        # Preparar la lista de amigos
+        # Preparar la lista de amigos (nivel y estado desde memoria)
         friends_list = []
-        for friend_user in main_user.friends:
-            # Obtener el estado de presencia
-            status = self._get_user_status(friend_user.username)
-
+        for friend_username, level in grafo["amigos"].items():
+            if self.nivel_de:
+                level = self.nivel_de(friend_username) or level
             friends_list.append(
                 {
-                    "username": friend_user.username,
-                    "level": friend_user.level,
-                    "status": status,
+                    "username": friend_username,
+                    "level": level,
+                    "status": self._get_user_status(friend_username),
                 }
             )
 
-        # Obtener solicitudes pendientes que el USUARIO RECIBIÓ
-        pending_received = [
-            sender_user.username for sender_user in main_user.received_requests
-        ]
-
-        # Obtener solicitudes pendientes que el USUARIO ENVIÓ
-        pending_sent = [
-            receiver_user.username for receiver_user in main_user.sent_requests
-        ]
-
         return {
             "friends": friends_list,
-            "pending_received": pending_received,
-            "pending_sent": pending_sent,
+            "pending_received": list(grafo["recibidas"]),
+            "pending_sent": list(grafo["enviadas"]),
         }
 
-    def update_user_presence(self, username: str, status: str, extra_data: Dict = None):
-        if username not in self.presence_data:
-            self.presence_data[username] = {}
-
-        # Actualizar estado y última vez visto
-        self.presence_data[username]["status"] = status
-        self.presence_data[username]["last_seen"] = datetime.now().isoformat()
-
-        # Guardar o limpiar extra_data (que contiene el SID)
-        if extra_data:
-            self.presence_data[username]["extra_data"] = extra_data
-        elif status == "offline" and "extra_data" in self.presence_data.get(
-            username, {}
-        ):
-            # Limpiar SID si se desconecta
-            del self.presence_data[username]["extra_data"]
-
-    def _get_user_status(self, username: str) -> str:
-        if username not in self.presence_data:
-            return "offline"  # Si nunca se conectó, está offline
-
-        presence = self.presence_data[username]
-        status = presence.get("status", "offline")
+    # Nombres de los amigos (para avisarles de la conexión/desconexión).
+    def get_friends_list_server(self, username: str) -> List[str]:
+        grafo = self._friend_graph(username)
+        return list(grafo["amigos"]) if grafo else []
+
+    # --- Grafo de amistades en memoria ---
+
+    def _friend_graph(self, username):
+        with self._grafo_lock:
+            grafo = self._grafo.get(username)
+            if grafo is not None:
+                self._grafo.move_to_end(username)
+                self._grafo_hits += 1
+                return grafo
+            self._grafo_misses += 1
+            generacion = self._generacion
+
+        grafo = self._load_friend_graph(username)
+        if grafo is None:
+            return None
+        with self._grafo_lock:
+            # Si algo se invalidó durante la consulta, no guardar (podría
+            # estar viejo); la próxima llamada vuelve a cargar.
+            if generacion == self._generacion:
+                self._grafo[username] = grafo
+                while len(self._grafo) > self.cache_size:
+                    self._grafo.popitem(last=False)
+        return grafo
+
+    # Una sola consulta: el usuario, sus amigos y sus solicitudes.
+    def _load_friend_graph(self, username):
+        yo = aliased(User)
+        otro = aliased(User)
+        consulta = union_all(
+            select(literal("yo"), yo.id, yo.username, yo.level).where(
+                yo.username == username
+            ),
+            select(literal("amigo"), otro.id, otro.username, otro.level)
+            .select_from(friendship)
+            .join(yo, yo.id == friendship.c.user_id)
+            .join(otro, otro.id == friendship.c.friend_id)
+            .where(yo.username == username),
+            select(literal("enviada"), otro.id, otro.username, otro.level)
+            .select_from(friend_request)
+            .join(yo, yo.id == friend_request.c.sender_id)
+            .join(otro, otro.id == friend_request.c.receiver_id)
+            .where(yo.username == username),
+            select(literal("recibida"), otro.id, otro.username, otro.level)
+            .select_from(friend_request)
+            .join(yo, yo.id == friend_request.c.receiver_id)
+            .join(otro, otro.id == friend_request.c.sender_id)
+            .where(yo.username == username),
+        )
+        filas = sorted(db.session.execute(consulta).all(), key=lambda f: f[1])
+        if not any(tipo == "yo" for tipo, _, _, _ in filas):
+            return None
+
+        grafo = {"amigos": {}, "recibidas": [], "enviadas": []}
+        for tipo, _, otro_username, level in filas:
+            if tipo == "amigo":
+                grafo["amigos"][otro_username] = level
+            elif tipo == "enviada":
+                grafo["enviadas"].append(otro_username)
+            elif tipo == "recibida":
+                grafo["recibidas"].append(otro_username)
+        return grafo
+
+    # Cambió una amistad o solicitud (ya confirmada en la DB).
+    def invalidate_friends(self, *usernames):
+        with self._grafo_lock:
+            self._generacion += 1
+            for username in usernames:
+                self._grafo.pop(username, None)
+
+    # El usuario se desconectó: su grafo se recarga si vuelve.
+    def forget_user(self, username):
+        with self._grafo_lock:
+            self._grafo.pop(username, None)
+
+    def get_metrics(self):
+        return {
+            "grafo_usuarios": len(self._grafo),
+            "grafo_aciertos": self._grafo_hits,
+            "grafo_fallos": self._grafo_misses,
+        }
 
-        # Si el estado registrado es 'offline', devolver 'offline'
-        if status == "offline":
-            return "offline"
+    def update_user_presence(self, username: str, status: str, extra_data: Dict = None):
+        self.presencia.actualizar(username, status, extra_data)
 
-        # Si está online/in_game/in_lobby, verificar la última vez visto
-        last_seen_iso = presence.get("last_seen")
-        if not last_seen_iso:
-            return "offline"  # Si no hay timestamp, asumir offline
+    # Latido del cliente; False si ya está offline (venció o se fue).
+    def presence_heartbeat(self, username: str, sid: str = None) -> bool:
+        return self.presencia.latido(username, sid)
 
-        try:
-            last_seen = datetime.fromisoformat(last_seen_iso)
-            now = datetime.now()
+    # Usuarios que dejaron de latir (ya marcados offline), una sola vez.
+    def expire_presences(self) -> List[str]:
+        return self.presencia.vencidos()
 
-            # Considerar offline si han pasado más de X segundos
-            if (now - last_seen).total_seconds() > 60:
-                return "offline"
+    def get_sid(self, username: str) -> Optional[str]:
+        return self.presencia.sid(username)
 
-            # Si está dentro del umbral, devolver el estado registrado
-            return status
-        except ValueError:
-            # Si el timestamp es inválido
-            return "offline"
+    def _get_user_status(self, username: str) -> str:
+        return self.presencia.estado(username)
 
     def send_private_message(self, sender: str, recipient: str, message: str) -> Dict:
-        # Obtener los objetos User
-        sender_user = User.query.filter_by(username=sender).first()
-        recipient_user = User.query.filter_by(username=recipient).first()
+        # Identidades desde memoria (solo hace falta el ID)
+        usuarios = self.identidades.obtener_varios([sender, recipient])
+        sender_user = usuarios.get(sender)
+        recipient_user = usuarios.get(recipient)
 
         if not sender_user or not recipient_user:
             return {
@@ -365,11 +483,12 @@ class SocialSystem:
 
         try:
             # Crear y guardar el objeto PrivateMessage en la DB
+            timestamp = datetime.utcnow()  # Usamos UTC para guardar en DB
             new_message = PrivateMessage(
                 sender_id=sender_user.id,
                 recipient_id=recipient_user.id,
                 message=message,
-                timestamp=datetime.utcnow(),  # Usamos UTC para guardar en DB
+                timestamp=timestamp,
             )
             db.session.add(new_message)
             db.session.commit()
@@ -379,7 +498,8 @@ class SocialSystem:
                 "sender": sender,
                 "recipient": recipient,
                 "message": message,
-                "timestamp": new_message.timestamp.isoformat(),  # Convertir a string para JSON
+                # Sin releer la fila tras el commit
+                "timestamp": timestamp.isoformat(),
             }
 
             return {"success": True, "message_data": message_data}
@@ -394,11 +514,13 @@ class SocialSystem:
 
     def get_conversation(self, user1_username, user2_username):
         # Obtener los IDs de los usuarios
-        user1 = User.query.filter_by(username=user1_username).first()
-        user2 = User.query.filter_by(username=user2_username).first()
+        usuarios = self.identidades.obtener_varios([user1_username, user2_username])
+        user1 = usuarios.get(user1_username)
+        user2 = usuarios.get(user2_username)
 
         if not user1 or not user2:
             return []
+        nombres = {user1.id: user1.username, user2.id: user2.username}
 
         # Consultar la tabla PrivateMessage
         messages = (
@@ -420,8 +542,8 @@ class SocialSystem:
         # Formatear los mensajes para el cliente
         conversation_data = [
             {
-                "sender": msg.sender.username,
-                "recipient": msg.recipient.username,
+                "sender": nombres[msg.sender_id],
+                "recipient": nombres[msg.recipient_id],
                 "message": msg.message,
                 "timestamp": msg.timestamp.isoformat(),  # Usar ISO para consistencia
             }
@@ -432,24 +554,22 @@ class SocialSystem:
 
     def mark_messages_as_read(self, username: str, other_user: str) -> bool:
         # Obtener los IDs de los usuarios
-        user = User.query.filter_by(username=username).first()
-        sender = User.query.filter_by(username=other_user).first()
+        usuarios = self.identidades.obtener_varios([username, other_user])
+        user = usuarios.get(username)
+        sender = usuarios.get(other_user)
 
         if not user or not sender:
             return False
 
         try:
-            # Busca mensajes no leídos enviados por 'other_user' a 'username'
-            messages_to_update = PrivateMessage.query.filter(
+            # Marca en un solo UPDATE los no leídos de 'other_user' a 'username'
+            actualizados = PrivateMessage.query.filter(
                 PrivateMessage.recipient_id == user.id,
                 PrivateMessage.sender_id == sender.id,
-                PrivateMessage.read
-                == False,  # Asume campo boolean 'read' en PrivateMessage
-            ).all()
+                PrivateMessage.read == False,
+            ).update({"read": True}, synchronize_session=False)
 
-            if messages_to_update:
-                for msg in messages_to_update:
-                    msg.read = True
+            if actualizados:
                 db.session.commit()
                 return True
             return False
@@ -462,45 +582,28 @@ class SocialSystem:
             return False
 
     def get_unread_message_count(self, username: str) -> Dict[str, int]:
-        unread_counts = {}
-
-        user = User.query.filter_by(username=username).first()
-        if not user:
+        user_id = self.identidades.id_de(username)
+        if not user_id:
             return {}
 
-        # Consulta para contar mensajes no leídos agrupados por remitente
+        # No leídos recibidos por el usuario, contados por remitente (con
+        # su nombre en la misma consulta)
         unread_query = (
-            db.session.query(
-                PrivateMessage.sender_id,
-                func.count(
-                    PrivateMessage.id
-                ),  # Contar cuántos mensajes hay por sender_id
-            )
+            db.session.query(User.username, func.count(PrivateMessage.id))
+            .join(User, User.id == PrivateMessage.sender_id)
             .filter(
-                PrivateMessage.recipient_id
-                == user.id,  # Mensajes recibidos por el usuario
+                PrivateMessage.recipient_id == user_id,
                 PrivateMessage.read == False,  # Que no estén leídos
             )
-            .group_by(PrivateMessage.sender_id)
+            .group_by(User.username)
             .all()
-        )  # Agrupar por remitente
-
-        # Mapear IDs de remitentes a nombres de usuario
-        sender_ids = [sender_id for sender_id, count in unread_query]
-        senders = User.query.filter(User.id.in_(sender_ids)).all()
-        sender_map = {s.id: s.username for s in senders}
-
-        # Construir el diccionario final
-        for sender_id, count in unread_query:
-            sender_username = sender_map.get(sender_id)
-            if sender_username:
-                unread_counts[sender_username] = count
+        )
 
-        return unread_counts
+        return {sender_username: count for sender_username, count in unread_query}
 
     def get_recent_conversations(self, username: str, limit: int = 10) -> List[Dict]:
-        # Obtener el usuario actual de la DB
-        user = User.query.filter_by(username=username).first()
+        # Obtener el usuario actual (identidad en memoria)
+        user = self.identidades.obtener(username)
         if not user:
             return []
 
@@ -561,17 +664,16 @@ class SocialSystem:
         room_id: str,
         room_name: str = None,
     ) -> Dict:
-        # Obtener los objetos User de la DB
-        sender_user = User.query.filter_by(username=sender_username).first()
-        recipient_user = User.query.filter_by(username=recipient_username).first()
+        # La amistad se resuelve desde el grafo en memoria
+        grafo = self._friend_graph(sender_username)
 
-        if not sender_user or not recipient_user:
+        if not grafo or self.identidades.obtener(recipient_username) is None:
             return {
                 "success": False,
                 "message": "Usuario remitente o destinatario no válido.",
             }
 
-        if not sender_user.is_friend(recipient_user):
+        if recipient_username not in grafo["amigos"]:
             return {"success": False, "message": "Solo puedes invitar amigos."}
 
         # Verificar que el destinatario está disponible (solo 'online' en el lobby)
@@ -601,13 +703,7 @@ class SocialSystem:
         }
 
         # Almacenar invitación temporalmente
-        if "invitations" not in self.presence_data:
-            self.presence_data["invitations"] = {}
-
-        if recipient_username not in self.presence_data["invitations"]:
-            self.presence_data["invitations"][recipient_username] = []
-
-        self.presence_data["invitations"][recipient_username].append(invitation_data)
+        self.invitations.setdefault(recipient_username, []).append(invitation_data)
 
         self._clean_old_invitations(recipient_username)
 
@@ -618,10 +714,7 @@ class SocialSystem:
         }
 
     def get_pending_invitations(self, username: str) -> List[Dict]:
-        if (
-            "invitations" not in self.presence_data
-            or username not in self.presence_data["invitations"]
-        ):
+        if username not in self.invitations:
             return []
 
         # Limpiar invitaciones antiguas primero
@@ -629,9 +722,7 @@ class SocialSystem:
 
         # Devolver solo invitaciones pendientes
         pending = [
-            inv
-            for inv in self.presence_data["invitations"][username]
-            if inv["status"] == "pending"
+            inv for inv in self.invitations[username] if inv["status"] == "pending"
         ]
 
         return pending
@@ -639,15 +730,12 @@ class SocialSystem:
     def respond_to_invitation(
         self, username: str, invitation_id: str, response: str
     ) -> Dict:
-        if (
-            "invitations" not in self.presence_data
-            or username not in self.presence_data["invitations"]
-        ):
+        if username not in self.invitations:
             return {"success": False, "message": "No hay invitaciones"}
 
         # Buscar invitación
         invitation = None
-        for inv in self.presence_data["invitations"][username]:
+        for inv in self.invitations[username]:
             if inv["id"] == invitation_id and inv["status"] == "pending":
                 invitation = inv
                 break
@@ -669,26 +757,31 @@ class SocialSystem:
             return {"success": True, "message": "Invitación rechazada"}
 
     def _clean_old_invitations(self, username: str):
-        if (
-            "invitations" not in self.presence_data
-            or username not in self.presence_data["invitations"]
-        ):
+        if username not in self.invitations:
             return
 
         now = datetime.now()
         valid_invitations = []
 
-        for invitation in self.presence_data["invitations"][username]:
+        for invitation in self.invitations[username]:
             inv_time = datetime.fromisoformat(invitation["timestamp"])
             # Mantener invitaciones de menos de 10 minutos
-            if (now - inv_time).total_seconds() < 600:  # 10 minutos
+            if (now - inv_time).total_seconds() < self.INVITATION_TTL_SECONDS:
                 valid_invitations.append(invitation)
             else:
                 # Marcar como expirada
                 invitation["status"] = "expired"
                 valid_invitations.append(invitation)
 
-        self.presence_data["invitations"][username] = valid_invitations
+        self.invitations[username] = valid_invitations
+
+    def expire_invitation(self, username: str, invitation_id: str) -> bool:
+        # Marca como expirada una invitación que sigue pendiente
+        for inv in self.invitations.get(username, []):
+            if inv["id"] == invitation_id and inv["status"] == "pending":
+                inv["status"] = "expired"
+                return True
+        return False
 
     def get_social_achievements(self) -> Dict:
         return self.social_achievements
@@ -224,10 +224,13 @@ function renderArsenal(maestriaData) {
             }
         });
         
+        // Puesto en el ranking de maestría del kit (si ya lo jugó)
+        const puestoTexto = kit.posicion ? ` · #${kit.posicion} de ${kit.jugadores}` : "";
+
         item.innerHTML = `
             <div class="kit-maestria-header">
                 <h4>${escapeHTML(kit.nombre)}</h4>
-                <span>Maestría ${level}</span>
+                <span>Maestría ${level}${puestoTexto}</span>
             </div>
             <div class.kit-maestria-progreso">
                 <progress value="${xpEnNivel}" max="${xpParaSiguiente}"></progress>
@@ -0,0 +1,137 @@
+/* ===================================================================
+   CODIFICACIÓN BINARIA DE EVENTOS (codecBinario.js)
+   Decodifica los eventos de juego que el servidor envía en binario
+   (ver src/core/codec_binario.py) una vez negociado el formato. El
+   esquema (CAMPOS) llega en la respuesta de la negociación.
+   =================================================================== */
+
+const FORMATO = 'bin1';
+const EXT_INT16 = 1;
+const AUSENTE = -32768;
+
+let _campos = null;
+const _utf8 = new TextDecoder();
+
+/**
+ * Ofrece el formato binario al servidor. Hasta que responde (o si no lo
+ * soporta) los eventos siguen llegando en JSON.
+ */
+export function negociarCodificacion(socket) {
+    socket.emit('negociar_codificacion', { formatos: [FORMATO, 'json'] }, (resp) => {
+        _campos = resp?.formato === FORMATO ? resp.campos : null;
+    });
+}
+
+// Payload de un evento de juego, venga en JSON (objeto) o en binario
+export function leerPayload(data) {
+    if (data instanceof ArrayBuffer || ArrayBuffer.isView(data)) {
+        return decodificarBinario(data);
+    }
+    return data;
+}
+
+export function decodificarBinario(buffer) {
+    const bytes = buffer instanceof ArrayBuffer
+        ? new Uint8Array(buffer)
+        : new Uint8Array(buffer.buffer, buffer.byteOffset, buffer.byteLength);
+    const lector = { bytes, vista: new DataView(bytes.buffer, bytes.byteOffset, bytes.byteLength), pos: 0 };
+    return _leer(lector);
+}
+
+function _leer(l) {
+    const b = l.bytes[l.pos++];
+    if (b < 0x80) return b;
+    if (b >= 0xe0) return b - 0x100;
+    if (b >= 0xa0 && b <= 0xbf) return _leerStr(l, b & 0x1f);
+    if (b >= 0x90 && b <= 0x9f) return _leerLista(l, b & 0x0f);
+    if (b >= 0x80 && b <= 0x8f) return _leerMapa(l, b & 0x0f);
+
+    const v = l.vista;
+    let n;
+    switch (b) {
+        case 0xc0: return null;
+        case 0xc2: return false;
+        case 0xc3: return true;
+        case 0xcc: return v.getUint8(l.pos++);
+        case 0xcd: n = v.getUint16(l.pos); l.pos += 2; return n;
+        case 0xce: n = v.getUint32(l.pos); l.pos += 4; return n;
+        case 0xcf: n = Number(v.getBigUint64(l.pos)); l.pos += 8; return n;
+        case 0xd0: return v.getInt8(l.pos++);
+        case 0xd1: n = v.getInt16(l.pos); l.pos += 2; return n;
+        case 0xd2: n = v.getInt32(l.pos); l.pos += 4; return n;
+        case 0xd3: n = Number(v.getBigInt64(l.pos)); l.pos += 8; return n;
+        case 0xca: n = v.getFloat32(l.pos); l.pos += 4; return n;
+        case 0xcb: n = v.getFloat64(l.pos); l.pos += 8; return n;
+        case 0xd9: return _leerStr(l, v.getUint8(l.pos++));
+        case 0xda: n = v.getUint16(l.pos); l.pos += 2; return _leerStr(l, n);
+        case 0xdb: n = v.getUint32(l.pos); l.pos += 4; return _leerStr(l, n);
+        case 0xc4: return _leerBin(l, v.getUint8(l.pos++));
+        case 0xc5: n = v.getUint16(l.pos); l.pos += 2; return _leerBin(l, n);
+        case 0xc6: n = v.getUint32(l.pos); l.pos += 4; return _leerBin(l, n);
+        case 0xc7: return _leerExt(l, v.getUint8(l.pos++));
+        case 0xc8: n = v.getUint16(l.pos); l.pos += 2; return _leerExt(l, n);
+        case 0xc9: n = v.getUint32(l.pos); l.pos += 4; return _leerExt(l, n);
+        case 0xdc: n = v.getUint16(l.pos); l.pos += 2; return _leerLista(l, n);
+        case 0xdd: n = v.getUint32(l.pos); l.pos += 4; return _leerLista(l, n);
+        case 0xde: n = v.getUint16(l.pos); l.pos += 2; return _leerMapa(l, n);
+        case 0xdf: n = v.getUint32(l.pos); l.pos += 4; return _leerMapa(l, n);
+        default: throw new Error(`Byte de tipo desconocido: 0x${b.toString(16)}`);
+    }
+}
+
+function _leerStr(l, n) {
+    const texto = _utf8.decode(l.bytes.subarray(l.pos, l.pos + n));
+    l.pos += n;
+    return texto;
+}
+
+function _leerBin(l, n) {
+    const crudo = l.bytes.slice(l.pos, l.pos + n);
+    l.pos += n;
+    return crudo;
+}
+
+function _leerLista(l, n) {
+    const lista = new Array(n);
+    for (let i = 0; i < n; i++) lista[i] = _leer(l);
+    return lista;
+}
+
+function _leerMapa(l, n) {
+    const mapa = {};
+    for (let i = 0; i < n; i++) {
+        const clave = _leer(l);
+        const valor = _leer(l);
+        const nombre = typeof clave === 'number' ? _campos?.[clave] ?? String(clave) : clave;
+        if (nombre === 'jugadores_empaquetados') {
+            mapa.jugadores = _desempaquetarJugadores(valor);
+        } else {
+            mapa[nombre] = valor;
+        }
+    }
+    return mapa;
+}
+
+// Array int16 little-endian (ext tipo 1)
+function _leerExt(l, n) {
+    const tipo = l.bytes[l.pos++];
+    if (tipo !== EXT_INT16) throw new Error(`Tipo ext desconocido: ${tipo}`);
+    const valores = new Array(n / 2);
+    for (let i = 0; i < valores.length; i++) {
+        valores[i] = l.vista.getInt16(l.pos + i * 2, true);
+    }
+    l.pos += n;
+    return valores;
+}
+
+// [nombres, posiciones, puntajes, restos] -> { nombre: { campo: valor } }
+function _desempaquetarJugadores([nombres, posiciones, puntajes, restos]) {
+    const jugadores = {};
+    nombres.forEach((nombre, i) => {
+        const campos = {};
+        if (posiciones[i] !== AUSENTE) campos.posicion = posiciones[i];
+        if (puntajes[i] !== AUSENTE) campos.puntaje = puntajes[i];
+        jugadores[nombre] = { ...campos, ...restos[i] };
+    });
+    return jugadores;
+}
@@ -0,0 +1,101 @@
+/* ===================================================================
+   SINCRONIZACIÓN DE ESTADO POR VERSIONES (estadoSync.js)
+   Aplica los deltas versionados que envía el servidor (ver
+   src/core/estado_sync.py) sobre el último estado completo conocido, e
+   hidrata las referencias al catálogo estático (src/core/catalogo.py).
+   =================================================================== */
+
+// Catálogo recibido una vez por conexión + casillas de la partida actual
+const _catalogo = { habilidades: {}, perks: {}, kits: {}, casillas: {}, etag: null };
+
+export function setCatalogo(data) {
+    if (!data) return;
+    _catalogo.habilidades = data.habilidades || {};
+    _catalogo.perks = data.perks || {};
+    _catalogo.kits = data.kits || {};
+    _catalogo.etag = data.etag || null;
+}
+
+export function setCasillasPartida(casillas) {
+    _catalogo.casillas = casillas || {};
+}
+
+export function getCatalogo() {
+    return _catalogo;
+}
+
+// Habilidad completa a partir de su ID (o del objeto, si ya estaba hidratada)
+function _hidratarHabilidad(ref, cooldown) {
+    if (ref !== null && typeof ref === 'object') {
+        return { ...ref, cooldown: cooldown ?? ref.cooldown ?? 0 };
+    }
+    return { ...(_catalogo.habilidades[ref] || { nombre: `#${ref}` }), id: ref, cooldown: cooldown ?? 0 };
+}
+
+/**
+ * Reemplaza las referencias del estado (IDs de habilidad, id_unico de
+ * casillas) por sus definiciones y ubica las fichas en el tablero. Es
+ * idempotente: se puede aplicar sobre un estado ya hidratado tras
+ * mezclar un delta.
+ */
+export function hidratarEstado(estado) {
+    if (!estado) return estado;
+    const jugadores = (estado.jugadores || []).map((j) => {
+        if (!Array.isArray(j.habilidades)) return j;
+        const cooldowns = j.cooldowns || [];
+        return { ...j, habilidades: j.habilidades.map((h, i) => _hidratarHabilidad(h, cooldowns[i])) };
+    });
+    const tablero = {};
+    for (const [pos, celda] of Object.entries(estado.tablero || {})) {
+        const ref = celda?.casilla_especial;
+        tablero[pos] = {
+            ...celda,
+            casilla_especial: typeof ref === 'string' ? (_catalogo.casillas[ref] || null) : ref,
+            jugadores: [],
+        };
+    }
+    // Las fichas se derivan de la posición de cada jugador (el servidor
+    // no las repite en el tablero)
+    for (const j of jugadores) {
+        const celda = tablero[j.posicion] ||= { casilla_especial: null, energia: null, jugadores: [] };
+        celda.jugadores.push({ nombre: j.nombre, energia: j.puntaje, activo: j.activo, avatar_emoji: j.avatar_emoji });
+    }
+    return { ...estado, jugadores, tablero };
+}
+
+/**
+ * Devuelve un estado nuevo con el delta aplicado, o null si el delta no
+ * parte de la versión que tenemos (hay que pedir el estado completo).
+ * No modifica 'estadoLocal'.
+ */
+export function aplicarDeltaEstado(estadoLocal, delta) {
+    if (!estadoLocal || estadoLocal.version === undefined || estadoLocal.version !== delta.base) {
+        return null;
+    }
+
+    const cambiosJugadores = delta.jugadores || {};
+    const jugadores = (estadoLocal.jugadores || []).map((j) =>
+        cambiosJugadores[j.nombre] ? { ...j, ...cambiosJugadores[j.nombre] } : j
+    );
+    // Jugadores que no conocíamos (llegan con todos sus campos)
+    for (const [nombre, campos] of Object.entries(cambiosJugadores)) {
+        if (!jugadores.some((j) => j.nombre === nombre)) jugadores.push({ ...campos });
+    }
+
+    const tablero = { ...(estadoLocal.tablero || {}) };
+    for (const [pos, celda] of Object.entries(delta.tablero || {})) {
+        if (celda === null) {
+            delete tablero[pos];
+        } else {
+            tablero[pos] = celda;
+        }
+    }
+
+    return hidratarEstado({
+        ...estadoLocal,
+        ...(delta.globales || {}),
+        jugadores,
+        tablero,
+        version: delta.version,
+    });
+}
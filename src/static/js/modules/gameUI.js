@@ -639,6 +639,7 @@ export function actualizarCooldownsUI(username, habilidadUsada) {
     const habIndex = jugador.habilidades.findIndex(h => h.nombre === habilidadUsada.nombre);
     if (habIndex > -1) {
         jugador.habilidades[habIndex].cooldown = habilidadUsada.cooldown;
+        if (jugador.cooldowns) jugador.cooldowns[habIndex] = habilidadUsada.cooldown;
     }
     
     // Si el modal de habilidades está abierto, refrescarlo
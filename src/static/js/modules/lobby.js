@@ -238,6 +238,14 @@ export async function loadTopPlayers() {
     }
 }
 
+/** Top 5 empujado por el servidor cuando cambia (evento 'actualizar_top_5'). */
+export function setTopPlayers(players) {
+    rankingCache.data = players;
+    rankingCache.isLoaded = true;
+    rankingCache.lastLoaded = Date.now();
+    _displayTopPlayers(players);
+}
+
 function _displayTopPlayers(players) {
     if (!topPlayersContainer) return;
     if (!players || players.length === 0) {
@@ -92,6 +92,9 @@ export function initSocial(socketRef, stateRef) {
         updateFriendStatusInCache(data);
     }
 });
+    _socket?.on("friend_status_batch", (data) => {
+        (data?.friends || []).forEach(updateFriendStatusInCache);
+    });
     _socket?.on("new_friend_request", (data) => invalidateSocialCache());
 }
 
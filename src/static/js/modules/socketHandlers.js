@@ -4,11 +4,13 @@
 
 import { show, setLoading, showNotification, manejarInvitacion, showAchievementNotification, playSound, escapeHTML } from './utils.js';
 import { updateProfileUI, fetchAndUpdateUserProfile } from './auth.js';
-import { updateWaitingRoomUI, appendLobbyChatMessage, loadTopPlayers } from './lobby.js';
+import { updateWaitingRoomUI, appendLobbyChatMessage, loadTopPlayers, setTopPlayers } from './lobby.js';
 import { actualizarEstadoJuego, renderEventos, agregarAlLog, appendGameChatMessage, mostrarModalFinJuego, actualizarCooldownsUI, actualizarEstadoParcial, actualizarEstadoRevancha } from './gameUI.js';
 import { displayPerkOffer, handlePerkActivated, updatePerkPrices } from './perks.js';
 import { appendPrivateMessage, updateSocialNotificationIndicator, invalidateSocialCache, updateFriendStatusInCache, getFriendStatusFromCache } from './social.js';
 import { invalidateAchievementsCache } from './achievements.js'; 
+import { aplicarDeltaEstado, hidratarEstado, setCatalogo, setCasillasPartida } from './estadoSync.js';
+import { negociarCodificacion, leerPayload } from './codecBinario.js';
 import { handleMaestriaData, invalidateArsenalCache, loadArsenalData } from './arsenal.js';
 
 let _socket = null;
@@ -25,6 +27,7 @@ let _gameAnimations = null;
 let btnLanzarDado = null;
 let btnMostrarHab = null;
 let _intermediatePosition = {};
+let _resyncPendiente = false;
 let codigoSalaActualDisplay = null;
 let resultadoDadoDisplay = null;
 let jugadoresEstadoDisplay = null;
@@ -38,6 +41,20 @@ let btnVolverLobby = null;
 let rematchWaitingMsg = null;
 
 
+// Estado completo resultante del delta que trae el evento. Si nos falta
+// una versión, pide el estado completo al servidor y devuelve null.
+function resolverEstado(data) {
+    if (!data.estado_delta) return hidratarEstado(data.estado_juego) || null;
+    const estado = aplicarDeltaEstado(_estadoJuego, data.estado_delta);
+    if (!estado && !_resyncPendiente && _idSala?.value) {
+        _resyncPendiente = true;
+        console.warn(`Delta v${data.estado_delta.version} sobre base ${data.estado_delta.base}, local v${_estadoJuego?.version}. Pidiendo estado completo.`);
+        _socket.emit("solicitar_estado_completo", { id_sala: _idSala.value });
+    }
+    return estado;
+}
+
+
 export function setupSocketHandlers(socketInstance, screenElements, loadingEl, notificationEl, stateRefs, gameAnimationsInstance) {
     _socket = socketInstance;
     _screens = screenElements;
@@ -75,6 +92,7 @@ export function setupSocketHandlers(socketInstance, screenElements, loadingEl, n
     _socket.on("connect", () => {
         setLoading(false, _loadingElement);
         console.log("Socket conectado.");
+        negociarCodificacion(_socket);
         if (_state.currentUser && _state.currentUser.username) { 
             console.log(`Reconectado como ${_state.currentUser.username}. Re-autenticando socket...`); 
             _socket.emit('authenticate', { username: _state.currentUser.username });
@@ -89,6 +107,10 @@ export function setupSocketHandlers(socketInstance, screenElements, loadingEl, n
     _socket.on("conectado", () => { 
         setLoading(false, _loadingElement);
         console.log("Conexión con servidor establecida.");
+    });
+    _socket.on("catalogo", (data) => {
+        // Definiciones estáticas: el estado por turno solo trae sus IDs
+        setCatalogo(data);
     });
      _socket.on('authenticated', (data) => {
         console.log(`Socket autenticado como: ${data.username}`);
@@ -97,6 +119,10 @@ export function setupSocketHandlers(socketInstance, screenElements, loadingEl, n
         setLoading(false, _loadingElement);
         showNotification(data.mensaje || "Error del servidor", _notificacionesContainer, "error");
     });
+    _socket.on("actualizar_top_5", (top) => {
+        // El servidor avisa solo cuando cambia el top: no hace falta sondear
+        setTopPlayers(top);
+    });
     _socket.on("precios_perks_actualizados", (costos) => {
         updatePerkPrices(costos);
     });
@@ -161,13 +187,16 @@ export function setupSocketHandlers(socketInstance, screenElements, loadingEl, n
         show("game", _screens);
         _mapaColores.value = estadoInicial.colores_jugadores || {}; 
         console.log("Mapa de colores recibido:", _mapaColores.value);
-        actualizarEstadoJuego(estadoInicial); 
+        _resyncPendiente = false;
+        setCasillasPartida(estadoInicial.catalogo_casillas);
+        actualizarEstadoJuego(hidratarEstado(estadoInicial)); 
         const eventosLista = document.getElementById("eventos-lista");
         if (eventosLista) eventosLista.innerHTML = ''; 
         agregarAlLog("¡La partida ha comenzado!");
     });
-    _socket.on("paso_1_resultado_movimiento", (data) => {
+    _socket.on("paso_1_resultado_movimiento", (payload) => {
         try {
+            const data = leerPayload(payload);
             if (btnLanzarDado) btnLanzarDado.disabled = true;
             if (btnMostrarHab) btnMostrarHab.disabled = true;
             const btnPerks = document.getElementById('btn-abrir-perks');
@@ -205,9 +234,10 @@ export function setupSocketHandlers(socketInstance, screenElements, loadingEl, n
             agregarAlLog(`Error del cliente: ${error.message}`);
         }
     });
-    _socket.on("paso_2_resultado_casilla", (data) => {
+    _socket.on("paso_2_resultado_casilla", (payload) => {
         try {
-            const estado_nuevo = data.estado_juego;
+            const data = leerPayload(payload);
+            const estado_nuevo = resolverEstado(data);
             const eventos_paso_2 = data.eventos || [];
             let sonidoCasilla = null;
             eventos_paso_2.forEach(evento => {
@@ -279,7 +309,7 @@ export function setupSocketHandlers(socketInstance, screenElements, loadingEl, n
         if (data.resultado?.exito) {
             _habilidadUsadaTurno.value = (data.jugador === _state.currentUser.username); 
         }
-        actualizarEstadoJuego(data.estado_juego);
+        actualizarEstadoJuego(resolverEstado(data));
         renderEventos(data.resultado?.eventos);
         if (data.resultado?.exito) {
             checkAndPlayCosmetic(data.habilidad, data.jugador);
@@ -293,7 +323,8 @@ export function setupSocketHandlers(socketInstance, screenElements, loadingEl, n
         if (data.resultado?.exito) {
             _habilidadUsadaTurno.value = (data.jugador === _state.currentUser.username); 
         }
-        actualizarEstadoParcial(data.estado_juego_parcial);
+        const estadoParcial = resolverEstado(data);
+        if (estadoParcial) actualizarEstadoParcial(estadoParcial);
         renderEventos(data.resultado?.eventos);
         if (data.resultado?.exito) {
             checkAndPlayCosmetic(data.habilidad, data.jugador);
@@ -303,15 +334,23 @@ export function setupSocketHandlers(socketInstance, screenElements, loadingEl, n
         if (data.resultado?.exito) {
             _habilidadUsadaTurno.value = (data.jugador === _state.currentUser?.username);
         }
-        actualizarEstadoParcial(data.estado_juego_parcial);
+        const estadoParcial = resolverEstado(data);
+        if (estadoParcial) actualizarEstadoParcial(estadoParcial);
         renderEventos(data.resultado?.eventos); 
         if (data.resultado?.exito) {
             checkAndPlayCosmetic(data.habilidad, data.jugador);
         }
     });
-    _socket.on("estado_juego_actualizado", (data) => { 
-        if (data.estado_juego) {
-            actualizarEstadoJuego(data.estado_juego);
+    _socket.on("estado_juego_completo", (data) => {
+        _resyncPendiente = false;
+        setCasillasPartida(data.estado_juego?.catalogo_casillas);
+        actualizarEstadoJuego(hidratarEstado(data.estado_juego));
+    });
+    _socket.on("estado_juego_actualizado", (payload) => {
+        const data = leerPayload(payload);
+        const estado = resolverEstado(data);
+        if (estado) {
+            actualizarEstadoJuego(estado);
         }
         if (data.eventos_recientes) {
             renderEventos(data.eventos_recientes);
@@ -499,7 +538,7 @@ export function setupSocketHandlers(socketInstance, screenElements, loadingEl, n
         updateSocialNotificationIndicator(true);
         invalidateSocialCache(); // Invalida el caché social
     });
-    _socket.on("friend_status_update", (data) => {
+    const handleFriendStatusUpdate = (data) => {
         const friendName = escapeHTML(data.username || data.friend);
         let message = `👤 Estado de ${friendName} actualizado.`; 
         const oldStatus = getFriendStatusFromCache(friendName); 
@@ -529,6 +568,11 @@ export function setupSocketHandlers(socketInstance, screenElements, loadingEl, n
         } else {
             updateFriendStatusInCache(data);
         }
+    };
+    _socket.on("friend_status_update", handleFriendStatusUpdate);
+    // Conexiones y desconexiones llegan agrupadas: un lote por ventana corta
+    _socket.on("friend_status_batch", (data) => {
+        (data?.friends || []).forEach(handleFriendStatusUpdate);
     });
 
     _socket.on("new_private_message", (data) => {
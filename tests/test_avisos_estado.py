@@ -0,0 +1,60 @@
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.avisos_estado import AgregadorEstados
+
+SIDS = {"Ana": "s-ana", "Beto": "s-beto", "Caro": "s-caro"}
+
+
+def crear_agregador():
+    agendados = []
+    emitidos = []
+    agregador = AgregadorEstados(
+        ventana=2,
+        agendar=lambda retardo, funcion: agendados.append(funcion),
+        emitir=lambda sid, cambios: emitidos.append((sid, cambios)),
+        sid_de=SIDS.get,
+    )
+    return agregador, agendados, emitidos
+
+
+def test_un_lote_por_destinatario():
+    agregador, agendados, emitidos = crear_agregador()
+    agregador.anotar("Dani", "online", ["Ana", "Beto"])
+    agregador.anotar("Eva", "online", ["Ana", "Fede"])  # Fede no está conectado
+    assert len(agendados) == 1  # Un solo vaciado por ventana
+
+    assert agendados[0]() == 2
+    assert sorted(emitidos) == [
+        (
+            "s-ana",
+            [
+                {"username": "Dani", "status": "online"},
+                {"username": "Eva", "status": "online"},
+            ],
+        ),
+        ("s-beto", [{"username": "Dani", "status": "online"}]),
+    ]
+
+
+def test_conexion_inestable_se_colapsa():
+    agregador, agendados, emitidos = crear_agregador()
+    agregador.anotar("Dani", "online", ["Ana"])
+    agendados.pop()()
+    emitidos.clear()
+
+    # offline -> online en la misma ventana: nada que avisar
+    agregador.anotar("Dani", "offline", ["Ana"])
+    agregador.anotar("Dani", "online", ["Ana"])
+    assert agendados.pop()() == 0
+    assert emitidos == []
+
+    # Un offline ya anunciado no se repite (vencimiento y luego desconexión)
+    agregador.anotar("Dani", "offline", ["Ana"])
+    agendados.pop()()
+    agregador.anotar("Dani", "offline", ["Ana"])
+    agendados.pop()()
+    assert emitidos == [("s-ana", [{"username": "Dani", "status": "offline"}])]
+    assert agregador.obtener_metricas()["colapsados"] == 2
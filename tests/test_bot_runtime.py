@@ -0,0 +1,271 @@
+import pytest
+import sys
+import os
+import subprocess
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.bot_runtime import (
+    RUTA_PESOS_DEFECTO,
+    CerebroNumpy,
+    VoltraceAgenteInferencia,
+    cargar_agente_inferencia,
+    cargar_pesos,
+    pesos_aleatorios,
+)
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def juego_bots():
+    from src.core.juego_web import JuegoOcaWeb
+
+    config = [
+        {"nombre": "Bot_1", "kit_id": "tactico"},
+        {"nombre": "Bot_2", "kit_id": "ingeniero"},
+    ]
+    return JuegoOcaWeb(config)
+
+
+def test_paridad_numpy_vs_torch(tmp_path):
+    torch = pytest.importorskip("torch")
+    from src.core.bot_agent import VoltraceAgent
+
+    agente = VoltraceAgent()
+    ruta = tmp_path / "cerebro.npz"
+    agente.exportar_pesos(str(ruta))
+
+    runtime = cargar_agente_inferencia(str(ruta))
+    assert runtime.cerebro.input_size == 9
+    assert runtime.cerebro.capas[0][0].shape == (9, 64)
+
+    estados = np.random.default_rng(0).random((256, 9), dtype=np.float32)
+    with torch.no_grad():
+        esperado = agente.cerebro(torch.from_numpy(estados)).numpy()
+
+    obtenido = runtime.cerebro(estados)
+    np.testing.assert_allclose(obtenido, esperado, rtol=1e-5, atol=1e-6)
+
+    # Con epsilon 0 ambos agentes eligen la misma acción
+    agente.epsilon = 0.0
+    runtime.epsilon = 0.0
+    for estado in estados[:32]:
+        assert runtime.tomar_decision(estado) == agente.tomar_decision(estado)
+
+
+def test_entrenamiento_exporta_pesos_cargables(tmp_path):
+    pytest.importorskip("torch")
+    from src.core.bot_agent import entrenar
+
+    ruta = tmp_path / "cerebro.npz"
+    agente = entrenar(partidas=3, ruta=str(ruta), semilla=0)
+    assert agente.epsilon < 1.0  # Hubo minibatches de entrenamiento
+
+    runtime = cargar_agente_inferencia(str(ruta))
+    assert runtime.epsilon == 0.05
+    assert runtime.cerebro.input_size == 9 and runtime.cerebro.output_size == 5
+
+
+def test_agente_sin_pesos_explora(tmp_path):
+    agente = cargar_agente_inferencia(str(tmp_path / "no_existe.npz"))
+    assert agente.epsilon == 1.0
+    assert 0 <= agente.tomar_decision([0.0] * 9) < 5
+
+
+def test_servidor_carga_pesos_entrenados_por_defecto(monkeypatch):
+    monkeypatch.delenv("VOLTRACE_PESOS_BOT", raising=False)
+    monkeypatch.delenv("VOLTRACE_SHM_PESOS", raising=False)
+    from src.app import agente_ia_global
+
+    entrenados = CerebroNumpy(cargar_pesos(RUTA_PESOS_DEFECTO))
+    for agente in (cargar_agente_inferencia(), agente_ia_global):
+        assert agente.epsilon == 0.05
+        for (w, b), (w_ok, b_ok) in zip(agente.cerebro.capas, entrenados.capas):
+            np.testing.assert_array_equal(w, w_ok)
+            np.testing.assert_array_equal(b, b_ok)
+
+
+def test_forma_invalida_rechazada():
+    pesos = pesos_aleatorios()
+    pesos["fc2_w"] = pesos["fc2_w"][:, :10]
+    with pytest.raises(ValueError):
+        CerebroNumpy(pesos)
+
+
+def test_turno_bot_no_entrena_en_servidor(juego_bots):
+    agente = VoltraceAgenteInferencia(CerebroNumpy(pesos_aleatorios(semilla=1)))
+    resultado = juego_bots.ejecutar_turno_bot("Bot_1", agente)
+    assert resultado["exito"]
+    assert len(agente.memory) == 1
+
+
+def test_servidor_no_importa_torch():
+    codigo = "import sys, src.app; print('torch' in sys.modules)"
+    salida = subprocess.run(
+        [sys.executable, "-c", codigo],
+        cwd=RAIZ,
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+    assert salida.stdout.strip().splitlines()[-1] == "False"
+
+
+def test_pesos_compartidos_recarga_en_caliente():
+    import uuid
+    from multiprocessing import shared_memory
+    from src.core.pesos_compartidos import SegmentoPesos, CerebroCompartido
+
+    nombre = f"vt_test_{uuid.uuid4().hex[:8]}"
+    pesos_v1 = pesos_aleatorios(semilla=1)
+    pesos_v2 = pesos_aleatorios(semilla=2)
+    creador = SegmentoPesos.crear(nombre, pesos_v1)
+    # Mismo proceso: se abre sin desregistrar del resource_tracker
+    lector = SegmentoPesos(shared_memory.SharedMemory(name=nombre))
+    try:
+        cerebro = CerebroCompartido(lector)
+        estado = np.linspace(0, 1, 9, dtype=np.float32)
+        np.testing.assert_allclose(cerebro(estado), CerebroNumpy(pesos_v1)(estado))
+
+        # Las vistas del worker son de solo lectura
+        with pytest.raises(ValueError):
+            cerebro.capas[0][0][0, 0] = 1.0
+
+        version = creador.publicar(pesos_v2)
+        np.testing.assert_allclose(cerebro(estado), CerebroNumpy(pesos_v2)(estado))
+        assert cerebro.version == version
+    finally:
+        del cerebro
+        lector.cerrar()
+        creador.destruir()
+
+
+def test_segmento_sobrevive_al_creador():
+    import uuid
+    from src.core.pesos_compartidos import SegmentoPesos, destruir_segmento
+
+    nombre = f"vt_test_{uuid.uuid4().hex[:8]}"
+    codigo = (
+        "from src.core.bot_runtime import pesos_aleatorios\n"
+        "from src.core.pesos_compartidos import SegmentoPesos\n"
+        f"SegmentoPesos.crear('{nombre}', pesos_aleatorios(semilla=1))\n"
+    )
+    salida = subprocess.run(
+        [sys.executable, "-c", codigo],
+        cwd=RAIZ,
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+    assert salida.returncode == 0, salida.stderr
+    assert "leaked shared_memory" not in salida.stderr
+
+    # El creador ya salió: un worker reiniciado se conecta al mismo segmento
+    segmento = SegmentoPesos.abrir(nombre)
+    try:
+        estado = np.linspace(0, 1, 9, dtype=np.float32)
+        cerebro = CerebroNumpy(pesos_aleatorios(semilla=1))
+        _, capas = segmento.vistas()
+        np.testing.assert_allclose(capas[0][0], cerebro.capas[0][0])
+        assert cerebro(estado).shape == (5,)
+        del capas
+    finally:
+        segmento.cerrar()
+    assert destruir_segmento(nombre)
+    assert not destruir_segmento(nombre)
+    with pytest.raises(FileNotFoundError):
+        SegmentoPesos.abrir(nombre)
+
+
+def test_abrir_espera_la_publicacion_del_creador():
+    import threading
+    import uuid
+    from multiprocessing import shared_memory
+    from src.core.pesos_compartidos import CABECERA, MAGIC, FORMATO, SegmentoPesos
+
+    nombre = f"vt_test_{uuid.uuid4().hex[:8]}"
+    capacidad = 8 * 1024
+    # El creador ya creó el segmento pero todavía no escribió la cabecera
+    shm = shared_memory.SharedMemory(
+        name=nombre, create=True, size=CABECERA.size + capacidad * 4
+    )
+    creador = SegmentoPesos(shm, propietario=True)
+    pesos = pesos_aleatorios(semilla=3)
+
+    def publicar():
+        CABECERA.pack_into(shm.buf, 0, MAGIC, FORMATO, capacidad, 0, *([0] * 6))
+        creador.publicar(pesos)
+
+    threading.Timer(0.05, publicar).start()
+    lector = SegmentoPesos.abrir(nombre)
+    try:
+        assert lector.version == 2
+        _, capas = lector.vistas()
+        np.testing.assert_allclose(capas[2][1], CerebroNumpy(pesos).capas[2][1])
+        del capas
+
+        # Un segmento ajeno sigue rechazándose al vencer la espera
+        shm.buf[:4] = b"XXXX"
+        with pytest.raises(ValueError):
+            SegmentoPesos.abrir(nombre, espera=0.05)
+    finally:
+        lector.cerrar()
+        creador.destruir()
+
+
+def test_adaptador_cacheado_y_features_basicas(juego_bots):
+    adaptador = juego_bots.obtener_adaptador_ml()
+    assert juego_bots.obtener_adaptador_ml() is adaptador
+
+    bot, rival = juego_bots.jugadores
+    bot.teletransportar_a(10)
+    rival.teletransportar_a(14)
+    estado = adaptador.obtener_estado_vectorial("Bot_1")
+
+    assert estado.dtype == np.float32 and estado.shape == (9,)
+    assert estado[0] == pytest.approx(10 / 75)
+    assert estado[7] == pytest.approx(14 / 75)
+    assert estado[8] == pytest.approx(rival.get_puntaje() / 1000)
+    # Mismo buffer en cada llamada (sin allocations)
+    assert adaptador.obtener_estado_vectorial("Bot_2") is estado
+
+
+def test_extraccion_por_lote_entre_partidas(juego_bots):
+    from src.core.juego_web import JuegoOcaWeb
+    from src.core.ml_adapter import VoltraceMLAdapter
+
+    otro = JuegoOcaWeb([{"nombre": "Bot_A"}, {"nombre": "Bot_B"}, {"nombre": "Bot_C"}])
+    otro.jugadores[2].set_activo(False)
+    solicitudes = [(juego_bots, "Bot_1"), (otro, "Bot_B"), (otro, "Bot_C")]
+
+    matriz, activos = VoltraceMLAdapter.extraer_lote(solicitudes, extendido=True)
+    assert matriz.shape == (3, 25)
+    assert list(activos) == [True, True, False]
+    assert not matriz[2].any()
+
+    individual = juego_bots.obtener_adaptador_ml(True).obtener_estado_vectorial("Bot_1")
+    np.testing.assert_array_equal(matriz[0], individual)
+
+    agente = VoltraceAgenteInferencia(
+        CerebroNumpy(pesos_aleatorios(input_size=25)), epsilon=0.0
+    )
+    assert agente.tomar_decisiones(matriz).shape == (3,)
+
+
+def test_lookahead_sigue_cambios_del_tablero(juego_bots):
+    juego_bots.casillas_especiales.clear()
+    juego_bots.energia_packs = [{"nombre": "P", "posicion": 5, "valor": 150}]
+    juego_bots.version_tablero += 1
+    bot = juego_bots.jugadores[0]
+    bot.teletransportar_a(2)
+
+    adaptador = juego_bots.obtener_adaptador_ml(extendido=True)
+    estado = adaptador.obtener_estado_vectorial("Bot_1")
+    assert estado[13 + 2] == pytest.approx(1.0)  # Pack a 3 casillas
+
+    juego_bots._buscar_energia_en_posicion(bot, 5)
+    estado = adaptador.obtener_estado_vectorial("Bot_1")
+    assert estado[13 + 2] == pytest.approx(75 / 150)  # Pack reducido a la mitad
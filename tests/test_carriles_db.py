@@ -0,0 +1,152 @@
+import pytest
+import sys
+import os
+import threading
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from sqlalchemy.orm.exc import StaleDataError
+
+from src.core.carriles_db import CarrilesDB
+from src.app import app
+from src.models import db, User
+
+
+@pytest.fixture
+def db_carriles():
+    app.config["TESTING"] = True
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///:memory:"
+
+    with app.app_context():
+        db.create_all()
+        u = User(username="Carril", email="carril@test.com")
+        u.set_password("123")
+        db.session.add(u)
+        db.session.commit()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+def test_usuarios_distintos_no_se_bloquean():
+    carriles = CarrilesDB(num_carriles=8)
+    otro = next(
+        c for c in ("B", "C", "D", "E") if carriles.indice(c) != carriles.indice("A")
+    )
+    dentro, liberar = threading.Event(), threading.Event()
+    registro = []
+
+    def escritura_larga():
+        with carriles.bloquear("A"):
+            dentro.set()
+            liberar.wait(2)
+            registro.append("A")
+
+    hilo = threading.Thread(target=escritura_larga)
+    hilo.start()
+    assert dentro.wait(2)
+
+    # Otro usuario entra sin esperar; el mismo usuario no puede
+    with carriles.bloquear(otro):
+        registro.append(otro)
+    assert registro == [otro]
+    assert not carriles._carriles[carriles.indice("A")].acquire(blocking=False)
+
+    liberar.set()
+    hilo.join(2)
+    # Reentrante: quien tiene el carril puede volver a tomarlo
+    with carriles.bloquear("A", otro):
+        with carriles.bloquear("A"):
+            registro.append("anidado")
+    assert registro == [otro, "A", "anidado"]
+
+
+def test_conflicto_de_version_se_reintenta(db_carriles):
+    carriles = CarrilesDB()
+    intentos = []
+
+    def sumar_xp():
+        user = User.query.filter_by(username="Carril").first()
+        intentos.append(user.version)
+        if len(intentos) == 1:
+            # Otra escritura (ej. otro proceso) se adelanta y confirma
+            with db.engine.begin() as conexion:
+                conexion.execute(
+                    text(
+                        "UPDATE user SET xp = xp + 100, version = version + 1 WHERE id = :id"
+                    ),
+                    {"id": user.id},
+                )
+        user.xp += 10
+        db.session.commit()
+        return user.xp
+
+    assert carriles.ejecutar(["Carril"], sumar_xp) == 110
+    assert len(intentos) == 2
+    metricas = carriles.obtener_metricas()
+    assert metricas["conflictos"] == 1 and metricas["reintentos"] == 1
+
+
+def test_conflicto_persistente_se_propaga(db_carriles):
+    carriles = CarrilesDB(max_reintentos=2)
+
+    def siempre_en_conflicto():
+        user = User.query.filter_by(username="Carril").first()
+        with db.engine.begin() as conexion:
+            conexion.execute(
+                text("UPDATE user SET version = version + 1 WHERE id = :id"),
+                {"id": user.id},
+            )
+        user.xp += 10
+        db.session.commit()
+
+    with pytest.raises(StaleDataError):
+        carriles.ejecutar(["Carril"], siempre_en_conflicto)
+    metricas = carriles.obtener_metricas()
+    assert metricas["conflictos"] == 3 and metricas["agotados"] == 1
+
+
+def test_aceptar_amistad_choca_con_fin_de_partida_y_se_reintenta(
+    db_carriles, monkeypatch
+):
+    from src.social import SocialSystem
+
+    amigo = User(username="CarrilAmigo", email="amigo@test.com")
+    amigo.set_password("123")
+    db.session.add(amigo)
+    db.session.commit()
+    amigo.send_friend_request(User.query.filter_by(username="Carril").first())
+    db.session.commit()
+
+    carriles = CarrilesDB()
+    social = SocialSystem(carriles=carriles)
+    aceptar_original = User.accept_friend_request
+    llamadas = []
+
+    def aceptar_con_carrera(self, otro):
+        llamadas.append(1)
+        if len(llamadas) == 1:
+            # El fin de partida del amigo confirma justo antes que nosotros
+            with db.engine.begin() as conexion:
+                conexion.execute(
+                    text(
+                        "UPDATE user SET xp = xp + 100, version = version + 1 WHERE id = :id"
+                    ),
+                    {"id": otro.id},
+                )
+        return aceptar_original(self, otro)
+
+    monkeypatch.setattr(User, "accept_friend_request", aceptar_con_carrera)
+
+    resultado = social.accept_friend_request("Carril", "CarrilAmigo")
+    assert resultado["success"], resultado
+    assert len(llamadas) == 2
+    assert carriles.obtener_metricas()["reintentos"] == 1
+
+    db.session.expire_all()
+    usuario = User.query.filter_by(username="Carril").first()
+    amigo = User.query.filter_by(username="CarrilAmigo").first()
+    assert usuario.is_friend(amigo)
+    assert (usuario.friends_count, amigo.friends_count) == (1, 1)
+    assert amigo.xp == 100  # La escritura del fin de partida no se pisó
@@ -0,0 +1,76 @@
+import pytest
+import sys
+import os
+import json
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.catalogo import (
+    CATALOGO,
+    HABILIDADES_POR_ID,
+    KITS_CATALOGO,
+    catalogo_casillas,
+)
+from src.core.juego_web import JuegoOcaWeb
+from src.app import app, socketio
+
+
+@pytest.fixture
+def juego():
+    config = [
+        {"nombre": "Ana", "kit_id": "ingeniero"},
+        {"nombre": "Beto", "kit_id": "tactico"},
+    ]
+    return JuegoOcaWeb(config, achievement_system=None)
+
+
+def test_estado_por_turno_solo_referencia_ids(juego):
+    ana = juego.jugadores[0]
+    ana.habilidades_cooldown[ana.habilidades[1].nombre] = 3
+    estado = ana.to_dict()
+
+    assert estado["habilidades"] == KITS_CATALOGO["ingeniero"]["habilidades"]
+    assert estado["cooldowns"] == [0, 3, 0, 0]
+    nombres = [HABILIDADES_POR_ID[i]["nombre"] for i in estado["habilidades"]]
+    assert nombres == [h.nombre for h in ana.habilidades]
+    assert "descripcion" not in json.dumps(estado)
+
+
+def test_tablero_referencia_casillas_de_la_partida(juego):
+    definiciones = catalogo_casillas(juego)
+    tablero = juego.obtener_estado_tablero()
+
+    referencias = [
+        celda["casilla_especial"]
+        for celda in tablero.values()
+        if celda["casilla_especial"] is not None
+    ]
+    assert referencias
+    assert all(ref in definiciones for ref in referencias)
+
+    # Las minas no están en el catálogo: viajan completas
+    juego.casillas_especiales[2] = {"nombre": "Mina", "tipo": "trampa", "valor": -50}
+    assert juego.obtener_estado_tablero()[2]["casilla_especial"]["tipo"] == "trampa"
+
+
+@pytest.mark.parametrize("ruta", ["/api/get_all_abilities", "/api/get_all_perks"])
+def test_endpoints_del_catalogo_con_etag(ruta):
+    cliente = app.test_client()
+    primera = cliente.get(ruta)
+    assert primera.status_code == 200
+    etag = primera.headers["ETag"]
+
+    segunda = cliente.get(ruta, headers={"If-None-Match": etag})
+    assert segunda.status_code == 304
+    assert segunda.data == b""
+
+
+def test_catalogo_se_envia_al_conectar():
+    cliente = socketio.test_client(app)
+    recibidos = {e["name"]: e["args"][0] for e in cliente.get_received()}
+    cliente.disconnect()
+
+    catalogo = recibidos["catalogo"]
+    assert catalogo["etag"]
+    assert len(catalogo["habilidades"]) == len(CATALOGO["habilidades"])
+    assert set(catalogo["kits"]) == set(KITS_CATALOGO)
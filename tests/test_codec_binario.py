@@ -0,0 +1,136 @@
+import pytest
+import sys
+import os
+import json
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core import codec_binario
+from src.core.estado_sync import SincronizadorEstado
+from src.core.proyeccion_estado import JSONCrudo
+from src.core.juego_web import JuegoOcaWeb
+from src.app import app, socketio, _emitir_evento_juego
+
+
+def estado_de(juego):
+    return {
+        "jugadores": juego.obtener_estado_jugadores(),
+        "tablero": juego.obtener_estado_tablero(),
+        "turno_actual": juego.obtener_turno_actual(),
+        "ronda": juego.ronda,
+        "estado": "jugando",
+        "colores_jugadores": {},
+        "evento_global_activo": juego.evento_global_activo,
+    }
+
+
+@pytest.fixture
+def juego():
+    config = [
+        {"nombre": "Ana", "kit_id": "ingeniero"},
+        {"nombre": "Beto", "kit_id": "tactico"},
+    ]
+    return JuegoOcaWeb(config, achievement_system=None)
+
+
+# Lo que vería un cliente JSON (claves a texto, tuplas a listas)
+def via_json(datos):
+    return json.loads(json.dumps(datos))
+
+
+def test_ida_y_vuelta_igual_que_json(juego):
+    sync = SincronizadorEstado()
+    completo = sync.registrar(estado_de(juego))
+    juego.jugadores[0].teletransportar_a(12)
+    juego.jugadores[1].procesar_energia(-250)
+    juego.jugadores[1].efectos_activos.append({"tipo": "escudo", "turnos": 2})
+    delta = sync.registrar(estado_de(juego))
+
+    payloads = [
+        {"estado_delta": delta, "eventos": ["💀 -30 energía"]},
+        {"estado_delta": completo, "eventos_recientes": []},
+        {
+            "jugador": "Ana",
+            "resultado": {"dado": 6, "pos_inicial": 1, "pos_final": 7},
+            "habilidad_usada": None,
+            "extra": {3: [1000, -2000, 5], "x": 1.5, "s": "a" * 300},
+        },
+    ]
+    for datos in payloads:
+        assert codec_binario.decodificar(codec_binario.codificar(datos)) == via_json(
+            datos
+        )
+
+    # Los fragmentos pre-codificados se codifican desde sus datos
+    crudo = JSONCrudo.codificar(delta)
+    binario = codec_binario.codificar({"estado_delta": crudo})
+    assert codec_binario.decodificar(binario) == {"estado_delta": via_json(delta)}
+
+
+def test_empaqueta_posiciones_y_energia(juego):
+    cambios = {
+        "Ana": {"posicion": 12, "puntaje": 1250},
+        "Beto": {"puntaje": -40, "activo": False},
+    }
+    binario = codec_binario.codificar({"estado_delta": {"jugadores": cambios}})
+    assert codec_binario.decodificar(binario) == {
+        "estado_delta": {"jugadores": cambios}
+    }
+    # Energía fuera de int16: se envía sin empaquetar, sin perder datos
+    grande = {"Ana": {"puntaje": 10**6}}
+    binario = codec_binario.codificar({"estado_delta": {"jugadores": grande}})
+    assert codec_binario.decodificar(binario)["estado_delta"]["jugadores"] == grande
+
+
+def test_binario_mas_chico_que_json(juego):
+    sync = SincronizadorEstado()
+    sync.registrar(estado_de(juego))
+    juego.jugadores[0].teletransportar_a(12)
+    juego.jugadores[0].procesar_energia(300)
+    juego.turno_actual = 1
+    datos = {"estado_delta": sync.registrar(estado_de(juego)), "eventos": []}
+
+    assert len(codec_binario.codificar(datos)) < len(
+        json.dumps(datos, separators=(",", ":")).encode("utf-8")
+    )
+
+
+def test_emision_segun_codificacion_negociada():
+    app.config["TESTING"] = True
+    c_bin = socketio.test_client(app)
+    c_json = socketio.test_client(app)
+    try:
+        respuesta = c_bin.emit(
+            "negociar_codificacion", {"formatos": ["bin1", "json"]}, callback=True
+        )
+        assert respuesta["formato"] == codec_binario.FORMATO
+        assert respuesta["campos"] == list(codec_binario.CAMPOS)
+        viejo = c_json.emit(
+            "negociar_codificacion", {"formatos": ["json"]}, callback=True
+        )
+        assert viejo["formato"] == "json"
+
+        manager = socketio.server.manager
+        for c in (c_bin, c_json):
+            sid = manager.sid_from_eio_sid(c.eio_sid, "/")
+            socketio.server.enter_room(sid, "sala_codec", namespace="/")
+        c_bin.get_received()
+        c_json.get_received()
+
+        datos = {
+            "estado_delta": JSONCrudo.codificar(
+                {"version": 2, "base": 1, "jugadores": {"Ana": {"posicion": 4}}}
+            ),
+            "eventos": ["Ana sacó 3"],
+        }
+        _emitir_evento_juego("paso_2_resultado_casilla", datos, room="sala_codec")
+
+        en_json = c_json.get_received()
+        en_binario = c_bin.get_received()
+        assert len(en_json) == len(en_binario) == 1
+        recibido = en_binario[0]["args"][0]
+        assert isinstance(recibido, bytes)
+        assert codec_binario.decodificar(recibido) == en_json[0]["args"][0]
+    finally:
+        c_bin.disconnect()
+        c_json.disconnect()
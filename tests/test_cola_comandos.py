@@ -0,0 +1,152 @@
+import pytest
+import sys
+import os
+import threading
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.cola_comandos import ColaComandosSala
+from src.app import app, socketio, salas_activas, _cancelar_temporizador_turno
+from src.models import db, User
+
+
+def test_comandos_en_orden_y_sin_anidar():
+    cola = ColaComandosSala("SALA1")
+    registro = []
+
+    def primero():
+        registro.append("inicio 1")
+        # Encolado desde dentro de otro comando: corre después, no anidado
+        cola.encolar(registro.append, "2")
+        registro.append("fin 1")
+
+    cola.encolar(primero)
+    cola.encolar(registro.append, "3")
+    assert registro == ["inicio 1", "fin 1", "2", "3"]
+    assert cola.obtener_metricas()["procesados"] == 3
+    assert cola.profundidad == 0
+
+
+def test_otro_hilo_no_ejecuta_mientras_la_sala_esta_ocupada():
+    cola = ColaComandosSala("SALA1")
+    ocupado, liberar, encolado = threading.Event(), threading.Event(), threading.Event()
+    activos, max_activos, registro = [0], [0], []
+
+    def comando(nombre):
+        activos[0] += 1
+        max_activos[0] = max(max_activos[0], activos[0])
+        if nombre == "largo":
+            ocupado.set()
+            liberar.wait(2)
+        registro.append(nombre)
+        activos[0] -= 1
+
+    hilo = threading.Thread(target=cola.encolar, args=(comando, "largo"))
+    hilo.start()
+    assert ocupado.wait(2)
+
+    def encolar_corto():
+        cola.encolar(comando, "corto")
+        encolado.set()
+
+    otro = threading.Thread(target=encolar_corto)
+    otro.start()
+    # Vuelve enseguida: lo ejecutará el worker que ya tiene la sala
+    assert encolado.wait(2)
+    assert registro == [] and cola.profundidad == 1
+
+    liberar.set()
+    hilo.join(2)
+    otro.join(2)
+    assert registro == ["largo", "corto"]
+    assert max_activos[0] == 1
+
+
+def test_coalesce_comandos_con_la_misma_clave():
+    cola = ColaComandosSala("SALA1")
+    registro = []
+
+    def bloquear():
+        cola.encolar(registro.append, "turno_bot_1", clave="turno_bot")
+        cola.encolar(registro.append, "turno_bot_2", clave="turno_bot")
+        cola.encolar(registro.append, "otro")
+
+    cola.encolar(bloquear)
+    assert registro == ["turno_bot_2", "otro"]
+    assert cola.obtener_metricas()["coalescidos"] == 1
+
+    # Una vez ejecutado, la misma clave vuelve a encolarse normalmente
+    cola.encolar(registro.append, "turno_bot_3", clave="turno_bot")
+    assert registro[-1] == "turno_bot_3"
+
+
+def test_un_error_no_bloquea_la_sala():
+    cola = ColaComandosSala("SALA1")
+    registro = []
+
+    def fallar():
+        cola.encolar(registro.append, "siguiente")
+        raise RuntimeError("falla")
+
+    cola.encolar(fallar)
+    assert registro == ["siguiente"]
+    metricas = cola.obtener_metricas()
+    assert metricas["fallidos"] == 1 and metricas["procesados"] == 2
+
+
+@pytest.fixture
+def socket_env():
+    app.config["TESTING"] = True
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///:memory:"
+    app.config["SECRET_KEY"] = "secret_cola"
+    app.config["WTF_CSRF_ENABLED"] = False
+
+    with app.app_context():
+        db.create_all()
+        for nombre in ("ColaA", "ColaB"):
+            u = User(username=nombre, email=f"{nombre}@test.com")
+            u.set_password("123")
+            db.session.add(u)
+        db.session.commit()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+def nombres_recibidos(cliente):
+    return [e["name"] for e in cliente.get_received()]
+
+
+def test_handler_encolado_responde_a_su_cliente(socket_env):
+    c1 = socketio.test_client(socket_env)
+    c2 = socketio.test_client(socket_env)
+    c1.emit("authenticate", {"username": "ColaA"})
+    c2.emit("authenticate", {"username": "ColaB"})
+    c1.emit("crear_sala", {"kit_id": "tactico"})
+    id_sala = next(
+        e["args"][0]["id_sala"] for e in c1.get_received() if e["name"] == "sala_creada"
+    )
+    c2.emit("unirse_sala", {"id_sala": id_sala})
+    c1.emit("iniciar_juego", {"id_sala": id_sala})
+    sala = salas_activas[id_sala]
+    _cancelar_temporizador_turno(id_sala)
+
+    try:
+        con_turno = c1 if sala.juego.obtener_turno_actual() == "ColaA" else c2
+        nombres_recibidos(c1)
+        nombres_recibidos(c2)
+
+        def sala_ocupada():
+            # El dado llega mientras la sala procesa otro comando
+            con_turno.emit("lanzar_dado", {"id_sala": id_sala})
+            assert sala.comandos.profundidad == 1
+            assert "paso_1_resultado_movimiento" not in nombres_recibidos(con_turno)
+
+        sala.comandos.encolar(sala_ocupada)
+        assert "paso_1_resultado_movimiento" in nombres_recibidos(con_turno)
+        assert sala.comandos.obtener_metricas()["fallidos"] == 0
+    finally:
+        _cancelar_temporizador_turno(id_sala)
+        c1.disconnect()
+        c2.disconnect()
+        salas_activas.pop(id_sala, None)
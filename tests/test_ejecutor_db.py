@@ -0,0 +1,160 @@
+import pytest
+import sys
+import os
+import socket
+from contextlib import contextmanager
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.ejecutor_db import EjecutorDB
+
+
+class LanzadorManual:
+    # Guarda los workers lanzados para ejecutarlos cuando el test decide
+    def __init__(self):
+        self.pendientes = []
+
+    def __call__(self, funcion):
+        self.pendientes.append(funcion)
+
+    def correr(self):
+        while self.pendientes:
+            self.pendientes.pop(0)()
+
+
+def test_workers_acotados_y_todas_las_tareas_corren():
+    lanzador = LanzadorManual()
+    ejecutor = EjecutorDB(lanzador, dormir=lambda s: None, max_workers=2)
+    hechas = []
+    for i in range(10):
+        assert ejecutor.enviar(hechas.append, i)
+
+    # Un hilo por tarea serían 10; aquí solo se lanzan 2 workers
+    assert len(lanzador.pendientes) == 2
+    assert ejecutor.obtener_metricas()["profundidad"] == 10
+
+    lanzador.correr()
+    assert hechas == list(range(10))
+    metricas = ejecutor.obtener_metricas()
+    assert metricas["completadas"] == 10 and metricas["workers_activos"] == 0
+
+    # Con los workers terminados, una nueva tarea lanza otro
+    ejecutor.enviar(hechas.append, 10)
+    assert len(lanzador.pendientes) == 1
+
+
+def test_cola_llena_descarta_o_espera():
+    lanzador = LanzadorManual()
+    ahora = [0.0]
+
+    def dormir(segundos):
+        ahora[0] += segundos
+
+    ejecutor = EjecutorDB(
+        lanzador,
+        dormir,
+        max_workers=1,
+        max_cola=3,
+        espera_max=0.5,
+        reloj=lambda: ahora[0],
+    )
+    hechas = []
+    for i in range(3):
+        ejecutor.enviar(hechas.append, i)
+
+    # Tarea descartable (ej. contar un chat): se rechaza sin esperar
+    assert not ejecutor.enviar(hechas.append, "chat", descartable=True)
+    # Tarea importante: espera hasta 'espera_max' y se encola igual
+    assert ejecutor.enviar(hechas.append, "xp")
+    assert ahora[0] >= 0.5
+
+    lanzador.correr()
+    assert hechas == [0, 1, 2, "xp"]
+    metricas = ejecutor.obtener_metricas()
+    assert metricas["rechazadas"] == 1 and metricas["esperas_cola_llena"] == 1
+    assert metricas["latencia_max_ms"] >= 500
+
+
+def test_un_error_no_detiene_al_worker_y_usa_el_contexto():
+    lanzador = LanzadorManual()
+    contextos = []
+
+    @contextmanager
+    def contexto():
+        contextos.append("entrar")
+        try:
+            yield
+        finally:
+            contextos.append("salir")
+
+    ejecutor = EjecutorDB(lanzador, dormir=lambda s: None, contexto=contexto)
+    hechas = []
+
+    def fallar():
+        raise RuntimeError("falla")
+
+    ejecutor.enviar(fallar)
+    ejecutor.enviar(hechas.append, "siguiente")
+    lanzador.correr()
+
+    assert hechas == ["siguiente"]
+    assert contextos == ["entrar", "salir"] * 2
+    metricas = ejecutor.obtener_metricas()
+    assert metricas["fallidas"] == 1 and metricas["completadas"] == 1
+
+
+class ConexionLenta:
+    # Imita una conexión psycopg2 asíncrona: la "respuesta del servidor"
+    # llega por un socket cuando el test la escribe
+    def __init__(self, lector):
+        self.lector = lector
+
+    def fileno(self):
+        return self.lector.fileno()
+
+    def poll(self):
+        from psycopg2 import extensions
+
+        try:
+            return extensions.POLL_OK if self.lector.recv(1) else extensions.POLL_READ
+        except BlockingIOError:
+            return extensions.POLL_READ
+
+
+def test_consulta_lenta_no_congela_el_hub():
+    eventlet = pytest.importorskip("eventlet")
+    pytest.importorskip("psycopg2")
+    from src.core.psycopg_cooperativo import espera_cooperativa
+
+    lector, servidor = socket.socketpair()
+    lector.setblocking(False)
+    conexion = ConexionLenta(lector)
+    ejecutor = EjecutorDB(iniciar_tarea=eventlet.spawn, dormir=eventlet.sleep)
+    terminadas = []
+    latidos = []
+
+    def consulta():
+        espera_cooperativa(conexion)  # Lo que psycopg2 llama por cada consulta
+        terminadas.append(len(latidos))
+
+    def latir():
+        while not terminadas:
+            latidos.append(1)
+            eventlet.sleep(0.01)
+
+    def responder():
+        eventlet.sleep(0.3)
+        servidor.send(b"x")
+
+    try:
+        ejecutor.enviar(consulta)
+        otros = [eventlet.spawn(latir), eventlet.spawn(responder)]
+        for hilo in otros:
+            hilo.wait()
+    finally:
+        lector.close()
+        servidor.close()
+
+    # El resto del servidor siguió corriendo mientras la consulta esperaba
+    assert terminadas and terminadas[0] >= 10
+    assert ejecutor.obtener_metricas()["completadas"] == 1
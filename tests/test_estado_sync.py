@@ -0,0 +1,231 @@
+import pytest
+import sys
+import os
+import json
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.estado_sync import SincronizadorEstado
+from src.core.proyeccion_estado import ProyeccionSala, JSONCrudo, JsonSocketIO
+from src.core.juego_web import JuegoOcaWeb
+from src.app import (
+    app,
+    socketio,
+    salas_activas,
+    _cancelar_temporizador_turno,
+    _delta_estado_juego,
+)
+from src.models import db, User
+
+
+def estado_de(juego):
+    return {
+        "jugadores": juego.obtener_estado_jugadores(),
+        "tablero": juego.obtener_estado_tablero(),
+        "turno_actual": juego.obtener_turno_actual(),
+        "ronda": juego.ronda,
+        "estado": "jugando",
+        "colores_jugadores": {},
+        "evento_global_activo": juego.evento_global_activo,
+    }
+
+
+# Registra el estado y devuelve la vista completa con su versión
+def completo(sync, juego):
+    sync.registrar(estado_de(juego))
+    return dict(sync.vista(), version=sync.version)
+
+
+# Misma lógica que aplicarDeltaEstado (estadoSync.js)
+def aplicar_delta(local, delta):
+    assert local["version"] == delta["base"]
+    jugadores = [
+        dict(j, **delta["jugadores"].get(j["nombre"], {})) for j in local["jugadores"]
+    ]
+    tablero = {str(pos): celda for pos, celda in local["tablero"].items()}
+    for pos, celda in delta["tablero"].items():
+        if celda is None:
+            tablero.pop(pos, None)
+        else:
+            tablero[pos] = celda
+    return dict(
+        local,
+        **delta["globales"],
+        jugadores=jugadores,
+        tablero=tablero,
+        version=delta["version"],
+    )
+
+
+def normalizar(estado):
+    estado = dict(estado, tablero={str(k): v for k, v in estado["tablero"].items()})
+    estado.pop("version", None)
+    return json.loads(json.dumps(estado, sort_keys=True))
+
+
+@pytest.fixture
+def juego():
+    config = [
+        {"nombre": "Ana", "kit_id": "tactico"},
+        {"nombre": "Beto", "kit_id": "ingeniero"},
+    ]
+    return JuegoOcaWeb(config, achievement_system=None)
+
+
+def test_delta_solo_trae_lo_que_cambio(juego):
+    sync = SincronizadorEstado()
+    inicial = completo(sync, juego)
+    assert inicial["version"] == 1
+
+    # Sin cambios: la versión no avanza y el delta va vacío
+    delta = sync.registrar(estado_de(juego))
+    assert delta["version"] == delta["base"] == 1
+    assert SincronizadorEstado.delta_vacio(delta)
+
+    juego.jugadores[0].teletransportar_a(10)
+    juego.ronda += 1
+    delta = sync.registrar(estado_de(juego))
+    assert (delta["base"], delta["version"]) == (1, 2)
+    assert delta["globales"] == {"ronda": juego.ronda}
+    assert set(delta["jugadores"]) == {"Ana"}
+    assert delta["jugadores"]["Ana"]["posicion"] == 10
+    # Las descripciones de habilidades no viajan si no cambiaron
+    assert "habilidades" not in delta["jugadores"]["Ana"]
+
+
+def test_mutaciones_en_el_lugar_y_celdas_vaciadas(juego):
+    sync = SincronizadorEstado()
+    local = completo(sync, juego)
+
+    # efectos_activos se muta en el lugar: igual debe detectarse
+    juego.jugadores[1].efectos_activos.append({"tipo": "escudo", "turnos": 2})
+    juego.jugadores[0].teletransportar_a(7)
+    # Una casilla que desaparece (ej. mina consumida) vacía su celda
+    pos_vaciada = next(
+        pos
+        for pos in juego.casillas_especiales
+        if all(p["posicion"] != pos for p in juego.energia_packs)
+    )
+    del juego.casillas_especiales[pos_vaciada]
+    delta = sync.registrar(estado_de(juego))
+    assert "efectos_activos" in delta["jugadores"]["Beto"]
+    assert delta["tablero"] == {str(pos_vaciada): None}
+
+    local = aplicar_delta(local, delta)
+    assert normalizar(local) == normalizar(estado_de(juego))
+
+
+def test_delta_mucho_mas_chico_que_el_estado_completo(juego):
+    sync = SincronizadorEstado()
+    sync.registrar(estado_de(juego))
+    juego.jugadores[0].teletransportar_a(12)
+    juego.turno_actual = 1
+
+    completo = len(json.dumps(estado_de(juego)))
+    delta = len(json.dumps(sync.registrar(estado_de(juego))))
+    assert delta * 10 < completo
+
+
+@pytest.fixture
+def socket_env():
+    app.config["TESTING"] = True
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///:memory:"
+    app.config["SECRET_KEY"] = "secret_sync"
+    app.config["WTF_CSRF_ENABLED"] = False
+
+    with app.app_context():
+        db.create_all()
+        for nombre in ("SyncA", "SyncB", "Mirón"):
+            u = User(username=nombre, email=f"{nombre}@test.com")
+            u.set_password("123")
+            db.session.add(u)
+        db.session.commit()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+def get_event_arg(received, event_name):
+    for event in received:
+        if event["name"] == event_name:
+            return event["args"][0]
+    return None
+
+
+def test_proyeccion_reutiliza_el_completo_de_cada_version(juego):
+    proyeccion = ProyeccionSala(lambda: estado_de(juego), lambda: {"extra": 1})
+    primero = proyeccion.completo()
+    assert proyeccion.completo() is primero
+
+    # El motor cambia sin emitir: el completo sigue siendo el de la versión
+    # vigente, que es desde donde parte el próximo delta
+    juego.jugadores[0].teletransportar_a(20)
+    assert proyeccion.completo() is primero
+    delta = json.loads(proyeccion.delta().texto)
+    assert delta["base"] == json.loads(primero.texto)["version"]
+
+    segundo = json.loads(proyeccion.completo().texto)
+    assert segundo["version"] == delta["version"]
+    assert segundo["jugadores"][0]["posicion"] == 20
+    assert segundo["extra"] == 1
+    assert proyeccion.obtener_metricas()["completos_codificados"] == 2
+
+
+def test_json_socketio_inserta_fragmentos_crudos():
+    crudo = JSONCrudo.codificar({"a": [1, 2], "b": "ñ"})
+    paquete = ["evento", {"estado_delta": crudo, "privado": "\x00x:0\x00"}]
+    texto = JsonSocketIO.dumps(paquete, separators=(",", ":"))
+    assert JsonSocketIO.loads(texto) == [
+        "evento",
+        {"estado_delta": {"a": [1, 2], "b": "ñ"}, "privado": "\x00x:0\x00"},
+    ]
+    with pytest.raises(TypeError):
+        JsonSocketIO.dumps({"x": object()})
+
+
+def test_resincronizacion_por_socket(socket_env):
+    c1 = socketio.test_client(socket_env)
+    c2 = socketio.test_client(socket_env)
+    c3 = socketio.test_client(socket_env)
+    c1.emit("authenticate", {"username": "SyncA"})
+    c2.emit("authenticate", {"username": "SyncB"})
+    c3.emit("authenticate", {"username": "Mirón"})
+
+    c1.emit("crear_sala", {"kit_id": "tactico"})
+    id_sala = get_event_arg(c1.get_received(), "sala_creada")["id_sala"]
+    c2.emit("unirse_sala", {"id_sala": id_sala})
+    c1.emit("iniciar_juego", {"id_sala": id_sala})
+    sala = salas_activas[id_sala]
+    _cancelar_temporizador_turno(id_sala)
+
+    try:
+        inicial = get_event_arg(c2.get_received(), "juego_iniciado")
+        assert inicial["version"] == sala.proyeccion.version
+        assert inicial["catalogo_casillas"]
+        c1.get_received()
+
+        # c2 pierde un delta
+        sala.juego.jugadores[0].teletransportar_a(9)
+        socketio.emit(
+            "estado_juego_actualizado",
+            {"estado_delta": _delta_estado_juego(sala), "eventos_recientes": []},
+            room=id_sala,
+        )
+        delta = get_event_arg(c1.get_received(), "estado_juego_actualizado")
+        assert delta["estado_delta"]["base"] == inicial["version"]
+        c2.get_received()
+
+        c2.emit("solicitar_estado_completo", {"id_sala": id_sala})
+        completo = get_event_arg(c2.get_received(), "estado_juego_completo")
+        estado = completo["estado_juego"]
+        assert estado["version"] == delta["estado_delta"]["version"]
+        assert estado["jugadores"][0]["posicion"] == 9
+
+        # Quien no participa de la sala no recibe nada
+        c3.emit("solicitar_estado_completo", {"id_sala": id_sala})
+        assert get_event_arg(c3.get_received(), "estado_juego_completo") is None
+    finally:
+        _cancelar_temporizador_turno(id_sala)
+        for c in (c1, c2, c3):
+            c.disconnect()
+        salas_activas.pop(id_sala, None)
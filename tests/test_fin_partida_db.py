@@ -0,0 +1,131 @@
+import pytest
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event
+
+from src.app import app, achievement_system, escritor_fin_partida, rankings_maestria
+from src.models import db, User, Achievement, UserAchievement, UserKitMaestria
+from src.core.game_config import (
+    XP_POR_PARTIDA,
+    XP_VICTORIA,
+    XP_MAESTRIA_BASE,
+    XP_MAESTRIA_VICTORIA,
+)
+
+NOMBRES = ("FinA", "FinB", "FinC", "FinD")
+
+
+@pytest.fixture
+def db_fin_partida():
+    app.config["TESTING"] = True
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///:memory:"
+
+    with app.app_context():
+        db.create_all()
+        existentes = {a.internal_id for a in Achievement.query.all()}
+        for internal_id, config in achievement_system.achievements_config.items():
+            if internal_id not in existentes:
+                db.session.add(
+                    Achievement(
+                        internal_id=internal_id,
+                        name=config.get("name", internal_id),
+                        xp_reward=config.get("xp_reward", 0),
+                    )
+                )
+        for nombre in NOMBRES:
+            u = User(username=nombre, email=f"{nombre}@test.com")
+            u.set_password("123")
+            db.session.add(u)
+        db.session.commit()
+
+        # FinA ya jugó: nivel de maestría, kit con XP previa y un logro
+        fin_a = User.query.filter_by(username="FinA").first()
+        fin_a.level, fin_a.xp, fin_a.games_played = 6, 2600, 3
+        db.session.add(
+            UserKitMaestria(user_id=fin_a.id, kit_id="tactico", xp=6700, level=1)
+        )
+        primera = Achievement.query.filter_by(internal_id="first_game").first()
+        db.session.add(UserAchievement(user_id=fin_a.id, achievement_id=primera.id))
+        db.session.commit()
+        achievement_system.load_definitions()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+def jugadores_de_partida(ganador):
+    return [
+        {
+            "username": nombre,
+            "ganador": nombre == ganador,
+            "kit_id": "tactico",
+            "event_data": {
+                "won": nombre == ganador,
+                "final_energy": 300,
+                "reached_position": 75 if nombre == ganador else 40,
+                "total_rounds": 20,
+                "player_count": len(NOMBRES),
+                "never_eliminated": True,
+            },
+        }
+        for nombre in NOMBRES
+    ]
+
+
+def test_fin_de_partida_de_4_jugadores_en_pocas_consultas(db_fin_partida):
+    sentencias = []
+
+    def contar(conn, cursor, statement, parameters, context, executemany):
+        sentencias.append(statement.split()[0].upper())
+
+    event.listen(db.engine, "before_cursor_execute", contar)
+    try:
+        resultados = escritor_fin_partida.registrar(jugadores_de_partida("FinA"))
+    finally:
+        event.remove(db.engine, "before_cursor_execute", contar)
+
+    # SELECT usuarios + logros (2 selectin) + maestrías (definiciones de
+    # logros en memoria); insert de logros; UPDATE por lotes; upsert de
+    # maestrías; resultados de la partida y upsert de resúmenes por período
+    assert sentencias.count("SELECT") == 4
+    assert sentencias.count("UPDATE") == 1
+    assert sentencias.count("INSERT") == 4
+    assert len(sentencias) == 9
+
+    a = resultados["FinA"]
+    assert a["games_played"] == 4 and a["games_won"] == 1
+    assert a["cosmetico"]  # 6700 + XP de maestría >= 6750
+    assert "first_game" not in a["logros"] and "first_win" in a["logros"]
+    assert "first_game" in resultados["FinB"]["logros"]
+
+    fin_a = User.query.filter_by(username="FinA").first()
+    recompensas = sum(
+        achievement_system.achievements_config[i].get("xp_reward", 0)
+        for i in a["logros"]
+    )
+    assert fin_a.xp == 2600 + XP_POR_PARTIDA + XP_VICTORIA + recompensas == a["xp"]
+    assert fin_a.version == 3  # creación + ajuste del fixture + fin de partida
+    maestria = UserKitMaestria.query.filter_by(user_id=fin_a.id).one()
+    assert maestria.xp == 6700 + XP_MAESTRIA_VICTORIA and maestria.cosmetic_unlocked
+    # El ranking del kit quedó con la XP total confirmada
+    assert rankings_maestria.posicion("tactico", "FinA")["xp"] == maestria.xp
+
+
+def test_segunda_partida_suma_maestria_sin_duplicar(db_fin_partida):
+    escritor_fin_partida.registrar(jugadores_de_partida("FinA"))
+    resultados = escritor_fin_partida.registrar(jugadores_de_partida("FinB"))
+
+    fin_a = User.query.filter_by(username="FinA").first()
+    maestria = UserKitMaestria.query.filter_by(user_id=fin_a.id).one()
+    assert maestria.xp == 6700 + XP_MAESTRIA_VICTORIA + XP_MAESTRIA_BASE
+    assert not resultados["FinA"]["cosmetico"]  # Ya estaba desbloqueado
+    assert resultados["FinA"]["consecutive_wins"] == 0
+    assert resultados["FinB"]["games_played"] == 2
+    ids = [
+        ua.achievement_id
+        for ua in UserAchievement.query.filter_by(user_id=fin_a.id).all()
+    ]
+    assert len(ids) == len(set(ids))
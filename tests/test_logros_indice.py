@@ -0,0 +1,172 @@
+import pytest
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event
+
+from src.app import app
+from src.core.achievements import AchievementSystem
+from src.core.carriles_db import CarrilesDB
+from src.models import db, User, Achievement, UserAchievement
+
+
+@pytest.fixture
+def sistema_logros():
+    app.config["TESTING"] = True
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///:memory:"
+
+    # Instancia propia: la cache no se comparte con otros tests
+    sistema = AchievementSystem(CarrilesDB())
+    with app.app_context():
+        db.create_all()
+        existentes = {a.internal_id for a in Achievement.query.all()}
+        for internal_id, config in sistema.achievements_config.items():
+            if internal_id not in existentes:
+                db.session.add(
+                    Achievement(
+                        internal_id=internal_id,
+                        name=config.get("name", internal_id),
+                        xp_reward=config.get("xp_reward", 0),
+                    )
+                )
+        u = User(username="Indice", email="indice@test.com")
+        u.set_password("123")
+        db.session.add(u)
+        db.session.commit()
+        sistema.load_definitions()
+        yield sistema
+        db.session.remove()
+        db.drop_all()
+
+
+def contar_sentencias(funcion, *args):
+    sentencias = []
+
+    def contar(conn, cursor, statement, parameters, context, executemany):
+        sentencias.append(statement.split()[0].upper())
+
+    event.listen(db.engine, "before_cursor_execute", contar)
+    try:
+        resultado = funcion(*args)
+    finally:
+        event.remove(db.engine, "before_cursor_execute", contar)
+    return resultado, sentencias
+
+
+def test_todas_las_reglas_estan_indexadas():
+    sistema = AchievementSystem(CarrilesDB())
+    indexados = set().union(*sistema.rules_by_event.values())
+    indexados |= set().union(*sistema.rules_by_stat.values())
+    assert indexados == set(sistema.achievements_config)
+    # Un dado no revisa persistencia ni reglas de estadísticas
+    assert sistema.candidate_rules([("dice_rolled", {})], []) == {"lucky_seven"}
+
+
+def test_eventos_sin_novedad_no_consultan_la_db(sistema_logros):
+    # Primera evaluación: carga el usuario y sus logros, y desbloquea
+    assert sistema_logros.check_achievement(
+        "Indice", "game_event", {"event_name": "fantasma"}
+    ) == ["fantasma"]
+
+    casos = [
+        ("dice_rolled", {"consecutive_sixes": 1}),
+        ("game_event", {"event_name": "fantasma"}),  # Ya desbloqueado
+        ("login", {"login_days": 2}),
+    ]
+    for tipo, datos in casos:
+        desbloqueados, sentencias = contar_sentencias(
+            sistema_logros.check_achievement, "Indice", tipo, datos
+        )
+        assert desbloqueados == [] and sentencias == [], tipo
+
+    # Reglas que leen estadísticas: solo el usuario, sin sus logros
+    desbloqueados, sentencias = contar_sentencias(
+        sistema_logros.check_achievement, "Indice", "room_created"
+    )
+    assert desbloqueados == [] and sentencias == ["SELECT"]
+    assert sistema_logros.get_metrics()["cache_fallos"] == 1
+
+
+def test_cache_refleja_lo_desbloqueado(sistema_logros):
+    sistema_logros.check_achievement("Indice", "dice_rolled", {"consecutive_sixes": 3})
+    user = User.query.filter_by(username="Indice").first()
+    assert user.xp == sistema_logros.achievements_config["lucky_seven"]["xp_reward"]
+
+    # Otro proceso otorgó 'inmortal': la cache no lo sabe, la verificación
+    # final en la DB evita duplicarlo
+    inmortal = Achievement.query.filter_by(internal_id="inmortal").first()
+    db.session.add(UserAchievement(user_id=user.id, achievement_id=inmortal.id))
+    db.session.commit()
+    assert (
+        sistema_logros.check_achievement(
+            "Indice", "game_event", {"event_name": "inmortal"}
+        )
+        == []
+    )
+    assert UserAchievement.query.filter_by(user_id=user.id).count() == 2
+
+    # Al irse el usuario se recarga desde la DB
+    sistema_logros.forget_user("Indice")
+    assert sistema_logros.check_achievement("Indice", "dice_rolled", {}) == []
+    assert sistema_logros._unlocked_cache["Indice"] == {"lucky_seven", "inmortal"}
+
+
+def test_desbloquear_varios_logros_en_sentencias_constantes(sistema_logros):
+    sistema_logros.check_achievement("Indice", "dice_rolled", {})  # Cache cargada
+
+    datos = {
+        "won": True,
+        "total_rounds": 60,
+        "final_energy": 1200,
+        "reached_position": 75,
+        "abilities_used": 5,
+    }
+    desbloqueados, sentencias = contar_sentencias(
+        sistema_logros.check_achievement, "Indice", "game_finished", datos
+    )
+    # Usuario (sin logros precargados), un INSERT de todos los logros y el
+    # UPDATE de XP; las definiciones ya están en memoria
+    assert len(desbloqueados) >= 6
+    assert sentencias == ["SELECT", "INSERT", "UPDATE"]
+
+    user = User.query.filter_by(username="Indice").first()
+    assert UserAchievement.query.filter_by(user_id=user.id).count() == len(
+        desbloqueados
+    )
+    assert user.xp == sum(
+        sistema_logros.achievements_config[i]["xp_reward"] for i in desbloqueados
+    )
+
+
+def progreso_de(documento, internal_id):
+    return next(a for a in documento["achievements"] if a["id"] == internal_id)
+
+
+def test_progreso_de_perfil_se_sirve_desde_memoria(sistema_logros):
+    documento = sistema_logros.get_user_achievement_progress("Indice")
+    assert documento["unlocked"] == 0
+    assert progreso_de(documento, "room_host")["current_value"] == 0
+
+    # Segunda vista: sin consultas
+    documento, sentencias = contar_sentencias(
+        sistema_logros.get_user_achievement_progress, "Indice"
+    )
+    assert sentencias == []
+
+    # Una evaluación actualiza estadísticas y desbloqueos del documento
+    user = User.query.filter_by(username="Indice").first()
+    user.rooms_created = 3
+    db.session.commit()
+    assert sistema_logros.check_achievement("Indice", "room_created") == ["first_room"]
+
+    documento, sentencias = contar_sentencias(
+        sistema_logros.get_user_achievement_progress, "Indice"
+    )
+    assert sentencias == []
+    assert documento["unlocked"] == 1
+    assert progreso_de(documento, "first_room")["unlocked"]
+    assert progreso_de(documento, "first_room")["unlocked_at"]
+    assert progreso_de(documento, "room_host")["current_value"] == 3
+    assert progreso_de(documento, "coleccionista")["current_value"] == 1
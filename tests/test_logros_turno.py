@@ -0,0 +1,106 @@
+import pytest
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.juego_web import JuegoOcaWeb
+from src.app import app, achievement_system, ranking
+from src.core.ranking import RankingMaterializado
+from src.models import db, User, Achievement
+
+LOGROS_DE_EVENTO = ("fantasma", "muralla_humana", "inmortal")
+
+
+@pytest.fixture
+def db_logros():
+    app.config["TESTING"] = True
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///:memory:"
+
+    with app.app_context():
+        db.create_all()
+        existentes = {a.internal_id for a in Achievement.query.all()}
+        for internal_id in LOGROS_DE_EVENTO:
+            if internal_id not in existentes:
+                config = achievement_system.achievements_config[internal_id]
+                db.session.add(
+                    Achievement(
+                        internal_id=internal_id,
+                        name=config["name"],
+                        xp_reward=config.get("xp_reward", 0),
+                    )
+                )
+        for nombre in ("LogroA", "LogroB"):
+            u = User(username=nombre, email=f"{nombre}@test.com")
+            u.set_password("123")
+            db.session.add(u)
+        db.session.commit()
+        achievement_system.load_definitions()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+def test_motor_acumula_hechos_del_turno():
+    juego = JuegoOcaWeb([{"nombre": "A"}, {"nombre": "B"}])
+    objetivo = juego._encontrar_jugador("B")
+    objetivo.efectos_activos.append({"tipo": "invisible", "turnos": 2})
+
+    assert not juego._puede_ser_afectado(objetivo)
+    assert juego.extraer_hechos_logros() == [
+        ("B", "game_event", {"event_name": "fantasma"})
+    ]
+    # Extraer vacía el buffer: el próximo turno empieza limpio
+    assert juego.extraer_hechos_logros() == []
+
+
+def test_lote_evalua_a_todos_con_un_solo_commit(db_logros, monkeypatch):
+    commits = []
+    commit_original = db.session.commit
+
+    def contar_commit():
+        commits.append(1)
+        commit_original()
+
+    monkeypatch.setattr(db.session, "commit", contar_commit)
+
+    desbloqueados = achievement_system.check_achievements_batch(
+        {
+            "LogroA": [
+                ("game_event", {"event_name": "fantasma"}),
+                ("game_event", {"event_name": "muralla_humana"}),
+                ("game_event", {"event_name": "fantasma"}),
+            ],
+            "LogroB": [("game_event", {"event_name": "inmortal"})],
+            "Bot_1": [("game_event", {"event_name": "fantasma"})],
+        }
+    )
+
+    assert sorted(desbloqueados["LogroA"]) == ["fantasma", "muralla_humana"]
+    assert desbloqueados["LogroB"] == ["inmortal"]
+    assert "Bot_1" not in desbloqueados
+    assert len(commits) == 1
+
+    usuario = User.query.filter_by(username="LogroA").first()
+    assert len(usuario.unlocked_achievements_assoc) == 2
+
+
+def test_desbloqueo_mueve_al_jugador_en_el_ranking(db_logros, monkeypatch):
+    assert achievement_system.ranking is ranking
+    avisos = []
+    propio = RankingMaterializado(al_cambiar_top=avisos.append)
+    propio.cargar([("LogroA", 1, 0, 0, 0), ("LogroB", 1, 100, 0, 0)])
+    monkeypatch.setattr(achievement_system, "ranking", propio)
+    for nombre in ("LogroA", "LogroB"):
+        achievement_system.forget_user(nombre)
+
+    desbloqueados = achievement_system.check_achievements_batch(
+        {"LogroA": [("game_event", {"event_name": "fantasma"})]}
+    )
+
+    assert desbloqueados == {"LogroA": ["fantasma"]}
+    usuario = User.query.filter_by(username="LogroA").first()
+    assert usuario.xp == 150
+    assert propio.posicion("LogroA") == 1
+    assert propio.top(1)[0]["xp"] == usuario.xp
+    assert [j["username"] for j in avisos[-1]] == ["LogroA", "LogroB"]
@@ -0,0 +1,129 @@
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.planificador_bots import PlanificadorBots
+
+
+class RelojFalso:
+    def __init__(self):
+        self.ahora = 1000.0
+
+    def __call__(self):
+        return self.ahora
+
+
+def crear_planificador(ejecutados, reloj, **kwargs):
+    return PlanificadorBots(
+        ejecutar_turno=lambda sala, bot: ejecutados.append((sala, bot)),
+        iniciar_tarea=lambda *a: None,  # Sin ticker real: se avanza a mano
+        dormir=lambda s: None,
+        reloj=reloj,
+        **kwargs,
+    )
+
+
+def test_turno_se_ejecuta_al_vencer():
+    ejecutados, reloj = [], RelojFalso()
+    planificador = crear_planificador(ejecutados, reloj, retardo_turno=2.0)
+    planificador.programar("SALA1", "Bot_1")
+
+    reloj.ahora += 1.0
+    planificador.avanzar()
+    assert not planificador.ejecutar_siguiente()
+
+    reloj.ahora += 1.5
+    planificador.avanzar()
+    assert planificador.ejecutar_siguiente()
+    assert ejecutados == [("SALA1", "Bot_1")]
+    assert planificador.obtener_metricas()["turnos_agendados"] == 0
+
+
+def test_cancelar_y_reprogramar_reemplaza_turno():
+    ejecutados, reloj = [], RelojFalso()
+    planificador = crear_planificador(ejecutados, reloj)
+    planificador.programar("SALA1", "Bot_1", retardo=0.5)
+    planificador.programar("SALA1", "Bot_2", retardo=0.5)
+    planificador.programar("SALA2", "Bot_3", retardo=0.5)
+    assert planificador.cancelar("SALA2")
+
+    reloj.ahora += 1.0
+    planificador.avanzar()
+    while planificador.ejecutar_siguiente():
+        pass
+    assert ejecutados == [("SALA1", "Bot_2")]
+
+
+def test_round_robin_entre_salas_y_metricas_de_lag():
+    ejecutados, reloj = [], RelojFalso()
+    planificador = crear_planificador(ejecutados, reloj)
+    for i in range(3):
+        planificador.programar(f"SALA{i}", "Bot_1", retardo=0.1 * (i + 1))
+
+    # Turnos con retardo mayor que la vuelta completa de la rueda
+    planificador.programar("LEJANA", "Bot_9", retardo=600)
+
+    reloj.ahora += 1.0
+    planificador.avanzar()
+    while planificador.ejecutar_siguiente():
+        pass
+
+    assert [s for s, _ in ejecutados] == ["SALA0", "SALA1", "SALA2"]
+    metricas = planificador.obtener_metricas()
+    assert metricas["turnos_ejecutados"] == 3
+    assert metricas["lag_turno_max_ms"] >= 700
+    assert planificador.tiene_turno_pendiente("LEJANA")
+
+
+def test_back_pressure_espacia_turnos():
+    ejecutados, reloj = [], RelojFalso()
+    planificador = crear_planificador(ejecutados, reloj, max_listos=2)
+    for i in range(6):
+        planificador.programar(f"SALA{i}", "Bot_1", retardo=0.1)
+    reloj.ahora += 0.5
+    planificador.avanzar()
+
+    assert planificador.obtener_metricas()["cola_listos"] == 6
+    assert planificador.factor_presion() > 1.0
+    turno = planificador.programar("NUEVA", "Bot_1")
+    assert turno.vence - reloj.ahora > planificador.retardo_turno
+
+
+def test_sala_solo_bots_corre_a_velocidad_de_motor(monkeypatch):
+    import time
+    import src.app as servidor
+
+    emitidos = []
+    emit_original = servidor.socketio.emit
+
+    def espia(evento, *args, **kwargs):
+        emitidos.append(evento)
+        return emit_original(evento, *args, **kwargs)
+
+    monkeypatch.setattr(servidor.socketio, "emit", espia)
+    # Sin escritura de estadísticas: solo interesa el ritmo de la sala
+    monkeypatch.setattr(
+        servidor, "_procesar_estadisticas_fin_juego_async", lambda *a: None
+    )
+
+    sala = servidor.SalaJuego("ffwd01")
+    for i in range(1, 5):
+        sala.agregar_jugador(f"Bot_{i}", f"Bot_{i}")
+    sala.iniciar_juego()
+    servidor.salas_activas[sala.id_sala] = sala
+    assert servidor._retardo_turno_bot(sala) == 0.0
+
+    try:
+        inicio = time.monotonic()
+        servidor._iniciar_temporizador_turno(
+            sala.id_sala, sala.juego.obtener_turno_actual()
+        )
+        while sala.estado == "jugando" and time.monotonic() - inicio < 20:
+            servidor.socketio.sleep(0.05)
+
+        assert sala.estado == "terminado"
+        assert "estado_juego_actualizado" not in emitidos
+        assert emitidos.count("juego_terminado") == 1
+    finally:
+        servidor.salas_activas.pop(sala.id_sala, None)
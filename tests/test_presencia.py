@@ -0,0 +1,54 @@
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.presencia import RegistroPresencia
+
+
+class Reloj:
+    def __init__(self):
+        self.ahora = 1000.0
+
+    def __call__(self):
+        return self.ahora
+
+
+def test_latidos_mantienen_y_el_vencimiento_sale_una_vez():
+    reloj = Reloj()
+    presencia = RegistroPresencia(ttl=60, reloj=reloj)
+    presencia.actualizar("Ana", "online", {"sid": "s1"})
+    presencia.actualizar("Beto", "in_game", {"sid": "s2", "room_id": "r"})
+
+    # Ana late; Beto no
+    vencidos = []
+    for _ in range(3):
+        reloj.ahora += 30
+        assert presencia.latido("Ana", "s1b")
+        vencidos += presencia.vencidos()
+    assert vencidos == ["Beto"]
+    assert presencia.estado("Beto") == "offline"
+    assert presencia.sid("Beto") == "s2"  # El socket puede seguir abierto
+    assert presencia.estado("Ana") == "online" and presencia.sid("Ana") == "s1b"
+
+    # Una sola entrada por usuario, aunque lata muchas veces
+    assert presencia.pendientes() == 1
+    reloj.ahora += 120
+    assert presencia.vencidos() == ["Ana"]
+    assert presencia.vencidos() == []
+    # Quien ya venció no revive con un latido, sí con un cambio de estado
+    assert not presencia.latido("Ana")
+    presencia.actualizar("Ana", "in_lobby", {"sid": "s1b", "room_id": "x"})
+    assert presencia.estado("Ana") == "in_lobby"
+    assert presencia.obtener_metricas()["vencidos"] == 2
+
+
+def test_desconexion_limpia_sid_y_no_vence_despues():
+    reloj = Reloj()
+    presencia = RegistroPresencia(ttl=60, reloj=reloj)
+    presencia.actualizar("Ana", "online", {"sid": "s1"})
+    presencia.actualizar("Ana", "offline")
+    assert presencia.sid("Ana") is None
+    reloj.ahora += 61
+    assert presencia.vencidos() == []
+    assert presencia.estado("Nadie") == "offline"
@@ -0,0 +1,91 @@
+import sys
+import os
+import random
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.ranking import RankingMaterializado, RankingsMaestria
+
+
+def test_posiciones_coinciden_con_ordenar():
+    ranking = RankingMaterializado(semilla=7)
+    azar = random.Random(3)
+    referencia = {}
+    for _ in range(2000):
+        nombre = f"J{azar.randrange(150)}"
+        if azar.random() < 0.05:
+            ranking.eliminar(nombre)
+            referencia.pop(nombre, None)
+            continue
+        level, xp = azar.randrange(1, 15), azar.randrange(0, 3000)
+        ranking.actualizar(nombre, level, xp, 1, 0)
+        referencia[nombre] = (-level, -xp, nombre)
+
+    orden = [clave[2] for clave in sorted(referencia.values())]
+    assert len(ranking) == len(orden)
+    assert [j["username"] for j in ranking.top(50)] == orden[:50]
+    for indice, nombre in enumerate(orden):
+        assert ranking.posicion(nombre) == indice + 1
+    vecinos = ranking.vecinos(orden[10], radio=2)
+    assert vecinos["posicion"] == 11
+    assert [j["username"] for j in vecinos["jugadores"]] == orden[8:13]
+    assert [j["posicion"] for j in vecinos["jugadores"]] == [9, 10, 11, 12, 13]
+    assert [j["username"] for j in ranking.vecinos(orden[0])["jugadores"]] == orden[:3]
+    assert ranking.posicion("Nadie") is None
+
+
+def test_solo_avisa_cuando_cambia_el_top():
+    avisos = []
+    ranking = RankingMaterializado(al_cambiar_top=avisos.append)
+    ranking.cargar(
+        [(f"J{i}", 10 - i, 100, 5, 1) for i in range(8)]  # J0 primero ... J7
+    )
+
+    # Subir fuera del top 5 no avisa
+    assert not ranking.actualizar("J7", 3, 500)
+    assert avisos == []
+
+    # Entrar al top 5 sí, con la lista nueva
+    assert ranking.actualizar("J6", 12, 0, 6, 2)
+    assert [j["username"] for j in avisos[-1]] == ["J6", "J0", "J1", "J2", "J3"]
+    assert avisos[-1][0]["games_played"] == 6
+
+    # Un lote (fin de partida) avisa una sola vez; lo omitido se conserva
+    ranking.actualizar_lote([("J5", 20, 0, None, None), ("J4", 19, 0, None, None)])
+    assert len(avisos) == 2
+    assert avisos[-1][0] == {
+        "username": "J5",
+        "level": 20,
+        "xp": 0,
+        "games_played": 5,
+        "games_won": 1,
+    }
+    assert ranking.obtener_metricas()["cambios_top"] == 2
+
+
+def test_rankings_de_maestria_por_kit():
+    rankings = RankingsMaestria()
+    rankings.cargar(
+        [
+            ("tactico", "Ana", 900),
+            ("tactico", "Beto", 300),
+            ("espectro", "Ana", 50),
+        ]
+    )
+
+    # Fin de partida: XP total ya confirmada
+    rankings.actualizar_lote([("tactico", "Beto", 1200), ("tactico", "Caro", 100)])
+
+    assert [j["username"] for j in rankings.top("tactico", 10)] == [
+        "Beto",
+        "Ana",
+        "Caro",
+    ]
+    assert rankings.posicion("tactico", "Ana") == {
+        "posicion": 2,
+        "xp": 900,
+        "jugadores": 3,
+    }
+    assert rankings.posicion("espectro", "Ana")["posicion"] == 1
+    assert rankings.posicion("espectro", "Beto") is None
+    assert rankings.top("inexistente", 5) == []
@@ -0,0 +1,142 @@
+import sys
+import os
+import random
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.rueda_temporizadores import RuedaTemporizadores
+
+
+class RelojFalso:
+    def __init__(self):
+        self.ahora = 1000.0
+
+    def __call__(self):
+        return self.ahora
+
+
+def test_dispara_a_tiempo_en_todos_los_niveles():
+    reloj = RelojFalso()
+    # Rueda chica (4 ranuras x 2 niveles = 1.6 s) para forzar cascadas y
+    # desborde con pocos temporizadores
+    rueda = RuedaTemporizadores(resolucion=0.1, bits=2, niveles=2, reloj=reloj)
+    azar = random.Random(7)
+    disparos = []
+    esperados = {}
+    for i in range(300):
+        retardo = azar.uniform(0.05, 12.0)
+        esperados[i] = rueda.tick_de(reloj.ahora + retardo)
+        rueda.agendar(retardo, lambda i=i: disparos.append((i, rueda._tick)))
+
+    for _ in range(130):
+        reloj.ahora += 0.1
+        rueda.avanzar()
+
+    assert sorted(i for i, _ in disparos) == list(range(300))
+    for i, tick in disparos:
+        assert tick == max(esperados[i], rueda.tick_de(1000.0) + 1)
+    assert rueda.pendientes == 0
+    assert rueda.obtener_metricas()["disparados"] == 300
+
+
+def test_cancelar_evita_el_disparo():
+    reloj = RelojFalso()
+    rueda = RuedaTemporizadores(reloj=reloj)
+    disparos = []
+    primero = rueda.agendar(5.0, disparos.append, "turno")
+    rueda.agendar(5.0, disparos.append, "revancha")
+    lejano = rueda.agendar(3600 * 24 * 30, disparos.append, "lejano")
+
+    assert primero.cancelar()
+    assert not primero.cancelar()  # Cancelar dos veces no cuenta
+    assert rueda.cancelar(lejano)
+
+    reloj.ahora += 6.0
+    rueda.avanzar()
+    assert disparos == ["revancha"]
+    metricas = rueda.obtener_metricas()
+    assert metricas["cancelados"] == 2 and metricas["pendientes"] == 0
+
+
+def test_un_error_no_detiene_al_resto():
+    reloj = RelojFalso()
+    rueda = RuedaTemporizadores(reloj=reloj)
+    disparos = []
+
+    def fallar():
+        raise RuntimeError("falla")
+
+    rueda.agendar(1.0, fallar)
+    rueda.agendar(1.0, disparos.append, "siguiente")
+    reloj.ahora += 1.5
+    assert rueda.avanzar() == 2
+    assert disparos == ["siguiente"]
+    assert rueda.obtener_metricas()["fallidos"] == 1
+
+
+def test_timeout_de_turno_usa_la_rueda_compartida():
+    import src.app as servidor
+
+    sala = servidor.SalaJuego("rueda01")
+    sala.agregar_jugador("sid_a", "Ana")
+    sala.agregar_jugador("sid_b", "Beto")
+    sala.iniciar_juego()
+    servidor.salas_activas[sala.id_sala] = sala
+    try:
+        pendientes = servidor.rueda_temporizadores.pendientes
+        servidor._iniciar_temporizador_turno(
+            sala.id_sala, sala.juego.obtener_turno_actual()
+        )
+        assert sala.turn_timer.activo
+        assert servidor.rueda_temporizadores.pendientes == pendientes + 1
+
+        servidor._cancelar_temporizador_turno(sala.id_sala)
+        assert sala.turn_timer is None
+        assert servidor.rueda_temporizadores.pendientes == pendientes
+    finally:
+        servidor._cancelar_temporizador_turno(sala.id_sala)
+        servidor.salas_activas.pop(sala.id_sala, None)
+
+
+def test_barrido_de_presencias_no_bloquea_el_ticker(monkeypatch):
+    import src.app as servidor
+    from src.core.ejecutor_db import EjecutorDB
+
+    reloj = RelojFalso()
+    rueda = RuedaTemporizadores(reloj=reloj)
+    esperas = []
+
+    def dormir(segundos):
+        esperas.append(segundos)
+        reloj.ahora += segundos
+
+    # Ejecutor sin lugar: encolar algo no descartable espera con 'dormir'
+    lleno = EjecutorDB(
+        iniciar_tarea=lambda funcion: None,
+        dormir=dormir,
+        max_cola=0,
+        espera_max=0.05,
+        reloj=reloj,
+    )
+    tareas = []
+    monkeypatch.setattr(servidor, "rueda_temporizadores", rueda)
+    monkeypatch.setattr(servidor, "ejecutor_db", lleno)
+    monkeypatch.setattr(servidor, "_temporizador_presencias", None)
+    monkeypatch.setattr(
+        servidor.socketio,
+        "start_background_task",
+        lambda funcion, *args: tareas.append((funcion, args)),
+    )
+    monkeypatch.setattr(servidor.social_system, "expire_presences", lambda: ["Ana"])
+
+    servidor._agendar_barrido_presencias()
+    reloj.ahora += servidor.PRESENCIA_BARRIDO_SEGUNDOS + 0.1
+    assert rueda.avanzar() == 1
+    # El ticker solo lanzó la tarea de fondo: no esperó a la cola llena
+    assert esperas == []
+    assert [funcion for funcion, _ in tareas] == [servidor._barrer_presencias]
+
+    # La espera (acotada) ocurre en la tarea de fondo
+    funcion, args = tareas.pop(0)
+    funcion(*args)
+    assert esperas and lleno.obtener_metricas()["esperas_cola_llena"] == 1
@@ -5,6 +5,8 @@ import json
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from sqlalchemy import event
+
 from src.app import app, socketio, social_system
 from src.models import db, User
 
@@ -73,3 +75,60 @@ def test_solicitud_rechazada(social_env):
 
         assert alice.is_friend(bob) is False
         assert bob.has_received_request_from(alice) is False
+
+
+def test_grafo_de_amigos_en_memoria(social_env):
+    with social_env.app_context():
+        social_system.invalidate_friends("Juan", "Bob")
+        social_system.send_friend_request("Juan", "Bob")
+        assert social_system.get_friends_list("Bob")["pending_received"] == ["Juan"]
+
+        sentencias = []
+
+        def contar(conn, cursor, statement, parameters, context, executemany):
+            sentencias.append(statement)
+
+        # Ya cargado: la lista y el aviso a amigos no consultan la DB
+        event.listen(db.engine, "before_cursor_execute", contar)
+        try:
+            assert social_system.get_friends_list("Bob")["friends"] == []
+            assert social_system.get_friends_list_server("Bob") == []
+        finally:
+            event.remove(db.engine, "before_cursor_execute", contar)
+        assert sentencias == []
+
+        # Aceptar invalida a los dos: la próxima lectura ya ve la amistad
+        social_system.accept_friend_request("Bob", "Juan")
+        datos = social_system.get_friends_list("Juan")
+        assert [a["username"] for a in datos["friends"]] == ["Bob"]
+        assert datos["pending_sent"] == []
+        assert social_system.get_friends_list_server("Bob") == ["Juan"]
+
+        social_system.remove_friend("Juan", "Bob")
+        assert social_system.get_friends_list_server("Bob") == []
+        assert "error" in social_system.get_friends_list("Nadie")
+
+
+def test_mensajes_por_id_sin_buscar_usuarios(social_env):
+    with social_env.app_context():
+        social_system.identidades.limpiar()
+        assert social_system.send_private_message("Juan", "Bob", "hola")["success"]
+        assert social_system.identidades.obtener_metricas()["usuarios"] == 2
+
+        sentencias = []
+
+        def contar(conn, cursor, statement, parameters, context, executemany):
+            sentencias.append(statement.split()[0].upper())
+
+        # Identidades en memoria: solo la consulta o escritura de mensajes
+        event.listen(db.engine, "before_cursor_execute", contar)
+        try:
+            social_system.send_private_message("Juan", "Bob", "¿jugamos?")
+            assert social_system.get_unread_message_count("Bob") == {"Juan": 2}
+            conversacion = social_system.get_conversation("Bob", "Juan")
+            assert social_system.mark_messages_as_read("Bob", "Juan") is True
+        finally:
+            event.remove(db.engine, "before_cursor_execute", contar)
+        assert sentencias == ["INSERT", "SELECT", "SELECT", "UPDATE"]
+        assert [m["sender"] for m in conversacion] == ["Juan", "Juan"]
+        assert social_system.get_unread_message_count("Bob") == {}
@@ -0,0 +1,119 @@
+import pytest
+import sys
+import os
+from datetime import date, datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.app import app
+from src.models import db, User, ResultadoPartida, ResumenPeriodo
+from src.core.temporadas import (
+    EstadisticasTemporada,
+    inicio_temporada,
+    inicios_de_periodo,
+)
+
+NOMBRES = ("TempA", "TempB", "TempC")
+
+
+class Reloj:
+    def __init__(self, ahora):
+        self.ahora = ahora
+
+    def __call__(self):
+        return self.ahora
+
+
+@pytest.fixture
+def db_temporadas():
+    app.config["TESTING"] = True
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///:memory:"
+
+    with app.app_context():
+        db.create_all()
+        for nombre in NOMBRES:
+            u = User(username=nombre, email=f"{nombre}@test.com")
+            u.set_password("123")
+            db.session.add(u)
+        db.session.commit()
+        ids = {u.username: u.id for u in User.query.filter(User.username.in_(NOMBRES))}
+        yield ids
+        db.session.remove()
+        db.drop_all()
+
+
+def partida(ids, ganador, xp=50):
+    return [
+        {
+            "user_id": ids[nombre],
+            "kit_id": "tactico",
+            "ganador": nombre == ganador,
+            "xp_ganada": xp + (100 if nombre == ganador else 0),
+        }
+        for nombre in NOMBRES
+    ]
+
+
+def test_inicios_de_periodo():
+    # Miércoles 18/02: semana desde el lunes 16, temporada desde enero
+    assert inicios_de_periodo(date(2026, 2, 18)) == {
+        "dia": date(2026, 2, 18),
+        "semana": date(2026, 2, 16),
+        "temporada": date(2026, 1, 1),
+    }
+    assert inicio_temporada(date(2026, 12, 31)) == date(2026, 10, 1)
+
+
+def test_resumenes_suman_y_ranking_por_periodo(db_temporadas):
+    reloj = Reloj(datetime(2026, 5, 11, 20, 0))  # Lunes
+    temporadas = EstadisticasTemporada(reloj=reloj)
+
+    temporadas.registrar(partida(db_temporadas, "TempA"))
+    reloj.ahora = datetime(2026, 5, 12, 9, 0)
+    temporadas.registrar(partida(db_temporadas, "TempB"))
+    temporadas.registrar(partida(db_temporadas, "TempB"))
+    db.session.commit()
+
+    assert ResultadoPartida.query.count() == 9
+    # Una fila por período y jugador, no por partida
+    assert ResumenPeriodo.query.count() == 2 * 3 + 3 * 2
+
+    hoy = temporadas.ranking("dia", "games_won")["jugadores"]
+    assert [(j["username"], j["games_won"]) for j in hoy][:2] == [
+        ("TempB", 2),
+        ("TempA", 0),
+    ]
+    semana = temporadas.ranking("semana", "xp_ganada")["jugadores"]
+    assert semana[0] == {
+        "posicion": 1,
+        "username": "TempB",
+        "games_played": 3,
+        "games_won": 2,
+        "xp_ganada": 3 * 50 + 2 * 100,
+    }
+    ayer = temporadas.ranking("dia", "games_won", fecha=date(2026, 5, 11))
+    assert ayer["inicio"] == "2026-05-11"
+    assert ayer["jugadores"][0]["username"] == "TempA"
+    assert len(temporadas.ranking("temporada", "games_played", n=2)["jugadores"]) == 2
+    assert "error" in temporadas.ranking("mes", "games_won")
+    assert "error" in temporadas.ranking("dia", "password_hash")
+
+
+def test_compactar_conserva_solo_la_temporada_cerrada(db_temporadas):
+    reloj = Reloj(datetime(2026, 3, 30, 12, 0))  # Lunes; la semana cruza a abril
+    temporadas = EstadisticasTemporada(reloj=reloj)
+    temporadas.registrar(partida(db_temporadas, "TempA"))
+    reloj.ahora = datetime(2026, 4, 2, 12, 0)
+    temporadas.registrar(partida(db_temporadas, "TempC"))
+    db.session.commit()
+
+    compactado = temporadas.compactar()
+    # Historial y días de marzo fuera; la semana del 30/03 sigue en curso
+    assert compactado == {"resultados": 3, "resumenes": 3}
+    assert temporadas.compactar() == {"resultados": 0, "resumenes": 0}
+
+    primera = temporadas.ranking("temporada", "games_won", fecha=date(2026, 3, 1))
+    assert primera["jugadores"][0]["username"] == "TempA"
+    semana = temporadas.ranking("semana", "games_played")["jugadores"]
+    assert all(j["games_played"] == 2 for j in semana)
+    assert temporadas.obtener_metricas()["filas_compactadas"] == 6